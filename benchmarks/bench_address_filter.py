@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+地址 Bloom 过滤器基准测试
+
+不存在的地址 (垃圾消息、写错的地址) 的查询开销：SQLite 上的主键查询 (代表持久化
+存储，不含网络往返) 对比先查 Bloom 过滤器，以及 GET /api/v1/resolve 完整请求。
+同时报告实测误判率和过滤器占用的内存。
+
+Usage:
+    python benchmarks/bench_address_filter.py [--agents 100000] [--number 100000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+import app as provider
+from bloom import BloomFilter
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3))
+    print(f"{name:<40} {seconds / number * 1e6:8.3f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=100000, help="registered agents")
+    parser.add_argument("--number", type=int, default=100000, help="iterations per case")
+    args = parser.parse_args()
+
+    addresses = [f"ai:agent{i}~main#localhost" for i in range(args.agents)]
+    unknown = [f"ai:spam{i}~main#localhost" for i in range(args.number)]
+
+    sql = sqlite3.connect(":memory:")
+    sql.execute("CREATE TABLE agents (aap_address TEXT PRIMARY KEY, owner_role TEXT)")
+    sql.executemany("INSERT INTO agents VALUES (?, ?)", ((a, a[3:].split("#")[0]) for a in addresses))
+    bloom = BloomFilter.build(addresses + [a[3:].split("#")[0] for a in addresses])
+    print(f"{args.agents} agents, filter {bloom.size // 8 / 1024:.0f} KiB, {bloom.hashes} hashes")
+
+    probes = iter(unknown * 4)
+    query = "SELECT 1 FROM agents WHERE aap_address = ?"
+    bench("sqlite primary key miss", lambda: sql.execute(query, (next(probes),)).fetchone(), args.number)
+    probes = iter(unknown * 4)
+    bench("bloom filter miss", lambda: next(probes) in bloom, args.number)
+    probes = iter(addresses * 4)
+    bench("bloom filter hit", lambda: next(probes) in bloom, args.number)
+
+    false_positives = sum(address in bloom for address in unknown)
+    print(f"false positives: {false_positives}/{len(unknown)} ({false_positives / len(unknown):.4%})")
+
+    # 完整请求，作为参照
+    provider.db = provider.InMemoryDB()
+    provider.admission = None
+    provider.app.config["TESTING"] = True
+    client = provider.app.test_client()
+    bench("GET /api/v1/resolve unknown (full request)",
+          lambda: client.get("/api/v1/resolve?address=ai:spam~main%23localhost"), max(args.number // 100, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+API Key 认证开销基准测试
+
+对比明文字典查找 (旧实现)、哈希前缀索引查找 (缓存未命中) 和缓存命中三条路径，
+以及一次完整的 GET /api/v1/inbox 请求。
+
+Usage:
+    python benchmarks/bench_auth.py [--keys 10000] [--number 100000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+import app as provider
+from auth import hash_api_key
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3))
+    print(f"{name:<36} {seconds / number * 1e6:8.3f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=10000, help="registered agents")
+    parser.add_argument("--number", type=int, default=100000, help="iterations per case")
+    args = parser.parse_args()
+
+    db = provider.InMemoryDB()
+    keys = [db.register_agent(f"ai:agent{i}~main#localhost", "bench")["api_key"]
+            for i in range(args.keys)]
+    api_key = keys[len(keys) // 2]
+
+    # 旧实现：{api_key: owner_role}
+    plaintext = {k: db.verify_api_key(k) for k in keys}
+    bench("plaintext dict lookup (legacy)", lambda: plaintext.get(api_key), args.number)
+
+    api_key_hash = hash_api_key(api_key)
+    bench("hash only", lambda: hash_api_key(api_key), args.number)
+    bench("hashed prefix lookup (cache miss)", lambda: db.lookup_api_key(api_key), args.number)
+
+    cache = provider.AuthCache()
+    cache.put(api_key_hash, db.lookup_api_key(api_key))
+    bench("hash + cache hit", lambda: cache.get(hash_api_key(api_key)), args.number)
+
+    # 完整请求，作为参照
+    provider.db = db
+    provider.app.config["TESTING"] = True
+    client = provider.app.test_client()
+    headers = {"Authorization": f"Bearer {api_key}"}
+    bench("GET /api/v1/inbox (full request)",
+          lambda: client.get("/api/v1/inbox", headers=headers), max(args.number // 100, 1))
+
+
+if __name__ == "__main__":
+    main()
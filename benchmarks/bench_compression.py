@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+传输压缩基准测试
+
+对比 identity / gzip / zstd 在典型消息体和收件箱响应上的传输字节数与 CPU 时间。
+zstd 需要安装 zstandard。
+
+Usage:
+    python benchmarks/bench_compression.py [--number 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+from compression import SUPPORTED_ENCODINGS, compress, decompress
+
+WORDS = ("agent", "novel", "chapter", "provider", "message", "inbox", "the", "a",
+         "resolve", "address", "story", "reply", "public", "feed", "protocol")
+
+
+def markdown_payload(size):
+    rnd = random.Random(42)
+    lines = []
+    while sum(len(l) for l in lines) < size:
+        lines.append("## " + " ".join(rnd.choice(WORDS) for _ in range(6)))
+        lines.append(" ".join(rnd.choice(WORDS) for _ in range(40)))
+    return "\n".join(lines)[:size]
+
+
+def json_payload(size):
+    rnd = random.Random(7)
+    rows = []
+    while len(json.dumps(rows)) < size:
+        rows.append({"id": rnd.randrange(10 ** 9), "tag": rnd.choice(WORDS), "score": rnd.random()})
+    return json.dumps(rows)
+
+
+def message(content, content_type):
+    return {
+        "envelope": {
+            "from_addr": "ai:alice~main#provider.com",
+            "to_addr": "ai:tom~novel#molten.com",
+            "message_type": "private",
+            "content_type": content_type,
+            "timestamp": "2026-01-01T00:00:00Z",
+        },
+        "payload": {"content": content},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="iterations per case")
+    args = parser.parse_args()
+
+    cases = {}
+    for size in (1024, 16 * 1024, 256 * 1024):
+        cases[f"send text/markdown {size // 1024}KB"] = message(markdown_payload(size), "text/markdown")
+        cases[f"send application/json {size // 1024}KB"] = message(json_payload(size), "application/json")
+    inbox = [message(markdown_payload(4096), "text/markdown") for _ in range(20)]
+    cases["inbox 20 x 4KB"] = {"messages": inbox, "count": len(inbox)}
+
+    print(f"{'case':<32} {'encoding':<9} {'bytes':>10} {'ratio':>7} {'compress':>12} {'decompress':>12}")
+    for name, body in cases.items():
+        raw = json.dumps(body).encode("utf-8")
+        print(f"{name:<32} {'identity':<9} {len(raw):>10} {1.0:>7.2f}")
+        for encoding in SUPPORTED_ENCODINGS:
+            data = compress(raw, encoding)
+            c = min(timeit.repeat(lambda: compress(raw, encoding), number=args.number, repeat=3))
+            d = min(timeit.repeat(lambda: decompress(data, encoding, len(raw)), number=args.number, repeat=3))
+            print(f"{'':<32} {encoding:<9} {len(data):>10} {len(raw) / len(data):>7.2f} "
+                  f"{c / args.number * 1e6:>9.1f} us {d / args.number * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Feed 扩散基准测试
+
+- 向 N 个粉丝发布：写扩散 (fan-out-on-write) vs 读扩散 (fan-out-on-read)
+- 粉丝读取时间线：关注 M 个作者时归并的开销
+
+Usage:
+    python benchmarks/bench_feed.py [--followers 10000] [--posts 100]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+from feed import FeedStore
+
+
+def post(i):
+    return {
+        "envelope": {"from_addr": "ai:star~main#provider.com", "to_addr": "ai:feed~public#provider.com",
+                     "message_type": "public", "content_type": "text/plain"},
+        "payload": {"content": f"post {i} " + "x" * 200},
+    }
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--followers", type=int, default=10000)
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--authors", type=int, default=50, help="authors followed by the reader")
+    args = parser.parse_args()
+
+    print(f"publish to {args.followers} followers ({args.posts} posts)")
+    for mode, threshold in (("fan-out-on-write", args.followers), ("fan-out-on-read", 0)):
+        store = FeedStore(fanout_threshold=threshold)
+        for i in range(args.followers):
+            store.follow(f"reader{i}~main", "star")
+        per_post = timed(lambda i: store.publish("star", post(i)), args.posts)
+        per_read = timed(lambda i: store.timeline(f"reader{i % args.followers}~main", limit=20), 1000)
+        print(f"  {mode:<18} publish {per_post * 1e3:9.3f} ms/post   read {per_read * 1e6:8.1f} us/page")
+
+    print(f"\nreader following {args.authors} authors, {args.posts} posts each")
+    for mode, threshold in (("fan-out-on-write", 10 ** 9), ("fan-out-on-read", 0), ("hybrid", 1)):
+        store = FeedStore(fanout_threshold=threshold)
+        for a in range(args.authors):
+            store.follow("reader~main", f"author{a}")
+            if a % 2:  # 一半作者有第二个粉丝，hybrid 下走读扩散
+                store.follow("other~main", f"author{a}")
+        for i in range(args.posts):
+            for a in range(args.authors):
+                store.publish(f"author{a}", post(i))
+        per_read = timed(lambda i: store.timeline("reader~main", limit=20), 1000)
+        print(f"  {mode:<18} read {per_read * 1e6:8.1f} us/page")
+
+
+if __name__ == "__main__":
+    main()
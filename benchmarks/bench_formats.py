@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+消息体格式基准测试：JSON vs MessagePack vs CBOR
+
+- 单条消息 (POST /api/v1/inbox 的请求体) 和 20 条消息的收件箱响应
+- 每种格式的编码时间、解码时间和字节数；另报告 gzip 之后的字节数
+  ("checked" 是 Provider 解码请求体的路径，多一次数据类型检查)
+- Provider 端 GET /api/v1/inbox 完整请求：JSON (拼接预编码记录) vs 转码为二进制
+
+Usage:
+    python benchmarks/bench_formats.py [--number 20000] [--content-size 200]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'provider', 'python-flask'))
+
+import app as provider
+import codec
+import formats
+
+
+def timed(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def codecs():
+    yield "json (stdlib)", lambda o: json.dumps(o, separators=(",", ":"), ensure_ascii=False).encode(), json.loads
+    if codec.orjson:
+        yield "json (orjson)", codec.orjson.dumps, codec.orjson.loads
+    if formats.msgpack:
+        yield "msgpack", lambda o: formats.msgpack.packb(o, use_bin_type=True), formats.msgpack.unpackb
+    if formats.cbor2:
+        yield "cbor", formats.cbor2.dumps, formats.cbor2.loads
+    # Provider 解码请求体时还要检查只含 JSON 类型 (formats.decode)
+    for mime in formats.BINARY_FORMATS:
+        name = mime.split("/")[1] + " (checked)"
+        yield name, (lambda o, m=mime: formats.encode(o, m)), (lambda d, m=mime: formats.decode(d, m))
+
+
+def compare(title, obj, number):
+    print(f"\n{title}")
+    print(f"  {'format':<18} {'bytes':>7} {'gzip':>7} {'encode us':>10} {'decode us':>10}")
+    for name, dumps, loads in codecs():
+        data = dumps(obj)
+        assert loads(data) == json.loads(json.dumps(obj))
+        print(f"  {name:<18} {len(data):7d} {len(gzip.compress(data)):7d} "
+              f"{timed(lambda: dumps(obj), number):10.2f} {timed(lambda: loads(data), number):10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="iterations per case")
+    parser.add_argument("--content-size", type=int, default=200, help="message text length")
+    args = parser.parse_args()
+    if not formats.BINARY_FORMATS:
+        print("neither msgpack nor cbor2 is installed; only JSON is available")
+
+    message = {
+        "envelope": {
+            "from_addr": "ai:alice~main#provider.com", "to_addr": "ai:tom~novel#molten.com",
+            "message_type": "private", "content_type": "text/plain", "timestamp": "2026-01-01T00:00:00Z",
+        },
+        "payload": {"content": "x" * args.content_size, "metadata": {"lang": "en", "seq": 12345, "score": 0.75}},
+    }
+    compare("one message (request body)", message, args.number)
+
+    db = provider.InMemoryDB()
+    db.register_agent("ai:tom~novel#localhost", "bench")
+    for _ in range(20):
+        db.add_message("tom~novel", {"envelope": dict(message["envelope"]), "payload": dict(message["payload"])})
+    inbox = codec.loads(codec.list_object("messages", db.get_encoded_messages("tom~novel", 20)))
+    compare("inbox response (20 messages)", inbox, args.number // 10)
+
+    provider.db = db
+    provider.admission = None
+    provider.app.config["TESTING"] = True
+    client = provider.app.test_client()
+    api_key = db.create_api_key("tom~novel")
+    print("\nGET /api/v1/inbox (full request, provider side)")
+    for mime in [formats.JSON] + formats.BINARY_FORMATS:
+        headers = {"Authorization": f"Bearer {api_key}", "Accept": mime}
+        assert client.get("/api/v1/inbox", headers=headers).mimetype == mime
+        us = timed(lambda: client.get("/api/v1/inbox", headers=headers), max(args.number // 100, 1))
+        print(f"  {mime:<24} {us:8.1f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+收件箱过滤查询基准测试
+
+同一个收件箱里按发件人 / reply_to / 正文关键词过滤：
+- scan：逐条解码再判断（没有索引时客户端或服务端只能这样做）
+- index：Inbox.query 走二级索引
+
+Usage:
+    python benchmarks/bench_inbox_query.py [--messages 100000] [--senders 1000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+from records import Inbox, MessageRecord
+
+WORDS = ["draft", "chapter", "review", "plot", "character", "ending", "outline", "scene"]
+
+
+def build(n, senders):
+    inbox = Inbox(fulltext=True)
+    for i in range(n):
+        content = f"{WORDS[i % len(WORDS)]} {WORDS[i * 7 % len(WORDS)]} note {i}"
+        envelope = {
+            "from_addr": f"ai:agent{i % senders}~main#other.com",
+            "to_addr": "ai:tom~novel#provider.com",
+            "message_type": "private",
+            "reply_to": f"m-{i // 10}" if i % 3 else None,
+        }
+        inbox.add(MessageRecord.create(envelope, {"content": content}), content)
+    return inbox
+
+
+def scan(inbox, limit, predicate):
+    matched = []
+    for record in reversed(inbox.records):
+        if predicate(record.to_dict()):
+            matched.append(record)
+            if len(matched) == limit:
+                break
+    return matched[::-1]
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"  {name:<36} {seconds * 1e6:10.1f} us/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--senders", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    inbox = build(args.messages, args.senders)
+    rare_sender = "ai:agent7~main#other.com"
+    old_thread = "m-42"
+    print(f"{args.messages} messages, {args.senders} senders")
+
+    cases = [
+        ("from_addr (rare sender)", {"from_addr": rare_sender},
+         lambda m: m["envelope"]["from_addr"] == rare_sender),
+        ("reply_to (old thread)", {"reply_to": old_thread},
+         lambda m: m["envelope"].get("reply_to") == old_thread),
+        ("q=plot ending", {"text": "plot ending"},
+         lambda m: "plot" in m["payload"]["content"] and "ending" in m["payload"]["content"]),
+    ]
+    for name, filters, predicate in cases:
+        assert inbox.query(20, **filters)[0] == scan(inbox, 20, predicate)
+        bench(f"{name}: scan", lambda: scan(inbox, 20, predicate), max(1, args.number // 10))
+        bench(f"{name}: index", lambda: inbox.query(20, **filters), args.number * 50)
+
+
+if __name__ == "__main__":
+    main()
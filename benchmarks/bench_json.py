@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化路径基准测试
+
+- SDK：asdict() 构造信封 vs 直接构造；标准库 json vs orjson 编码请求体
+- Provider：GET /api/v1/inbox 逐条 jsonify vs 编码信封后拼接预编码 payload
+
+Usage:
+    python benchmarks/bench_json.py [--number 20000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from dataclasses import asdict
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'sdk', 'python'))
+sys.path.insert(0, os.path.join(ROOT, 'provider', 'python-flask'))
+
+from aap import MessageEnvelope, MessagePayload, _json
+import app as provider
+import codec
+
+
+def bench(name, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3))
+    print(f"{name:<44} {seconds / number * 1e6:8.2f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="iterations per case")
+    args = parser.parse_args()
+    n = args.number
+
+    print(f"orjson: {'yes' if codec.orjson else 'no (stdlib json fallback)'}")
+
+    env = MessageEnvelope(from_addr="ai:alice~main#provider.com", to_addr="ai:tom~novel#molten.com")
+    payload = MessagePayload(content="Hello! " * 50, metadata={"lang": "en"})
+    bench("envelope via asdict()", lambda: {k: v for k, v in asdict(env).items() if v is not None}, n)
+    bench("envelope via to_dict()", env.to_dict, n)
+
+    body = {"envelope": env.to_dict(), "payload": payload.to_dict()}
+    bench("encode body: json.dumps", lambda: json.dumps(body).encode("utf-8"), n)
+    bench("encode body: aap._json.dumps", lambda: _json.dumps(body), n)
+
+    # Provider 收件箱
+    db = provider.InMemoryDB()
+    for _ in range(100):
+        db.add_message("tom~novel", {"envelope": dict(body["envelope"]), "payload": dict(body["payload"])})
+    provider.app.config["TESTING"] = True
+
+    with provider.app.app_context():
+        def legacy():
+            messages = db.get_messages("tom~novel", 20)
+            return json.dumps({"messages": messages, "count": len(messages)})
+
+        def spliced():
+            encoded = db.get_encoded_messages("tom~novel", 20)
+            return b'{"messages":' + codec.join_array(encoded) + b',"count":' + str(len(encoded)).encode() + b'}'
+
+        bench("inbox(20): json.dumps per request", legacy, n // 10)
+        bench("inbox(20): jsonify per request", lambda: provider.jsonify(
+            {"messages": db.get_messages("tom~novel", 20), "count": 20}), n // 10)
+        bench("inbox(20): splice encoded records", spliced, n // 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+收件箱内存占用基准测试
+
+对比每条已存储消息占用的字节数：
+- dict：原来的存法，嵌套 dict + 预编码 JSON bytes
+- record：records.MessageRecord（__slots__、字符串驻留、整数编码）
+
+消息从 JSON 解析而来（与真实请求一样，每条消息的字符串都是独立对象），
+发件人从 --senders 个地址里轮换。
+
+Usage:
+    python benchmarks/bench_memory.py [--messages 100000] [--content-size 100]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+import codec
+from records import Inbox, MessageRecord
+
+
+def request_bodies(n, senders, content_size):
+    for i in range(n):
+        body = {
+            "envelope": {
+                "from_addr": f"ai:agent{i % senders}~main#other-provider.com",
+                "to_addr": "ai:tom~novel#provider.com",
+                "message_type": "private",
+                "content_type": "text/plain",
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+            },
+            "payload": {"content": "x" * content_size, "metadata": {}},
+        }
+        yield codec.loads(codec.dumps(body))
+
+
+def store_dict(inbox, message):
+    message["id"] = str(uuid.uuid4())
+    message["received_at"] = datetime.utcnow().isoformat() + "Z"
+    inbox.setdefault("_list", []).append(message)
+    inbox.setdefault("_encoded", []).append(codec.dumps(message))
+
+
+def store_record(inbox, message):
+    inbox.records.append(MessageRecord.create(message["envelope"], message["payload"]))
+
+
+def measure(make_inbox, store, args):
+    gc.collect()
+    tracemalloc.start()
+    inbox = make_inbox()
+    for message in request_bodies(args.messages, args.senders, args.content_size):
+        store(inbox, message)
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / args.messages, inbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--content-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages, {args.senders} senders, {args.content_size}B content, "
+          f"orjson: {'yes' if codec.orjson else 'no'}")
+    before, _ = measure(dict, store_dict, args)
+    after, _ = measure(Inbox, store_record, args)
+    print(f"  {'dict + encoded':<16} {before:8.0f} bytes/message")
+    print(f"  {'MessageRecord':<16} {after:8.0f} bytes/message  ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
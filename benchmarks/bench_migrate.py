@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+导出 / 导入基准测试 (NDJSON)
+
+把 --agents 个 Agent、共 --messages 条消息导出成 NDJSON，再导入一个空的 InMemoryDB，
+报告消息/秒、导出大小和导出过程中的内存峰值 (tracemalloc，不含已有数据)。
+另测一次经过 HTTP 接口 (测试客户端) 的完整导出和导入。
+
+Usage:
+    python benchmarks/bench_migrate.py [--agents 1000] [--messages 1000000] [--batch-size 5000]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+import app as provider
+import migrate
+
+
+def populate(agents, messages):
+    db = provider.InMemoryDB()
+    roles = [f"agent{i}~main" for i in range(agents)]
+    for role in roles:
+        db.register_agent(f"ai:{role}#localhost", "bench")
+    for n in range(messages):
+        role = roles[n % agents]
+        db.add_message(role, {
+            "envelope": {"from_addr": "ai:amy~main#other.com", "to_addr": f"ai:{role}#localhost",
+                         "message_type": "private", "content_type": "text/plain"},
+            "payload": {"content": f"message {n} " + "x" * 100},
+        })
+    return db
+
+
+def report(name, messages, seconds, extra=""):
+    print(f"{name:<32} {seconds:7.2f} s {messages / seconds:12,.0f} messages/s {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=1000, help="agents (inboxes)")
+    parser.add_argument("--messages", type=int, default=1000000, help="messages in total")
+    parser.add_argument("--batch-size", type=int, default=migrate.IMPORT_BATCH_SIZE, help="import batch size")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    source = populate(args.agents, args.messages)
+    print(f"populated {args.agents} agents / {args.messages} messages in {time.perf_counter() - start:.1f} s")
+
+    # 导出：逐块丢弃，只统计大小；另跑一遍 tracemalloc 看内存峰值 (应与数据量无关)
+    export = lambda: sum(len(chunk) for chunk in migrate.chunked(migrate.export_lines(source, "localhost")))
+    start = time.perf_counter()
+    size = export()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    export()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    report("export (streamed)", args.messages, seconds,
+           f"{size / 2**20:8.1f} MiB, peak {peak / 2**20:.1f} MiB")
+
+    data = b"".join(migrate.export_lines(source, "localhost"))
+    target = provider.InMemoryDB()
+    start = time.perf_counter()
+    stats = migrate.import_lines(target, migrate.iter_lines(io.BytesIO(data)), args.batch_size)
+    report(f"import (batch {args.batch_size})", args.messages, time.perf_counter() - start)
+    assert stats["messages"] == args.messages and stats["agents"] == args.agents
+
+    # 完整 HTTP 请求 (测试客户端，不经过网络)
+    os.environ["ADMIN_TOKEN"] = "bench"
+    provider.admission = None
+    provider.app.config["TESTING"] = True
+    client = provider.app.test_client()
+    headers = {"Authorization": "Bearer bench"}
+    provider.db = source
+    start = time.perf_counter()
+    body = client.get("/api/v1/admin/export", headers=headers).data
+    report("GET /api/v1/admin/export", args.messages, time.perf_counter() - start)
+    provider.db = provider.InMemoryDB()
+    start = time.perf_counter()
+    r = client.post("/api/v1/admin/import", data=body, headers=headers)
+    report("POST /api/v1/admin/import", args.messages, time.perf_counter() - start)
+    assert r.get_json()["messages"] == args.messages
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Agent 注册基准测试：逐个注册 vs 批量注册
+
+注册 --agents 个 Agent 的注册/秒：每个 Agent 一次 POST /api/agent/register，
+对比 POST /api/agent/register:batch (不同批大小，逐项和 atomic 两种模式)。
+用 Flask 测试客户端，不经过网络，所以批量的收益在真实部署里还要加上省掉的往返。
+
+Usage:
+    python benchmarks/bench_register.py [--agents 10000] [--batch-sizes 100,1000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+import app as provider
+
+
+def run(name, agents, register):
+    """Register agents into a fresh store and print registrations/s."""
+    provider.db = provider.InMemoryDB()
+    provider.auth_cache.clear()
+    start = time.perf_counter()
+    register()
+    seconds = time.perf_counter() - start
+    assert len(provider.db.agents) == agents, f"{name}: registered {len(provider.db.agents)}"
+    print(f"{name:<36} {seconds:7.3f} s {agents / seconds:10,.0f} registrations/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=10000, help="agents to register")
+    parser.add_argument("--batch-sizes", default="100,1000", help="comma-separated batch sizes")
+    args = parser.parse_args()
+
+    provider.admission = None
+    provider.app.config["TESTING"] = True
+    provider.REGISTER_BATCH_MAX = max(provider.REGISTER_BATCH_MAX, *map(int, args.batch_sizes.split(",")))
+    client = provider.app.test_client()
+    items = [{"aap_address": f"ai:agent{i}~main#localhost", "model": "bench"} for i in range(args.agents)]
+
+    def one_by_one():
+        for item in items:
+            assert client.post("/api/agent/register", json=item).status_code == 201
+
+    run("POST /api/agent/register x N", args.agents, one_by_one)
+
+    for size in map(int, args.batch_sizes.split(",")):
+        for atomic in (False, True):
+            def batched():
+                for i in range(0, len(items), size):
+                    r = client.post("/api/agent/register:batch", json={"agents": items[i:i + size], "atomic": atomic})
+                    assert r.status_code == 200
+
+            run(f"register:batch ({size}{', atomic' if atomic else ''})", args.agents, batched)
+
+    # 存储本身 (生成 key、哈希、建收件箱)，作为下限参照
+    registrations = [(item["aap_address"], "bench", "", "") for item in items]
+    run("InMemoryDB.register_agents", args.agents, lambda: provider.db.register_agents(registrations))
+
+
+if __name__ == "__main__":
+    main()
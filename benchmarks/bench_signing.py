@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+消息签名基准测试
+
+- sign：SigningKey.sign（规范化 JSON + Ed25519 签名）
+- canonical：只做规范化，看 JSON 占签名/验签多少
+- verify：逐条 verify，每次重新解析公钥
+- verify_batch：一次验证一批收件箱消息，同一发送方的公钥只解析一次
+
+Usage:
+    python benchmarks/bench_signing.py [--messages 1000] [--senders 10] [--size 200]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sdk', 'python'))
+
+from aap import MessageEnvelope, SigningKey
+from aap import signing
+
+
+def build(n, senders, size):
+    keys = [SigningKey.generate() for _ in range(senders)]
+    items = []
+    for i in range(n):
+        key = keys[i % senders]
+        envelope = MessageEnvelope(from_addr=f"ai:agent{i % senders}~main#other.com",
+                                   to_addr="ai:tom~novel#provider.com").to_dict()
+        payload = {"content": "x" * size, "metadata": {"n": i}}
+        envelope["signature"] = key.sign(envelope, payload)
+        items.append((key.public_key, envelope, payload))
+    return keys, items
+
+
+def verify_uncached(items):
+    for public_key, envelope, payload in items:
+        signing._load_public_key.cache_clear()
+        signing.verify(public_key, envelope, payload)
+
+
+def bench(name, fn, count, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f"  {name:<28} {seconds / count * 1e6:8.1f} us/msg  {count / seconds:10.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--senders", type=int, default=10)
+    parser.add_argument("--size", type=int, default=200, help="content bytes per message")
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+
+    keys, items = build(args.messages, args.senders, args.size)
+    n = len(items)
+    print(f"{n} messages, {args.senders} senders, {args.size}B content")
+
+    assert all(signing.verify_batch(items))
+    key = keys[0]
+    bench("canonical", lambda: [signing.canonical_bytes(e, p) for _, e, p in items], n, args.number)
+    bench("sign", lambda: [key.sign(e, p) for _, e, p in items], n, args.number)
+    bench("verify (key parsed each time)", lambda: verify_uncached(items), n, args.number)
+    bench("verify_batch", lambda: signing.verify_batch(items), n, args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Webhook 推送 vs 轮询基准测试
+
+消息按泊松过程到达同一个 Agent (--rate 条/秒，持续 --duration 秒)：
+
+- webhook：WebhookDispatcher 推送到本地 HTTP 接收端，统计 POST 次数和从提交到
+  接收端收到的延迟
+- poll：同一到达序列下每 --poll-interval 秒 GET /api/v1/inbox 一次，统计请求次数
+  和从到达到被取走的延迟 (按零耗时请求计算，是轮询的下界)
+
+Usage:
+    python benchmarks/bench_webhooks.py [--rate 200] [--duration 5] [--window 0.05] [--poll-interval 1]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+from common import percentile
+from relay import HTTPTransport
+from webhooks import WebhookDispatcher
+
+
+class Receiver(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    posts = 0
+    latencies = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        now = time.perf_counter()
+        messages = json.loads(body)["messages"]
+        Receiver.posts += 1
+        Receiver.latencies.extend(now - m["sent"] for m in messages)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def arrivals(rate, duration, seed=1):
+    rng = random.Random(seed)
+    t, times = 0.0, []
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+def report(name, requests, latencies, duration):
+    values = sorted(latencies)
+    print(f"  {name:<24} {requests:6d} requests ({requests / duration:6.1f}/s)  "
+          f"latency p50 {percentile(values, 50) * 1e3:7.1f} ms  p99 {percentile(values, 99) * 1e3:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=200, help="messages per second")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--window", type=float, default=0.05, help="webhook coalescing window (s)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    times = arrivals(args.rate, args.duration)
+    print(f"{len(times)} messages over {args.duration}s ({args.rate}/s)")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+
+    for window in (0, args.window):
+        Receiver.posts, Receiver.latencies = 0, []
+        hooks = WebhookDispatcher(HTTPTransport(allow_private=True), window=window)
+        start = time.perf_counter()
+        for t in times:
+            delay = start + t - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            message = json.dumps({"sent": time.perf_counter(), "payload": {"content": "x" * 100}}).encode()
+            hooks.submit("ai:tom~novel#localhost", url, "secret", message)
+        hooks.flush(30)
+        report(f"webhook window={window * 1e3:.0f}ms", Receiver.posts, Receiver.latencies, args.duration)
+
+    polls = int(args.duration / args.poll_interval) + 1
+    poll_latencies = [(int(t / args.poll_interval) + 1) * args.poll_interval - t for t in times]
+    report(f"poll every {args.poll_interval}s", polls, poll_latencies, args.duration)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
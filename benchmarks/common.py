@@ -0,0 +1,83 @@
+"""
+基准测试公共工具：延迟统计、结果文件读写。
+
+结果文件是 JSON，结构为:
+    {
+        "benchmark": "loadtest",
+        "meta": {"commit": "...", "python": "3.11.7", "timestamp": "...", "args": {...}},
+        "results": {"<case>": {"ops_per_sec": ..., "p50_ms": ..., ...}}
+    }
+compare.py 按 case 名对比两个结果文件。
+"""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Summarize per-operation latencies (seconds) measured over `elapsed` seconds."""
+    values = sorted(latencies)
+    n = len(values)
+    return {
+        "ops": n,
+        "errors": errors,
+        "ops_per_sec": round(n / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / n * 1e3, 3) if n else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1e3, 3),
+        "p95_ms": round(percentile(values, 95) * 1e3, 3),
+        "p99_ms": round(percentile(values, 99) * 1e3, 3),
+        "max_ms": round(values[-1] * 1e3, 3) if n else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(benchmark, results, args, path=None):
+    """Write a result file and return its path."""
+    commit = git_commit()
+    now = datetime.utcnow()
+    data = {
+        "benchmark": benchmark,
+        "meta": {
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": now.isoformat() + "Z",
+            "args": args,
+        },
+        "results": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{benchmark}-{now:%Y%m%dT%H%M%S}-{commit}.json")
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
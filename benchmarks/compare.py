@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+对比两个基准测试结果文件
+
+Usage:
+    python benchmarks/compare.py baseline.json current.json [--threshold 10]
+
+按 case 列出 ops/s 与 p99 的变化；任何 case 吞吐下降或 p99 上升超过
+threshold% 时以非零状态退出，可用于 CI 回归检查。
+"""
+
+import argparse
+import sys
+
+from common import load_results
+
+# (指标, 数值越大越好)
+METRICS = (("ops_per_sec", True), ("p99_ms", False), ("ns_per_op", False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    base = load_results(args.baseline)
+    cur = load_results(args.current)
+    print(f"baseline {base['meta']['commit']}  ->  current {cur['meta']['commit']}\n")
+
+    regressions = []
+    for case in sorted(set(base["results"]) & set(cur["results"])):
+        for metric, higher_is_better in METRICS:
+            if metric not in base["results"][case] or metric not in cur["results"][case]:
+                continue
+            old, new = base["results"][case][metric], cur["results"][case][metric]
+            if not old:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > args.threshold else ""
+            if flag:
+                regressions.append((case, metric))
+            print(f"{case:<40} {metric:<12} {old:>12.3f} -> {new:>12.3f} ({change:+6.1f}%) {flag}")
+
+    for case in sorted(set(base["results"]) ^ set(cur["results"])):
+        print(f"{case:<40} only in {'baseline' if case in base['results'] else 'current'}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+AAP 负载测试
+
+在本地启动两个 Provider 进程 (local / remote)，用 SDK 驱动
+register / resolve / send / send_remote / fetch 负载，报告 p50/p95/p99 延迟和 ops/s，
+结果写入 benchmarks/results/ 下的 JSON 文件，可用 compare.py 对比不同提交。
+
+Usage:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --workloads send,fetch --concurrency 1,8,32 \\
+        --payload-sizes 100,10000 --duration 10
+    python benchmarks/loadtest.py --provider-url http://localhost:5000   # 使用已启动的 Provider
+"""
+
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import ROOT, summarize, write_results
+
+sys.path.insert(0, os.path.join(ROOT, "sdk", "python"))
+
+from aap import AAPClient
+
+PROVIDER_APP = os.path.join(ROOT, "provider", "python-flask", "app.py")
+WORKLOADS = ("register", "resolve", "send", "send_remote", "fetch")
+
+
+class ProviderProcess:
+    """A provider app.py subprocess listening on localhost:<port>."""
+
+    def __init__(self, port):
+        self.port = port
+        self.host = f"localhost:{port}"
+        self.url = f"http://{self.host}"
+        self._blob_dir = tempfile.TemporaryDirectory(prefix="aap-bench-")
+        self._proc = None
+
+    def __enter__(self):
+        env = dict(os.environ, PORT=str(self.port), BLOB_DIR=self._blob_dir.name, ALLOW_PRIVATE_TARGETS="true")
+        self._proc = subprocess.Popen(
+            [sys.executable, PROVIDER_APP],
+            cwd=os.path.dirname(PROVIDER_APP),
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(self.url + "/health", timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError(f"Provider on port {self.port} did not start")
+
+    def __exit__(self, *exc):
+        if self._proc:
+            self._proc.terminate()
+            self._proc.wait(timeout=10)
+        self._blob_dir.cleanup()
+
+
+def register(provider_url, host, name):
+    address = f"ai:{name}~bench#{host}"
+    r = requests.post(provider_url + "/api/agent/register", json={"aap_address": address, "model": "bench"})
+    r.raise_for_status()
+    return address, r.json()["api_key"]
+
+
+def run_workload(fn, concurrency, duration, max_ops):
+    """Call fn(i) from `concurrency` threads until duration/max_ops is reached."""
+    counter = itertools.count()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        local, failed = [], 0
+        while time.monotonic() < deadline:
+            i = next(counter)
+            if max_ops and i >= max_ops:
+                break
+            start = time.perf_counter()
+            try:
+                fn(i)
+            except Exception:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(latencies, time.perf_counter() - start, sum(errors))
+
+
+def make_workloads(local, remote, payload_size):
+    """Build {workload: fn(i)} closures against the local/remote providers."""
+    client = AAPClient(max_retries=1)
+    content = "x" * payload_size
+    run_id = f"{os.getpid()}-{time.monotonic_ns()}"
+    agent_ids = itertools.count()  # 跨 case 唯一，避免重复注册
+
+    sender, _ = register(local.url, local.host, f"sender-{run_id}")
+    receiver, receiver_key = register(local.url, local.host, f"receiver-{run_id}")
+    remote_receiver, _ = register(remote.url, remote.host, f"receiver-{run_id}")
+
+    # 预先填充收件箱，fetch 才有内容可取
+    for _ in range(20):
+        client.send_message(sender, receiver, content)
+
+    return {
+        "register": lambda i: register(local.url, local.host, f"agent-{run_id}-{next(agent_ids)}"),
+        "resolve": lambda i: client.resolve(receiver),
+        "send": lambda i: client.send_message(sender, receiver, content),
+        "send_remote": lambda i: client.send_message(sender, remote_receiver, content),
+        "fetch": lambda i: client.fetch_inbox(receiver, receiver_key, limit=20),
+    }
+
+
+def parse_list(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP load test")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS), help="comma-separated subset of %s" % (WORKLOADS,))
+    parser.add_argument("--concurrency", default="1,8", help="comma-separated thread counts")
+    parser.add_argument("--payload-sizes", default="100,10000", help="comma-separated content sizes in bytes")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per case")
+    parser.add_argument("--max-ops", type=int, default=0, help="stop a case after this many operations (0 = no limit)")
+    parser.add_argument("--port", type=int, default=5101, help="local provider port (remote uses port + 1)")
+    parser.add_argument("--provider-url", help="use an already running local provider instead of spawning one")
+    parser.add_argument("--remote-url", help="use an already running remote provider")
+    parser.add_argument("--output", help="result file path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    workloads = parse_list(args.workloads)
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {sorted(unknown)}")
+
+    sizes = parse_list(args.payload_sizes, int)
+    with _provider(args.provider_url, args.port) as local, _provider(args.remote_url, args.port + 1) as remote:
+        results = {}
+        for size in sizes:
+            fns = make_workloads(local, remote, size)
+            for workload in workloads:
+                if not workload.startswith("send") and size != sizes[0]:
+                    continue  # 与消息大小无关，只跑一次
+                for concurrency in parse_list(args.concurrency, int):
+                    case = f"{workload}/c{concurrency}" + (f"/{size}B" if workload.startswith("send") else "")
+                    stats = run_workload(fns[workload], concurrency, args.duration, args.max_ops)
+                    results[case] = stats
+                    print(f"{case:<28} {stats['ops_per_sec']:>9.1f} ops/s  p50 {stats['p50_ms']:>8.2f} ms  "
+                          f"p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  errors {stats['errors']}")
+
+    path = write_results("loadtest", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+class _ExternalProvider:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.host = self.url.split("://", 1)[-1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def _provider(url, port):
+    return _ExternalProvider(url) if url else ProviderProcess(port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+SDK 热路径微基准
+
+覆盖每条消息都会执行的 CPU 工作：parse_address、_validate_address_component、
+is_valid_address、MessageEnvelope 构造 (__post_init__ 里的 utcnow) 和 to_dict，
+输入包括常见地址和对抗性输入 (超长、非法字符)。
+
+Usage:
+    python benchmarks/microbench.py                    # 运行并写入 results/
+    python benchmarks/microbench.py --check            # 与 baselines/microbench.json 对比，退化超过阈值时退出码为 1
+    python benchmarks/microbench.py --save-baseline    # 更新基线 (在同一台机器上换代前后对比才有意义)
+    python benchmarks/microbench.py -k parse_address   # 只跑名字包含该字符串的 case
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+from common import BENCH_DIR, ROOT, write_results
+
+sys.path.insert(0, os.path.join(ROOT, "sdk", "python"))
+
+import aap
+from aap import (
+    InvalidAddressError,
+    MessageEnvelope,
+    MessagePayload,
+    _validate_address_component,
+    is_valid_address,
+    parse_address,
+)
+
+BASELINE = os.path.join(BENCH_DIR, "baselines", "microbench.json")
+
+# ---------- 输入 ----------
+
+ADDR_TYPICAL = "ai:tom~novel#molten.com"
+ADDR_PORT = "ai:writer-01~main_role#localhost:5000"
+ADDR_MAX_COMPONENTS = "ai:" + "o" * 64 + "~" + "r" * 64 + "#" + ("p" * 60 + ".") * 4 + "com"
+ADDR_500 = "ai:" + "a" * 486 + "~role#p.com"              # 正好 500 字符，owner 超长
+ADDR_501 = "ai:" + "a" * 498                               # 总长超限，最早被拒绝
+ADDR_BAD_CHARS = "ai:tom<script>alert(1)</script>~novel#molten.com"
+ADDR_BAD_CHARS_LONG = "ai:" + "é" * 64 + "~" + "‮" * 64 + "#" + "%" * 253
+ADDR_NO_PREFIX = "tom~novel#molten.com"
+ADDR_NO_ROLE = "ai:" + "a" * 400 + "#molten.com"           # 正则匹配失败
+ADDR_MANY_HASH = "ai:a~" + "#" * 490                       # 正则回溯候选很多
+
+assert len(ADDR_500) == 500 and len(ADDR_501) == 501
+
+
+def _raises(fn, arg):
+    """Benchmark a call that must be rejected; fail fast if the input is accepted."""
+    try:
+        fn(arg)
+    except InvalidAddressError:
+        pass
+    else:
+        raise AssertionError(f"adversarial input was accepted: {arg[:40]!r}")
+
+    def call():
+        try:
+            fn(arg)
+        except InvalidAddressError:
+            pass
+    return call
+
+
+def _cases():
+    env = MessageEnvelope(from_addr=ADDR_TYPICAL, to_addr=ADDR_PORT)
+    env_reply = MessageEnvelope(from_addr=ADDR_TYPICAL, to_addr=ADDR_PORT, reply_to="msg-123")
+    payload = MessagePayload(content="Hello!", metadata={"lang": "en"})
+
+    return {
+        # parse_address: 正常输入
+        "parse_address/typical": lambda: parse_address(ADDR_TYPICAL),
+        "parse_address/with_port": lambda: parse_address(ADDR_PORT),
+        "parse_address/max_components": lambda: parse_address(ADDR_MAX_COMPONENTS),
+        # parse_address: 对抗性输入 (都会抛出 InvalidAddressError)
+        "parse_address/reject_500_chars": _raises(parse_address, ADDR_500),
+        "parse_address/reject_501_chars": _raises(parse_address, ADDR_501),
+        "parse_address/reject_bad_chars": _raises(parse_address, ADDR_BAD_CHARS),
+        "parse_address/reject_bad_chars_long": _raises(parse_address, ADDR_BAD_CHARS_LONG),
+        "parse_address/reject_no_prefix": _raises(parse_address, ADDR_NO_PREFIX),
+        "parse_address/reject_no_role": _raises(parse_address, ADDR_NO_ROLE),
+        "parse_address/reject_many_hash": _raises(parse_address, ADDR_MANY_HASH),
+        # is_valid_address
+        "is_valid_address/valid": lambda: is_valid_address(ADDR_TYPICAL),
+        "is_valid_address/invalid": lambda: is_valid_address(ADDR_BAD_CHARS),
+        # _validate_address_component
+        "validate_component/short": lambda: _validate_address_component("novel", "role", aap.MAX_ROLE_LENGTH),
+        "validate_component/max_len": lambda: _validate_address_component("o" * 64, "owner", aap.MAX_OWNER_LENGTH),
+        "validate_component/reject_bad_chars": _raises(
+            lambda v: _validate_address_component(v, "owner", aap.MAX_OWNER_LENGTH), "tom<script>"),
+        # 信封
+        "envelope/construct": lambda: MessageEnvelope(from_addr=ADDR_TYPICAL, to_addr=ADDR_PORT),
+        "envelope/construct_with_timestamp": lambda: MessageEnvelope(
+            from_addr=ADDR_TYPICAL, to_addr=ADDR_PORT, timestamp="2026-01-01T00:00:00Z"),
+        "envelope/to_dict": env.to_dict,
+        "envelope/to_dict_reply": env_reply.to_dict,
+        "payload/to_dict": payload.to_dict,
+    }
+
+
+def measure(fn, repeat, min_time):
+    """Best-of-`repeat` ns/op, with the loop count chosen so each run takes >= min_time."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 10
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP SDK microbenchmarks")
+    parser.add_argument("-k", dest="filter", default="", help="only run cases containing this string")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timing run")
+    parser.add_argument("--check", action="store_true", help="compare against the tracked baseline")
+    parser.add_argument("--threshold", type=float, default=25.0, help="allowed regression in percent for --check")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {os.path.relpath(BASELINE, ROOT)}")
+    args = parser.parse_args()
+
+    results = {}
+    for name, fn in _cases().items():
+        if args.filter not in name:
+            continue
+        ns = measure(fn, args.repeat, args.min_time)
+        results[name] = {"ns_per_op": round(ns, 1)}
+        print(f"{name:<44} {ns:>10.1f} ns/op")
+
+    run_args = {k: v for k, v in vars(args).items() if k not in ("check", "save_baseline")}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        path = write_results("microbench", results, run_args, BASELINE)
+    else:
+        path = write_results("microbench", results, run_args)
+    print(f"\nresults written to {path}")
+
+    if args.check:
+        compare = os.path.join(BENCH_DIR, "compare.py")
+        sys.exit(subprocess.call([sys.executable, compare, BASELINE, path, "--threshold", str(args.threshold)]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Gossip 成员发现收敛模拟
+
+在本机启动 --nodes 个 gossip 节点 (分布在 --processes 个进程里，每个节点一个
+HTTP 服务端口，走真实的 HTTPTransport)，所有节点只知道第一个节点 (种子)，测量：
+
+- join：从全部节点开始 gossip 到每个节点的 Merkle 根哈希一致 (成员表完全相同) 的时间
+- update：收敛后一个节点修改自己的条目，直到所有节点都看到新 incarnation 的时间
+- 每次同步的平均往返次数和字节数；收敛后的稳定状态下每次同步只有一次往返
+
+Usage:
+    python benchmarks/sim_gossip.py [--nodes 120] [--processes 4] [--interval 1] [--fanout 2]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'provider', 'python-flask'))
+
+from common import write_results
+
+
+def make_handler(node):
+    import codec
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # HTTPTransport 复用连接
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            data = codec.dumps(node.handle(codec.loads(body)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def worker(ports, seed, args, commands, results):
+    """Host the gossip nodes for `ports` and answer commands from the main process."""
+    from gossip import Gossip
+    from relay import HTTPTransport
+
+    nodes = []
+    for port in ports:
+        name = f"127.0.0.1:{port}"
+        node = Gossip(name, info={"capabilities": ["resolve"]}, peers=[seed],
+                      transport=HTTPTransport(timeout=5, allow_private=True),
+                      interval=args.interval, fanout=args.fanout)
+        server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(node))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        nodes.append(node)
+    results.put(("ready", None))
+
+    while True:
+        command, arg = commands.get()
+        if command == "start":
+            for node in nodes:
+                node.start()
+        elif command == "status":
+            results.put(("status", [
+                (node.provider, node.tree.hash(), len(node.alive()),
+                 {arg: node.members[arg]["incarnation"]} if arg in node.members else {}, dict(node.stats))
+                for node in nodes
+            ]))
+        elif command == "update":
+            for node in nodes:
+                if node.provider == arg:
+                    node.update_self(info={"capabilities": ["resolve", "inbox"]})
+                    results.put(("updated", node.self_entry["incarnation"]))
+        elif command == "stop":
+            for node in nodes:
+                node.stop()
+            return
+
+
+def collect(queues, results, arg=None):
+    for q in queues:
+        q.put(("status", arg))
+    rows = []
+    for _ in queues:
+        kind, data = results.get()
+        assert kind == "status"
+        rows.extend(data)
+    return rows
+
+
+def totals(rows):
+    keys = ("syncs", "rounds", "bytes_sent", "bytes_received")
+    return {k: sum(row[4][k] for row in rows) for k in keys}
+
+
+def per_sync(before, after):
+    syncs = after["syncs"] - before["syncs"] or 1
+    return {
+        "syncs": after["syncs"] - before["syncs"],
+        "rounds_per_sync": round((after["rounds"] - before["rounds"]) / syncs, 2),
+        "bytes_per_sync": round((after["bytes_sent"] + after["bytes_received"]
+                                 - before["bytes_sent"] - before["bytes_received"]) / syncs),
+    }
+
+
+def wait_for(predicate, queues, results, args, arg=None):
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.timeout:
+        rows = collect(queues, results, arg)
+        if predicate(rows):
+            return time.perf_counter() - start, rows
+        time.sleep(args.poll)
+    return None, collect(queues, results, arg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=120)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=1.0, help="gossip interval (s)")
+    parser.add_argument("--fanout", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=21000)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--poll", type=float, default=0.2)
+    parser.add_argument("--output", help="result file (default benchmarks/results/...)")
+    args = parser.parse_args()
+
+    ports = [args.base_port + i for i in range(args.nodes)]
+    seed = f"127.0.0.1:{ports[0]}"
+    results = multiprocessing.Queue()
+    queues, procs = [], []
+    for i in range(args.processes):
+        q = multiprocessing.Queue()
+        p = multiprocessing.Process(target=worker, args=(ports[i::args.processes], seed, args, q, results), daemon=True)
+        p.start()
+        queues.append(q)
+        procs.append(p)
+    for _ in procs:
+        results.get()
+
+    print(f"{args.nodes} nodes in {args.processes} processes, interval {args.interval}s, fanout {args.fanout}")
+    out = {}
+    try:
+        before = totals(collect(queues, results))
+        for q in queues:
+            q.put(("start", None))
+        elapsed, rows = wait_for(
+            lambda rows: all(r[2] == args.nodes for r in rows) and len({r[1] for r in rows}) == 1,
+            queues, results, args
+        )
+        join = totals(rows)
+        out["join"] = dict(per_sync(before, join), seconds=round(elapsed, 2) if elapsed else None,
+                           converged=elapsed is not None)
+        print(f"  join    {'%.2fs' % elapsed if elapsed else 'NOT CONVERGED'}  {out['join']}")
+
+        target = f"127.0.0.1:{ports[-1]}"
+        queues[(args.nodes - 1) % args.processes].put(("update", target))
+        kind, incarnation = results.get()
+        elapsed, rows = wait_for(
+            lambda rows: all(r[3].get(target) == incarnation for r in rows),
+            queues, results, args, target
+        )
+        out["update"] = dict(per_sync(join, totals(rows)), seconds=round(elapsed, 2) if elapsed else None,
+                             converged=elapsed is not None)
+        print(f"  update  {'%.2fs' % elapsed if elapsed else 'NOT CONVERGED'}  {out['update']}")
+
+        # 稳定状态：成员表一致时每次同步只比较根哈希
+        steady = totals(collect(queues, results))
+        time.sleep(args.interval * 3)
+        out["steady"] = per_sync(steady, totals(collect(queues, results)))
+        print(f"  steady  {out['steady']}")
+    finally:
+        for q in queues:
+            q.put(("stop", None))
+        for p in procs:
+            p.join(timeout=5)
+
+    print(f"results: {write_results('sim_gossip', out, vars(args), args.output)}")
+
+
+if __name__ == "__main__":
+    main()
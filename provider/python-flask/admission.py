@@ -0,0 +1,137 @@
+"""
+准入控制与过载保护
+
+每个请求按路由归入一个类别，类别有自己的并发上限和排队上限，所有类别共享总并发
+capacity (一般等于 WSGI 线程数)：
+
+- 有空位时直接进入；没有空位时排队，最多等 queue_timeout 秒
+- 排队满或等待超时返回 503 + Retry-After，不再占用线程处理注定超时的请求
+- 有空位释放时按类别优先级分配给排队的请求 (同优先级先到先得)；某个类别已到上限
+  时跳过它，让其他类别的请求先进
+- /health、/metrics、管理接口等不在任何类别里，不受限制，过载时也能访问
+
+优先级 (数字小的先)：已认证的读取和 resolve > 已认证的写入 > 匿名写入 (收消息、注册)。
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+ADMISSION_QUEUE_TIMEOUT = 0.5  # 秒，排队等待上限
+ADMISSION_RETRY_AFTER = 1      # 秒，503 响应的 Retry-After
+
+
+class Overloaded(Exception):
+    """The request was shed; `retry_after` is the suggested wait in seconds."""
+    code = "SERVICE_OVERLOADED"
+
+    def __init__(self, message, reason, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClass:
+    __slots__ = ("name", "priority", "max_in_flight", "max_queue", "in_flight", "queued")
+
+    def __init__(self, name, priority, max_in_flight, max_queue):
+        self.name = name
+        self.priority = priority
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.queued = 0
+
+
+class _Waiter:
+    __slots__ = ("route_class", "event", "granted", "cancelled")
+
+    def __init__(self, route_class):
+        self.route_class = route_class
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Bounded concurrency per route class with a shared, priority-ordered wait queue."""
+
+    def __init__(self, classes, capacity=0, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 retry_after=ADMISSION_RETRY_AFTER):
+        self.classes = {c.name: c for c in classes}
+        self.capacity = capacity  # 0 表示只受各类别上限约束
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters = []  # [(priority, seq, _Waiter)]
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _has_room(self, route_class):
+        return (route_class.in_flight < route_class.max_in_flight
+                and (not self.capacity or self.in_flight < self.capacity))
+
+    def _take(self, route_class):
+        route_class.in_flight += 1
+        self.in_flight += 1
+
+    def admit(self, name):
+        """
+        Wait for a slot in class `name`. Returns the seconds spent queued.
+
+        Raises:
+            Overloaded: the queue is full or the slot did not free up in time
+        """
+        start = time.monotonic()
+        with self._lock:
+            route_class = self.classes[name]
+            # 释放时总会立即分配给排队的请求，所以有空位就说明没有能用这个空位的排队请求
+            if self._has_room(route_class):
+                self._take(route_class)
+                return 0.0
+            if route_class.queued >= route_class.max_queue:
+                raise Overloaded(f"Too many {name} requests queued", "queue_full", self.retry_after)
+            waiter = _Waiter(route_class)
+            heapq.heappush(self._waiters, (route_class.priority, next(self._seq), waiter))
+            route_class.queued += 1
+
+        waiter.event.wait(self.queue_timeout)
+        with self._lock:
+            if waiter.granted:
+                return time.monotonic() - start
+            waiter.cancelled = True  # 留在堆里，分配时跳过
+            route_class.queued -= 1
+        raise Overloaded(f"No {name} capacity within {self.queue_timeout}s", "timeout", self.retry_after)
+
+    def release(self, name):
+        with self._lock:
+            route_class = self.classes[name]
+            route_class.in_flight -= 1
+            self.in_flight -= 1
+            self._grant()
+
+    def _grant(self):
+        blocked = []  # 所在类别已满的排队请求，分配结束后放回
+        while self._waiters and (not self.capacity or self.in_flight < self.capacity):
+            entry = heapq.heappop(self._waiters)
+            waiter = entry[2]
+            if waiter.cancelled:
+                continue
+            if not self._has_room(waiter.route_class):
+                blocked.append(entry)
+                continue
+            self._take(waiter.route_class)
+            waiter.route_class.queued -= 1
+            waiter.granted = True
+            waiter.event.set()
+        for entry in blocked:
+            heapq.heappush(self._waiters, entry)
+
+    def stats(self):
+        """{class: {"in_flight", "queued", "max_in_flight"}}"""
+        with self._lock:
+            return {
+                c.name: {"in_flight": c.in_flight, "queued": c.queued, "max_in_flight": c.max_in_flight}
+                for c in self.classes.values()
+            }
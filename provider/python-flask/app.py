@@ -11,13 +11,233 @@ Usage:
 """
 
 import uuid
-import secrets
+import hmac
+import threading
+import time
+import urllib.parse
 from datetime import datetime
 from functools import wraps
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, send_file
 import os
 
+from admission import AdmissionController, Overloaded, RouteClass
+from auth import (
+    ALL_SCOPES,
+    SCOPE_INBOX_READ,
+    SCOPE_KEYS_MANAGE,
+    SCOPE_MESSAGES_SEND,
+    AuthCache,
+    generate_api_key,
+    hash_api_key,
+    key_prefix,
+    verify_key_hash,
+)
+from compression import SUPPORTED_ENCODINGS, DecompressionMiddleware, compress_response
+import codec
+from bloom import BloomFilter
+from blobs import BLOB_GC_GRACE, BLOB_QUOTA, HASH_PREFIX, BlobError, BlobStore, parse_content_hash
+from formats import BINARY_FORMATS, SUPPORTED_FORMATS, BinaryRequest, transcode_response
+from feed import FANOUT_ON_WRITE_MAX_FOLLOWERS, FEED_OWNER_ROLE, FeedStore
+from metrics import Metrics, histogram_rows
+import migrate
+from profiling import RequestProfiler
+from records import Inbox, MessageRecord, parse_time
+from relay import HTTPTransport, QueueFull, Relay, RelayError, base_url
+import signing
+from directory import announce
+from gossip import GOSSIP_VERIFY_PER_ROUND, Gossip
+from tenants import Tenant, load_tenants
+from webhooks import WebhookDispatcher, check_url as check_webhook_url
+from threads import ThreadIndex, key_str
+
 app = Flask(__name__)
+app.json = codec.FastJSONProvider(app)
+app.request_class = BinaryRequest  # request.get_json() 也接受 MessagePack / CBOR 请求体
+
+# ==================== 指标 (Prometheus) ====================
+
+INBOX_DEPTH_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+metrics = Metrics()
+metrics.counter("aap_http_requests_total", "HTTP requests by route, method and status",
+                ("route", "method", "status"))
+metrics.histogram("aap_http_request_duration_seconds", "HTTP request latency", ("route", "method"))
+metrics.counter("aap_errors_total", "Error responses by AAP error code", ("code",))
+metrics.counter("aap_auth_failures_total", "Rejected API key authentications", ("reason",))
+metrics.counter("aap_messages_stored_total", "Messages stored in inboxes")
+metrics.counter("aap_message_bytes_stored_total", "Encoded payload bytes of messages stored in inboxes")
+metrics.counter("aap_idempotency_duplicates_total", "Messages deduplicated by X-Idempotency-Key")
+
+
+@metrics.collector
+def collect_inbox_metrics():
+    depths = [len(inbox) for store in all_dbs() for inbox in store.messages.values()]
+    yield ("aap_inboxes", "gauge", "Number of inboxes", [("", [], len(depths))])
+    yield ("aap_inbox_depth", "histogram", "Distribution of messages per inbox",
+           histogram_rows(depths, INBOX_DEPTH_BUCKETS))
+
+
+@metrics.collector
+def collect_relay_metrics():
+    stats = relay.stats()
+    for name, mtype, help, field in (
+        ("aap_relay_queued", "gauge", "Outbound messages waiting per destination provider", "queued"),
+        ("aap_relay_delivered_total", "counter", "Outbound messages delivered per destination provider", "delivered"),
+        ("aap_relay_failed_total", "counter", "Outbound messages given up on per destination provider", "failed"),
+    ):
+        yield (name, mtype, help, [("", [("provider", p)], st[field]) for p, st in sorted(stats.items())])
+
+
+@metrics.collector
+def collect_webhook_metrics():
+    # 按 Agent 分标签基数太大，只输出总数
+    stats = webhooks.stats().values()
+    for name, mtype, help, field in (
+        ("aap_webhook_queued", "gauge", "Messages waiting to be pushed to agent webhooks", "queued"),
+        ("aap_webhook_delivered_total", "counter", "Messages pushed to agent webhooks", "delivered"),
+        ("aap_webhook_failed_total", "counter", "Messages whose webhook push was given up (still in the inbox)", "failed"),
+        ("aap_webhook_dropped_total", "counter", "Messages not pushed because the webhook queue was full", "dropped"),
+        ("aap_webhook_requests_total", "counter", "Batched webhook POSTs", "batches"),
+    ):
+        yield (name, mtype, help, [("", [], sum(st[field] for st in stats))])
+
+
+# 先注册，after_request 逆序执行，因此记录的耗时包含响应压缩
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.inc("aap_http_requests_total", route, request.method, response.status_code)
+    start = g.get("request_start")
+    if start is not None:
+        metrics.observe("aap_http_request_duration_seconds", time.perf_counter() - start, route, request.method)
+    return response
+
+
+# ==================== 性能剖析 (按请求采样) ====================
+
+PROFILE_ROUTES = tuple(os.environ.get("PROFILE_ROUTES", "/api/v1/resolve,/api/v1/inbox").split(","))
+profiler = RequestProfiler(float(os.environ.get("PROFILE_SAMPLE_RATE", 0)), PROFILE_ROUTES)
+
+
+def is_admin_token(value) -> bool:
+    """value 与 ADMIN_TOKEN 一致 (未设置 ADMIN_TOKEN 时管理接口关闭)"""
+    token = os.environ.get("ADMIN_TOKEN")
+    return bool(token and value) and hmac.compare_digest(value.encode(), token.encode())
+
+
+@app.before_request
+def start_profiling():
+    # X-AAP-Profile: {ADMIN_TOKEN} 强制剖析本次请求
+    force = "X-AAP-Profile" in request.headers and is_admin_token(request.headers["X-AAP-Profile"])
+    if profiler.wants(request.path, force):
+        g.profile = profiler.start()
+
+
+@app.teardown_request
+def stop_profiling(exc):
+    recorder = g.pop("profile", None)
+    if recorder is not None:
+        profiler.stop(recorder, request.url_rule.rule if request.url_rule else "unmatched")
+
+
+# ==================== 准入控制 (过载保护，见 admission.py) ====================
+
+# 类别: (优先级，数字小的先; 默认并发上限; 默认排队上限)
+ROUTE_CLASSES = {
+    "read": (0, 32, 64),    # 已认证的读取，以及匿名的 resolve 和 blob 下载
+    "write": (1, 16, 32),   # 已认证的写入 (都有 require_auth，上传 blob 也要 API Key)
+    "ingest": (2, 16, 32),  # 匿名写入：收消息、注册、gossip
+}
+# 不在这里的端点 (健康检查、指标、管理接口等) 不受限制。
+# 匿名写入必须归入 ingest，否则匿名请求能挤占已认证写入的优先级
+ENDPOINT_CLASSES = {
+    "resolve": "read", "get_inbox": "read", "get_thread": "read", "get_feed": "read",
+    "get_following": "read", "get_outbound_status": "read", "download_blob": "read", "list_keys": "read",
+    "send_outbound": "write", "follow": "write", "upload_blob": "write",
+    "create_key": "write", "rotate_key": "write", "revoke_key": "write",
+    "receive_message": "ingest", "receive_batch": "ingest", "register_agent": "ingest", "register_batch": "ingest",
+    "gossip_exchange": "ingest",
+}
+
+metrics.histogram("aap_admission_queue_seconds", "Time requests waited for admission", ("class",))
+metrics.counter("aap_admission_shed_total", "Requests rejected with 503 by admission control", ("class", "reason"))
+
+admission = AdmissionController(
+    [
+        RouteClass(
+            name, priority,
+            int(os.environ.get(f"ADMISSION_{name.upper()}_CONCURRENCY", concurrency)),
+            int(os.environ.get(f"ADMISSION_{name.upper()}_QUEUE", queue))
+        )
+        for name, (priority, concurrency, queue) in ROUTE_CLASSES.items()
+    ],
+    capacity=int(os.environ.get("ADMISSION_CAPACITY", 48)),  # 所有类别共享，一般等于 WSGI 线程数
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", 0.5))
+) if os.environ.get("ADMISSION_ENABLED", "true").lower() == "true" else None
+
+
+@metrics.collector
+def collect_admission_metrics():
+    stats = admission.stats() if admission else {}
+    for name, help, field in (
+        ("aap_admission_in_flight", "Requests being handled per admission class", "in_flight"),
+        ("aap_admission_queued", "Requests waiting for admission per admission class", "queued"),
+    ):
+        yield (name, "gauge", help, [("", [("class", c)], st[field]) for c, st in sorted(stats.items())])
+
+
+@app.before_request
+def admit_request():
+    name = ENDPOINT_CLASSES.get(request.endpoint) if admission else None
+    if name is None:
+        return None
+    try:
+        waited = admission.admit(name)
+    except Overloaded as e:
+        metrics.inc("aap_admission_shed_total", name, e.reason)
+        response, status = error_response(e.code, str(e))
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, status
+    g.admission_class = name
+    metrics.observe("aap_admission_queue_seconds", waited, name)
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    name = g.pop("admission_class", None)
+    if name is not None:
+        admission.release(name)
+
+
+# ==================== 传输压缩 ====================
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+MAX_DECOMPRESSED_SIZE = int(os.environ.get("MAX_DECOMPRESSED_SIZE", 10 * 1024 * 1024))
+# 压缩后的请求体大小上限，超过时不读完直接返回 413
+MAX_COMPRESSED_SIZE = int(os.environ.get("MAX_COMPRESSED_SIZE", MAX_DECOMPRESSED_SIZE))
+
+# 解压 POST /api/v1/inbox/*、/api/v1/outbox 和批量注册的请求体 (gzip / zstd)
+app.wsgi_app = DecompressionMiddleware(app.wsgi_app, ["/api/v1/inbox", "/api/v1/outbox", "/api/agent/register:batch"],
+                                       MAX_DECOMPRESSED_SIZE, MAX_COMPRESSED_SIZE)
+
+
+@app.after_request
+def compress_large_responses(response):
+    """超过阈值的响应按 Accept-Encoding 压缩"""
+    return compress_response(response, request.accept_encodings, COMPRESSION_MIN_SIZE)
+
+
+# 在压缩之后注册，因此先于压缩执行
+@app.after_request
+def negotiate_response_format(response):
+    """Accept 优先 MessagePack / CBOR 时把 JSON 响应转码 (见 formats.py)"""
+    return transcode_response(response, request.accept_mimetypes)
 
 # ==================== 输入验证常量 ====================
 MAX_OWNER_LENGTH = 64
@@ -27,15 +247,29 @@ VALID_CHARS = frozenset(
     "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_."
 )
 
+# Provider 可以包含端口号 (localhost:5000)，与 SDK 保持一致
+VALID_CHARS_PROVIDER = VALID_CHARS | frozenset(":")
+
 # 验证地址组件
-def validate_address_component(value: str, name: str, max_len: int) -> bool:
+def validate_address_component(value: str, name: str, max_len: int, valid_chars=None) -> bool:
     """Validate a single address component. Returns True if valid."""
     if not value:
         return False
     if len(value) > max_len:
         return False
     # 检查有效字符
-    return all(c in VALID_CHARS for c in value)
+    chars = valid_chars or VALID_CHARS
+    return all(c in chars for c in value)
+
+def split_address(address):
+    """(owner_role, provider) of an AAP address, or (None, None) if malformed."""
+    if not isinstance(address, str) or not address.startswith("ai:") or address.count('#') != 1:
+        return None, None
+    owner_role, provider = address[3:].split('#')
+    if not owner_role or not provider:
+        return None, None
+    return owner_role, provider
+
 
 # ==================== 错误码定义 (遵循 v0.03 规范) ====================
 
@@ -51,12 +285,24 @@ ERROR_CODES = {
     "ALREADY_EXISTS": (409, "Agent already registered"),
     "MISSING_FIELD": (400, "Missing required field"),
     "WRONG_PROVIDER": (400, "Message not for this provider"),
+    "KEY_NOT_FOUND": (404, "API key not found"),
+    "UNSUPPORTED_ENCODING": (415, "Content-Encoding not supported"),
+    "PAYLOAD_TOO_LARGE": (413, "Request body too large"),
+    "BLOB_NOT_FOUND": (404, "Blob not found"),
+    "BLOB_HASH_MISMATCH": (400, "Uploaded content does not match declared hash"),
+    "THREAD_NOT_FOUND": (404, "Thread not found"),
+    "INVALID_SIGNATURE": (401, "Message signature does not match the sender's public key"),
+    "GOSSIP_DISABLED": (404, "Gossip discovery is not enabled on this Provider"),
+    "UNKNOWN_PROVIDER": (404, "This Provider does not serve that domain"),
+    "QUOTA_EXCEEDED": (403, "Provider quota exceeded for this domain"),
+    "SERVICE_OVERLOADED": (503, "Provider is overloaded, retry later"),
 }
 
 
 def error_response(code: str, message: str = None):
     """Return standardized error response."""
     status, default_msg = ERROR_CODES.get(code, (500, "Internal error"))
+    metrics.inc("aap_errors_total", code)
     return jsonify({
         "error": {
             "code": code,
@@ -70,38 +316,74 @@ def error_response(code: str, message: str = None):
 class InMemoryDB:
     """内存存储，生产环境请替换为真实数据库"""
     
-    def __init__(self):
+    def __init__(self, fulltext=False, domain=None):
+        self.fulltext = fulltext  # 是否为收件箱正文建全文索引
+        self.domain = domain      # 多域名托管时所属的域名，单域名模式为 None
+        self.message_count = 0    # 收件箱消息总数，用于配额
         self.agents = {}      # {aap_address: agent_data}
-        self.messages = {}     # {owner_role: {idempotency_key: message}}
-        self.api_keys = {}     # {api_key: owner_role}
+        self.messages = {}     # {owner_role: Inbox}，消息存为紧凑的 MessageRecord
+        self.api_keys = {}     # {key_prefix: key_record}，只存哈希不存明文
+        self.owner_keys = {}   # {owner_role: [key_prefix, ...]}
         self.idempotency = {}  # {idempotency_key: response}
+        self.threads = ThreadIndex()  # reply_to 会话线程，跨收件箱
+        self.known = BloomFilter(ADDRESS_FILTER_CAPACITY, ADDRESS_FILTER_ERROR_RATE)  # 已注册的地址和 owner_role
+        # 过滤器的写入 (置位是读-改-写) 和重建替换串行化，并发注册不会丢位造成误拒；读不加锁
+        self._known_lock = threading.Lock()
+    
+    def rebuild_address_filter(self):
+        """从存储重建 Bloom 过滤器 (启动时，以及条目数超过容量时)"""
+        with self._known_lock:
+            self._rebuild_address_filter()
     
-    def register_agent(self, aap_address, model):
+    def _rebuild_address_filter(self):
+        # 先写 agents 再 _remember：快照之后注册的会等锁，加进新过滤器
+        agents = list(self.agents.items())
+        keys = [key for address, agent in agents for key in (address, agent["owner_role"])]
+        self.known = BloomFilter.build(keys, ADDRESS_FILTER_CAPACITY, ADDRESS_FILTER_ERROR_RATE)
+    
+    def _remember(self, aap_address, owner_role):
+        with self._known_lock:
+            if self.known.full():
+                self._rebuild_address_filter()
+            else:
+                self.known.add(aap_address)
+                self.known.add(owner_role)
+    
+    def register_agent(self, aap_address, model, public_key="", webhook_url=""):
         owner_role = aap_address.split('#')[0].replace('ai:', '')
-        api_key = self._generate_api_key()
         
         self.agents[aap_address] = {
             "aap_address": aap_address,
             "owner_role": owner_role,
             "model": model,
             "created_at": datetime.utcnow().isoformat() + "Z",
-            "public_key": ""
+            "public_key": public_key
         }
+        if webhook_url:
+            self.agents[aap_address]["webhook_url"] = webhook_url
+            self.agents[aap_address]["webhook_secret"] = generate_api_key()
         
-        self.api_keys[api_key] = owner_role
-        self.messages[owner_role] = {}
+        api_key = self.create_api_key(owner_role)
+        self.messages[owner_role] = Inbox(self.fulltext)
+        self._remember(aap_address, owner_role)
         
-        return {
+        result = {
             "success": True,
             "aap_address": aap_address,
             "api_key": api_key,
             "provider": aap_address.split('#')[1] if '#' in aap_address else "",
             "message": "Agent registered successfully"
         }
+        if webhook_url:
+            result["webhook_secret"] = self.agents[aap_address]["webhook_secret"]
+        return result
     
-    def _generate_api_key(self):
-        """Generate secure API key using secrets module."""
-        return secrets.token_urlsafe(32)
+    def register_agents(self, registrations):
+        """
+        Register (aap_address, model, public_key, webhook_url) tuples that have already been
+        validated; returns register_agent() results in order. 持久化存储应在一个事务里写入。
+        """
+        return [self.register_agent(*registration) for registration in registrations]
     
     def resolve(self, aap_address):
         """Resolve AAP address"""
@@ -112,7 +394,8 @@ class InMemoryDB:
                 "aap": aap_address,
                 "public_key": agent.get("public_key", ""),
                 "receive": {
-                    "inbox_url": f"/api/v1/inbox/{agent['owner_role']}"
+                    "inbox_url": f"/api/v1/inbox/{agent['owner_role']}",
+                    "blob_url": "/api/v1/blobs"
                 }
             }
         return None
@@ -120,43 +403,300 @@ class InMemoryDB:
     def get_agent(self, aap_address):
         return self.agents.get(aap_address)
     
+    def has_inbox(self, owner_role):
+        return owner_role in self.messages
+    
     def add_message(self, owner_role, message, idempotency_key=None):
-        """Add message with optional idempotency key."""
-        if owner_role not in self.messages:
-            self.messages[owner_role] = {}
+        """
+        Add message with optional idempotency key.
         
-        # 幂等性检查
-        if idempotency_key and idempotency_key in self.messages[owner_role]:
-            return self.messages[owner_role][idempotency_key]
+        Returns the stored MessageRecord (the existing one for a duplicate key).
+        """
+        inbox = self.messages.get(owner_role)
+        if inbox is None:
+            inbox = self.messages[owner_role] = Inbox(self.fulltext)
         
-        msg_id = str(uuid.uuid4())
-        message["id"] = msg_id
-        message["received_at"] = datetime.utcnow().isoformat() + "Z"
+        # 幂等性检查
+        if idempotency_key and idempotency_key in inbox.by_key:
+            metrics.inc("aap_idempotency_duplicates_total")
+            return inbox.by_key[idempotency_key]
         
-        # 如果有幂等性 key，存储映射
+        payload = message.get("payload", {})
+        record = MessageRecord.create(message.get("envelope", {}), payload)
         if idempotency_key:
-            self.messages[owner_role][idempotency_key] = message
+            inbox.by_key[idempotency_key] = record
+        inbox.add(record, payload.get("content"))
+        self.threads.add(record)
+        self.message_count += 1
         
-        # 同时存储到列表（用于获取）
-        if owner_role not in self.messages:
-            self.messages[owner_role] = {}
-        self.messages[owner_role]["_list"] = self.messages[owner_role].get("_list", [])
-        self.messages[owner_role]["_list"].append(message)
+        metrics.inc("aap_messages_stored_total")
+        metrics.inc("aap_message_bytes_stored_total", value=len(record.payload))
         
-        return message
+        return record
     
     def get_messages(self, owner_role, limit=20):
-        """Get messages for owner_role."""
-        msg_dict = self.messages.get(owner_role, {})
-        msg_list = msg_dict.get("_list", [])
-        return msg_list[-limit:]
+        """Get messages for owner_role as dicts."""
+        inbox = self.messages.get(owner_role)
+        return [r.to_dict() for r in inbox.records[-limit:]] if inbox else []
+    
+    def get_encoded_messages(self, owner_role, limit=20):
+        """Get JSON bytes of the last `limit` messages for owner_role."""
+        inbox = self.messages.get(owner_role)
+        return [r.encode() for r in inbox.records[-limit:]] if inbox else []
+    
+    def query_messages(self, owner_role, limit=20, before=None, **filters):
+        """
+        Filtered inbox page as (JSON bytes list, next_cursor); see Inbox.query.
+        
+        Raises:
+            ValueError: full-text filter requested but the index is disabled
+        """
+        inbox = self.messages.get(owner_role)
+        if inbox is None:
+            if filters.get("text") is not None and not self.fulltext:
+                raise ValueError("Full-text index is disabled")
+            return [], None
+        records, next_cursor = inbox.query(limit, before, **filters)
+        return [r.encode() for r in records], next_cursor
+    
+    # ---------- 导出 / 导入 (见 migrate.py) ----------
+    
+    def iter_agents(self, start=0):
+        """(position, agent) in registration order; Agent 不会被删除，位置可以作为续传游标"""
+        agents = list(self.agents.values())
+        for i in range(start, len(agents)):
+            yield i, agents[i]
+    
+    def iter_api_keys(self):
+        """Key records (hashes, never plaintext)."""
+        return list(self.api_keys.values())
+    
+    def iter_messages(self, inbox_start=0, record_start=0):
+        """
+        (inbox position, record position, owner_role, MessageRecord, idempotency_key) in
+        storage order. 收件箱和消息都只追加，(inbox position, record position) 可以作为续传游标。
+        """
+        inboxes = list(self.messages.items())
+        for i in range(inbox_start, len(inboxes)):
+            owner_role, inbox = inboxes[i]
+            keys = {id(record): key for key, record in list(inbox.by_key.items())}
+            records = inbox.records
+            for j in range(record_start if i == inbox_start else 0, len(records)):
+                record = records[j]
+                yield i, j, owner_role, record, keys.get(id(record))
+    
+    def import_batch(self, agents=(), api_keys=(), messages=()):
+        """
+        Insert exported agents, key records and (owner_role, MessageRecord, idempotency_key)
+        messages, skipping those already present (same address, key prefix or message id),
+        so replaying an import is harmless. 持久化存储应在一个事务里写入一批。
+        
+        Returns the number of items inserted per kind.
+        """
+        inserted = {"agents": 0, "keys": 0, "messages": 0}
+        for agent in agents:
+            address = agent["aap_address"]
+            if address in self.agents:
+                continue
+            self.agents[address] = agent
+            self.messages.setdefault(agent["owner_role"], Inbox(self.fulltext))
+            self._remember(address, agent["owner_role"])
+            inserted["agents"] += 1
+        for record in api_keys:
+            prefix = record["prefix"]
+            if prefix in self.api_keys:
+                continue
+            record = {k: v for k, v in record.items() if k != "domain"}
+            if self.domain:
+                record["domain"] = self.domain
+            self.api_keys[prefix] = record
+            self.owner_keys.setdefault(record["owner_role"], []).append(prefix)
+            inserted["keys"] += 1
+        for owner_role, record, idempotency_key in messages:
+            if record.uid in self.threads.records:
+                continue
+            inbox = self.messages.get(owner_role)
+            if inbox is None:
+                inbox = self.messages[owner_role] = Inbox(self.fulltext)
+            if idempotency_key:
+                inbox.by_key[idempotency_key] = record
+            content = None
+            if self.fulltext:
+                payload = codec.loads(record.payload)
+                content = payload.get("content") if isinstance(payload, dict) else None
+            inbox.add(record, content)
+            self.threads.add(record)
+            self.message_count += 1
+            inserted["messages"] += 1
+        return inserted
+    
+    def create_api_key(self, owner_role, scopes=ALL_SCOPES):
+        """Issue a new API key for owner_role. Only its hash is stored."""
+        api_key = generate_api_key()
+        while key_prefix(api_key) in self.api_keys:
+            api_key = generate_api_key()
+        
+        prefix = key_prefix(api_key)
+        self.api_keys[prefix] = {
+            "prefix": prefix,
+            "key_hash": hash_api_key(api_key),
+            "owner_role": owner_role,
+            "scopes": list(scopes),
+            "created_at": datetime.utcnow().isoformat() + "Z"
+        }
+        if self.domain:
+            self.api_keys[prefix]["domain"] = self.domain  # 共享的认证缓存靠它区分域名
+        self.owner_keys.setdefault(owner_role, []).append(prefix)
+        return api_key
+    
+    def lookup_api_key(self, api_key, api_key_hash=None):
+        """Return the key record for api_key, or None if unknown/revoked."""
+        record = self.api_keys.get(key_prefix(api_key))
+        if record is None:
+            return None
+        if not verify_key_hash(api_key_hash or hash_api_key(api_key), record["key_hash"]):
+            return None
+        return record
     
     def verify_api_key(self, api_key):
-        return self.api_keys.get(api_key)
+        record = self.lookup_api_key(api_key)
+        return record["owner_role"] if record else None
+    
+    def list_api_keys(self, owner_role):
+        """List key metadata (never the hash) for owner_role."""
+        return [
+            {k: v for k, v in self.api_keys[prefix].items() if k != "key_hash"}
+            for prefix in self.owner_keys.get(owner_role, [])
+        ]
+    
+    def revoke_api_key(self, owner_role, prefix):
+        """Revoke a key owned by owner_role. Returns True if it existed."""
+        record = self.api_keys.get(prefix)
+        if record is None or record["owner_role"] != owner_role:
+            return False
+        del self.api_keys[prefix]
+        self.owner_keys[owner_role].remove(prefix)
+        return True
 
 
 # 初始化数据库
-db = InMemoryDB()
+INBOX_FULLTEXT = os.environ.get("INBOX_FULLTEXT", "false").lower() == "true"
+FEED_FANOUT_MAX_FOLLOWERS = int(os.environ.get("FEED_FANOUT_MAX_FOLLOWERS", FANOUT_ON_WRITE_MAX_FOLLOWERS))
+# 已注册地址的 Bloom 过滤器 (见 bloom.py)，每个域名一个
+ADDRESS_FILTER_CAPACITY = int(os.environ.get("ADDRESS_FILTER_CAPACITY", 100_000))
+ADDRESS_FILTER_ERROR_RATE = float(os.environ.get("ADDRESS_FILTER_ERROR_RATE", 0.001))
+db = InMemoryDB(fulltext=INBOX_FULLTEXT)
+feed_store = FeedStore(fanout_threshold=FEED_FANOUT_MAX_FOLLOWERS)
+blob_store = BlobStore(
+    os.environ.get("BLOB_DIR", "blobs"),
+    int(os.environ.get("MAX_BLOB_SIZE", 100 * 1024 * 1024)),
+    quota=int(os.environ.get("BLOB_QUOTA", BLOB_QUOTA)),
+    grace=float(os.environ.get("BLOB_GC_GRACE", BLOB_GC_GRACE))
+)
+BLOB_GC_INTERVAL = float(os.environ.get("BLOB_GC_INTERVAL", 3600))  # 秒，0 表示不自动回收
+auth_cache = AuthCache(ttl=float(os.environ.get("AUTH_CACHE_TTL", 60)))
+# 为 true 时允许向回环、内网等非公网地址发起请求 (本机或内网部署多个 Provider 时)。
+# 默认拒绝：收件人域名、webhook_url、gossip 条目都可能来自不可信方
+ALLOW_PRIVATE_TARGETS = os.environ.get("ALLOW_PRIVATE_TARGETS", "").lower() in ("1", "true", "yes")
+# 调试模式；webhook_url 只有这时才允许 http://
+DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
+relay = Relay(
+    transport=HTTPTransport(allow_private=ALLOW_PRIVATE_TARGETS),
+    queue_size=int(os.environ.get("RELAY_QUEUE_SIZE", 1000)),
+    concurrency=int(os.environ.get("RELAY_CONCURRENCY", 4)),
+    batch_size=int(os.environ.get("RELAY_BATCH_SIZE", 50)),
+    max_attempts=int(os.environ.get("RELAY_MAX_ATTEMPTS", 5))
+)
+INBOX_BATCH_MAX = int(os.environ.get("INBOX_BATCH_MAX", 500))
+# 其他 Provider 上发送方的公钥，resolve 一次后缓存
+sender_keys = signing.KeyCache(
+    ttl=float(os.environ.get("SENDER_KEY_TTL", 300)),
+    max_size=int(os.environ.get("SENDER_KEY_CACHE_SIZE", 10000))
+)
+# 查询失败 (连不上、超时、5xx、非公网地址) 的 Provider，按域名缓存，期间不再回查。
+# 查询发生在收消息的请求里：超时要短、不重试，避免匿名请求拖住工作线程
+sender_key_failures = signing.KeyCache(
+    ttl=float(os.environ.get("SENDER_KEY_NEGATIVE_TTL", 30)),
+    max_size=int(os.environ.get("SENDER_KEY_CACHE_SIZE", 10000))
+)
+sender_key_transport = HTTPTransport(
+    timeout=float(os.environ.get("SENDER_KEY_TIMEOUT", 2)),
+    allow_private=ALLOW_PRIVATE_TARGETS,
+    keep_alive=False
+)
+# 为 true 时，公布了公钥的发送方必须签名
+REQUIRE_SIGNATURES = os.environ.get("REQUIRE_SIGNATURES", "").lower() in ("1", "true", "yes")
+# 注册了 webhook_url 的 Agent，新消息合并后推送 (见 webhooks.py)
+webhooks = WebhookDispatcher(
+    transport=HTTPTransport(timeout=10, allow_private=ALLOW_PRIVATE_TARGETS),
+    allow_http=DEBUG,
+    window=float(os.environ.get("WEBHOOK_WINDOW", 0.05)),
+    batch_size=int(os.environ.get("WEBHOOK_BATCH_SIZE", 100)),
+    max_in_flight=int(os.environ.get("WEBHOOK_MAX_IN_FLIGHT", 2)),
+    queue_size=int(os.environ.get("WEBHOOK_QUEUE_SIZE", 1000)),
+    max_attempts=int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", 5))
+)
+
+# ==================== 多域名托管 (见 tenants.py) ====================
+
+def make_tenant(domain, max_agents, max_messages):
+    """每个域名独立的注册表、收件箱和 Feed；连接池、Blob 存储和缓存共享"""
+    return Tenant(domain, InMemoryDB(INBOX_FULLTEXT, domain), FeedStore(fanout_threshold=FEED_FANOUT_MAX_FOLLOWERS),
+                  max_agents, max_messages)
+
+
+# 为空时是单域名模式：使用上面的 db / feed_store，请求的 Host 即本 Provider 的域名
+tenants = load_tenants(
+    os.environ.get("TENANTS", ""),
+    os.environ.get("TENANTS_FILE"),
+    make_tenant,
+    int(os.environ.get("TENANT_MAX_AGENTS", 0)),
+    int(os.environ.get("TENANT_MAX_MESSAGES", 0))
+)
+
+# 不属于某个域名的端点，任何 Host 都可以访问
+SHARED_ENDPOINTS = frozenset({
+    "index", "health", "prometheus_metrics", "static",
+    "get_profile", "get_flamegraph", "configure_profile", "reset_profile", "collect_blobs",
+    "gossip_exchange", "gossip_members", "gossip_directory",
+})
+
+
+def all_dbs():
+    return [tenant.db for tenant in tenants] or [db]
+
+
+for store in all_dbs():
+    store.rebuild_address_filter()
+
+
+metrics.counter("aap_address_filter_lookups_total",
+                "Address lookups by Bloom filter outcome (miss: answered without a storage lookup)", ("result",))
+
+
+def filtered_lookup(store, key, lookup):
+    """
+    先查 store.known：key 肯定不存在时直接返回 None，不调用 lookup (不查存储)；
+    否则返回 lookup(key)。
+    """
+    if key not in store.known:
+        metrics.inc("aap_address_filter_lookups_total", "miss")
+        return None
+    result = lookup(key)
+    metrics.inc("aap_address_filter_lookups_total", "hit" if result else "false_positive")
+    return result
+
+
+@app.before_request
+def route_tenant():
+    """按 Host 选出本次请求服务的域名 (g.tenant)"""
+    if not tenants:
+        g.tenant = Tenant(request.host, db, feed_store)
+        return None
+    g.tenant = tenants.get(request.host)
+    if g.tenant is None and request.endpoint not in SHARED_ENDPOINTS:
+        return error_response("UNKNOWN_PROVIDER", f"{request.host} is not served by this Provider")
+    return None
 
 # ==================== 辅助装饰器 ====================
 
@@ -166,21 +706,134 @@ def require_auth(f):
     def decorated(*args, **kwargs):
         auth = request.headers.get("Authorization", "")
         if not auth.startswith("Bearer "):
+            metrics.inc("aap_auth_failures_total", "missing")
             return jsonify({"error": "UNAUTHORIZED", "message": "Missing or invalid API key"}), 401
         
         api_key = auth[7:]  # 去掉 "Bearer "
-        owner_role = db.verify_api_key(api_key)
+        api_key_hash = hash_api_key(api_key)
         
-        if not owner_role:
+        # 先查进程内缓存，未命中再查存储
+        record = auth_cache.get(api_key_hash)
+        if record is None:
+            record = g.tenant.db.lookup_api_key(api_key, api_key_hash)
+            if record is not None:
+                auth_cache.put(api_key_hash, record)
+        # 认证缓存由所有域名共享，别的域名的 key 不能用
+        if record is None or record.get("domain") != g.tenant.db.domain:
+            metrics.inc("aap_auth_failures_total", "invalid")
             return jsonify({"error": "UNAUTHORIZED", "message": "Invalid API key"}), 401
         
-        g.owner_role = owner_role
+        g.owner_role = record["owner_role"]
+        g.api_key = record
+        return f(*args, **kwargs)
+    return decorated
+
+
+def require_scope(scope):
+    """要求当前 API Key 具有指定权限 (需放在 require_auth 之后)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if scope not in g.api_key["scopes"]:
+                return error_response("AUTHENTICATION_FAILED", f"API key lacks scope: {scope}")
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def require_admin(f):
+    """要求 Authorization: Bearer {ADMIN_TOKEN}"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        auth = request.headers.get("Authorization", "")
+        if not os.environ.get("ADMIN_TOKEN"):
+            return error_response("AUTHENTICATION_FAILED", "Admin API disabled (ADMIN_TOKEN not set)")
+        if not (auth.startswith("Bearer ") and is_admin_token(auth[7:])):
+            return error_response("AUTHENTICATION_FAILED", "Invalid admin token")
         return f(*args, **kwargs)
     return decorated
 
 
 # ==================== Agent 注册 API ====================
 
+REGISTER_BATCH_MAX = int(os.environ.get("REGISTER_BATCH_MAX", 1000))
+
+
+class RegistrationRejected(Exception):
+    """注册请求校验失败，code 为 ERROR_CODES 中的错误码"""
+    
+    def __init__(self, code, message=None):
+        super().__init__(message or ERROR_CODES[code][1])
+        self.code = code
+
+
+def parse_registration(data):
+    """
+    Validate one registration request (单个注册和批量注册共用).
+    
+    Returns:
+        (aap_address, provider, model, public_key, webhook_url)
+    
+    Raises:
+        RegistrationRejected: invalid body, address, public_key or webhook_url
+    """
+    if not data or not isinstance(data, dict):
+        raise RegistrationRejected("INVALID_REQUEST", "Missing JSON body")
+    
+    aap_address = data.get("aap_address", "")
+    if not isinstance(aap_address, str):
+        raise RegistrationRejected("INVALID_ADDRESS", "Address must be a string")
+    aap_address = aap_address.strip()
+    model = data.get("model", "unknown")
+    public_key = data.get("public_key") or ""
+    if public_key and not signing.is_public_key(public_key):
+        raise RegistrationRejected("INVALID_REQUEST", "public_key must be ed25519:<base64 of 32 bytes>")
+    webhook_url = data.get("webhook_url") or ""
+    
+    # 简单验证
+    if not aap_address.startswith("ai:"):
+        raise RegistrationRejected("INVALID_ADDRESS", "Address must start with 'ai:'")
+    
+    # 检查长度
+    if len(aap_address) > 500:
+        raise RegistrationRejected("INVALID_ADDRESS", "Address too long (max 500 characters)")
+    
+    # 解析并验证各组件
+    parts = aap_address[3:].split('#')
+    if len(parts) != 2:
+        raise RegistrationRejected("INVALID_ADDRESS", "Invalid address format")
+    owner_role, provider = parts
+    if owner_role.count('~') != 1:
+        raise RegistrationRejected("INVALID_ADDRESS", "Invalid address format")
+    owner, role = owner_role.split('~')
+    if not owner or not role or not provider:
+        raise RegistrationRejected("INVALID_ADDRESS", "Empty component")
+    if not validate_address_component(owner, "owner", MAX_OWNER_LENGTH):
+        raise RegistrationRejected("INVALID_ADDRESS", "Invalid owner characters or too long")
+    if not validate_address_component(role, "role", MAX_ROLE_LENGTH):
+        raise RegistrationRejected("INVALID_ADDRESS", "Invalid role characters or too long")
+    if not validate_address_component(provider, "provider", MAX_PROVIDER_LENGTH, VALID_CHARS_PROVIDER):
+        raise RegistrationRejected("INVALID_ADDRESS", "Invalid provider characters or too long")
+    if webhook_url:
+        # 放在最后：要解析主机名，拒绝非公网地址
+        try:
+            check_webhook_url(webhook_url, allow_http=DEBUG, allow_private=ALLOW_PRIVATE_TARGETS)
+        except ValueError as e:
+            raise RegistrationRejected("INVALID_REQUEST", str(e))
+    
+    return aap_address, provider, model, public_key, webhook_url
+
+
+def check_registration(tenant, aap_address, provider):
+    """Raise RegistrationRejected if aap_address belongs to another domain or is already registered."""
+    if tenants and provider.lower() != tenant.domain:
+        raise RegistrationRejected("WRONG_PROVIDER", f"Register {provider} agents at {provider}")
+    
+    # 检查是否已注册
+    if filtered_lookup(tenant.db, aap_address, tenant.db.get_agent):
+        raise RegistrationRejected("ALREADY_EXISTS", "Agent already registered")
+
+
 @app.route("/api/agent/register", methods=["POST"])
 def register_agent():
     """
@@ -189,7 +842,9 @@ def register_agent():
     Request:
         {
             "aap_address": "ai:name~role#provider.com",
-            "model": "gpt-4"
+            "model": "gpt-4",
+            "public_key": "ed25519:<base64> (optional, used to verify signed messages)",
+            "webhook_url": "https://agent.example/aap (optional, new messages are pushed here)"
         }
     
     Response:
@@ -198,49 +853,100 @@ def register_agent():
             "aap_address": "ai:name~role#provider.com",
             "api_key": "abc123...",
             "provider": "provider.com",
-            "message": "Agent registered successfully"
+            "message": "Agent registered successfully",
+            "webhook_secret": "用于校验 X-AAP-Signature (只在设置了 webhook_url 时返回)"
         }
     """
-    data = request.get_json()
+    try:
+        aap_address, provider, model, public_key, webhook_url = parse_registration(request.get_json())
+        check_registration(g.tenant, aap_address, provider)
+    except RegistrationRejected as e:
+        return error_response(e.code, str(e))
+    if g.tenant.agents_full():
+        return error_response("QUOTA_EXCEEDED", f"{g.tenant.domain} has reached its agent quota")
     
-    if not data:
-        return error_response("INVALID_REQUEST", "Missing JSON body")
+    result = g.tenant.db.register_agent(aap_address, model, public_key, webhook_url)
+    return jsonify(result), 201
+
+
+@app.route("/api/agent/register:batch", methods=["POST"])
+def register_batch():
+    """
+    批量注册 Agent
     
-    aap_address = data.get("aap_address", "").strip()
-    model = data.get("model", "unknown")
+    每项与 POST /api/agent/register 的请求体相同，用同样的规则校验。默认逐项注册，
+    一项失败不影响其他项；atomic 为 true 时全部通过才注册，否则一个都不注册。
     
-    # 简单验证
-    if not aap_address.startswith("ai:"):
-        return error_response("INVALID_ADDRESS", "Address must start with 'ai:'")
+    Body:
+        {
+            "agents": [{"aap_address": "ai:name~role#provider.com", "model": "gpt-4"}],
+            "atomic": false
+        }
     
-    # 检查长度
-    if len(aap_address) > 500:
-        return error_response("INVALID_ADDRESS", "Address too long (max 500 characters)")
+    Response:
+        {
+            "results": [
+                {"status": 201, "aap_address": "...", "api_key": "...", "provider": "..."},
+                {"status": 409, "error": {"code": "ALREADY_EXISTS", "message": "..."}}
+            ],
+            "registered": 1
+        }
     
-    # 解析并验证各组件
-    try:
-        parts = aap_address[3:].split('#')
-        if len(parts) != 2:
-            return error_response("INVALID_ADDRESS", "Invalid address format")
-        owner_role, provider = parts
-        owner, role = owner_role.split('~')
-        if not owner or not role or not provider:
-            return error_response("INVALID_ADDRESS", "Empty component")
-        if not validate_address_component(owner, "owner", MAX_OWNER_LENGTH):
-            return error_response("INVALID_ADDRESS", "Invalid owner characters or too long")
-        if not validate_address_component(role, "role", MAX_ROLE_LENGTH):
-            return error_response("INVALID_ADDRESS", "Invalid role characters or too long")
-        if not validate_address_component(provider, "provider", MAX_PROVIDER_LENGTH):
-            return error_response("INVALID_ADDRESS", "Invalid provider characters or too long")
-    except Exception:
-        return error_response("INVALID_ADDRESS", "Invalid address format")
+    atomic 时有任一项失败则返回第一个失败项的错误码和状态，"errors" 列出全部失败项：
+        {"error": {"code": "...", "message": "agents[3]: ..."}, "errors": [{"index": 3, "code": "...", "message": "..."}]}
+    """
+    data = request.get_json(silent=True)
+    items = data.get("agents") if isinstance(data, dict) else None
     
-    # 检查是否已注册
-    if db.get_agent(aap_address):
-        return error_response("ALREADY_EXISTS", "Agent already registered")
+    if not isinstance(items, list) or not items:
+        return error_response("INVALID_REQUEST", "agents must be a non-empty list")
+    if len(items) > REGISTER_BATCH_MAX:
+        return error_response("PAYLOAD_TOO_LARGE", f"At most {REGISTER_BATCH_MAX} agents per batch")
+    atomic = data.get("atomic") is True
     
-    result = db.register_agent(aap_address, model)
-    return jsonify(result), 201
+    tenant = g.tenant
+    accepted, errors, seen = [], {}, set()
+    for i, item in enumerate(items):
+        try:
+            aap_address, provider, model, public_key, webhook_url = parse_registration(item)
+            if aap_address in seen:
+                raise RegistrationRejected("ALREADY_EXISTS", "Address appears twice in this batch")
+            check_registration(tenant, aap_address, provider)
+        except RegistrationRejected as e:
+            errors[i] = e
+            continue
+        seen.add(aap_address)
+        accepted.append((i, (aap_address, model, public_key, webhook_url)))
+    
+    # 配额：逐项模式下超出的项失败，atomic 模式下整批失败
+    if tenant.max_agents:
+        room = max(0, tenant.max_agents - len(tenant.db.agents))
+        for i, _ in accepted[room:]:
+            errors[i] = RegistrationRejected("QUOTA_EXCEEDED", f"{tenant.domain} has reached its agent quota")
+        accepted = accepted[:room]
+    
+    if atomic and errors:
+        failed = sorted(errors.items())
+        for _, e in failed:
+            metrics.inc("aap_errors_total", e.code)
+        index, first = failed[0]
+        return jsonify({
+            "error": {"code": first.code, "message": f"agents[{index}]: {first}; nothing was registered"},
+            "errors": [{"index": i, "code": e.code, "message": str(e)} for i, e in failed]
+        }), ERROR_CODES[first.code][0]
+    
+    registered = tenant.db.register_agents([registration for _, registration in accepted])
+    
+    results = [None] * len(items)
+    for (i, _), result in zip(accepted, registered):
+        result = dict(result, status=201)
+        del result["success"], result["message"]
+        results[i] = result
+    for i, e in errors.items():
+        metrics.inc("aap_errors_total", e.code)
+        results[i] = {"status": ERROR_CODES[e.code][0], "error": {"code": e.code, "message": str(e)}}
+    
+    return jsonify({"results": results, "registered": len(registered)})
 
 
 # ==================== Resolve API ====================
@@ -270,7 +976,19 @@ def resolve():
     if len(aap_address) > 500:
         return error_response("INVALID_ADDRESS", "Address too long")
     
-    result = db.resolve(aap_address)
+    result = filtered_lookup(g.tenant.db, aap_address, g.tenant.db.resolve)
+    
+    # 公开动态地址不是注册的 Agent，但需要能被 resolve 到
+    if not result and aap_address.split('#')[0] == "ai:" + FEED_OWNER_ROLE:
+        result = {
+            "version": "0.03",
+            "aap": aap_address,
+            "public_key": "",
+            "receive": {
+                "inbox_url": f"/api/v1/inbox/{FEED_OWNER_ROLE}",
+                "blob_url": "/api/v1/blobs"
+            }
+        }
     
     if not result:
         return error_response("ADDRESS_NOT_FOUND", f"Address {aap_address} not found")
@@ -278,12 +996,173 @@ def resolve():
     # 转换为完整 URL（生产环境需要配置 BASE_URL）
     base_url = request.host_url.rstrip('/')
     result["receive"]["inbox_url"] = base_url + result["receive"]["inbox_url"]
+    result["receive"]["blob_url"] = base_url + result["receive"]["blob_url"]
     
     return jsonify(result)
 
 
 # ==================== Receive API (收消息) ====================
 
+class MessageRejected(Exception):
+    """入站消息校验失败，code 为 ERROR_CODES 中的错误码"""
+    
+    def __init__(self, code, message=None):
+        super().__init__(message or ERROR_CODES[code][1])
+        self.code = code
+
+
+def sender_public_key(address):
+    """发送方公钥：本地 Agent 查注册信息，其他 Provider 的地址 resolve 后缓存；没有则为 """""
+    agent = filtered_lookup(g.tenant.db, address, g.tenant.db.get_agent)
+    if agent:
+        return agent.get("public_key", "")
+    public_key = sender_keys.get(address)
+    if public_key is not None:
+        return public_key
+    provider = split_address(address)[1]
+    if not provider or provider == g.tenant.domain:
+        return ""
+    local = tenants.get(provider)
+    if local is not None:
+        # 同一进程托管的其他域名，直接查它的注册表
+        agent = filtered_lookup(local.db, address, local.db.get_agent)
+        return agent.get("public_key", "") if agent else ""
+    provider = provider.lower()
+    if sender_key_failures.get(provider) is not None:
+        return ""
+    query = urllib.parse.urlencode({"address": address})
+    try:
+        status, body = sender_key_transport.request("GET", f"{base_url(provider)}/api/v1/resolve?{query}")
+        public_key = (codec.loads(body).get("public_key") or "") if status == 200 else ""
+    except (RelayError, ValueError, AttributeError):
+        status = None
+    if status not in (200, 404):
+        sender_key_failures.put(provider, "")  # 短暂记住失败，对端恢复后再查
+        return ""
+    sender_keys.put(address, public_key)
+    return public_key
+
+
+def verify_signatures(messages):
+    """
+    批量验证 [(envelope, payload)] 的发送方签名，同一发送方的公钥只查一次
+    
+    Returns:
+        每条消息的拒绝原因，通过或无需验证时为 None
+    """
+    errors = [None] * len(messages)
+    keys = {}
+    batch, positions = [], []
+    for i, (envelope, payload) in enumerate(messages):
+        if not isinstance(envelope, dict) or not isinstance(payload, dict):
+            continue
+        signed = "signature" in envelope
+        if not signed and not REQUIRE_SIGNATURES:
+            continue
+        sender = envelope.get("from_addr")
+        if sender not in keys:
+            keys[sender] = sender_public_key(sender)
+        if not keys[sender]:
+            continue  # 发送方没有公布公钥，签名交给收件方自行判断
+        if not signed:
+            errors[i] = "Sender publishes a public key; the message must be signed"
+        elif signing.AVAILABLE:
+            batch.append((keys[sender], envelope, payload))
+            positions.append(i)
+    for i, ok in zip(positions, signing.verify_batch(batch)):
+        if not ok:
+            errors[i] = ERROR_CODES["INVALID_SIGNATURE"][1]
+    return errors
+
+
+_NOT_VERIFIED = object()
+
+
+def store_incoming_message(owner_role, envelope, payload, idempotency_key=None, signature_error=_NOT_VERIFIED,
+                           tenant=None, authenticated=False):
+    """
+    校验并存储一条发给本 Provider 的消息 (单条接收和批量接收共用)
+    
+    signature_error 是 verify_signatures 预先算好的结果 (批量接收时一次验证整批)，
+    不传则在这里验证。tenant 是收件方所在的域名，默认为本次请求的域名。
+    authenticated 表示 from_addr 已由 API Key 证实 (POST /api/v1/outbox)。
+    
+    Returns:
+        (message_id, 说明文字)
+    
+    Raises:
+        MessageRejected
+    """
+    if not isinstance(envelope, dict) or not isinstance(payload, dict):
+        raise MessageRejected("INVALID_ENVELOPE", "envelope and payload must be objects")
+    
+    # 验证必填字段
+    required = ["from_addr", "to_addr"]
+    for field in required:
+        if not envelope.get(field):
+            raise MessageRejected("MISSING_FIELD", f"Missing required field: {field}")
+    
+    # 验证目标地址属于这个 Provider
+    to_addr = envelope.get("to_addr", "")
+    
+    tenant = tenant or g.tenant
+    if (split_address(to_addr)[1] or "").lower() != tenant.domain.lower():
+        raise MessageRejected("WRONG_PROVIDER", "Message not for this provider")
+    
+    # 收件人不存在时在验签之前拒绝，Bloom 过滤器排除的不查存储
+    if owner_role != FEED_OWNER_ROLE and not filtered_lookup(tenant.db, owner_role, tenant.db.has_inbox):
+        raise MessageRejected("ADDRESS_NOT_FOUND", f"No agent {owner_role} on this provider")
+    
+    # 大附件：内容在发送方 Provider 的 Blob 存储里，信封只带哈希和大小。
+    # 本域名的发送方必须已经上传；其他 Provider 的 Blob 由收件人到对方那里下载
+    if "content_hash" in envelope:
+        digest = parse_content_hash(envelope["content_hash"])
+        if not digest:
+            raise MessageRejected("INVALID_ENVELOPE", "content_hash must be sha256:<hex>")
+        size = blob_store.size(digest)
+        sender_is_local = (split_address(envelope["from_addr"])[1] or "").lower() == tenant.domain.lower()
+        if size is None and sender_is_local:
+            raise MessageRejected("BLOB_NOT_FOUND", "Upload the blob to /api/v1/blobs first")
+        if size is not None and envelope.get("content_size", size) != size:
+            raise MessageRejected("INVALID_ENVELOPE", "content_size does not match stored blob")
+    
+    if signature_error is _NOT_VERIFIED:
+        signature_error = verify_signatures([(envelope, payload)])[0]
+    if signature_error:
+        raise MessageRejected("INVALID_SIGNATURE", signature_error)
+    
+    # 公开动态：ai:feed~public#provider 收到的是本 Provider 上 Agent 发布的帖子。
+    # 以作者身份发布要么用作者的 API Key 走 outbox，要么带作者公钥能验证的签名
+    if owner_role == FEED_OWNER_ROLE:
+        author = tenant.db.get_agent(envelope["from_addr"])
+        if not author:
+            raise MessageRejected("ADDRESS_NOT_FOUND", "Only agents registered on this provider can publish")
+        signed = "signature" in envelope and author.get("public_key") and signing.AVAILABLE
+        if not authenticated and not signed:
+            raise MessageRejected("AUTHENTICATION_REQUIRED",
+                                  "Publish through POST /api/v1/outbox with the author's API key, or sign the post")
+        post = tenant.feed.publish(envelope["from_addr"], {"envelope": envelope, "payload": payload}, idempotency_key)
+        return post["id"], "Post published"
+    
+    if tenant.messages_full():
+        raise MessageRejected("QUOTA_EXCEEDED", f"{tenant.domain} has reached its message quota")
+    
+    # 存储消息（支持幂等性）
+    message = {
+        "envelope": envelope,
+        "payload": payload
+    }
+    
+    stored = tenant.db.message_count
+    result = tenant.db.add_message(owner_role, message, idempotency_key)
+    
+    # 推送到 webhook；幂等重复的消息不再推送
+    agent = tenant.db.get_agent(to_addr)
+    if agent and agent.get("webhook_url") and tenant.db.message_count != stored:
+        webhooks.submit(to_addr, agent["webhook_url"], agent["webhook_secret"], result.encode())
+    return result.id, "Message received"
+
+
 @app.route("/api/v1/inbox/<owner_role>", methods=["POST"])
 def receive_message(owner_role):
     """
@@ -299,7 +1178,9 @@ def receive_message(owner_role):
                 "message_type": "private",
                 "reply_to": "optional-message-id",
                 "content_type": "text/plain",
-                "timestamp": "2026-01-01T00:00:00Z"
+                "timestamp": "2026-01-01T00:00:00Z",
+                "content_hash": "sha256:... (optional, see /api/v1/blobs)",
+                "content_size": 1048576
             },
             "payload": {
                 "content": "Hello!",
@@ -312,60 +1193,644 @@ def receive_message(owner_role):
     if not data:
         return error_response("INVALID_REQUEST", "Missing JSON body")
     
+    try:
+        message_id, text = store_incoming_message(
+            owner_role,
+            data.get("envelope", {}),
+            data.get("payload", {}),
+            request.headers.get("X-Idempotency-Key")
+        )
+    except MessageRejected as e:
+        return error_response(e.code, str(e))
+    
+    return jsonify({
+        "success": True,
+        "message": text,
+        "message_id": message_id
+    }), 201
+
+
+@app.route("/api/v1/inbox:batch", methods=["POST"])
+def receive_batch():
+    """
+    批量接收消息 (Provider 之间转发用，见 relay.py)
+    
+    每条消息独立校验和存储，一条失败不影响其他消息。
+    
+    Body:
+        {
+            "messages": [
+                {"envelope": {...}, "payload": {...}, "idempotency_key": "optional"}
+            ]
+        }
+    
+    Response:
+        {
+            "results": [
+                {"status": 201, "message_id": "..."},
+                {"status": 400, "error": {"code": "MISSING_FIELD", "message": "..."}}
+            ]
+        }
+    """
+    data = request.get_json(silent=True)
+    messages = data.get("messages") if isinstance(data, dict) else None
+    
+    if not isinstance(messages, list) or not messages:
+        return error_response("INVALID_REQUEST", "messages must be a non-empty list")
+    if len(messages) > INBOX_BATCH_MAX:
+        return error_response("PAYLOAD_TOO_LARGE", f"At most {INBOX_BATCH_MAX} messages per batch")
+    
+    items = [item if isinstance(item, dict) else {} for item in messages]
+    signature_errors = verify_signatures([(item.get("envelope", {}), item.get("payload", {})) for item in items])
+    
+    results = []
+    for item, signature_error in zip(items, signature_errors):
+        envelope = item.get("envelope", {})
+        to_addr = envelope.get("to_addr") if isinstance(envelope, dict) else None
+        owner_role = split_address(to_addr)[0] or ""
+        try:
+            message_id, _ = store_incoming_message(
+                owner_role, envelope, item.get("payload", {}), item.get("idempotency_key"), signature_error
+            )
+            results.append({"status": 201, "message_id": message_id})
+        except MessageRejected as e:
+            metrics.inc("aap_errors_total", e.code)
+            results.append({"status": ERROR_CODES[e.code][0], "error": {"code": e.code, "message": str(e)}})
+    
+    return jsonify({"results": results})
+
+
+# ==================== Outbox API (转发到其他 Provider) ====================
+
+@app.route("/api/v1/outbox", methods=["POST"])
+@require_auth
+@require_scope(SCOPE_MESSAGES_SEND)
+def send_outbound():
+    """
+    发送消息 (由 Provider 代为投递)
+    
+    本 Provider 上的 Agent 不用自己 resolve 和连接对端：发给本 Provider 的消息直接
+    存入收件箱 (201)，发给其他 Provider 的消息进入转发队列 (202)，用
+    GET /api/v1/outbox/{relay_id} 查询投递结果。对端队列已满时返回 429。
+    
+    Headers:
+        Authorization: Bearer {api_key}
+        X-Idempotency-Key: optional
+    
+    Body: 与 POST /api/v1/inbox/{owner_role} 相同，from_addr 必须是当前 API Key 的 Agent
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return error_response("INVALID_REQUEST", "Missing JSON body")
+    
     envelope = data.get("envelope", {})
     payload = data.get("payload", {})
+    if not isinstance(envelope, dict) or not isinstance(payload, dict):
+        return error_response("INVALID_ENVELOPE", "envelope and payload must be objects")
     
-    # 验证必填字段
-    required = ["from_addr", "to_addr"]
-    for field in required:
-        if not envelope.get(field):
-            return error_response("MISSING_FIELD", f"Missing required field: {field}")
-    
-    # 验证目标地址属于这个 Provider
-    to_addr = envelope.get("to_addr", "")
+    agent = g.tenant.db.get_agent(envelope.get("from_addr"))
+    if not agent or agent["owner_role"] != g.owner_role:
+        return error_response("AUTHENTICATION_FAILED", "from_addr must be the agent owning this API key")
     
-    # 简单验证（生产环境需要更严格）
-    if request.host not in to_addr:
-        return error_response("WRONG_PROVIDER", "Message not for this provider")
+    owner_role, provider = split_address(envelope.get("to_addr"))
+    if not provider:
+        return error_response("INVALID_ADDRESS", "to_addr is not a valid AAP address")
     
-    # 获取幂等性 key
     idempotency_key = request.headers.get("X-Idempotency-Key")
     
-    # 存储消息（支持幂等性）
-    message = {
-        "envelope": envelope,
-        "payload": payload
-    }
+    # 本域名或同一进程托管的其他域名：直接存入收件箱，不经过网络
+    local = g.tenant if provider == g.tenant.domain else tenants.get(provider)
+    if local is not None:
+        try:
+            message_id, _ = store_incoming_message(owner_role, envelope, payload, idempotency_key, tenant=local,
+                                                   authenticated=True)
+        except MessageRejected as e:
+            return error_response(e.code, str(e))
+        return jsonify({"success": True, "status": "delivered", "message_id": message_id}), 201
+    
+    try:
+        relay_id = relay.submit(g.owner_role, provider, envelope, payload, idempotency_key)
+    except QueueFull as e:
+        response, status = error_response(e.code, str(e))
+        response.headers["Retry-After"] = "1"
+        return response, status
     
-    result = db.add_message(owner_role, message, idempotency_key)
+    return jsonify({"success": True, "status": "queued", "relay_id": relay_id}), 202
+
+
+@app.route("/api/v1/outbox/<relay_id>", methods=["GET"])
+@require_auth
+def get_outbound_status(relay_id):
+    """
+    查询转发状态
     
-    return jsonify({
-        "success": True,
-        "message": "Message received",
-        "message_id": result["id"]
-    }), 201
+    Response:
+        {"relay_id": "...", "to": "...", "status": "queued|sending|delivered|failed",
+         "attempts": 1, "error": null, "message_id": "对端返回的消息 id"}
+    """
+    status = relay.status(relay_id)
+    if not status or status.pop("owner_role") != g.owner_role:
+        return error_response("ADDRESS_NOT_FOUND", "Unknown relay id")
+    return jsonify(status)
 
 
 # ==================== Inbox API (取消息) ====================
 
+# (query 参数, Inbox.query 参数)
+INBOX_FILTERS = (
+    ("from_addr", "from_addr"),
+    ("reply_to", "reply_to"),
+    ("content_type", "content_type"),
+    ("message_type", "message_type"),
+    ("since", "since"),
+    ("until", "until"),
+    ("q", "text"),
+)
+INBOX_QUERY_MAX_LIMIT = 100
+
+
 @app.route("/api/v1/inbox", methods=["GET"])
 @require_auth
+@require_scope(SCOPE_INBOX_READ)
 def get_inbox():
     """
     获取收件箱
     
     GET /api/v1/inbox?limit=20
     
+    过滤 (可组合，走收件箱的二级索引，不扫描全部消息):
+        from_addr=ai:x~y#provider   发件人
+        reply_to=<message id>       回复某条消息的消息
+        content_type=text/plain
+        message_type=private
+        since=/until=               接收时间范围 (ISO 8601 或 epoch 秒，含端点)
+        q=关键词                    正文全文检索 (需 INBOX_FULLTEXT=true)
+        cursor=                     上一页的 next_cursor (为空时从最新开始)
+    
+    带过滤条件时响应多一个 next_cursor 字段，用于继续取更早的消息。
+    
     Headers:
         Authorization: Bearer {api_key}
     """
     limit = request.args.get("limit", 20, type=int)
-    messages = db.get_messages(g.owner_role, limit)
+    
+    filters = {}
+    for param, name in INBOX_FILTERS:
+        if param in request.args:
+            filters[name] = request.args[param]
+    
+    if not filters and "cursor" not in request.args:
+        encoded = g.tenant.db.get_encoded_messages(g.owner_role, limit)
+        # 等价于 jsonify({"messages": [...], "count": n})，但复用存储时编码好的 payload
+        return app.response_class(codec.list_object("messages", encoded), mimetype="application/json")
+    
+    limit = max(1, min(limit, INBOX_QUERY_MAX_LIMIT))
+    before = request.args.get("cursor", type=int)
+    try:
+        for name in ("since", "until"):
+            if name in filters:
+                filters[name] = parse_time(filters[name])
+    except ValueError:
+        return error_response("INVALID_REQUEST", "since/until must be ISO 8601 or epoch seconds")
+    
+    try:
+        encoded, next_cursor = g.tenant.db.query_messages(g.owner_role, limit, before, **filters)
+    except ValueError as e:
+        return error_response("INVALID_REQUEST", str(e))
+    
+    return app.response_class(
+        codec.list_object("messages", encoded,
+                          next_cursor=str(next_cursor) if next_cursor is not None else None),
+        mimetype="application/json"
+    )
+
+
+# ==================== Thread API (会话线程) ====================
+
+THREAD_MAX_LIMIT = 200
+
+
+@app.route("/api/v1/threads/<message_id>", methods=["GET"])
+@require_auth
+@require_scope(SCOPE_INBOX_READ)
+def get_thread(message_id):
+    """
+    获取消息所在的会话线程
+    
+    message_id 可以是线程中的任意一条消息。返回根消息和全部回复 (按到达顺序)，
+    只包含调用者收到的或本 Provider 上调用者发出的消息；每条消息的
+    envelope.reply_to 即父消息 id。
+    
+    GET /api/v1/threads/{message_id}?limit=50&cursor=50
+    
+    Response:
+        {
+            "messages": [...],
+            "count": 50,
+            "thread_id": "根消息 id",
+            "next_cursor": "50"
+        }
+    """
+    limit = max(1, min(request.args.get("limit", 50, type=int), THREAD_MAX_LIMIT))
+    offset = max(0, request.args.get("cursor", 0, type=int))
+    
+    root = g.tenant.db.threads.root_of(message_id)
+    if root is None:
+        return error_response("THREAD_NOT_FOUND")
+    
+    def visible(record):
+        if split_address(record.to_addr)[0] == g.owner_role:
+            return True
+        return split_address(record.from_addr) == (g.owner_role, g.tenant.domain)
+    
+    records = [r for r in g.tenant.db.threads.thread(root) if visible(r)]
+    if not records:
+        return error_response("THREAD_NOT_FOUND")
+    
+    page = records[offset:offset + limit]
+    next_cursor = str(offset + limit) if offset + limit < len(records) else None
+    return app.response_class(
+        codec.list_object("messages", [r.encode() for r in page],
+                          thread_id=key_str(root), next_cursor=next_cursor),
+        mimetype="application/json"
+    )
+
+
+# ==================== Feed API (公开动态) ====================
+
+@app.route("/api/v1/feed", methods=["GET"])
+@require_auth
+@require_scope(SCOPE_INBOX_READ)
+def get_feed():
+    """
+    获取关注的作者发布的帖子
+    
+    GET /api/v1/feed?limit=20&cursor=123      时间倒序分页
+    GET /api/v1/feed?unread=true&limit=20     上次读取之后的新帖 (时间正序)，并推进已读游标
+    GET /api/v1/feed?author=ai:x~y#provider   某个作者的帖子
+    
+    Response:
+        {
+            "posts": [...],
+            "count": 20,
+            "next_cursor": "123"
+        }
+    """
+    limit = max(1, min(request.args.get("limit", 20, type=int), 100))
+    before = request.args.get("cursor", type=int)
+    author = request.args.get("author")
+    
+    if author:
+        entries = g.tenant.feed.author_posts(author, limit, before)
+    elif request.args.get("unread", "").lower() == "true":
+        entries = g.tenant.feed.unread(g.owner_role, limit)
+        return app.response_class(
+            codec.list_object("posts", [e[2] for e in entries], next_cursor=None),
+            mimetype="application/json"
+        )
+    else:
+        entries = g.tenant.feed.timeline(g.owner_role, limit, before)
+    
+    next_cursor = str(entries[-1][0]) if len(entries) == limit else None
+    return app.response_class(
+        codec.list_object("posts", [e[2] for e in entries], next_cursor=next_cursor),
+        mimetype="application/json"
+    )
+
+
+@app.route("/api/v1/feed/follow", methods=["POST", "DELETE"])
+@require_auth
+def follow():
+    """
+    关注 / 取消关注本 Provider 上的作者
+    
+    POST   /api/v1/feed/follow   {"address": "ai:alice~main#provider.com"}
+    DELETE /api/v1/feed/follow   {"address": "ai:alice~main#provider.com"}
+    """
+    data = request.get_json(silent=True) or {}
+    address = (data.get("address") or "").strip()
+    
+    if not address:
+        return error_response("MISSING_FIELD", "Missing required field: address")
+    
+    if request.method == "DELETE":
+        g.tenant.feed.unfollow(g.owner_role, address)
+        return jsonify({"success": True, "following": False, "address": address})
+    
+    if not filtered_lookup(g.tenant.db, address, g.tenant.db.get_agent):
+        return error_response("ADDRESS_NOT_FOUND", f"Address {address} not found")
+    g.tenant.feed.follow(g.owner_role, address)
+    return jsonify({"success": True, "following": True, "address": address})
+
+
+@app.route("/api/v1/feed/following", methods=["GET"])
+@require_auth
+def get_following():
+    """
+    列出当前 Agent 关注的作者
+    
+    GET /api/v1/feed/following
+    """
+    following = g.tenant.feed.get_following(g.owner_role)
+    return jsonify({"following": following, "count": len(following)})
+
+
+# ==================== Blob API (大附件) ====================
+
+@app.route("/api/v1/blobs", methods=["POST"])
+@require_auth
+@require_scope(SCOPE_MESSAGES_SEND)
+def upload_blob():
+    """
+    流式上传 Blob，按 SHA-256 去重存储，计入当前 Agent 的 Blob 配额 (BLOB_QUOTA)
+    
+    发送方上传到自己的 Provider，收件人从发送方的 Provider 下载。
+    已知哈希时可先 HEAD /api/v1/blobs/{sha256} 检查，存在则无需上传
+    (HEAD 不会延长回收宽限期，见 collect_blobs)。
+    
+    POST /api/v1/blobs
+    
+    Headers:
+        Authorization: Bearer {api_key}  (需要 messages:send)
+        Content-Type: application/octet-stream
+        X-Content-SHA256: <hex> (optional, verified after upload)
+    
+    Response:
+        {
+            "content_hash": "sha256:...",
+            "size": 1048576,
+            "deduplicated": false
+        }
+    """
+    expected = request.headers.get("X-Content-SHA256")
+    if expected is not None:
+        expected = parse_content_hash(expected)
+        if not expected:
+            return error_response("INVALID_REQUEST", "X-Content-SHA256 must be a hex SHA-256 digest")
+    
+    try:
+        digest, size, created = blob_store.put_stream(request.stream, expected, (g.tenant.domain, g.owner_role))
+    except BlobError as e:
+        return error_response(e.code, str(e))
     
     return jsonify({
-        "messages": messages,
-        "count": len(messages)
-    })
+        "content_hash": HASH_PREFIX + digest,
+        "size": size,
+        "deduplicated": not created
+    }), 201 if created else 200
+
+
+@app.route("/api/v1/blobs/<content_hash>", methods=["GET", "HEAD"])
+def download_blob(content_hash):
+    """
+    下载 Blob，支持 Range 请求
+    
+    GET /api/v1/blobs/{sha256}
+    
+    Headers (optional):
+        Range: bytes=0-1023
+    """
+    digest = parse_content_hash(content_hash)
+    if not digest:
+        return error_response("INVALID_REQUEST", "Blob id must be a hex SHA-256 digest")
+    if not blob_store.exists(digest):
+        return error_response("BLOB_NOT_FOUND")
+    
+    return send_file(
+        os.path.abspath(blob_store.path(digest)),
+        mimetype="application/octet-stream",
+        conditional=True,
+        etag=digest,
+        max_age=31536000  # 内容寻址，永不变化
+    )
+
+
+def referenced_blobs():
+    """所有域名的收件箱和 Feed 里消息引用的 Blob 摘要"""
+    stores = [(tenant.db, tenant.feed) for tenant in tenants] if tenants else [(db, feed_store)]
+    digests = set()
+    for store, feed in stores:
+        for _, _, _, record, _ in store.iter_messages():
+            if record.content_hash:
+                digests.add(parse_content_hash(record.content_hash))
+        for entries in list(feed.posts.values()):
+            for _, _, data in list(entries):
+                if b'"content_hash"' in data:
+                    digests.add(parse_content_hash(codec.loads(data)["envelope"].get("content_hash")))
+    digests.discard(None)
+    return digests
+
+
+@app.route("/api/v1/admin/blobs/gc", methods=["POST"])
+@require_admin
+def collect_blobs():
+    """
+    回收没有消息引用、且超过宽限期 (BLOB_GC_GRACE) 的 Blob
+    
+    Response:
+        {"removed": 3, "bytes": 1048576}
+    """
+    return jsonify(blob_store.collect(referenced_blobs()))
+
+
+def start_blob_gc(interval=BLOB_GC_INTERVAL):
+    """后台线程：每 interval 秒回收一次 Blob"""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                stats = blob_store.collect(referenced_blobs())
+            except Exception as e:  # 下一轮再试
+                print(f"Blob GC failed: {e}")
+                continue
+            if stats["removed"]:
+                print(f"Blob GC: removed {stats['removed']} blobs ({stats['bytes']} bytes)")
+    
+    thread = threading.Thread(target=run, name="blob-gc", daemon=True)
+    thread.start()
+    return thread
+
+
+# ==================== API Key 管理 ====================
+
+@app.route("/api/v1/keys", methods=["GET"])
+@require_auth
+@require_scope(SCOPE_KEYS_MANAGE)
+def list_keys():
+    """
+    列出当前 Agent 的 API Key (只返回前缀和元数据)
+    
+    GET /api/v1/keys
+    """
+    keys = g.tenant.db.list_api_keys(g.owner_role)
+    return jsonify({"keys": keys, "count": len(keys)})
+
+
+@app.route("/api/v1/keys", methods=["POST"])
+@require_auth
+@require_scope(SCOPE_KEYS_MANAGE)
+def create_key():
+    """
+    创建新的 API Key，可限定权限范围
+    
+    POST /api/v1/keys
+    
+    Body (optional):
+        {"scopes": ["inbox:read"]}
+    """
+    data = request.get_json(silent=True) or {}
+    scopes = data.get("scopes", g.api_key["scopes"])
+    
+    if not isinstance(scopes, list) or not scopes:
+        return error_response("INVALID_REQUEST", "scopes must be a non-empty list")
+    unknown = [s for s in scopes if s not in ALL_SCOPES]
+    if unknown:
+        return error_response("INVALID_REQUEST", f"Unknown scopes: {unknown}")
+    # 不允许签发比当前 key 权限更大的 key
+    if not set(scopes) <= set(g.api_key["scopes"]):
+        return error_response("AUTHENTICATION_FAILED", "Cannot grant scopes the current key lacks")
+    
+    api_key = g.tenant.db.create_api_key(g.owner_role, scopes)
+    return jsonify({
+        "api_key": api_key,
+        "prefix": key_prefix(api_key),
+        "scopes": scopes
+    }), 201
+
+
+@app.route("/api/v1/keys/rotate", methods=["POST"])
+@require_auth
+def rotate_key():
+    """
+    轮换当前 API Key：签发同权限的新 key 并立即吊销当前 key
+    
+    POST /api/v1/keys/rotate
+    """
+    scopes = g.api_key["scopes"]
+    old_prefix = g.api_key["prefix"]
+    
+    api_key = g.tenant.db.create_api_key(g.owner_role, scopes)
+    g.tenant.db.revoke_api_key(g.owner_role, old_prefix)
+    auth_cache.invalidate(old_prefix)
+    
+    return jsonify({
+        "api_key": api_key,
+        "prefix": key_prefix(api_key),
+        "scopes": scopes,
+        "revoked": old_prefix
+    }), 201
+
+
+@app.route("/api/v1/keys/<prefix>", methods=["DELETE"])
+@require_auth
+@require_scope(SCOPE_KEYS_MANAGE)
+def revoke_key(prefix):
+    """
+    吊销指定 API Key
+    
+    DELETE /api/v1/keys/{prefix}
+    """
+    if not g.tenant.db.revoke_api_key(g.owner_role, prefix):
+        return error_response("KEY_NOT_FOUND")
+    auth_cache.invalidate(prefix)
+    return jsonify({"success": True, "revoked": prefix})
+
+
+# ==================== 管理接口: 性能剖析 ====================
+
+@app.route("/api/v1/admin/profile", methods=["GET"])
+@require_admin
+def get_profile():
+    """
+    采样统计和分配快照 (按分配字节数排序)
+    
+    Query params:
+        top: 返回的分配位置数量 (默认 50)
+    """
+    try:
+        top = int(request.args.get("top", 50))
+    except ValueError:
+        return error_response("INVALID_REQUEST", "top must be an integer")
+    return jsonify(profiler.summary(top))
+
+
+@app.route("/api/v1/admin/profile/flamegraph", methods=["GET"])
+@require_admin
+def get_flamegraph():
+    """Collapsed stacks，可直接用 flamegraph.pl 或 speedscope 打开"""
+    return app.response_class(profiler.collapsed(), content_type="text/plain; charset=utf-8")
+
+
+@app.route("/api/v1/admin/profile", methods=["POST"])
+@require_admin
+def configure_profile():
+    """
+    运行时调整采样，无需重启
+    
+    Request body:
+        {"sample_rate": 0.01, "routes": ["/api/v1/resolve"], "reset": true}
+    """
+    data = request.get_json(silent=True) or {}
+    if "sample_rate" in data:
+        rate = data["sample_rate"]
+        if not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+            return error_response("INVALID_REQUEST", "sample_rate must be between 0 and 1")
+        profiler.sample_rate = float(rate)
+    if "routes" in data:
+        routes = data["routes"]
+        if not isinstance(routes, list) or not all(isinstance(r, str) for r in routes):
+            return error_response("INVALID_REQUEST", "routes must be a list of path prefixes")
+        profiler.routes = tuple(routes)
+    if data.get("reset"):
+        profiler.reset()
+    return jsonify(profiler.summary(0))
+
+
+@app.route("/api/v1/admin/profile", methods=["DELETE"])
+@require_admin
+def reset_profile():
+    """清空已聚合的剖析数据"""
+    profiler.reset()
+    return "", 204
+
+
+# ==================== 管理接口: 导出 / 导入 (见 migrate.py) ====================
+
+@app.route("/api/v1/admin/export", methods=["GET"])
+@require_admin
+def export_data():
+    """
+    以 NDJSON 流式导出本域名的 Agent、API Key 哈希和收件箱消息
+    
+    Query params:
+        cursor: 上次导出中断前最后一个 checkpoint 的 cursor
+    """
+    cursor = request.args.get("cursor")
+    try:
+        migrate.parse_cursor(cursor)
+    except migrate.MigrationError as e:
+        return error_response("INVALID_REQUEST", str(e))
+    lines = migrate.export_lines(g.tenant.db, g.tenant.domain, cursor)
+    return app.response_class(migrate.chunked(lines), mimetype="application/x-ndjson")
+
+
+@app.route("/api/v1/admin/import", methods=["POST"])
+@require_admin
+def import_data():
+    """
+    导入 GET /api/v1/admin/export 的输出 (NDJSON 请求体)
+    
+    已存在的地址、key 前缀和消息 id 跳过，可以安全地重放。
+    
+    Response:
+        {"lines": 120000, "agents": 1000, "keys": 1000, "messages": 118000, "skipped": 0,
+         "cursor": "messages:40:200"}
+    """
+    try:
+        stats = migrate.import_lines(g.tenant.db, migrate.iter_lines(request.stream))
+    except migrate.MigrationError as e:
+        return error_response("INVALID_REQUEST", f"{e}; earlier lines were imported")
+    return jsonify(stats)
 
 
 # ==================== 静态文件 / 健康检查 ====================
@@ -380,6 +1845,10 @@ def index():
             "resolve": "/api/v1/resolve",
             "receive": "/api/v1/inbox/{owner_role}",
             "inbox": "/api/v1/inbox",
+            "keys": "/api/v1/keys",
+            "blobs": "/api/v1/blobs",
+            "feed": "/api/v1/feed",
+            "metrics": "/metrics",
             "providers_info": "/api/v1/providers/info"
         }
     })
@@ -390,8 +1859,29 @@ def health():
     return jsonify({"status": "ok"})
 
 
+@app.route("/metrics")
+def prometheus_metrics():
+    """
+    Prometheus 指标 (文本格式)
+    
+    设置 METRICS_TOKEN 后需要 Authorization: Bearer {METRICS_TOKEN}
+    """
+    token = os.environ.get("METRICS_TOKEN")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth.encode(), f"Bearer {token}".encode()):
+            return error_response("AUTHENTICATION_REQUIRED")
+    return app.response_class(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ==================== Provider Info (v0.04 Stage 1) ====================
 
+CAPABILITIES = [
+    "resolve", "inbox", "register", "register_batch", "compression", "blobs", "feed", "relay", "inbox_batch", "webhooks"
+] + (
+    ["signatures"] if signing.AVAILABLE else []
+) + (["binary_formats"] if BINARY_FORMATS else [])
+
 @app.route("/api/v1/providers/info", methods=["GET"])
 def provider_info():
     """
@@ -404,23 +1894,136 @@ def provider_info():
         {
             "provider": "provider.com",
             "version": "0.04",
-            "capabilities": ["resolve", "inbox", "register"],
-            "discovery_method": "direct"
+            "capabilities": ["resolve", "inbox", "register", "compression", "blobs", "feed", "relay", "inbox_batch", "webhooks", "signatures", "binary_formats"],
+            "discovery_method": "direct",
+            "compression": {"encodings": ["zstd", "gzip"], "min_size": 1024},
+            "content_types": ["application/json", "application/msgpack", "application/cbor"]
         }
     """
     return jsonify({
-        "provider": request.host,
+        "provider": g.tenant.domain,
         "version": "0.04",
-        "capabilities": ["resolve", "inbox", "register"],
-        "discovery_method": "direct"
+        "capabilities": CAPABILITIES + (["gossip"] if gossip is not None else []),
+        "discovery_method": "direct",
+        "compression": {
+            "encodings": SUPPORTED_ENCODINGS,
+            "min_size": COMPRESSION_MIN_SIZE
+        },
+        "content_types": SUPPORTED_FORMATS
+    })
+
+
+# ==================== Gossip 成员发现 (v0.04 阶段5) ====================
+
+# PROVIDER_DOMAIN: 地址里 # 后面的部分；PUBLIC_BASE_URL: 对外地址 (默认按域名推断)
+PROVIDER_DOMAIN = os.environ.get("PROVIDER_DOMAIN", f"localhost:{os.environ.get('PORT', 5000)}")
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL")
+
+GOSSIP_PEERS = [peer.strip() for peer in os.environ.get("GOSSIP_PEERS", "").split(",") if peer.strip()]
+GOSSIP_ENABLED = os.environ.get("GOSSIP_ENABLED", "true" if GOSSIP_PEERS else "false").lower() == "true"
+
+gossip = Gossip(
+    PROVIDER_DOMAIN,
+    PUBLIC_BASE_URL,
+    {
+        "capabilities": CAPABILITIES + ["gossip"],
+        "compression": {"encodings": SUPPORTED_ENCODINGS, "min_size": COMPRESSION_MIN_SIZE},
+    },
+    GOSSIP_PEERS,
+    transport=HTTPTransport(timeout=5, allow_private=ALLOW_PRIVATE_TARGETS),
+    interval=float(os.environ.get("GOSSIP_INTERVAL", 5)),
+    fanout=int(os.environ.get("GOSSIP_FANOUT", 2)),
+    verify_per_round=int(os.environ.get("GOSSIP_VERIFY_PER_ROUND", GOSSIP_VERIFY_PER_ROUND))
+) if GOSSIP_ENABLED else None
+
+
+@app.route("/api/v1/gossip", methods=["POST"])
+def gossip_exchange():
+    """
+    Provider 之间的反熵同步 (一次往返)
+    
+    Request:  {"nodes": {"": "根哈希"}, "entries": [{"provider": "a.com", "incarnation": 1712345678901, ...}]}
+    Response: {"nodes": {"0": "...", ..., "f": "..."}, "entries": [...]}
+    """
+    if gossip is None:
+        return error_response("GOSSIP_DISABLED")
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return error_response("INVALID_REQUEST", "Request body must be a JSON object")
+    return jsonify(gossip.handle(data))
+
+
+@app.route("/api/v1/gossip/members", methods=["GET"])
+def gossip_members():
+    """本 Provider 当前认为在线的成员 (含自己)"""
+    if gossip is None:
+        return error_response("GOSSIP_DISABLED")
+    members = gossip.alive()
+    return jsonify({"provider": gossip.provider, "count": len(members), "members": members})
+
+
+@app.route("/api/v1/directory", methods=["GET"])
+def gossip_directory():
+    """
+    以种子节点目录格式列出 gossip 得到的成员，SDK 的 ProviderDirectory 可以直接
+    把开启 gossip 的 Provider 当作种子节点使用。成员表随时在变，总是返回完整列表。
+    """
+    if gossip is None:
+        return error_response("GOSSIP_DISABLED")
+    providers = []
+    for entry in gossip.alive():
+        entry = {k: v for k, v in entry.items() if k not in ("incarnation", "status")}
+        entry["discovery_method"] = "gossip"
+        providers.append(entry)
+    return jsonify({
+        "directory_id": f"gossip:{gossip.provider}",
+        "version": 0,
+        "full": True,
+        "more": False,
+        "providers": providers,
+        "removed": []
     })
 
 
 # ==================== 启动 ====================
 
+# ==================== 种子节点登记 (v0.04 阶段4) ====================
+
+SEED_NODES = [seed.strip() for seed in os.environ.get("SEED_NODES", "").split(",") if seed.strip()]
+SEED_HEARTBEAT = float(os.environ.get("SEED_HEARTBEAT", 3600))  # 秒，须小于种子节点的 DIRECTORY_ENTRY_TTL
+SEED_RETRY_DELAY = 10  # 秒，有种子节点登记失败时的重试间隔
+
+
+def start_seed_announcer(provider, url=None):
+    """后台线程：向 SEED_NODES 登记本 Provider，之后定期续期"""
+    def run():
+        time.sleep(1)  # 等 app.run 开始监听，种子节点会回访 providers/info
+        while True:
+            results = announce(SEED_NODES, provider, url,
+                               HTTPTransport(timeout=10, allow_private=ALLOW_PRIVATE_TARGETS))
+            for seed, result in results.items():
+                if result is not True:
+                    print(f"Seed node {seed}: registration failed: {result}")
+            time.sleep(SEED_HEARTBEAT if all(r is True for r in results.values()) else SEED_RETRY_DELAY)
+    
+    thread = threading.Thread(target=run, name="seed-announcer", daemon=True)
+    thread.start()
+    return thread
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
-    debug = os.environ.get("DEBUG", "false").lower() == "true"
+    
+    if SEED_NODES:
+        if tenants:
+            for tenant in tenants:
+                start_seed_announcer(tenant.domain)
+        else:
+            start_seed_announcer(PROVIDER_DOMAIN, PUBLIC_BASE_URL)
+    if gossip is not None:
+        gossip.start()
+    if BLOB_GC_INTERVAL > 0:
+        start_blob_gc()
     
     print(f"""
 ╔═══════════════════════════════════════════════════╗
@@ -437,4 +2040,4 @@ if __name__ == "__main__":
 ╚═══════════════════════════════════════════════════╝
     """)
     
-    app.run(host="0.0.0.0", port=port, debug=debug)
+    app.run(host="0.0.0.0", port=port, debug=DEBUG)
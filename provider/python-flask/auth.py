@@ -0,0 +1,93 @@
+"""
+API Key 认证辅助
+
+API Key 只以哈希形式存储：key 的前 API_KEY_PREFIX_LENGTH 个字符作为索引
+(常数时间查找)，完整 key 的 SHA-256 作为校验值。校验通过的结果缓存在进程内
+(带 TTL)，吊销 key 时立即失效。
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+API_KEY_PREFIX_LENGTH = 12
+AUTH_CACHE_TTL = 60          # 秒，多进程部署时吊销最多延迟这么久生效
+AUTH_CACHE_MAX_SIZE = 10000
+
+# key 权限范围
+SCOPE_INBOX_READ = "inbox:read"
+SCOPE_KEYS_MANAGE = "keys:manage"
+SCOPE_MESSAGES_SEND = "messages:send"
+ALL_SCOPES = (SCOPE_INBOX_READ, SCOPE_KEYS_MANAGE, SCOPE_MESSAGES_SEND)
+
+
+def generate_api_key() -> str:
+    """Generate secure API key using secrets module."""
+    return secrets.token_urlsafe(32)
+
+
+def key_prefix(api_key: str) -> str:
+    """Return the non-secret index prefix of an API key."""
+    return api_key[:API_KEY_PREFIX_LENGTH]
+
+
+def hash_api_key(api_key: str) -> str:
+    """Return the fixed-length hash stored in place of the API key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def verify_key_hash(api_key_hash: str, stored_hash: str) -> bool:
+    """Constant-time comparison of two key hashes."""
+    return hmac.compare_digest(api_key_hash, stored_hash)
+
+
+class AuthCache:
+    """
+    In-process cache of verified API keys.
+
+    Entries are keyed by the key hash, so plaintext keys are never retained,
+    and can be invalidated by prefix when a key is revoked or rotated.
+    """
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_size: int = AUTH_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}    # {key_hash: (record, expires_at)}
+        self._by_prefix = {}  # {prefix: key_hash}
+        self._lock = threading.Lock()
+
+    def get(self, api_key_hash: str):
+        """Return the cached key record, or None on miss/expiry."""
+        entry = self._entries.get(api_key_hash)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if expires_at < time.monotonic():
+            self.invalidate(record["prefix"])
+            return None
+        return record
+
+    def put(self, api_key_hash: str, record: dict) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # 满了直接清空，简单且不会出错；缓存会很快重新热起来
+                self._entries.clear()
+                self._by_prefix.clear()
+            self._entries[api_key_hash] = (record, time.monotonic() + self.ttl)
+            self._by_prefix[record["prefix"]] = api_key_hash
+
+    def invalidate(self, prefix: str) -> None:
+        with self._lock:
+            api_key_hash = self._by_prefix.pop(prefix, None)
+            if api_key_hash is not None:
+                self._entries.pop(api_key_hash, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_prefix.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
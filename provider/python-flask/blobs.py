@@ -0,0 +1,178 @@
+"""
+内容寻址 Blob 存储
+
+大附件不进消息体：发送方把内容流式上传到 POST /api/v1/blobs，信封里只带
+content_hash ("sha256:<hex>") 和 content_size。Blob 按 SHA-256 存在磁盘上，
+相同内容只存一份；下载走 send_file，支持 Range 请求。
+
+上传需要 API Key，按上传者 (owner) 计配额：同一 owner 重复上传相同内容只计一次。
+collect() 删除没有任何已存消息引用、且最近一次上传已超过宽限期的 Blob，宽限期
+留给其他 Provider 上的收件人来下载 (发往外部的消息不在本地存储里)。
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+
+BLOB_CHUNK_SIZE = 64 * 1024
+BLOB_QUOTA = 1024 * 1024 * 1024    # 每个 owner 的字节数
+BLOB_GC_GRACE = 7 * 24 * 3600      # 秒，未被引用的 Blob 保留多久
+HASH_PREFIX = "sha256:"
+_HEX_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobError(ValueError):
+    """Blob upload rejected."""
+    code = "INVALID_REQUEST"
+
+
+class BlobTooLarge(BlobError):
+    code = "PAYLOAD_TOO_LARGE"
+
+
+class BlobHashMismatch(BlobError):
+    code = "BLOB_HASH_MISMATCH"
+
+
+class BlobQuotaExceeded(BlobError):
+    code = "QUOTA_EXCEEDED"
+
+
+def parse_content_hash(value):
+    """Return the hex digest from "sha256:<hex>" (or bare hex), or None if malformed."""
+    if not isinstance(value, str):
+        return None
+    digest = value[len(HASH_PREFIX):] if value.startswith(HASH_PREFIX) else value
+    digest = digest.lower()
+    return digest if _HEX_DIGEST.match(digest) else None
+
+
+class BlobStore:
+    """Blobs stored on disk as <root>/<digest[:2]>/<digest>."""
+
+    def __init__(self, root, max_size, quota=BLOB_QUOTA, grace=BLOB_GC_GRACE):
+        self.root = root
+        self.max_size = max_size
+        self.quota = quota
+        self.grace = grace
+        self._owned = {}   # {owner: {digest: size}}
+        self._usage = {}   # {owner: bytes}
+        self._lock = threading.Lock()
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def size(self, digest):
+        """Size in bytes, or None if the blob does not exist."""
+        try:
+            return os.path.getsize(self.path(digest))
+        except OSError:
+            return None
+
+    def usage(self, owner):
+        """Bytes charged to owner."""
+        return self._usage.get(owner, 0)
+
+    def put_stream(self, stream, expected_digest=None, owner=None):
+        """
+        Stream a blob to disk, hashing as it is written, and charge it to owner.
+
+        Returns (digest, size, created); created is False when an identical
+        blob was already stored.
+        """
+        limit = self.max_size
+        if owner is not None and expected_digest not in self._owned.get(owner, ()):
+            # 流式写入时就按剩余配额截断；重传自己已有的内容需声明哈希才不受剩余配额限制
+            limit = min(limit, self.quota - self.usage(owner))
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = stream.read(BLOB_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > limit:
+                        if size > self.max_size:
+                            raise BlobTooLarge(f"Blob exceeds {self.max_size} bytes")
+                        raise BlobQuotaExceeded(f"Blob quota of {self.quota} bytes exceeded")
+                    h.update(chunk)
+                    f.write(chunk)
+
+            digest = h.hexdigest()
+            if expected_digest and expected_digest != digest:
+                raise BlobHashMismatch(f"Uploaded content hashes to {HASH_PREFIX}{digest}")
+
+            with self._lock:
+                if owner is not None:
+                    owned = self._owned.setdefault(owner, {})
+                    if digest not in owned:
+                        # 并发上传时流式检查用的是开始时的用量，这里按最新用量再查一次
+                        if self.usage(owner) + size > self.quota:
+                            raise BlobQuotaExceeded(f"Blob quota of {self.quota} bytes exceeded")
+                        owned[digest] = size
+                        self._usage[owner] = self.usage(owner) + size
+
+                dest = self.path(digest)
+                if os.path.exists(dest):
+                    os.remove(tmp_path)
+                    os.utime(dest)  # 重新上传相当于续期，宽限期从现在算起
+                    return digest, size, False
+
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+                return digest, size, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def collect(self, referenced, now=None):
+        """
+        Delete blobs whose digest is not in referenced and that were last uploaded
+        more than `grace` seconds ago, releasing their quota; also removes stale
+        partial uploads. Returns {"removed": count, "bytes": freed}.
+        """
+        cutoff = (time.time() if now is None else now) - self.grace
+        removed = freed = 0
+        try:
+            shards = os.listdir(self.root)
+        except FileNotFoundError:
+            return {"removed": 0, "bytes": 0}
+
+        for shard in shards:
+            directory = os.path.join(self.root, shard)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if shard != "tmp" and name in referenced:
+                    continue
+                path = os.path.join(directory, name)
+                with self._lock:
+                    try:
+                        stat = os.stat(path)
+                        if stat.st_mtime >= cutoff:
+                            continue
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                    if shard == "tmp":
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+                    for owner, owned in self._owned.items():
+                        size = owned.pop(name, None)
+                        if size is not None:
+                            self._usage[owner] -= size
+        return {"removed": removed, "bytes": freed}
@@ -0,0 +1,75 @@
+"""
+Bloom 过滤器：快速排除不存在的地址
+
+每个域名的 InMemoryDB 维护一个过滤器，里面是已注册的 aap_address 和 owner_role。
+resolve、收消息、关注等先查过滤器：不在过滤器里的 key 一定不存在，直接返回
+ADDRESS_NOT_FOUND，不查存储；在过滤器里的 (含少量误判) 再查存储确认。
+
+- 注册时加入；启动时从存储重建 (换成持久化存储后，重建就是扫一遍 Agent 表)
+- 不支持删除：删掉的 Agent 仍在过滤器里，只会多一次存储查询，不会误拒
+- 条目数超过 capacity 时误判率上升，此时按两倍容量从存储重建
+- add 不是线程安全的 (置位是读-改-写)，并发写入由调用方加锁；查询无需加锁
+
+k 个位置用双重哈希 (h1 + i * h2) 从一次 BLAKE2b 摘要算出。
+"""
+
+import hashlib
+import math
+
+BLOOM_CAPACITY = 100_000    # 条目数，超过后按两倍重建
+BLOOM_ERROR_RATE = 0.001    # 达到 capacity 时的误判率
+
+
+class BloomFilter:
+    """Set membership with no false negatives and ~error_rate false positives up to capacity entries."""
+
+    __slots__ = ("capacity", "error_rate", "size", "hashes", "count", "_bits")
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        # m = -n ln p / (ln 2)^2，k = m / n * ln 2
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def build(cls, keys, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        """Filter holding keys, sized for at least twice as many entries."""
+        keys = list(keys)
+        bloom = cls(max(capacity, 2 * len(keys)), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def __len__(self):
+        return self.count
+
+    def _hashes(self, key):
+        h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest(), "little")
+        return h & 0xFFFFFFFFFFFFFFFF, (h >> 64) | 1
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        size, bits = self.size, self._bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        h1, h2 = self._hashes(key)
+        size, bits = self.size, self._bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False  # 多数不存在的 key 在前一两个位置就能排除
+        return True
+
+    def full(self):
+        return self.count >= self.capacity
+
+    def false_positive_rate(self):
+        """Expected false positive rate at the current fill."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
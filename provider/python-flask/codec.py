@@ -0,0 +1,99 @@
+"""
+JSON 编解码
+
+安装可选依赖 `orjson` 时使用 orjson，否则退回标准库 json。FastJSONProvider
+接管 Flask 的 jsonify / request.get_json，所有路由自动走同一条编码路径。
+
+orjson 只支持 64 位整数：超出范围的整数解码时会变成 float，编码时报错。这两种情况
+退回标准库 json，保证任意大小的整数原样往返 (签名校验依赖这一点)。
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+
+# 19 位以上的数字串可能是 orjson 会降级成 float 的整数 (-2**63 以下、2**64 以上)；
+# 误报 (字符串里的长数字、长小数) 只是多走一次标准库解码。translate 把数字以外的
+# 字节都换成空格再找 19 个连续的 0，比正则快几倍
+_DIGITS_ONLY = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_WIDE_NUMBER = b"0" * 19
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+if orjson:
+    def dumps(obj) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # 超出 64 位的整数
+            return _stdlib_dumps(obj)
+
+    def dumps_stored(obj) -> bytes:
+        # orjson 的输出保留了整块写缓冲区 (小对象也约 1 KiB)，长期保存前复制成精确大小
+        try:
+            return bytes(memoryview(orjson.dumps(obj)))
+        except TypeError:
+            return _stdlib_dumps(obj)
+
+    def loads(data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if _WIDE_NUMBER in bytes(data).translate(_DIGITS_ONLY):
+            return json.loads(data)
+        return orjson.loads(data)
+else:
+    dumps = dumps_stored = _stdlib_dumps
+
+    def loads(data):
+        return json.loads(data)
+
+
+def join_array(items) -> bytes:
+    """Splice already-encoded JSON values into a JSON array without re-encoding them."""
+    return b"[" + b",".join(items) + b"]"
+
+
+def list_object(field, items, **extra) -> bytes:
+    """
+    Encode {field: [...items], "count": len(items), **extra}, splicing the
+    already-encoded items instead of re-serializing them.
+    """
+    parts = [dumps(field), b":", join_array(items), b',"count":', str(len(items)).encode()]
+    for key, value in extra.items():
+        parts += [b",", dumps(key), b":", dumps(value)]
+    return b"{" + b"".join(parts) + b"}"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when available."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default).decode("utf-8")
+            except TypeError:  # 超出 64 位的整数，交给标准库
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson and not kwargs:
+            return loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if not orjson or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            data = orjson.dumps(obj, default=self.default)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
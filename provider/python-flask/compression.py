@@ -0,0 +1,151 @@
+"""
+传输压缩 (gzip / zstd)
+
+- 请求体：带 Content-Encoding 的请求在进入 Flask 之前由 DecompressionMiddleware 解压
+- 响应体：超过阈值的 JSON 响应按 Accept-Encoding 压缩
+
+zstd 需要安装可选依赖 `zstandard`，未安装时只支持 gzip。
+"""
+
+import gzip
+import io
+import json
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# 按优先级排列
+SUPPORTED_ENCODINGS = (["zstd"] if zstandard else []) + ["gzip"]
+
+COMPRESSIBLE_MIMETYPES = frozenset([
+    "application/json", "application/msgpack", "application/cbor", "text/plain", "text/markdown"
+])
+
+_CORRUPT_ERRORS = (OSError, EOFError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+class DecompressionError(ValueError):
+    """Request body could not be decompressed."""
+    code = "UNSUPPORTED_ENCODING"
+    status = "415 Unsupported Media Type"
+
+
+class DecompressedTooLarge(DecompressionError):
+    """Request body inflates beyond the allowed size."""
+    code = "PAYLOAD_TOO_LARGE"
+    status = "413 Payload Too Large"
+
+
+class CompressedTooLarge(DecompressionError):
+    """Compressed request body is larger than allowed."""
+    code = "PAYLOAD_TOO_LARGE"
+    status = "413 Payload Too Large"
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str, max_size: int) -> bytes:
+    """Decompress data, refusing to inflate beyond max_size bytes."""
+    try:
+        if encoding == "gzip":
+            with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+                out = f.read(max_size + 1)
+        elif encoding == "zstd" and zstandard:
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+            out = reader.read(max_size + 1)
+        else:
+            raise DecompressionError(f"Unsupported Content-Encoding: {encoding}")
+    except _CORRUPT_ERRORS as e:
+        raise DecompressionError(f"Corrupt {encoding} body: {e}") from e
+
+    if len(out) > max_size:
+        raise DecompressedTooLarge(f"Decompressed body exceeds {max_size} bytes")
+    return out
+
+
+class DecompressionMiddleware:
+    """
+    WSGI middleware that transparently decompresses request bodies.
+
+    Only requests whose path starts with one of `path_prefixes` are touched;
+    downstream handlers see a plain body with the original Content-Type.
+    At most max_compressed_size (default max_size) bytes of compressed body are read.
+    """
+
+    def __init__(self, wsgi_app, path_prefixes, max_size, max_compressed_size=None):
+        self.wsgi_app = wsgi_app
+        self.path_prefixes = tuple(path_prefixes)
+        self.max_size = max_size
+        self.max_compressed_size = max_compressed_size or max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if not encoding or encoding == "identity" or not environ.get("PATH_INFO", "").startswith(self.path_prefixes):
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            body = self._read(environ)
+            body = decompress(body, encoding, self.max_size)
+        except DecompressionError as e:
+            error = json.dumps({"error": {"code": e.code, "message": str(e)}}).encode("utf-8")
+            start_response(e.status, [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(error))),
+            ])
+            return [error]
+
+        environ["wsgi.input"] = io.BytesIO(body)
+        environ["CONTENT_LENGTH"] = str(len(body))
+        del environ["HTTP_CONTENT_ENCODING"]
+        return self.wsgi_app(environ, start_response)
+
+    def _read(self, environ):
+        """Compressed body, refusing more than max_compressed_size bytes (declared or actual)."""
+        limit = self.max_compressed_size
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > limit:
+            raise CompressedTooLarge(f"Compressed body exceeds {limit} bytes")
+        # 没有 Content-Length (chunked) 时最多读 limit + 1 字节
+        body = environ["wsgi.input"].read(length if length else limit + 1)
+        if len(body) > limit:
+            raise CompressedTooLarge(f"Compressed body exceeds {limit} bytes")
+        return body
+
+
+def compress_response(response, accept_encodings, min_size):
+    """Compress a Flask response in place if the client accepts it."""
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = accept_encodings.best_match(SUPPORTED_ENCODINGS)
+    if not encoding:
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
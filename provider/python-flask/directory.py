@@ -0,0 +1,279 @@
+"""
+种子节点 Provider 目录 (v0.04 阶段4)
+
+种子节点维护一份 Provider 列表，客户端下载一次后只同步增量：
+
+- Provider 向种子节点登记 (POST /api/v1/directory/providers)，种子节点访问对方域名上的
+  /api/v1/providers/info 确认地址可达，并记录它声明的能力
+- 每次变更 (新增、更新、删除、过期) 分配一个递增的序号 seq，目录的 version 是最大 seq
+- GET /api/v1/directory?since={version}&directory_id={id} 只返回 seq > since 的条目和删除记录；
+  directory_id 不一致 (换了种子节点或种子节点重启) 或删除记录已被淘汰时返回完整列表
+- 登记超过 entry_ttl 秒未续期的 Provider 视为下线，按删除处理
+
+单独运行：SEED_PORT=6000 python directory.py
+Provider 设置 SEED_NODES 后启动时向种子节点登记，并按 SEED_HEARTBEAT 定期续期 (见 app.py)。
+"""
+
+import hmac
+import os
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict
+
+from flask import Flask, jsonify, request
+
+import codec
+from compression import compress_response
+from relay import HTTPTransport, RelayError, base_url
+
+DIRECTORY_ENTRY_TTL = 24 * 3600   # 秒，登记的有效期，Provider 需在此之前续期
+DIRECTORY_MAX_TOMBSTONES = 10000  # 保留的删除记录数，更早的增量只能全量同步
+DIRECTORY_PAGE_LIMIT = 10000      # 单次响应最多返回的条目数
+
+# 目录条目保存的 providers/info 字段
+INFO_FIELDS = ("version", "capabilities", "compression")
+
+
+class DirectoryError(Exception):
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+class Directory:
+    """Provider list with per-change sequence numbers."""
+
+    def __init__(self, entry_ttl=DIRECTORY_ENTRY_TTL, max_tombstones=DIRECTORY_MAX_TOMBSTONES):
+        self.directory_id = uuid.uuid4().hex  # 进程内存储，重启后客户端需要全量同步
+        self.entry_ttl = entry_ttl
+        self.max_tombstones = max_tombstones
+        self.version = 0
+        self.min_seq = 0  # since 小于它时增量不完整 (对应的删除记录已淘汰)
+        self.entries = OrderedDict()     # {provider: entry}，按 seq 递增
+        self.expires = {}                # {provider: 过期时间}
+        self.tombstones = OrderedDict()  # {provider: seq}，按 seq 递增
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _next_seq(self):
+        self.version += 1
+        return self.version
+
+    def upsert(self, provider, info, url=None):
+        """Record (or refresh) a provider from its providers/info response."""
+        entry = {"provider": provider}
+        if url and url != base_url(provider):
+            entry["base_url"] = url  # 与默认规则一致时省略，列表更紧凑
+        for field in INFO_FIELDS:
+            if field in info:
+                entry[field] = info[field]
+        with self._lock:
+            self.expires[provider] = time.monotonic() + self.entry_ttl
+            old = self.entries.get(provider)
+            if old is not None and {k: v for k, v in old.items() if k != "seq"} == entry:
+                return old  # 只是续期，内容没变，不产生增量
+            entry["seq"] = self._next_seq()
+            self.entries.pop(provider, None)
+            self.entries[provider] = entry
+            self.tombstones.pop(provider, None)
+            return entry
+
+    def remove(self, provider):
+        with self._lock:
+            return self._remove(provider)
+
+    def _remove(self, provider):
+        if self.entries.pop(provider, None) is None:
+            return False
+        self.expires.pop(provider, None)
+        self.tombstones[provider] = self._next_seq()
+        while len(self.tombstones) > self.max_tombstones:
+            _, seq = self.tombstones.popitem(last=False)
+            self.min_seq = seq
+        return True
+
+    def expire(self, now=None):
+        """Remove providers whose registration was not renewed in time."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [p for p, deadline in self.expires.items() if deadline <= now]
+            for provider in expired:
+                self._remove(provider)
+        return len(expired)
+
+    def changes(self, since=None, directory_id=None, limit=DIRECTORY_PAGE_LIMIT):
+        """
+        Entries and removals after `since`, or the full list when the client's
+        state cannot be brought up to date with a delta.
+
+        At most `limit` changes are returned; "version" is then the seq of the
+        last one returned and "more" is true, so the client asks again.
+        """
+        with self._lock:
+            full = (since is None or directory_id != self.directory_id
+                    or since < self.min_seq or since > self.version)
+            if full:
+                since = 0
+            # 从末尾往前走到 seq <= since 为止，代价与增量大小成正比
+            changed = []
+            for entry in reversed(self.entries.values()):
+                if entry["seq"] <= since:
+                    break
+                changed.append(entry)
+            removed = []
+            if not full:
+                for provider, seq in reversed(self.tombstones.items()):
+                    if seq <= since:
+                        break
+                    removed.append((seq, provider))
+
+            changes = sorted([(e["seq"], e) for e in changed] + removed, key=lambda c: c[0])
+            more = len(changes) > limit
+            changes = changes[:limit]
+            return {
+                "directory_id": self.directory_id,
+                "version": changes[-1][0] if more else self.version,
+                "full": full,
+                "more": more,
+                "providers": [c for _, c in changes if isinstance(c, dict)],
+                "removed": [c for _, c in changes if isinstance(c, str)],
+            }
+
+
+def fetch_info(transport, url):
+    """providers/info of the provider at url, or raise DirectoryError."""
+    try:
+        status, body = transport.request("GET", url + "/api/v1/providers/info")
+    except RelayError as e:
+        raise DirectoryError("PROVIDER_UNREACHABLE", str(e), 502)
+    if status != 200:
+        raise DirectoryError("PROVIDER_UNREACHABLE", f"providers/info returned HTTP {status}", 502)
+    try:
+        info = codec.loads(body)
+    except ValueError:
+        info = None
+    if not isinstance(info, dict):
+        raise DirectoryError("INVALID_REQUEST", "providers/info is not a JSON object")
+    return info
+
+
+def announce(seeds, provider, url=None, transport=None):
+    """
+    Register this provider with each seed node.
+
+    Returns {seed: True | error message}; unreachable seeds do not stop the others.
+    """
+    transport = transport or HTTPTransport(timeout=10)
+    body = codec.dumps({"provider": provider, "base_url": url or base_url(provider)})
+    results = {}
+    for seed in seeds:
+        try:
+            status, data = transport.request(
+                "POST", seed.rstrip("/") + "/api/v1/directory/providers", body,
+                {"Content-Type": "application/json"}
+            )
+            results[seed] = True if status in (200, 201) else f"HTTP {status}: {data[:200]!r}"
+        except RelayError as e:
+            results[seed] = str(e)
+    return results
+
+
+# ==================== 种子节点服务 ====================
+
+def create_seed_app(directory=None, transport=None, admin_token=None):
+    """Flask app serving a Directory; transport is used to verify registrations."""
+    app = Flask("aap-seed")
+    app.directory = directory = directory or Directory()
+    transport = transport or HTTPTransport(timeout=10)
+
+    def error(code, message, status):
+        return jsonify({"error": {"code": code, "message": message}}), status
+
+    @app.errorhandler(DirectoryError)
+    def directory_error(e):
+        return error(e.code, str(e), e.status)
+
+    @app.before_request
+    def expire_entries():
+        directory.expire()
+
+    @app.after_request
+    def compress(response):
+        # 全量列表可能很大，按 Accept-Encoding 压缩
+        return compress_response(response, request.accept_encodings, 1024)
+
+    @app.route("/api/v1/directory", methods=["GET"])
+    def get_directory():
+        """
+        GET /api/v1/directory?since={version}&directory_id={id}
+
+        Response:
+            {"directory_id": "...", "version": 42, "full": false, "more": false,
+             "providers": [{"provider": "a.com", "capabilities": [...], "seq": 41}],
+             "removed": ["b.com"]}
+        """
+        since = request.args.get("since")
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return error("INVALID_REQUEST", "since must be an integer", 400)
+        return jsonify(directory.changes(since, request.args.get("directory_id")))
+
+    @app.route("/api/v1/directory/providers", methods=["POST"])
+    def register_provider():
+        """
+        登记或续期 Provider
+
+        Request: {"provider": "provider.com", "base_url": "https://provider.com (optional)"}
+
+        base_url 的主机 (含端口) 必须就是 provider，否则谁都能把别人的域名登记到自己的服务器上。
+        """
+        data = request.get_json(silent=True)
+        provider = data.get("provider") if isinstance(data, dict) else None
+        if not isinstance(provider, str) or not provider or len(provider) > 253:
+            return error("INVALID_REQUEST", "provider is required", 400)
+        provider = provider.strip().lower()
+        url = data.get("base_url") or base_url(provider)
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            return error("INVALID_REQUEST", "base_url must be an http(s) URL", 400)
+        url = url.rstrip("/")
+        if urllib.parse.urlsplit(url).netloc.lower() != provider:
+            return error("INVALID_REQUEST", f"base_url host must be {provider}", 400)
+
+        info = fetch_info(transport, url)
+        if str(info.get("provider", "")).lower() != provider:
+            return error("INVALID_REQUEST", f"{url} reports provider {info.get('provider')!r}", 400)
+        entry = directory.upsert(provider, info, url)
+        return jsonify(entry), 201
+
+    @app.route("/api/v1/directory/providers/<provider>", methods=["DELETE"])
+    def remove_provider(provider):
+        auth = request.headers.get("Authorization", "")
+        if not admin_token or not hmac.compare_digest(auth.encode(), f"Bearer {admin_token}".encode()):
+            return error("AUTHENTICATION_FAILED", "Admin token required", 403)
+        if not directory.remove(provider.lower()):
+            return error("ADDRESS_NOT_FOUND", f"{provider} is not listed", 404)
+        return jsonify({"success": True})
+
+    @app.route("/health")
+    def health():
+        return jsonify({"status": "ok", "providers": len(directory), "version": directory.version})
+
+    return app
+
+
+if __name__ == "__main__":
+    # 与 Provider 相同：默认不回访非公网地址，本机测试时设 ALLOW_PRIVATE_TARGETS=true
+    allow_private = os.environ.get("ALLOW_PRIVATE_TARGETS", "").lower() in ("1", "true", "yes")
+    seed = create_seed_app(
+        Directory(entry_ttl=float(os.environ.get("DIRECTORY_ENTRY_TTL", DIRECTORY_ENTRY_TTL))),
+        HTTPTransport(timeout=10, allow_private=allow_private),
+        admin_token=os.environ.get("ADMIN_TOKEN")
+    )
+    seed.run(host="0.0.0.0", port=int(os.environ.get("SEED_PORT", 6000)))
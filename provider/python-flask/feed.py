@@ -0,0 +1,134 @@
+"""
+公开动态 (Feed)
+
+发往 ai:feed~public#<provider> 的消息是作者的公开帖子。关注关系保存在本
+Provider 上，时间线采用混合扩散：
+
+- 写扩散：发布时作者粉丝数不超过 fanout_threshold，把帖子推到每个粉丝的时间线
+- 读扩散：粉丝太多时只记在作者名下，粉丝读取时再按 seq 归并
+
+帖子在发布时编码一次 (codec.dumps_stored)，读取时直接拼接。
+发布带 X-Idempotency-Key 时按 (作者, key) 去重，客户端超时重试不会重复发帖。
+"""
+
+import heapq
+import itertools
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+import codec
+
+FEED_OWNER_ROLE = "feed~public"
+FANOUT_ON_WRITE_MAX_FOLLOWERS = 1000
+TIMELINE_MAX = 1000  # 每个粉丝的写扩散时间线最多保留的帖子数
+
+
+def _newest_first(entries, before):
+    """Iterate an ascending entry list newest-first, starting below seq `before`."""
+    end = len(entries) if before is None else bisect_left(entries, (before,))
+    for i in range(end - 1, -1, -1):
+        yield entries[i]
+
+
+def _oldest_first(entries, after):
+    """Iterate an ascending entry list oldest-first, starting above seq `after`."""
+    for i in range(bisect_left(entries, (after + 1,)), len(entries)):
+        yield entries[i]
+
+
+class FeedStore:
+    """
+    Follower graph, posts and timelines.
+
+    Timeline entries are (seq, author, encoded_post) tuples kept in ascending
+    seq order, so every list can be bisected and merged by seq.
+    """
+
+    def __init__(self, fanout_threshold=FANOUT_ON_WRITE_MAX_FOLLOWERS, timeline_max=TIMELINE_MAX):
+        self.fanout_threshold = fanout_threshold
+        self.timeline_max = timeline_max
+        self.followers = {}   # {author: set(follower)}
+        self.following = {}   # {follower: set(author)}
+        self.posts = {}       # {author: [entry]}  作者的全部帖子
+        self.pull_posts = {}  # {author: [entry]}  发布时走读扩散的帖子
+        self.timelines = {}   # {follower: [entry]} 写扩散推送的帖子
+        self.cursors = {}     # {follower: 已读到的 seq}
+        self.by_key = {}      # {(author, idempotency_key): post}
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    # ---------- 关注关系 ----------
+
+    def follow(self, follower, author):
+        with self._lock:
+            self.followers.setdefault(author, set()).add(follower)
+            self.following.setdefault(follower, set()).add(author)
+
+    def unfollow(self, follower, author):
+        with self._lock:
+            self.followers.get(author, set()).discard(follower)
+            self.following.get(follower, set()).discard(author)
+
+    def get_following(self, follower):
+        return sorted(self.following.get(follower, ()))
+
+    def follower_count(self, author):
+        return len(self.followers.get(author, ()))
+
+    # ---------- 发布 ----------
+
+    def publish(self, author, post, idempotency_key=None):
+        """Store a post and fan it out. Returns the post with id/seq filled in (the earlier one for a repeated key)."""
+        with self._lock:
+            if idempotency_key:
+                earlier = self.by_key.get((author, idempotency_key))
+                if earlier is not None:
+                    return earlier
+                self.by_key[(author, idempotency_key)] = post
+            seq = next(self._seq)
+            post["id"] = f"feed-{seq}"
+            post["seq"] = seq
+            post["received_at"] = datetime.utcnow().isoformat() + "Z"
+            entry = (seq, author, codec.dumps_stored(post))
+
+            self.posts.setdefault(author, []).append(entry)
+
+            followers = self.followers.get(author, ())
+            if len(followers) <= self.fanout_threshold:
+                for follower in followers:
+                    timeline = self.timelines.setdefault(follower, [])
+                    timeline.append(entry)
+                    # 超过两倍上限时一次性裁剪，摊还 O(1)
+                    if len(timeline) > 2 * self.timeline_max:
+                        del timeline[:-self.timeline_max]
+            else:
+                self.pull_posts.setdefault(author, []).append(entry)
+        return post
+
+    # ---------- 读取 ----------
+
+    def _sources(self, follower, iterate, bound):
+        following = self.following.get(follower, set())
+        pushed = (e for e in iterate(self.timelines.get(follower, []), bound) if e[1] in following)
+        pulled = [iterate(self.pull_posts[a], bound) for a in following if a in self.pull_posts]
+        return [pushed] + pulled
+
+    def timeline(self, follower, limit=20, before=None):
+        """Newest-first page of the follower's timeline with seq < before."""
+        sources = self._sources(follower, _newest_first, before)
+        merged = heapq.merge(*sources, key=lambda e: -e[0])
+        return list(itertools.islice(merged, limit))
+
+    def unread(self, follower, limit=20):
+        """Oldest-first posts after the follower's cursor; advances the cursor."""
+        after = self.cursors.get(follower, 0)
+        sources = self._sources(follower, _oldest_first, after)
+        entries = list(itertools.islice(heapq.merge(*sources), limit))
+        if entries:
+            self.cursors[follower] = entries[-1][0]
+        return entries
+
+    def author_posts(self, author, limit=20, before=None):
+        """Newest-first page of one author's posts."""
+        return list(itertools.islice(_newest_first(self.posts.get(author, []), before), limit))
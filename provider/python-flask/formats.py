@@ -0,0 +1,164 @@
+"""
+二进制消息体格式 (MessagePack / CBOR)
+
+JSON 之外，请求体和响应体可以用更紧凑的二进制编码，按 HTTP 头协商：
+
+- 请求体：Content-Type: application/msgpack 或 application/cbor 时由 BinaryRequest
+  解码，路由里的 request.get_json() 照常拿到 dict
+- 响应体：Accept 里二进制格式的优先级高于 JSON 时，JSON 响应在压缩之前转码
+  (transcode_response)；同等优先级 (含 */* 和没有 Accept) 仍然返回 JSON
+
+数据模型与 JSON 相同：解码后只允许 dict (str 键)、list、str、int、float、bool、None，
+二进制或扩展类型 (bytes、CBOR 日期等) 按格式错误拒绝，因此存储和转发的内容与 JSON
+请求完全一样。整数必须在 int64 / uint64 范围内 (-2**63 ~ 2**64-1)：CBOR 的大整数 (bignum)
+同样按格式错误拒绝 (400)，否则存下的消息无法再用 MessagePack 取回。JSON 请求体没有这个限制。
+浮点数必须是有限值：NaN、±Infinity 不是合法 JSON，同样按格式错误拒绝 (400)。
+
+MessagePack 需要安装可选依赖 `msgpack`，CBOR 需要 `cbor2`；都没有安装时只支持 JSON。
+"""
+
+from math import isfinite
+
+from flask import Request
+
+from codec import loads as json_loads
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # 可选依赖
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# 按优先级排列；JSON 在最前，客户端不区分时返回 JSON
+BINARY_FORMATS = ([MSGPACK] if msgpack else []) + ([CBOR] if cbor2 else [])
+SUPPORTED_FORMATS = [JSON] + BINARY_FORMATS
+
+# 请求 Content-Type 的别名
+ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+_SCALARS = frozenset([str, int, float, bool, type(None)])
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 64 - 1
+
+
+class FormatError(ValueError):
+    """Body could not be decoded, or holds values JSON cannot represent."""
+    code = "INVALID_REQUEST"
+
+
+def _check(obj):
+    """Raise FormatError unless obj is made only of JSON types."""
+    stack = [obj]
+    pop, extend = stack.pop, stack.extend
+    while stack:
+        value = pop()
+        kind = type(value)
+        if kind is dict:
+            for key in value:
+                if type(key) is not str:
+                    raise FormatError("Object keys must be strings")
+            extend(value.values())
+        elif kind is list:
+            extend(value)
+        elif kind is int:
+            if not _INT_MIN <= value <= _INT_MAX:
+                raise FormatError("Integers must fit in 64 bits")
+        elif kind is float:
+            if not isfinite(value):
+                raise FormatError("Floats must be finite")
+        elif kind not in _SCALARS:
+            raise FormatError(f"Unsupported value type: {kind.__name__}")
+
+
+def encode(obj, mimetype) -> bytes:
+    if mimetype == MSGPACK and msgpack:
+        return msgpack.packb(obj, use_bin_type=True)
+    if mimetype == CBOR and cbor2:
+        return cbor2.dumps(obj)
+    raise ValueError(f"Unsupported format: {mimetype}")
+
+
+def decode(data, mimetype):
+    """
+    Decode a MessagePack / CBOR body into JSON-compatible values.
+
+    Raises:
+        FormatError: corrupt body, trailing data or non-JSON values
+    """
+    mimetype = ALIASES.get(mimetype, mimetype)
+    try:
+        if mimetype == MSGPACK and msgpack:
+            obj = msgpack.unpackb(data, raw=False)
+        elif mimetype == CBOR and cbor2:
+            obj = cbor2.loads(data)
+        else:
+            raise FormatError(f"Unsupported Content-Type: {mimetype}")
+    except FormatError:
+        raise
+    except Exception as e:  # 各个库的解码错误类型不同
+        raise FormatError(f"Corrupt {mimetype} body: {e}") from e
+    _check(obj)
+    return obj
+
+
+def is_binary(mimetype):
+    return ALIASES.get(mimetype, mimetype) in BINARY_FORMATS
+
+
+class BinaryRequest(Request):
+    """Flask request whose get_json() also decodes MessagePack / CBOR bodies."""
+
+    _binary_json = None
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if not is_binary(self.mimetype):
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if self._binary_json is not None:
+            return self._binary_json
+        try:
+            obj = decode(self.get_data(cache=cache), self.mimetype)
+        except FormatError as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+        if cache:
+            self._binary_json = obj
+        return obj
+
+
+def response_format(accept_mimetypes):
+    """Binary format the client prefers over JSON, or None."""
+    best = accept_mimetypes.best_match(SUPPORTED_FORMATS)
+    return best if best in BINARY_FORMATS else None
+
+
+def transcode_response(response, accept_mimetypes):
+    """Re-encode a JSON Flask response in place if the client prefers a binary format."""
+    if (
+        not BINARY_FORMATS
+        or response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.mimetype != JSON
+    ):
+        return response
+
+    response.vary.add("Accept")
+    mimetype = response_format(accept_mimetypes)
+    if not mimetype:
+        return response
+
+    try:
+        data = encode(json_loads(response.get_data()), mimetype)
+    except (ValueError, TypeError, OverflowError):
+        return response  # 比如超出 64 位的整数，保持 JSON
+    response.set_data(data)
+    response.mimetype = mimetype
+    return response
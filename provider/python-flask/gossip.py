@@ -0,0 +1,381 @@
+"""
+Gossip 成员发现 (v0.04 阶段5)
+
+开启后，Provider 之间互相交换已知的 Provider 列表，不依赖种子节点：
+
+- 每个 Provider 的成员条目由它自己维护，incarnation 只在信息变化 (启动、能力变化、
+  下线) 时增大；合并时 incarnation 大的条目胜出
+- 成员按 sha1(provider) 的十六进制前缀放进一棵 16 叉 Merkle 树 (depth 层，叶子是
+  depth 个十六进制字符的前缀)，写入时增量更新从叶子到根的哈希
+- 每个周期随机选 fanout 个已知成员做反熵同步：发送根哈希，对方只展开哈希不同的
+  子树，逐层向下直到叶子再交换条目。两边一致时只需一次请求，
+  同步代价与差异大小 (乘以树高) 成正比，而不是与网络规模成正比
+
+连续 suspect_after 次联系不上的成员只在本地标记为可疑，不参与选择、不对外列出，
+再次联系上或收到它更新的条目时恢复。
+
+POST /api/v1/gossip 是匿名的，条目内容不可信：关于 X 的条目只在本节点主动同步 X
+(连接 X 自己域名上的地址) 时从 X 的响应里采纳。其他来源的条目 (对方推送的、第三方转述的)
+只记作候选，每个周期最多直接联系 verify_per_round 个候选核实。incarnation 必须是
+63 位以内的非负整数，且不能比本地时钟超前 GOSSIP_MAX_SKEW。
+"""
+
+import hashlib
+import random
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+import codec
+from relay import HTTPTransport, RelayError, base_url
+
+GOSSIP_INTERVAL = 5.0     # 秒
+GOSSIP_FANOUT = 2         # 每个周期同步的成员数
+GOSSIP_DEPTH = 2          # Merkle 树高，叶子数 16 ** depth
+GOSSIP_SUSPECT_AFTER = 3  # 连续失败几次后标记为可疑
+GOSSIP_MAX_ROUNDS = 8     # 单次同步最多往返次数 (depth + 2 足够)
+GOSSIP_VERIFY_PER_ROUND = 16    # 每个周期直接核实的候选数
+GOSSIP_MAX_CANDIDATES = 1000    # 待核实候选的上限，满了不再接收
+GOSSIP_MAX_SKEW = 24 * 3600 * 1000  # 毫秒，incarnation 最多比本地时钟超前多少
+MAX_INCARNATION = 2 ** 63 - 1
+
+# 成员条目字段；capabilities / compression 取自该 Provider 的 providers/info
+MEMBER_FIELDS = ("provider", "base_url", "incarnation", "status", "capabilities", "compression")
+INFO_FIELDS = ("capabilities", "compression")
+_HEX = "0123456789abcdef"
+
+
+def _digest(entry):
+    return f"{entry['provider']}:{entry['incarnation']}:{entry.get('status', 'alive')}"
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _valid_incarnation(incarnation):
+    return (type(incarnation) is int and 0 <= incarnation <= MAX_INCARNATION
+            and incarnation <= time.time() * 1000 + GOSSIP_MAX_SKEW)
+
+
+class MerkleTree:
+    """16-ary hash tree over member digests keyed by sha1(provider) prefix."""
+
+    def __init__(self, depth=GOSSIP_DEPTH):
+        self.depth = depth
+        self.leaves = {}  # {leaf prefix: {provider: digest}}
+        self.hashes = {}  # {prefix: hash}，空子树不存，哈希视为 ""
+
+    def leaf_of(self, provider):
+        return _sha1(provider)[:self.depth]
+
+    def update(self, provider, digest):
+        leaf = self.leaf_of(provider)
+        members = self.leaves.setdefault(leaf, {})
+        if members.get(provider) == digest:
+            return
+        members[provider] = digest
+        self._rehash(leaf)
+
+    def _rehash(self, leaf):
+        members = self.leaves.get(leaf)
+        self._set(leaf, _sha1("|".join(sorted(members.values()))) if members else "")
+        prefix = leaf
+        while prefix:
+            prefix = prefix[:-1]
+            children = [self.hashes.get(prefix + c, "") for c in _HEX]
+            self._set(prefix, _sha1("|".join(children)) if any(children) else "")
+
+    def _set(self, prefix, value):
+        if value:
+            self.hashes[prefix] = value
+        else:
+            self.hashes.pop(prefix, None)
+
+    def hash(self, prefix=""):
+        return self.hashes.get(prefix, "")
+
+    def children(self, prefix):
+        return {prefix + c: self.hashes.get(prefix + c, "") for c in _HEX}
+
+    def providers(self, leaf):
+        return list(self.leaves.get(leaf, ()))
+
+
+class Gossip:
+    """
+    Membership state of one provider plus the anti-entropy protocol.
+
+    handle() serves POST /api/v1/gossip; sync_with() runs the initiator side.
+    """
+
+    def __init__(self, provider, url=None, info=None, peers=(), transport=None,
+                 depth=GOSSIP_DEPTH, fanout=GOSSIP_FANOUT, interval=GOSSIP_INTERVAL,
+                 suspect_after=GOSSIP_SUSPECT_AFTER, verify_per_round=GOSSIP_VERIFY_PER_ROUND,
+                 max_candidates=GOSSIP_MAX_CANDIDATES):
+        self.provider = provider
+        self.transport = transport or HTTPTransport(timeout=5)
+        self.fanout = fanout
+        self.interval = interval
+        self.suspect_after = suspect_after
+        self.verify_per_round = verify_per_round
+        self.max_candidates = max_candidates
+        self.tree = MerkleTree(depth)
+        self.members = {}   # {provider: entry}
+        self.failures = {}  # {provider: 连续失败次数}，只在本地
+        self.candidates = OrderedDict()  # {provider: incarnation}，听说过但还没有直接核实
+        self.seeds = [p for p in peers if p != provider]  # 启动时联系的地址 (provider 名)
+        self.stats = {"syncs": 0, "rounds": 0, "bytes_sent": 0, "bytes_received": 0, "entries_received": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.self_entry = self._entry(provider, url, int(time.time() * 1000), "alive", info or {})
+        self.merge([self.self_entry])
+
+    @staticmethod
+    def _entry(provider, url, incarnation, status, info):
+        entry = {"provider": provider, "incarnation": incarnation, "status": status}
+        if url and url != base_url(provider):
+            entry["base_url"] = url
+        for field in INFO_FIELDS:
+            if field in info:
+                entry[field] = info[field]
+        return entry
+
+    # ---------- 成员表 ----------
+
+    def merge(self, entries):
+        """Adopt trusted entries newer than ours. Returns the number adopted."""
+        adopted = 0
+        bump = None
+        with self._lock:
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                provider, incarnation = entry.get("provider"), entry.get("incarnation")
+                if not isinstance(provider, str) or not provider or not _valid_incarnation(incarnation):
+                    continue
+                if provider == self.provider and entry is not self.self_entry:
+                    # 自己的条目只由自己修改；别处有更大的 incarnation (如重启前的旧条目) 时发布更新的版本
+                    if incarnation > self.self_entry["incarnation"]:
+                        bump = incarnation
+                    continue
+                current = self.members.get(provider)
+                if current is not None and current["incarnation"] >= incarnation:
+                    continue
+                entry = {k: entry[k] for k in MEMBER_FIELDS if k in entry}
+                self.members[provider] = entry
+                self.failures.pop(provider, None)
+                self.candidates.pop(provider, None)
+                self.tree.update(provider, _digest(entry))
+                adopted += 1
+        if bump is not None:
+            self.update_self(min_incarnation=bump + 1)
+        return adopted
+
+    def receive(self, entries, source=None):
+        """
+        Take entries from the network: adopt those about `source` (the peer we
+        connected to ourselves) and keep the rest as candidates to verify.
+
+        Returns the number adopted.
+        """
+        trusted = []
+        with self._lock:
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                provider, incarnation = entry.get("provider"), entry.get("incarnation")
+                if not isinstance(provider, str) or not provider or not _valid_incarnation(incarnation):
+                    continue
+                if provider == source:
+                    url = entry.get("base_url")
+                    # base_url 只能指向它自己的域名，否则就是在替别人登记地址
+                    if url is None or (isinstance(url, str) and urllib.parse.urlsplit(url).netloc == provider):
+                        trusted.append(entry)
+                    continue
+                if provider == self.provider:
+                    continue
+                current = self.members.get(provider)
+                if current is not None and current["incarnation"] >= incarnation:
+                    continue
+                if provider in self.candidates or len(self.candidates) < self.max_candidates:
+                    self.candidates[provider] = max(incarnation, self.candidates.get(provider, 0))
+        return self.merge(trusted)
+
+    def verify_candidates(self, limit=None):
+        """Ask up to `limit` candidates for their own entry; unreachable ones are dropped."""
+        adopted = 0
+        with self._lock:
+            picked = list(self.candidates)[:self.verify_per_round if limit is None else limit]
+            for provider in picked:
+                del self.candidates[provider]
+        for provider in picked:
+            try:
+                adopted += self.verify(provider)
+            except (RelayError, ValueError, AttributeError, TypeError, OverflowError):
+                pass
+        return adopted
+
+    def update_self(self, url=None, info=None, status=None, min_incarnation=0):
+        """Publish a change to this provider's own entry (bumps its incarnation)."""
+        old = self.self_entry
+        self.self_entry = self._entry(
+            self.provider,
+            url or old.get("base_url"),
+            max(int(time.time() * 1000), old["incarnation"] + 1, min_incarnation),
+            status or old["status"],
+            old if info is None else info
+        )
+        self.merge([self.self_entry])
+
+    def leave(self):
+        """Announce that this provider is leaving, then stop gossiping."""
+        self.stop()
+        self.update_self(status="left")
+        self.gossip_once()
+
+    def alive(self):
+        """Members believed reachable, self included, sorted by provider."""
+        with self._lock:
+            return [
+                e for _, e in sorted(self.members.items())
+                if e.get("status", "alive") == "alive" and self.failures.get(e["provider"], 0) < self.suspect_after
+            ]
+
+    def _url(self, provider):
+        entry = self.members.get(provider)
+        return (entry or {}).get("base_url") or base_url(provider)
+
+    # ---------- 响应方 ----------
+
+    def handle(self, request):
+        """
+        One anti-entropy round, responder side.
+
+        Request:  {"nodes": {prefix: hash}, "entries": [...]}
+        Response: {"nodes": {child prefix: hash}, "entries": [...]} for every
+                  requested prefix whose hash differs from ours
+        """
+        entries = request.get("entries") or ()
+        self.receive(entries if isinstance(entries, list) else ())
+        nodes = {}
+        entries = []
+        theirs = request.get("nodes") or {}
+        if not isinstance(theirs, dict):
+            theirs = {}
+        with self._lock:
+            for prefix, their_hash in theirs.items():
+                if not isinstance(prefix, str) or len(prefix) > self.tree.depth or self.tree.hash(prefix) == their_hash:
+                    continue
+                if len(prefix) < self.tree.depth:
+                    nodes.update(self.tree.children(prefix))
+                else:
+                    entries.extend(self.members[p] for p in self.tree.providers(prefix))
+        return {"nodes": nodes, "entries": entries}
+
+    # ---------- 发起方 ----------
+
+    def _post(self, provider, body):
+        data = codec.dumps(body)
+        status, response = self.transport.request(
+            "POST", self._url(provider) + "/api/v1/gossip", data, {"Content-Type": "application/json"}
+        )
+        if status != 200:
+            raise RelayError(f"gossip with {provider}: HTTP {status}")
+        self.stats["rounds"] += 1
+        self.stats["bytes_sent"] += len(data)
+        self.stats["bytes_received"] += len(response)
+        return codec.loads(response)
+
+    def verify(self, provider):
+        """
+        Fetch `provider`'s own entry from provider itself in one round. Returns the number adopted.
+
+        Raises:
+            RelayError: provider unreachable or not gossiping
+        """
+        # 只请求它所在的叶子；"-" 不会等于任何哈希，对方总会返回这片叶子的条目
+        response = self._post(provider, {"nodes": {self.tree.leaf_of(provider): "-"}, "entries": [self.self_entry]})
+        received = response.get("entries") or []
+        if not isinstance(received, list):
+            raise ValueError(f"gossip with {provider}: entries is not a list")
+        self.stats["entries_received"] += len(received)
+        return self.receive(received, provider)
+
+    def sync_with(self, provider):
+        """
+        Reconcile membership with one peer. Returns the number of entries adopted.
+
+        Raises:
+            RelayError: peer unreachable or not gossiping
+        """
+        self.stats["syncs"] += 1
+        adopted = 0
+        request = {"nodes": {"": self.tree.hash()}, "entries": [self.self_entry]}
+        for _ in range(GOSSIP_MAX_ROUNDS):
+            response = self._post(provider, request)
+            received = response.get("entries") or []
+            if not isinstance(received, list):
+                raise ValueError(f"gossip with {provider}: entries is not a list")
+            self.stats["entries_received"] += len(received)
+            adopted += self.receive(received, provider)
+
+            # 叶子：把对方缺少或比对方新的条目推回去
+            theirs = {e.get("provider"): e.get("incarnation") for e in received if isinstance(e, dict)}
+            leaves = {self.tree.leaf_of(p) for p in theirs if isinstance(p, str)}
+            push = []
+            nodes = {}
+            with self._lock:
+                for prefix, their_hash in (response.get("nodes") or {}).items():
+                    if self.tree.hash(prefix) == their_hash:
+                        continue
+                    if their_hash == "":
+                        leaves.add(prefix)  # 对方整个子树为空，直接推送
+                    else:
+                        nodes[prefix] = self.tree.hash(prefix)
+                for leaf in list(leaves):
+                    if len(leaf) < self.tree.depth:
+                        leaves.discard(leaf)
+                        leaves.update(p for p in self.tree.leaves if p.startswith(leaf))
+                for leaf in leaves:
+                    for p in self.tree.providers(leaf):
+                        entry = self.members[p]
+                        if theirs.get(p) is None or theirs[p] < entry["incarnation"]:
+                            push.append(entry)
+            if not nodes and not push:
+                break
+            request = {"nodes": nodes, "entries": push}
+        self.failures.pop(provider, None)
+        return adopted
+
+    def gossip_once(self):
+        """Sync with up to `fanout` random peers (seeds while we know no one), then verify candidates."""
+        peers = [e["provider"] for e in self.alive() if e["provider"] != self.provider]
+        if not peers:
+            peers = list(self.seeds)
+        adopted = 0
+        for provider in random.sample(peers, min(self.fanout, len(peers))):
+            try:
+                adopted += self.sync_with(provider)
+            except (RelayError, ValueError, AttributeError, TypeError, OverflowError):
+                # TypeError / OverflowError：对端数据无法编码，与连不上同样处理
+                with self._lock:
+                    self.failures[provider] = self.failures.get(provider, 0) + 1
+        return adopted + self.verify_candidates()
+
+    def start(self):
+        """Gossip in a daemon thread every ~interval seconds (jittered) until stop()."""
+        def run():
+            while True:
+                self.gossip_once()
+                if self._stop.wait(self.interval * random.uniform(0.5, 1.5)):
+                    return
+
+        self._thread = threading.Thread(target=run, name="gossip", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,180 @@
+"""
+Prometheus 文本格式指标
+
+计数器按线程分片：每个线程只写自己的 dict，热路径上没有锁，也不会丢计数；
+抓取 /metrics 时再把所有分片相加。线程结束后其分片在锁内原子地并入 retired，
+分片数量不会随连接数增长，计数也不会回退。
+"""
+
+import itertools
+import threading
+import weakref
+from bisect import bisect_left
+
+# 秒
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _merge(into, shard):
+    for key, value in shard.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            if current is None:
+                into[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    current[i] += v
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _label_pairs(names, values):
+    """Return 'k1="v1",k2="v2"' (without braces)."""
+    return ",".join('%s="%s"' % (k, _escape(v)) for k, v in zip(names, values))
+
+
+def _braced(pairs):
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Registry of counters and histograms.
+
+    Samples are keyed by (name, *label_values); histograms store
+    [bucket counts..., +Inf count, sum] per key.
+    """
+
+    def __init__(self):
+        self._meta = {}        # {name: (type, help, label_names, buckets)}
+        self._collectors = []  # 抓取时调用，返回 (name, type, help, [(suffix, labels, value)])
+        self._local = threading.local()
+        self._shards = {}      # {shard_id: data}，存活线程的分片
+        self._shard_ids = itertools.count()
+        self._retired = {}
+        self._lock = threading.Lock()  # 只在新线程注册分片、线程退出、抓取时使用
+
+    # ---------- 注册 ----------
+
+    def counter(self, name, help, labels=()):
+        self._meta[name] = ("counter", help, tuple(labels), None)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help, tuple(labels), tuple(buckets))
+
+    def collector(self, fn):
+        """Register fn() -> iterable of (name, type, help, samples) evaluated at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    # ---------- 热路径 ----------
+
+    def _new_shard(self):
+        data = self._local.data = {}
+        shard_id = next(self._shard_ids)
+        with self._lock:
+            self._shards[shard_id] = data
+        # 线程对象回收时把分片并入 retired
+        weakref.finalize(threading.current_thread(), self._retire, shard_id)
+        return data
+
+    def _retire(self, shard_id):
+        with self._lock:
+            _merge(self._retired, self._shards.pop(shard_id))
+
+    def inc(self, name, *labels, value=1):
+        try:
+            data = self._local.data
+        except AttributeError:
+            data = self._new_shard()
+        key = (name,) + labels
+        data[key] = data.get(key, 0) + value
+
+    def observe(self, name, value, *labels):
+        try:
+            data = self._local.data
+        except AttributeError:
+            data = self._new_shard()
+        key = (name,) + labels
+        slots = data.get(key)
+        buckets = self._meta[name][3]
+        if slots is None:
+            slots = data[key] = [0] * (len(buckets) + 1) + [0.0]
+        slots[bisect_left(buckets, value)] += 1
+        slots[-1] += value
+
+    # ---------- 抓取 ----------
+
+    def snapshot(self):
+        """Sum of all shards as {key: value}."""
+        with self._lock:
+            total = {}
+            _merge(total, self._retired)
+            for data in self._shards.values():
+                _merge(total, dict(data))
+        return total
+
+    def value(self, name, *labels):
+        """Current value of a counter (mainly for tests)."""
+        return self.snapshot().get((name,) + labels, 0)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        samples = self.snapshot()
+        by_name = {}
+        for key, value in samples.items():
+            by_name.setdefault(key[0], []).append((key[1:], value))
+
+        lines = []
+        for name, (mtype, help, label_names, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {mtype}")
+            if buckets:
+                les = ['le="%r"' % b for b in buckets] + ['le="+Inf"']
+            for label_values, value in sorted(by_name.get(name, ()), key=lambda s: s[0]):
+                pairs = _label_pairs(label_names, label_values)
+                if mtype == "counter":
+                    lines.append(f"{name}{_braced(pairs)} {_format_value(value)}")
+                    continue
+                prefix = f"{name}_bucket{{{pairs}," if pairs else f"{name}_bucket{{"
+                cumulative = 0
+                for le, count in zip(les, value[:-1]):
+                    cumulative += count
+                    lines.append(f"{prefix}{le}}} {cumulative}")
+                lines.append(f"{name}_sum{_braced(pairs)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_braced(pairs)} {cumulative}")
+
+        for collect in self._collectors:
+            for name, mtype, help, rows in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {mtype}")
+                for suffix, labels, value in rows:
+                    pairs = _label_pairs([k for k, _ in labels], [v for _, v in labels])
+                    lines.append(f"{name}{suffix}{_braced(pairs)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def histogram_rows(values, buckets):
+    """Build (suffix, labels, value) rows for a histogram computed at scrape time."""
+    counts = [0] * (len(buckets) + 1)
+    for v in values:
+        counts[bisect_left(buckets, v)] += 1
+    rows = []
+    cumulative = 0
+    for bound, count in zip(tuple(buckets) + ("+Inf",), counts):
+        cumulative += count
+        rows.append(("_bucket", [("le", bound if bound == "+Inf" else repr(bound))], cumulative))
+    rows.append(("_sum", [], sum(values)))
+    rows.append(("_count", [], cumulative))
+    return rows
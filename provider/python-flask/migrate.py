@@ -0,0 +1,347 @@
+"""
+导出 / 导入 (NDJSON)
+
+把一个域名的 Agent、API Key 哈希和收件箱消息导出成 NDJSON，再导入另一台主机或另一种存储：
+
+    GET  /api/v1/admin/export[?cursor=...]   流式导出 (chunked)，内存占用与数据量无关
+    POST /api/v1/admin/import                NDJSON 请求体，边读边解析，每 batch_size 行写入一批
+
+每行一个 JSON 对象，按 type 区分：
+
+    {"type": "header", "format": "aap-export", "version": 1, "domain": "...", "exported_at": "..."}
+    {"type": "agent", "agent": {...}}                    含 webhook_secret
+    {"type": "key", "key": {...}}                        只有哈希，没有明文
+    {"type": "message", "owner_role": "...", "idempotency_key": "...",
+     "message": {"envelope": {...}, "payload": {...}, "id": "...", "received_at": "..."}}
+    {"type": "checkpoint", "cursor": "messages:3:1200"}
+    {"type": "end", "counts": {"agents": n, "keys": n, "messages": n}}
+
+消息保留原来的 id、received_at 和幂等 key，会话线程在导入时重建。Feed 不在导出范围内。
+
+断点续传：
+- 导出每 checkpoint_lines 行和每一段结束时输出 checkpoint，中断后用最后一个 cursor 继续；
+  没有 end 行说明导出不完整
+- 导入是幂等的：已存在的地址、key 前缀和消息 id 跳过，重放已经导入的部分是安全的
+
+命令行 (管理接口需要 ADMIN_TOKEN)：
+
+    python migrate.py export http://old-host:5000 dump.ndjson [--resume]
+    python migrate.py import http://new-host:5000 dump.ndjson [--resume]
+
+export --resume 从文件里最后一个 checkpoint 继续；import 每次 POST chunk_lines 行，
+成功后把文件偏移写入 dump.ndjson.progress，--resume 从那里继续。
+"""
+
+import argparse
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import codec
+from records import MessageRecord
+
+EXPORT_FORMAT = "aap-export"
+EXPORT_VERSION = 1
+EXPORT_CHECKPOINT_LINES = 10000  # 导出时每隔多少行输出一个 checkpoint
+EXPORT_CHUNK_SIZE = 64 * 1024    # 字节，流式响应每次写出的块大小
+IMPORT_BATCH_SIZE = 5000         # 行，导入时每批写入的条数
+IMPORT_MAX_LINE = 16 * 1024 * 1024
+CLI_CHUNK_LINES = 50000          # 命令行导入时每次 POST 的行数
+
+SECTIONS = ("agents", "keys", "messages")
+
+
+class MigrationError(ValueError):
+    """Malformed export line or cursor; `line` is the 1-based line number (0 for a cursor)."""
+
+    def __init__(self, message, line=0):
+        super().__init__(f"line {line}: {message}" if line else message)
+        self.line = line
+
+
+def parse_cursor(cursor):
+    """(section, a, b) from "agents:<i>", "keys" or "messages:<inbox>:<record>"; None starts at the beginning."""
+    if not cursor:
+        return "agents", 0, 0
+    section, *numbers = cursor.split(":")
+    try:
+        numbers = [int(n) for n in numbers]
+    except ValueError:
+        raise MigrationError(f"Invalid cursor: {cursor}") from None
+    expected = {"agents": 1, "keys": 0, "messages": 2}.get(section)
+    if expected is None or len(numbers) != expected or any(n < 0 for n in numbers):
+        raise MigrationError(f"Invalid cursor: {cursor}")
+    numbers += [0, 0]
+    return section, numbers[0], numbers[1]
+
+
+# ---------- 导出 ----------
+
+def _line(obj):
+    return codec.dumps(obj) + b"\n"
+
+
+def _checkpoint(cursor):
+    return b'{"type":"checkpoint","cursor":"' + cursor.encode() + b'"}\n'
+
+
+def export_lines(db, domain, cursor=None, checkpoint_lines=EXPORT_CHECKPOINT_LINES):
+    """
+    NDJSON lines (bytes) for db, starting at cursor.
+
+    Raises:
+        MigrationError: invalid cursor (before the first line is produced)
+    """
+    section, a, b = parse_cursor(cursor)
+    counts = dict.fromkeys(SECTIONS, 0)
+    yield _line({"type": "header", "format": EXPORT_FORMAT, "version": EXPORT_VERSION, "domain": domain,
+                 "exported_at": datetime.utcnow().isoformat() + "Z", "cursor": cursor})
+
+    if section == "agents":
+        for i, agent in db.iter_agents(a):
+            yield _line({"type": "agent", "agent": agent})
+            counts["agents"] += 1
+            if counts["agents"] % checkpoint_lines == 0:
+                yield _checkpoint(f"agents:{i + 1}")
+        section, a, b = "keys", 0, 0
+        yield _checkpoint("keys")
+
+    if section == "keys":
+        # Key 可以被吊销删除，位置不稳定，所以这一段整段重来 (导入时按前缀去重)
+        for record in db.iter_api_keys():
+            yield _line({"type": "key", "key": record})
+            counts["keys"] += 1
+        a, b = 0, 0
+        yield _checkpoint("messages:0:0")
+
+    for i, j, owner_role, record, idempotency_key in db.iter_messages(a, b):
+        parts = [b'{"type":"message","owner_role":', codec.dumps(owner_role)]
+        if idempotency_key is not None:
+            parts += [b',"idempotency_key":', codec.dumps(idempotency_key)]
+        parts += [b',"message":', record.encode(), b"}\n"]
+        yield b"".join(parts)
+        counts["messages"] += 1
+        if counts["messages"] % checkpoint_lines == 0:
+            yield _checkpoint(f"messages:{i}:{j + 1}")
+
+    yield _line({"type": "end", "counts": counts})
+
+
+def chunked(lines, size=EXPORT_CHUNK_SIZE):
+    """Join lines into blocks of about size bytes, so a streamed response is not one write per line."""
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+# ---------- 导入 ----------
+
+def iter_lines(stream, chunk_size=EXPORT_CHUNK_SIZE, max_line=IMPORT_MAX_LINE):
+    """Lines of a binary stream read in fixed-size blocks (WSGI input has no efficient readline)."""
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        if len(pending) > max_line:
+            raise MigrationError(f"Line longer than {max_line} bytes")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _parse(line, number):
+    try:
+        item = codec.loads(line)
+    except ValueError as e:
+        raise MigrationError(f"Invalid JSON: {e}", number) from None
+    if not isinstance(item, dict):
+        raise MigrationError("Expected a JSON object", number)
+    kind = item.get("type")
+    try:
+        if kind == "agent":
+            agent = item["agent"]
+            if not isinstance(agent.get("aap_address"), str) or not isinstance(agent.get("owner_role"), str):
+                raise ValueError("agent needs aap_address and owner_role")
+            return kind, agent
+        if kind == "key":
+            key = item["key"]
+            if not all(isinstance(key.get(f), str) for f in ("prefix", "key_hash", "owner_role")) \
+                    or not isinstance(key.get("scopes"), list):
+                raise ValueError("key needs prefix, key_hash, owner_role and scopes")
+            return kind, key
+        if kind == "message":
+            owner_role = item["owner_role"]
+            idempotency_key = item.get("idempotency_key")
+            if not isinstance(owner_role, str) or not isinstance(idempotency_key, (str, type(None))):
+                raise ValueError("message needs a string owner_role")
+            return kind, (owner_role, MessageRecord.restore(item["message"]), idempotency_key)
+        if kind == "header":
+            if item.get("format") != EXPORT_FORMAT or item.get("version") != EXPORT_VERSION:
+                raise ValueError(f"unsupported export format {item.get('format')} v{item.get('version')}")
+            return kind, item
+        if kind in ("checkpoint", "end"):
+            return kind, item
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise MigrationError(f"Invalid {kind} line: {e}", number) from None
+    raise MigrationError(f"Unknown line type: {kind!r}", number)
+
+
+def import_lines(db, lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import NDJSON lines into db in batches of batch_size items.
+
+    Returns {"lines", "agents", "keys", "messages", "skipped", "cursor"}, where cursor is
+    the last checkpoint seen.
+
+    Raises:
+        MigrationError: a malformed line; every line before it has been imported
+    """
+    stats = {"lines": 0, "agents": 0, "keys": 0, "messages": 0, "skipped": 0, "cursor": None}
+    batch = {"agents": [], "api_keys": [], "messages": []}
+    pending = 0
+
+    def flush():
+        inserted = db.import_batch(**batch)
+        for kind, n in inserted.items():
+            stats[kind] += n
+        stats["skipped"] += pending - sum(inserted.values())
+        for items in batch.values():
+            items.clear()
+
+    try:
+        for number, line in enumerate(lines, 1):
+            stats["lines"] = number
+            if not line.strip():
+                continue
+            kind, value = _parse(line, number)
+            if kind == "checkpoint":
+                stats["cursor"] = value.get("cursor")
+                continue
+            if kind in ("header", "end"):
+                continue
+            batch[{"agent": "agents", "key": "api_keys", "message": "messages"}[kind]].append(value)
+            pending += 1
+            if pending >= batch_size:
+                flush()
+                pending = 0
+    finally:
+        if pending:
+            flush()
+    return stats
+
+
+# ---------- 命令行 ----------
+
+def _request(url, token, data=None, cursor=None):
+    if cursor:
+        url += "?" + urllib.parse.urlencode({"cursor": cursor})
+    headers = {"Authorization": f"Bearer {token}"}
+    if data is not None:
+        headers["Content-Type"] = "application/x-ndjson"
+    return urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=300)
+
+
+def _last_checkpoint(path):
+    """(byte offset just after the last checkpoint line, its cursor, whether the file ends with an end line)."""
+    offset, cursor, done, position = 0, None, False, 0
+    with open(path, "rb") as f:
+        for line in f:
+            position += len(line)
+            if line.startswith(b'{"type":"checkpoint"'):
+                offset, cursor = position, codec.loads(line)["cursor"]
+            done = line.startswith(b'{"type":"end"')
+    return offset, cursor, done
+
+
+def export_to_file(base_url, path, token, resume=False):
+    cursor = None
+    mode = "wb"
+    if resume and os.path.exists(path):
+        offset, cursor, done = _last_checkpoint(path)
+        if done:
+            print(f"{path} is already complete")
+            return
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+        mode = "ab"
+    with _request(base_url.rstrip("/") + "/api/v1/admin/export", token, cursor=cursor) as response, \
+            open(path, mode) as out:
+        if cursor:
+            response.readline()  # 续传时不重复写 header
+        total = 0
+        while True:
+            chunk = response.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(chunk)
+            total += len(chunk)
+    if not _last_checkpoint(path)[2]:
+        sys.exit(f"export of {path} was interrupted; rerun with --resume")
+    print(f"exported {total} bytes to {path}" + (f" (resumed at {cursor})" if cursor else ""))
+
+
+def import_from_file(base_url, path, token, resume=False, chunk_lines=CLI_CHUNK_LINES):
+    progress = path + ".progress"
+    offset = 0
+    if resume and os.path.exists(progress):
+        with open(progress) as f:
+            offset = int(f.read().strip() or 0)
+    url = base_url.rstrip("/") + "/api/v1/admin/import"
+    totals = {"agents": 0, "keys": 0, "messages": 0, "skipped": 0}
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= chunk_lines:
+                    break
+            if not lines:
+                break
+            try:
+                with _request(url, token, data=b"".join(lines)) as response:
+                    stats = codec.loads(response.read())
+            except urllib.error.HTTPError as e:
+                sys.exit(f"import failed after byte {offset}: {e.read().decode(errors='replace')}")
+            offset += sum(len(line) for line in lines)
+            with open(progress, "w") as p:
+                p.write(str(offset))
+            for kind in totals:
+                totals[kind] += stats[kind]
+            print(f"  {offset} bytes: +{stats['agents']} agents, +{stats['keys']} keys, "
+                  f"+{stats['messages']} messages, {stats['skipped']} skipped")
+    print(f"imported {totals['agents']} agents, {totals['keys']} keys, {totals['messages']} messages "
+          f"({totals['skipped']} already present)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export / import a provider's agents, keys and inboxes as NDJSON")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("url", help="provider base URL, e.g. http://localhost:5000")
+    parser.add_argument("path", help="NDJSON file")
+    parser.add_argument("--token", default=os.environ.get("ADMIN_TOKEN"), help="admin token (default: $ADMIN_TOKEN)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export / import")
+    parser.add_argument("--chunk-lines", type=int, default=CLI_CHUNK_LINES, help="lines per import request")
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error("--token or ADMIN_TOKEN is required")
+    if args.command == "export":
+        export_to_file(args.url, args.path, args.token, args.resume)
+    else:
+        import_from_file(args.url, args.path, args.token, args.resume, args.chunk_lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+按请求采样的性能剖析
+
+开启后，按 sample_rate 抽取部分请求：在请求线程上用 sys.setprofile 记录调用栈
+耗时，同时用 tracemalloc 记录该请求期间分配且仍存活的内存。结果聚合成
+collapsed stack 格式 ("a;b;c <微秒>")，可直接交给 flamegraph.pl / speedscope。
+
+同一时间只剖析一个请求 (tracemalloc 是进程级的)，其他请求照常处理、不采样。
+分配快照同样是进程级的：采样期间其他线程分配且仍存活的内存也会计入。
+若 tracemalloc 已由外部开启 (PYTHONTRACEMALLOC、调试工具等)，只采调用栈、
+不采分配，也不会关掉外部的 tracing。
+"""
+
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from time import perf_counter
+
+MAX_STACKS = 10000      # 最多保留的不同调用栈数量
+ALLOC_TOP = 50          # 分配快照保留的代码行数
+ALLOC_FRAMES = 8        # tracemalloc 记录的栈深度
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _c_name(fn):
+    module = getattr(fn, "__module__", None)
+    return f"{module}.{fn.__qualname__}" if module else fn.__qualname__
+
+
+class _StackRecorder:
+    """sys.setprofile callback accumulating self time per call stack."""
+
+    def __init__(self, trace_allocations=True):
+        self.trace_allocations = trace_allocations  # 是否由本次采样开启 tracemalloc
+        self.names = []
+        self.frames = []   # [[start, child_time]]
+        self.samples = {}  # {collapsed stack: self seconds}
+
+    def __call__(self, frame, event, arg):
+        now = perf_counter()
+        if event == "call" or event == "c_call":
+            self.names.append(_frame_name(frame.f_code) if event == "call" else _c_name(arg))
+            self.frames.append([now, 0.0])
+        elif self.frames:
+            # return / c_return / c_exception；开始剖析前进入的帧直接忽略
+            start, child = self.frames.pop()
+            elapsed = now - start
+            key = ";".join(self.names)
+            self.names.pop()
+            self.samples[key] = self.samples.get(key, 0.0) + elapsed - child
+            if self.frames:
+                self.frames[-1][1] += elapsed
+
+
+class RequestProfiler:
+    """
+    Sampled per-request CPU and allocation profiles, aggregated in process.
+
+    start() returns a token when the request is sampled; pass it to stop()
+    once the request is finished. Allocation figures are process-wide and
+    skipped when tracemalloc was already tracing before start().
+    """
+
+    def __init__(self, sample_rate=0.0, routes=(), max_stacks=MAX_STACKS):
+        self.sample_rate = sample_rate
+        self.routes = tuple(routes)
+        self.max_stacks = max_stacks
+        self._active = threading.Lock()  # 同时只剖析一个请求
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stacks = {}   # {collapsed stack: self seconds}
+            self.allocs = {}   # {"file:line": [size, count]}
+            self.requests = {}  # {route: 采样次数}
+            self.dropped = 0   # 超过 max_stacks 被丢弃的栈
+
+    def wants(self, path, force=False):
+        if force:
+            return True
+        if self.sample_rate <= 0 or not path.startswith(self.routes):
+            return False
+        return random.random() < self.sample_rate
+
+    # ---------- 采集 ----------
+
+    def start(self):
+        if not self._active.acquire(blocking=False):
+            return None
+        # 外部已在 tracing：快照里混着采样前的分配，且不能替别人关掉
+        trace = not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start(ALLOC_FRAMES)
+        recorder = _StackRecorder(trace)
+        sys.setprofile(recorder)
+        return recorder
+
+    def stop(self, recorder, route):
+        sys.setprofile(None)
+        snapshot = None
+        try:
+            if recorder.trace_allocations:
+                snapshot = tracemalloc.take_snapshot()
+        finally:
+            if recorder.trace_allocations:
+                tracemalloc.stop()
+            self._active.release()
+        stats = []
+        if snapshot is not None:
+            stats = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]).statistics("lineno")
+
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+            for key, seconds in recorder.samples.items():
+                if key in self.stacks:
+                    self.stacks[key] += seconds
+                elif len(self.stacks) < self.max_stacks:
+                    self.stacks[key] = seconds
+                else:
+                    self.dropped += 1
+            for stat in stats:
+                frame = stat.traceback[0]
+                key = f"{frame.filename}:{frame.lineno}"
+                slot = self.allocs.setdefault(key, [0, 0])
+                slot[0] += stat.size
+                slot[1] += stat.count
+
+    # ---------- 输出 ----------
+
+    def collapsed(self):
+        """Collapsed stacks ("frame;frame;frame microseconds"), heaviest first."""
+        with self._lock:
+            items = sorted(self.stacks.items(), key=lambda kv: -kv[1])
+        return "".join(f"{stack} {int(seconds * 1e6)}\n" for stack, seconds in items if seconds >= 1e-6)
+
+    def summary(self, top=ALLOC_TOP):
+        with self._lock:
+            allocs = sorted(self.allocs.items(), key=lambda kv: -kv[1][0])[:top]
+            return {
+                "enabled": self.sample_rate > 0,
+                "sample_rate": self.sample_rate,
+                "routes": list(self.routes),
+                "sampled_requests": dict(self.requests),
+                "stacks": len(self.stacks),
+                "dropped_stacks": self.dropped,
+                "allocations": [
+                    {"location": location, "size": size, "count": count}
+                    for location, (size, count) in allocs
+                ],
+            }
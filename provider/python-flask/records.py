@@ -0,0 +1,336 @@
+"""
+紧凑的消息记录
+
+收件箱里的每条消息是一个 __slots__ 对象，而不是 {"envelope": {...}, "payload": {...}}
+嵌套 dict：
+
+- 地址和 content_type 用 sys.intern 去重，同一发件人的所有消息共享一个字符串
+- 协议定义的 message_type (MESSAGE_TYPES) 存成下标，其他值原样存字符串；id 存成 128 位整数
+- received_at 和规范格式的 timestamp 存成 epoch 微秒
+- payload 写入时编码一次，存 JSON bytes
+
+读取时才转回 dict (to_dict) 或 JSON (encode)，输出与原来的嵌套 dict 一致。
+
+Inbox 在写入时增量维护二级索引 (发件人、reply_to、content_type、message_type、
+接收时间，以及可选的正文全文索引)，过滤查询只遍历最小的倒排表。倒排表是按
+位置递增的 array，可直接二分。
+"""
+
+import re
+import sys
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import codec
+
+# 固定的表：不随收到的消息增长 (message_type 来自匿名请求，且表为所有域名共享)
+MESSAGE_TYPES = ("private", "public")
+_TYPE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES)}
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# 有独立槽位的信封字段，输出时按这个顺序，其余字段放在 extra 里
+ENVELOPE_FIELDS = (
+    "from_addr", "to_addr", "message_type", "reply_to",
+    "content_type", "timestamp", "content_hash", "content_size",
+)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _type_code(message_type):
+    return _TYPE_CODES.get(message_type, message_type)
+
+
+def _to_micros(dt):
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+@lru_cache(maxsize=4096)
+def _date(days):
+    return (date(1970, 1, 1) + timedelta(days=days)).isoformat()
+
+
+def _isoformat(micros):
+    """Same string as datetime.isoformat() + "Z", without building a datetime."""
+    seconds, us = divmod(micros, 1000000)
+    days, seconds = divmod(seconds, 86400)
+    hh, mm, ss = seconds // 3600, seconds // 60 % 60, seconds % 60
+    if us:
+        return "%sT%02d:%02d:%02d.%06dZ" % (_date(days), hh, mm, ss, us)
+    return "%sT%02d:%02d:%02dZ" % (_date(days), hh, mm, ss)
+
+
+def parse_time(value):
+    """
+    Epoch microseconds from an ISO 8601 timestamp or epoch seconds.
+
+    Raises:
+        ValueError: unparseable value
+    """
+    try:
+        return int(float(value) * 1000000)
+    except (ValueError, OverflowError):
+        pass
+    dt = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return _to_micros(dt)
+
+
+def _compact_timestamp(value):
+    """Epoch microseconds if value is a canonical UTC ISO timestamp, else value unchanged."""
+    if not value.endswith("Z"):
+        return value
+    try:
+        micros = _to_micros(datetime.fromisoformat(value[:-1]))
+    except (ValueError, TypeError):
+        return value
+    # 只有能原样还原时才压缩，保证读出的字符串与写入时一致
+    return micros if _isoformat(micros) == value else value
+
+
+class MessageRecord:
+    """One stored inbox message."""
+
+    __slots__ = ("uid", "received_us", "payload", "extra") + ENVELOPE_FIELDS
+
+    @classmethod
+    def create(cls, envelope, payload):
+        """Build a record for a newly received message, assigning id and received_at."""
+        return cls._build(envelope, payload, uuid.uuid4().int, _to_micros(datetime.utcnow()))
+
+    @classmethod
+    def _build(cls, envelope, payload, uid, received_us):
+        self = cls()
+        self.uid = uid
+        self.received_us = received_us
+        self.payload = codec.dumps_stored(payload)
+
+        extra = dict(envelope)
+        self.from_addr = _intern(extra.pop("from_addr", None))
+        self.to_addr = _intern(extra.pop("to_addr", None))
+        self.content_type = _intern(extra.pop("content_type", None))
+        self.reply_to = extra.pop("reply_to", None)
+        self.content_hash = extra.pop("content_hash", None)
+        self.content_size = extra.pop("content_size", None)
+        # 非字符串的 message_type / timestamp 原样留在 extra，避免与编码后的整数混淆
+        message_type = extra.get("message_type")
+        self.message_type = None
+        if type(message_type) is str:
+            self.message_type = _type_code(extra.pop("message_type"))
+        timestamp = extra.get("timestamp")
+        self.timestamp = None
+        if type(timestamp) is str:
+            self.timestamp = _compact_timestamp(extra.pop("timestamp"))
+        self.extra = extra or None
+        return self
+
+    @classmethod
+    def restore(cls, data):
+        """
+        Rebuild an exported record (the to_dict() / encode() shape), keeping its id and received_at.
+
+        Raises:
+            KeyError, TypeError, ValueError: malformed data
+        """
+        hex_id = data["id"].replace("-", "")
+        if len(hex_id) != 32:
+            raise ValueError(f"Invalid message id: {data['id']}")
+        received_at = data["received_at"]
+        if received_at.endswith("Z"):  # 导出的都是这种格式，跳过 parse_time 的尝试
+            received_us = _to_micros(datetime.fromisoformat(received_at[:-1]))
+        else:
+            received_us = parse_time(received_at)
+        return cls._build(data["envelope"], data["payload"], int(hex_id, 16), received_us)
+
+    @property
+    def id(self):
+        h = "%032x" % self.uid
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    @property
+    def received_at(self):
+        return _isoformat(self.received_us)
+
+    def envelope(self):
+        # 读路径热点，按 ENVELOPE_FIELDS 顺序展开而不是 getattr 循环
+        envelope = {}
+        if self.from_addr is not None:
+            envelope["from_addr"] = self.from_addr
+        if self.to_addr is not None:
+            envelope["to_addr"] = self.to_addr
+        message_type = self.message_type
+        if message_type is not None:
+            envelope["message_type"] = MESSAGE_TYPES[message_type] if type(message_type) is int else message_type
+        if self.reply_to is not None:
+            envelope["reply_to"] = self.reply_to
+        if self.content_type is not None:
+            envelope["content_type"] = self.content_type
+        timestamp = self.timestamp
+        if timestamp is not None:
+            envelope["timestamp"] = _isoformat(timestamp) if type(timestamp) is int else timestamp
+        if self.content_hash is not None:
+            envelope["content_hash"] = self.content_hash
+        if self.content_size is not None:
+            envelope["content_size"] = self.content_size
+        if self.extra:
+            envelope.update(self.extra)
+        return envelope
+
+    def to_dict(self):
+        return {
+            "envelope": self.envelope(),
+            "payload": codec.loads(self.payload),
+            "id": self.id,
+            "received_at": self.received_at,
+        }
+
+    def encode(self) -> bytes:
+        """JSON bytes equal to codec.dumps(self.to_dict()), reusing the stored payload."""
+        return b"".join((
+            b'{"envelope":', codec.dumps(self.envelope()),
+            b',"payload":', self.payload,
+            b',"id":"', self.id.encode(),
+            b'","received_at":"', self.received_at.encode(), b'"}',
+        ))
+
+
+# ---------- 全文索引 ----------
+
+MAX_INDEXED_CHARS = 10000  # 只索引正文的前这么多字符
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens of text.
+
+    ASCII words are indexed whole; other runs (e.g. CJK, which has no spaces)
+    are split into overlapping character bigrams, so queries need at least
+    two such characters.
+    """
+    tokens = set()
+    for word in _WORD.findall(text[:MAX_INDEXED_CHARS].lower()):
+        if word.isascii() or len(word) == 1:
+            tokens.add(word)
+        else:
+            tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def _contains(positions, pos):
+    i = bisect_left(positions, pos)
+    return i < len(positions) and positions[i] == pos
+
+
+_EMPTY = array("I")
+
+
+class Inbox:
+    """
+    Records of one owner_role in arrival order, plus the idempotency index
+    and secondary indexes {value: array of record positions}.
+    """
+
+    __slots__ = ("records", "by_key", "times", "by_from", "by_reply_to",
+                 "by_content_type", "by_message_type", "terms")
+
+    def __init__(self, fulltext=False):
+        self.records = []
+        self.by_key = {}  # {idempotency_key: MessageRecord}
+        self.times = array("q")  # received_us，与 records 一一对应，单调不减
+        self.by_from = {}
+        self.by_reply_to = {}
+        self.by_content_type = {}
+        self.by_message_type = {}
+        self.terms = {} if fulltext else None  # {token: positions}，None 表示未开启全文索引
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, record, content=None):
+        """Append a record and update the indexes; content feeds the full-text index."""
+        pos = len(self.records)
+        # 时钟回拨时沿用上一条的时间，保证 times 可二分
+        if self.times and record.received_us < self.times[-1]:
+            record.received_us = self.times[-1]
+        self.records.append(record)
+        self.times.append(record.received_us)
+
+        for index, value in ((self.by_from, record.from_addr),
+                             (self.by_reply_to, record.reply_to),
+                             (self.by_content_type, record.content_type),
+                             (self.by_message_type, record.message_type)):
+            if value is not None and not isinstance(value, (dict, list)):
+                positions = index.get(value)
+                if positions is None:
+                    positions = index[value] = array("I")
+                positions.append(pos)
+
+        if self.terms is not None and type(content) is str:
+            for token in tokenize(content):
+                positions = self.terms.get(token)
+                if positions is None:
+                    positions = self.terms[token] = array("I")
+                positions.append(pos)
+
+    def query(self, limit=20, before=None, from_addr=None, reply_to=None, content_type=None,
+              message_type=None, since=None, until=None, text=None):
+        """
+        The newest `limit` records matching every given filter, oldest first
+        (the same order as an unfiltered inbox page).
+
+        since/until are inclusive epoch microseconds; before is the cursor
+        returned with the previous page. Returns (records, next_cursor).
+
+        Raises:
+            ValueError: text given but the full-text index is disabled
+        """
+        end = len(self.records) if before is None else max(0, min(before, len(self.records)))
+        start = 0
+        if since is not None:
+            start = bisect_left(self.times, since, 0, end)
+        if until is not None:
+            end = bisect_right(self.times, until, start, end)
+
+        lists = []
+        if from_addr is not None:
+            lists.append(self.by_from.get(from_addr, _EMPTY))
+        if reply_to is not None:
+            lists.append(self.by_reply_to.get(reply_to, _EMPTY))
+        if content_type is not None:
+            lists.append(self.by_content_type.get(content_type, _EMPTY))
+        if message_type is not None:
+            code = _TYPE_CODES.get(message_type, message_type)
+            lists.append(self.by_message_type.get(code, _EMPTY))
+        if text is not None:
+            if self.terms is None:
+                raise ValueError("Full-text index is disabled")
+            tokens = tokenize(text)
+            lists.extend(self.terms.get(token, _EMPTY) for token in tokens)
+
+        matched = []
+        others = ()
+        if not lists:
+            candidates = range(end - 1, start - 1, -1)
+        else:
+            # 从最短的倒排表出发，其余条件逐个二分检查
+            lists.sort(key=len)
+            driver, others = lists[0], lists[1:]
+            lo, hi = bisect_left(driver, start), bisect_left(driver, end)
+            candidates = (driver[i] for i in range(hi - 1, lo - 1, -1))
+        for pos in candidates:
+            if all(_contains(other, pos) for other in others):
+                matched.append(pos)
+                if len(matched) == limit:
+                    break
+
+        next_cursor = matched[-1] if len(matched) == limit else None
+        return [self.records[pos] for pos in reversed(matched)], next_cursor
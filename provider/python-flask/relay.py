@@ -0,0 +1,436 @@
+"""
+跨 Provider 转发 (Relay)
+
+本 Provider 上的 Agent 把发往其他 Provider 的消息交给 POST /api/v1/outbox，
+由这里异步投递：
+
+- 每个目标 Provider 一个有界队列；队列满时拒绝新消息 (背压)，慢的目标只影响自己
+- 每个目标最多 concurrency 个投递线程，线程各自持有到目标的 keep-alive 连接，
+  空闲 idle_timeout 秒后退出
+- 目标在 providers/info 中声明 inbox_batch 时，把排队的消息合并成一次
+  POST /api/v1/inbox:batch (最多 batch_size 条)，否则逐条 POST 到 resolve 出的 inbox_url
+- 连接失败、5xx、429 按指数退避重试，重试期间该线程不取新消息，失败的目标自然被限速
+- providers/info 和 resolve 结果按 TTL 缓存，查询失败只缓存 negative_ttl 秒
+- HTTPTransport 默认只连接公网地址：目标解析到回环、私有、链路本地等地址时拒绝
+  (TargetForbidden)，连接的是校验过的那个 IP，DNS 重绑定也绕不过去。本机或内网
+  部署多个 Provider 时用 allow_private=True (app.py 的 ALLOW_PRIVATE_TARGETS)
+"""
+
+import http.client
+import ipaddress
+import socket
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict, deque
+
+import codec
+
+RELAY_QUEUE_SIZE = 1000     # 每个目标 Provider 的队列上限
+RELAY_CONCURRENCY = 4       # 每个目标 Provider 的投递线程上限
+RELAY_BATCH_SIZE = 50       # 每次批量投递的消息数上限
+RELAY_MAX_ATTEMPTS = 5
+RELAY_RETRY_DELAY = 0.5     # 秒，第 n 次重试前等待 retry_delay * 2**(n-1)
+RELAY_CACHE_TTL = 300       # 秒，providers/info 和 resolve 缓存
+RELAY_NEGATIVE_TTL = 10     # 秒，providers/info 查询失败的缓存
+RELAY_STATUS_SIZE = 10000   # 保留投递状态的消息数
+
+BATCH_CAPABILITY = "inbox_batch"
+
+
+class RelayError(Exception):
+    """Delivery attempt failed; `retryable` tells whether to try again."""
+
+    def __init__(self, message, retryable=True, code="INTERNAL_ERROR"):
+        super().__init__(message)
+        self.retryable = retryable
+        self.code = code
+
+
+class TargetForbidden(RelayError):
+    """The target host resolves to a loopback, private, link-local or otherwise non-public address."""
+
+    def __init__(self, message):
+        super().__init__(message, retryable=False, code="TARGET_FORBIDDEN")
+
+
+class QueueFull(Exception):
+    """The destination's queue is full; the caller should retry later."""
+    code = "RATE_LIMIT_EXCEEDED"
+
+
+def base_url(provider):
+    """Same rule as the SDK: plain http for localhost, https otherwise."""
+    if "localhost" in provider or "127.0.0.1" in provider:
+        return f"http://{provider}"
+    return f"https://{provider}"
+
+
+def is_public_address(ip):
+    """True for globally routable addresses (IPv4-mapped IPv6 judged by the IPv4 address)."""
+    address = ipaddress.ip_address(ip.split("%", 1)[0])
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def public_addresses(host, port):
+    """
+    getaddrinfo() results for host, refusing hosts that resolve to any non-public address.
+
+    Raises:
+        TargetForbidden: host resolves to a non-public address
+        OSError: host does not resolve
+    """
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for info in infos:
+        if not is_public_address(info[4][0]):
+            raise TargetForbidden(f"{host} resolves to non-public address {info[4][0]}")
+    return infos
+
+
+def _public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection() that only connects to the public addresses it checked."""
+    host, port = address
+    error = None
+    for family, type_, proto, _, sockaddr in public_addresses(host, port):
+        sock = socket.socket(family, type_, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    raise error or OSError(f"{host} did not resolve")
+
+
+class HTTPTransport:
+    """
+    Keep-alive HTTP(S) connections, one per (thread, host).
+
+    Unless allow_private is set, connections to non-public addresses raise TargetForbidden.
+    With keep_alive=False every request uses a fresh connection and is never retried.
+    """
+
+    def __init__(self, timeout=10, allow_private=False, keep_alive=True):
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self.keep_alive = keep_alive
+        self._local = threading.local()
+
+    def _connection(self, scheme, netloc):
+        conns = self._local.__dict__.setdefault("conns", {})
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = conns[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+            if not self.allow_private:
+                # HTTPSConnection 在这之上做 TLS，证书和 SNI 仍按主机名校验
+                conn._create_connection = _public_connection
+        return conn
+
+    def _drop(self, scheme, netloc):
+        conn = self._local.__dict__.get("conns", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """Return (status, body bytes). Raises RelayError on connection failure."""
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        # 复用的连接可能已被对端关闭，此时换新连接重试一次
+        for attempt in (1, 2):
+            conn = self._connection(parts.scheme, parts.netloc)
+            reused = conn.sock is not None
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+                if not self.keep_alive:
+                    self._drop(parts.scheme, parts.netloc)
+                return response.status, data
+            except TargetForbidden:
+                self._drop(parts.scheme, parts.netloc)
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                self._drop(parts.scheme, parts.netloc)
+                if not reused or attempt == 2:
+                    raise RelayError(f"{method} {url}: {e}")
+
+    def close(self):
+        for conn in self._local.__dict__.pop("conns", {}).values():
+            conn.close()
+
+
+class OutboundMessage:
+    __slots__ = ("id", "owner_role", "provider", "envelope", "payload", "idempotency_key")
+
+    def __init__(self, id, owner_role, provider, envelope, payload, idempotency_key):
+        self.id = id
+        self.owner_role = owner_role
+        self.provider = provider
+        self.envelope = envelope
+        self.payload = payload
+        self.idempotency_key = idempotency_key
+
+
+class _Destination:
+    __slots__ = ("provider", "queue", "workers", "cond", "delivered", "failed")
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.queue = deque()
+        self.workers = 0
+        self.cond = threading.Condition()
+        self.delivered = 0
+        self.failed = 0
+
+
+class Relay:
+    """
+    Per-destination queues drained by pooled, batching delivery threads.
+
+    Delivery threads are started on demand by submit(); nothing runs until
+    the first outbound message.
+    """
+
+    def __init__(self, transport=None, queue_size=RELAY_QUEUE_SIZE, concurrency=RELAY_CONCURRENCY,
+                 batch_size=RELAY_BATCH_SIZE, max_attempts=RELAY_MAX_ATTEMPTS,
+                 retry_delay=RELAY_RETRY_DELAY, cache_ttl=RELAY_CACHE_TTL, negative_ttl=RELAY_NEGATIVE_TTL,
+                 idle_timeout=30.0, linger=0.005, status_size=RELAY_STATUS_SIZE):
+        self.transport = transport or HTTPTransport()
+        self.queue_size = queue_size
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+        self.idle_timeout = idle_timeout
+        self.linger = linger  # 队列不满一批时多等一会儿，把随后到达的消息并进同一批
+        self.status_size = status_size
+        self._destinations = {}  # {provider: _Destination}
+        self._cache = {}         # {key: (expires_at, value)}
+        self._status = OrderedDict()  # {relay_id: status dict}
+        self._lock = threading.Lock()
+
+    # ---------- 提交 ----------
+
+    def submit(self, owner_role, provider, envelope, payload, idempotency_key=None):
+        """
+        Queue a message for provider and return its relay id.
+
+        Raises:
+            QueueFull: the destination already has queue_size messages waiting
+        """
+        with self._lock:
+            dest = self._destinations.get(provider)
+            if dest is None:
+                dest = self._destinations[provider] = _Destination(provider)
+
+        # 也用作对端的幂等 key，必须全局唯一
+        relay_id = f"relay-{uuid.uuid4()}"
+        with dest.cond:
+            if len(dest.queue) >= self.queue_size:
+                raise QueueFull(f"Relay queue for {provider} is full")
+            # 没有指定幂等 key 时用 relay id，重试不会在对端产生重复消息
+            message = OutboundMessage(relay_id, owner_role, provider, envelope, payload,
+                                      idempotency_key or relay_id)
+            self._set_status(message, "queued")
+            dest.queue.append(message)
+            # 积压超过现有线程一批的量时加线程，最多 concurrency 个
+            if dest.workers < self.concurrency and len(dest.queue) > dest.workers * self.batch_size:
+                dest.workers += 1
+                threading.Thread(target=self._work, args=(dest,), daemon=True,
+                                 name=f"relay-{provider}").start()
+            else:
+                dest.cond.notify()
+        return relay_id
+
+    # ---------- 状态 ----------
+
+    def _set_status(self, message, state, attempts=0, error=None, message_id=None):
+        with self._lock:
+            self._status[message.id] = {
+                "relay_id": message.id,
+                "owner_role": message.owner_role,
+                "to": message.envelope.get("to_addr"),
+                "status": state,
+                "attempts": attempts,
+                "error": error,
+                "message_id": message_id,
+            }
+            self._status.move_to_end(message.id)
+            while len(self._status) > self.status_size:
+                self._status.popitem(last=False)
+
+    def status(self, relay_id):
+        with self._lock:
+            status = self._status.get(relay_id)
+            return dict(status) if status else None
+
+    def stats(self):
+        """{provider: {"queued", "workers", "delivered", "failed"}}"""
+        with self._lock:
+            destinations = list(self._destinations.values())
+        return {
+            d.provider: {"queued": len(d.queue), "workers": d.workers,
+                         "delivered": d.delivered, "failed": d.failed}
+            for d in destinations
+        }
+
+    def flush(self, timeout=10.0):
+        """Wait until every queue is drained and idle. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                pending = [s for s in self._status.values() if s["status"] in ("queued", "sending")]
+            if not pending:
+                return True
+            time.sleep(0.01)
+        return False
+
+    # ---------- 缓存 ----------
+
+    def _cached(self, key, load):
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = load()
+        # 失败 (None) 只短暂缓存：既不会每条消息都去查，对端恢复后也能很快用上
+        self._cache[key] = (now + (self.cache_ttl if value is not None else self.negative_ttl), value)
+        return value
+
+    def provider_info(self, provider):
+        def load():
+            try:
+                status, body = self.transport.request("GET", base_url(provider) + "/api/v1/providers/info")
+            except RelayError:
+                return None
+            return codec.loads(body) if status == 200 else None
+        return self._cached(("info", provider), load)
+
+    def inbox_url(self, address, provider):
+        def load():
+            query = urllib.parse.urlencode({"address": address})
+            status, body = self.transport.request("GET", f"{base_url(provider)}/api/v1/resolve?{query}")
+            if status == 404:
+                raise RelayError(f"Address {address} not found", retryable=False, code="ADDRESS_NOT_FOUND")
+            if status != 200:
+                raise RelayError(f"Resolve {address} failed with HTTP {status}", retryable=status >= 500)
+            url = codec.loads(body).get("receive", {}).get("inbox_url")
+            if not url:
+                raise RelayError(f"No inbox URL for {address}", retryable=False, code="ADDRESS_NOT_FOUND")
+            return urllib.parse.urljoin(base_url(provider) + "/", url)
+        return self._cached(("inbox", address), load)
+
+    # ---------- 投递 ----------
+
+    def _work(self, dest):
+        while True:
+            with dest.cond:
+                if not dest.queue:
+                    dest.cond.wait(self.idle_timeout)
+                    if not dest.queue:
+                        dest.workers -= 1
+                        return
+                if len(dest.queue) < self.batch_size and self.linger:
+                    dest.cond.wait(self.linger)
+                batch = [dest.queue.popleft() for _ in range(min(self.batch_size, len(dest.queue)))]
+            if not batch:
+                continue
+            for message in batch:
+                self._set_status(message, "sending")
+            try:
+                info = self.provider_info(dest.provider)
+                if info and BATCH_CAPABILITY in info.get("capabilities", ()):
+                    self._send_batch(dest, batch)
+                else:
+                    for message in batch:
+                        self._send_one(dest, message)
+            except Exception as e:  # 投递线程不能因为意外错误退出
+                for message in batch:
+                    status = self.status(message.id)
+                    if status is None or status["status"] == "sending":
+                        self._finish(dest, message, False, 0, f"{type(e).__name__}: {e}")
+
+    def _retrying(self, send):
+        """Call send() until it succeeds or fails permanently. Returns (result, attempts)."""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return send(), attempt
+            except RelayError as e:
+                if not e.retryable or attempt == self.max_attempts:
+                    e.attempts = attempt
+                    raise
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+    def _post(self, url, body, headers):
+        status, data = self.transport.request("POST", url, body, headers)
+        if status == 429 or status >= 500:
+            raise RelayError(f"POST {url} returned HTTP {status}")
+        return status, data
+
+    def _send_one(self, dest, message):
+        def send():
+            url = self.inbox_url(message.envelope.get("to_addr", ""), dest.provider)
+            body = codec.dumps({"envelope": message.envelope, "payload": message.payload})
+            return self._post(url, body, {"Content-Type": "application/json",
+                                          "X-Idempotency-Key": message.idempotency_key})
+        try:
+            (status, data), attempts = self._retrying(send)
+        except RelayError as e:
+            self._finish(dest, message, False, e.attempts, str(e))
+            return
+        result = codec.loads(data) if data else {}
+        if status < 300:
+            self._finish(dest, message, True, attempts, message_id=result.get("message_id"))
+        else:
+            self._finish(dest, message, False, attempts, _error_text(result, status))
+
+    def _send_batch(self, dest, batch):
+        body = codec.dumps({"messages": [
+            {"envelope": m.envelope, "payload": m.payload, "idempotency_key": m.idempotency_key}
+            for m in batch
+        ]})
+        url = base_url(dest.provider) + "/api/v1/inbox:batch"
+        try:
+            (status, data), attempts = self._retrying(
+                lambda: self._post(url, body, {"Content-Type": "application/json"}))
+        except RelayError as e:
+            for message in batch:
+                self._finish(dest, message, False, e.attempts, str(e))
+            return
+
+        result = codec.loads(data) if data else {}
+        results = result.get("results") if status < 300 else None
+        if not isinstance(results, list) or len(results) != len(batch):
+            for message in batch:
+                self._finish(dest, message, False, attempts, _error_text(result, status))
+            return
+        for message, item in zip(batch, results):
+            if item.get("status", 500) < 300:
+                self._finish(dest, message, True, attempts, message_id=item.get("message_id"))
+            else:
+                self._finish(dest, message, False, attempts, _error_text(item, item.get("status")))
+
+    def _finish(self, dest, message, ok, attempts, error=None, message_id=None):
+        with dest.cond:
+            if ok:
+                dest.delivered += 1
+            else:
+                dest.failed += 1
+        self._set_status(message, "delivered" if ok else "failed", attempts, error, message_id)
+
+
+def _error_text(result, status):
+    error = result.get("error") if isinstance(result, dict) else None
+    if isinstance(error, dict):
+        return f"{error.get('code')}: {error.get('message')}"
+    return f"HTTP {status}"
@@ -0,0 +1,111 @@
+"""
+消息签名验证 (Ed25519)
+
+Agent 注册时可以提交 public_key ("ed25519:<base64>")，resolve 时原样返回。
+带 signature 字段的消息在接收时用发送方公钥验证：本 Provider 的 Agent 直接查
+注册信息，其他 Provider 的发送方 resolve 一次后放进 KeyCache (有 TTL、有上限)。
+
+规范化方式与 SDK (aap.signing) 一致：去掉信封里的 signature 后，
+{"envelope", "payload"} 按 key 排序、无空白、UTF-8 编码的 JSON。
+
+验签需要可选依赖 cryptography，未安装时 AVAILABLE 为 False，签名不做验证。
+"""
+
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+except ImportError:  # 可选依赖
+    Ed25519PublicKey = None
+
+AVAILABLE = Ed25519PublicKey is not None
+
+KEY_PREFIX = "ed25519:"
+KEY_SIZE = 32
+SIGNATURE_SIZE = 64
+
+
+def _decode(value, size):
+    """Raw bytes of an "ed25519:<base64>" value, or None if malformed."""
+    if type(value) is not str or not value.startswith(KEY_PREFIX):
+        return None
+    try:
+        raw = base64.b64decode(value[len(KEY_PREFIX):], validate=True)
+    except ValueError:
+        return None
+    return raw if len(raw) == size else None
+
+
+def is_public_key(value):
+    return _decode(value, KEY_SIZE) is not None
+
+
+def canonical_bytes(envelope, payload):
+    if "signature" in envelope:
+        envelope = {k: v for k, v in envelope.items() if k != "signature"}
+    return json.dumps(
+        {"envelope": envelope, "payload": payload},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=4096)
+def _load_public_key(public_key):
+    return Ed25519PublicKey.from_public_bytes(_decode(public_key, KEY_SIZE))
+
+
+def verify_batch(items):
+    """
+    Verify [(public_key, envelope, payload)], parsing each distinct key once.
+
+    Returns a list of bools; malformed keys or signatures count as failures.
+    """
+    results = []
+    for public_key, envelope, payload in items:
+        signature = _decode(envelope.get("signature"), SIGNATURE_SIZE)
+        if signature is None or not is_public_key(public_key):
+            results.append(False)
+            continue
+        try:
+            _load_public_key(public_key).verify(signature, canonical_bytes(envelope, payload))
+            results.append(True)
+        except InvalidSignature:
+            results.append(False)
+    return results
+
+
+class KeyCache:
+    """Bounded TTL cache {address: public_key}; "" records an address without a key."""
+
+    def __init__(self, ttl=300.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # {address: (expires_at, public_key)}，按最近使用排序
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, address):
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[address]
+                return None
+            self._entries.move_to_end(address)
+            return entry[1]
+
+    def put(self, address, public_key):
+        with self._lock:
+            self._entries[address] = (time.monotonic() + self.ttl, public_key or "")
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
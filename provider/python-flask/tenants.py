@@ -0,0 +1,90 @@
+"""
+多域名托管 (虚拟主机)
+
+一个进程同时作为多个 Provider 域名提供服务。每个域名 (Tenant) 有自己的 Agent 注册表、
+收件箱、API Key 和 Feed (各自一个 InMemoryDB / FeedStore) 以及配额；转发连接池、
+Blob 存储、认证缓存、发送方公钥缓存和指标由所有域名共享。
+
+按 Host 头路由：请求开始时在 {host: Tenant} 里查一次。没有配置域名时为单域名模式，
+与原来一样把请求的 Host 当作本 Provider 的域名。
+
+配置：
+    TENANTS=a.com,b.com
+    TENANTS_FILE=tenants.json
+        {"a.com": {"max_agents": 1000, "max_messages": 100000, "aliases": ["www.a.com"]}}
+"""
+
+import json
+
+TENANT_MAX_AGENTS = 0    # 默认配额，0 表示不限
+TENANT_MAX_MESSAGES = 0
+
+
+class Tenant:
+    """One provider domain served by this process."""
+
+    __slots__ = ("domain", "db", "feed", "max_agents", "max_messages")
+
+    def __init__(self, domain, db, feed, max_agents=TENANT_MAX_AGENTS, max_messages=TENANT_MAX_MESSAGES):
+        self.domain = domain
+        self.db = db
+        self.feed = feed
+        self.max_agents = max_agents
+        self.max_messages = max_messages
+
+    def agents_full(self):
+        return bool(self.max_agents) and len(self.db.agents) >= self.max_agents
+
+    def messages_full(self):
+        return bool(self.max_messages) and self.db.message_count >= self.max_messages
+
+
+class TenantRegistry:
+    """Tenants by domain, with aliases, for host-based routing."""
+
+    def __init__(self):
+        self.tenants = {}   # {domain: Tenant}
+        self._by_host = {}  # {domain 或别名: Tenant}
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def __iter__(self):
+        return iter(self.tenants.values())
+
+    def add(self, tenant, aliases=()):
+        self.tenants[tenant.domain] = tenant
+        for host in (tenant.domain, *aliases):
+            self._by_host[host.lower()] = tenant
+        return tenant
+
+    def get(self, host):
+        """Tenant serving host (a Host header or an address's provider part), or None."""
+        return self._by_host.get(host) or self._by_host.get(host.lower())
+
+
+def load_tenants(domains, path, make_tenant, max_agents=TENANT_MAX_AGENTS, max_messages=TENANT_MAX_MESSAGES):
+    """
+    Build a TenantRegistry from TENANTS (comma-separated domains) and TENANTS_FILE.
+
+    make_tenant(domain, max_agents, max_messages) creates the per-domain stores;
+    max_agents / max_messages are the quotas of domains that do not set their own.
+    """
+    config = {}
+    for domain in domains.split(","):
+        if domain.strip():
+            config[domain.strip().lower()] = {}
+    if path:
+        with open(path) as f:
+            for domain, options in json.load(f).items():
+                config[domain.lower()] = options or {}
+
+    registry = TenantRegistry()
+    for domain, options in config.items():
+        tenant = make_tenant(
+            domain,
+            int(options.get("max_agents", max_agents)),
+            int(options.get("max_messages", max_messages))
+        )
+        registry.add(tenant, options.get("aliases", ()))
+    return registry
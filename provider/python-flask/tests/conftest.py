@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import app as provider
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Flask test client backed by a fresh in-memory store."""
+    monkeypatch.setattr(provider, "db", provider.InMemoryDB())
+    provider.auth_cache.clear()
+    provider.app.config["TESTING"] = True
+    return provider.app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """Register an agent and return (address, api_key)."""
+    def _register(address="ai:tom~novel#localhost"):
+        r = client.post("/api/agent/register", json={"aap_address": address})
+        assert r.status_code == 201
+        return address, r.get_json()["api_key"]
+    return _register
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+import app as provider
+from admission import AdmissionController, Overloaded, RouteClass
+
+
+def controller(capacity=0, timeout=0.2, read=(1, 5), ingest=(1, 5)):
+    return AdmissionController(
+        [RouteClass("read", 0, *read), RouteClass("ingest", 2, *ingest)],
+        capacity=capacity, queue_timeout=timeout
+    )
+
+
+def queued(ctl, name, results):
+    """Start a thread that waits for admission and records (name, outcome) when it gets a slot."""
+    def run():
+        try:
+            ctl.admit(name)
+            results.append(name)
+        except Overloaded as e:
+            results.append(e.reason)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_queued(ctl, name, n):
+    deadline = time.monotonic() + 2
+    while ctl.stats()[name]["queued"] < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+class TestAdmissionController:
+    """Per-class limits, deadlines and priority."""
+
+    def test_admits_until_class_limit(self):
+        ctl = controller(timeout=0.01, read=(2, 0))
+        assert ctl.admit("read") == 0.0
+        assert ctl.admit("read") == 0.0
+        with pytest.raises(Overloaded) as e:
+            ctl.admit("read")
+        assert e.value.reason == "queue_full"
+        assert ctl.admit("ingest") == 0.0  # 其他类别不受影响
+
+    def test_queued_request_gets_released_slot(self):
+        ctl = controller(timeout=2)
+        ctl.admit("read")
+        results = []
+        thread = queued(ctl, "read", results)
+        wait_queued(ctl, "read", 1)
+        ctl.release("read")
+        thread.join()
+        assert results == ["read"]
+        assert ctl.stats()["read"] == {"in_flight": 1, "queued": 0, "max_in_flight": 1}
+
+    def test_deadline_sheds_waiters(self):
+        ctl = controller(timeout=0.02)
+        ctl.admit("read")
+        start = time.monotonic()
+        with pytest.raises(Overloaded) as e:
+            ctl.admit("read")
+        assert e.value.reason == "timeout"
+        assert time.monotonic() - start < 1
+        assert ctl.stats()["read"]["queued"] == 0
+        ctl.release("read")
+        assert ctl.admit("read") == 0.0
+
+    def test_reads_are_admitted_before_earlier_anonymous_writes(self):
+        ctl = controller(capacity=1, timeout=2, read=(5, 5), ingest=(5, 5))
+        ctl.admit("ingest")
+        results = []
+        threads = [queued(ctl, "ingest", results)]
+        wait_queued(ctl, "ingest", 1)
+        threads.append(queued(ctl, "read", results))
+        wait_queued(ctl, "read", 1)
+
+        ctl.release("ingest")
+        time.sleep(0.05)
+        assert results == ["read"]
+        ctl.release("read")
+        for thread in threads:
+            thread.join()
+        assert results == ["read", "ingest"]
+
+    def test_full_class_does_not_block_others(self):
+        ctl = controller(capacity=2, timeout=2, read=(1, 5), ingest=(5, 5))
+        ctl.admit("read")
+        ctl.admit("ingest")
+        results = []
+        threads = [queued(ctl, "read", results)]
+        wait_queued(ctl, "read", 1)
+        threads.append(queued(ctl, "ingest", results))
+        wait_queued(ctl, "ingest", 1)
+
+        # 释放的是 ingest 的位置，read 仍然满，排在后面的 ingest 先进
+        ctl.release("ingest")
+        threads[1].join()
+        assert results == ["ingest"]
+        ctl.release("read")
+        threads[0].join()
+        assert results == ["ingest", "read"]
+
+
+class TestAdmissionMiddleware:
+    """503 + Retry-After from the Flask app."""
+
+    @pytest.fixture
+    def tight(self, monkeypatch):
+        ctl = controller(timeout=0.01, read=(1, 0), ingest=(1, 0))
+        monkeypatch.setattr(provider, "admission", ctl)
+        return ctl
+
+    def test_shed_with_retry_after(self, client, tight):
+        tight.admit("read")  # 占满 read
+        r = client.get("/api/v1/resolve", query_string={"address": "ai:tom~novel#localhost"})
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
+        assert r.get_json()["error"]["code"] == "SERVICE_OVERLOADED"
+        assert client.get("/health").status_code == 200
+        assert client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#localhost"}).status_code == 201
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'aap_admission_shed_total{class="read",reason="queue_full"}' in text
+        assert 'aap_admission_queue_seconds_count{class="ingest"}' in text
+
+    def test_write_class_requires_auth(self, client):
+        # write 的优先级高于匿名的 ingest，归入 write 的端点不认证就必须被拒绝
+        writes = [rule for rule in provider.app.url_map.iter_rules()
+                  if provider.ENDPOINT_CLASSES.get(rule.endpoint) == "write"]
+        assert {"upload_blob", "send_outbound"} <= {rule.endpoint for rule in writes}
+        for rule in writes:
+            url = rule.rule.replace("<", "").replace(">", "")
+            for method in rule.methods - {"HEAD", "OPTIONS"}:
+                r = client.open(url, method=method, data=b"x")
+                assert r.status_code == 401, (rule.endpoint, method)
+
+    def test_slot_released_after_request(self, client, tight):
+        for _ in range(3):
+            assert client.get("/api/v1/resolve", query_string={"address": "ai:x~y#localhost"}).status_code == 404
+        assert tight.stats()["read"]["in_flight"] == 0
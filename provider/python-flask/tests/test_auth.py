@@ -0,0 +1,114 @@
+import pytest
+
+import app as provider
+from auth import AuthCache, hash_api_key, key_prefix
+
+
+def auth_header(api_key):
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+class TestKeyStorage:
+    """API keys are stored hashed and indexed by prefix."""
+    
+    def test_plaintext_key_not_stored(self, client, register):
+        _, api_key = register()
+        
+        record = provider.db.api_keys[key_prefix(api_key)]
+        assert record["key_hash"] == hash_api_key(api_key)
+        assert api_key not in str(provider.db.api_keys)
+    
+    def test_wrong_key_with_valid_prefix_rejected(self, client, register):
+        _, api_key = register()
+        forged = key_prefix(api_key) + "x" * 31
+        
+        r = client.get("/api/v1/inbox", headers=auth_header(forged))
+        assert r.status_code == 401
+    
+    def test_inbox_with_valid_key(self, client, register):
+        _, api_key = register()
+        
+        r = client.get("/api/v1/inbox", headers=auth_header(api_key))
+        assert r.status_code == 200
+
+
+class TestAuthCache:
+    """Verified keys are cached and invalidated on revocation."""
+    
+    def test_cache_populated_after_auth(self, client, register):
+        _, api_key = register()
+        client.get("/api/v1/inbox", headers=auth_header(api_key))
+        
+        assert provider.auth_cache.get(hash_api_key(api_key)) is not None
+    
+    def test_cache_ttl_expiry(self):
+        cache = AuthCache(ttl=-1)
+        cache.put("h", {"prefix": "p", "owner_role": "tom~novel"})
+        
+        assert cache.get("h") is None
+        assert len(cache) == 0
+    
+    def test_invalidate_by_prefix(self):
+        cache = AuthCache()
+        cache.put("h", {"prefix": "p", "owner_role": "tom~novel"})
+        cache.invalidate("p")
+        
+        assert cache.get("h") is None
+
+
+class TestKeyManagement:
+    """Key rotation, scoping and revocation endpoints."""
+    
+    def test_rotate_revokes_old_key(self, client, register):
+        _, old_key = register()
+        client.get("/api/v1/inbox", headers=auth_header(old_key))  # warm cache
+        
+        r = client.post("/api/v1/keys/rotate", headers=auth_header(old_key))
+        assert r.status_code == 201
+        new_key = r.get_json()["api_key"]
+        
+        assert client.get("/api/v1/inbox", headers=auth_header(old_key)).status_code == 401
+        assert client.get("/api/v1/inbox", headers=auth_header(new_key)).status_code == 200
+    
+    def test_scoped_key_cannot_manage_keys(self, client, register):
+        _, api_key = register()
+        r = client.post("/api/v1/keys", json={"scopes": ["inbox:read"]},
+                        headers=auth_header(api_key))
+        scoped = r.get_json()["api_key"]
+        
+        assert client.get("/api/v1/inbox", headers=auth_header(scoped)).status_code == 200
+        assert client.get("/api/v1/keys", headers=auth_header(scoped)).status_code == 403
+    
+    def test_unknown_scope_rejected(self, client, register):
+        _, api_key = register()
+        r = client.post("/api/v1/keys", json={"scopes": ["admin"]},
+                        headers=auth_header(api_key))
+        assert r.status_code == 400
+    
+    def test_revoke_key(self, client, register):
+        _, api_key = register()
+        r = client.post("/api/v1/keys", headers=auth_header(api_key))
+        extra = r.get_json()
+        
+        r = client.delete(f"/api/v1/keys/{extra['prefix']}", headers=auth_header(api_key))
+        assert r.status_code == 200
+        assert client.get("/api/v1/inbox", headers=auth_header(extra["api_key"])).status_code == 401
+    
+    def test_revoke_other_owners_key(self, client, register):
+        _, key_a = register("ai:tom~novel#localhost")
+        _, key_b = register("ai:amy~main#localhost")
+        
+        r = client.delete(f"/api/v1/keys/{key_prefix(key_b)}", headers=auth_header(key_a))
+        assert r.status_code == 404
+    
+    def test_list_keys_hides_hash(self, client, register):
+        _, api_key = register()
+        r = client.get("/api/v1/keys", headers=auth_header(api_key))
+        
+        keys = r.get_json()["keys"]
+        assert len(keys) == 1
+        assert "key_hash" not in keys[0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+import app as provider
+from blobs import BlobStore
+
+
+def message(content_hash, content_size, from_addr="ai:amy~main#localhost"):
+    return {
+        "envelope": {
+            "from_addr": from_addr,
+            "to_addr": "ai:tom~novel#localhost",
+            "content_type": "application/pdf",
+            "content_hash": content_hash,
+            "content_size": content_size,
+        },
+        "payload": {"content": ""},
+    }
+
+
+@pytest.fixture
+def blobs(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(provider, "blob_store", BlobStore(str(tmp_path), 1024 * 1024))
+    return provider.blob_store
+
+
+@pytest.fixture
+def sender(register):
+    """API key of the local agent ai:amy~main#localhost, used for uploads."""
+    return register("ai:amy~main#localhost")[1]
+
+
+def upload(client, data, api_key, **headers):
+    return client.post("/api/v1/blobs", data=data, headers={
+        "Content-Type": "application/octet-stream", "Authorization": f"Bearer {api_key}", **headers
+    })
+
+
+class TestBlobUpload:
+    """Content-addressed blob uploads."""
+    
+    def test_upload_returns_hash(self, client, blobs, sender):
+        data = b"chapter one " * 1000
+        r = upload(client, data, sender)
+        
+        assert r.status_code == 201
+        body = r.get_json()
+        assert body["content_hash"] == "sha256:" + hashlib.sha256(data).hexdigest()
+        assert body["size"] == len(data)
+    
+    def test_duplicate_upload_deduplicated(self, client, blobs, sender):
+        upload(client, b"same", sender)
+        r = upload(client, b"same", sender)
+        
+        assert r.status_code == 200
+        assert r.get_json()["deduplicated"] is True
+    
+    def test_declared_hash_mismatch(self, client, blobs, sender):
+        r = upload(client, b"data", sender, **{"X-Content-SHA256": "0" * 64})
+        
+        assert r.status_code == 400
+        assert r.get_json()["error"]["code"] == "BLOB_HASH_MISMATCH"
+    
+    def test_too_large(self, client, blobs, sender):
+        blobs.max_size = 10
+        r = upload(client, b"x" * 11, sender)
+        
+        assert r.status_code == 413
+        assert os.listdir(os.path.join(blobs.root, "tmp")) == []
+    
+    def test_requires_api_key_with_send_scope(self, client, blobs, sender):
+        r = client.post("/api/v1/blobs", data=b"data", headers={"Content-Type": "application/octet-stream"})
+        assert r.status_code == 401
+        
+        read_only = client.post("/api/v1/keys", json={"scopes": ["inbox:read"]},
+                                headers={"Authorization": f"Bearer {sender}"}).get_json()["api_key"]
+        assert upload(client, b"data", read_only).status_code == 403
+    
+    def test_quota_per_owner(self, client, blobs, sender, register):
+        blobs.quota = 10
+        assert upload(client, b"x" * 6, sender).status_code == 201
+        digest = hashlib.sha256(b"x" * 6).hexdigest()
+        r = upload(client, b"x" * 6, sender, **{"X-Content-SHA256": digest})
+        assert r.status_code == 200  # 同一内容只计一次
+        
+        r = upload(client, b"y" * 6, sender)
+        assert r.status_code == 403
+        assert r.get_json()["error"]["code"] == "QUOTA_EXCEEDED"
+        assert blobs.usage(("localhost", "amy~main")) == 6
+        
+        _, other = register("ai:bob~main#localhost")
+        assert upload(client, b"y" * 6, other).status_code == 201
+
+
+class TestBlobCollection:
+    """Garbage collection of unreferenced blobs."""
+    
+    ADMIN = {"Authorization": "Bearer admin-secret"}
+    
+    @pytest.fixture(autouse=True)
+    def admin_token(self, monkeypatch):
+        monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    
+    def age(self, blobs, digest, seconds):
+        past = time.time() - seconds
+        os.utime(blobs.path(digest), (past, past))
+    
+    def test_collects_unreferenced_after_grace(self, client, blobs, sender, register):
+        register()
+        kept = upload(client, b"attached", sender).get_json()
+        orphan = upload(client, b"orphan", sender).get_json()
+        fresh = upload(client, b"fresh", sender).get_json()
+        client.post("/api/v1/inbox/tom~novel", json=message(kept["content_hash"], kept["size"], "ai:amy~main#localhost"))
+        for blob in (kept, orphan):
+            self.age(blobs, blob["content_hash"][7:], blobs.grace + 1)
+        
+        r = client.post("/api/v1/admin/blobs/gc", headers=self.ADMIN)
+        assert r.get_json() == {"removed": 1, "bytes": len(b"orphan")}
+        assert blobs.exists(kept["content_hash"][7:])
+        assert blobs.exists(fresh["content_hash"][7:])
+        assert not blobs.exists(orphan["content_hash"][7:])
+        assert blobs.usage(("localhost", "amy~main")) == len(b"attached") + len(b"fresh")
+    
+    def test_requires_admin(self, client, blobs):
+        assert client.post("/api/v1/admin/blobs/gc").status_code == 403
+
+
+class TestBlobDownload:
+    """Blob downloads with range requests."""
+    
+    def test_range_request(self, client, blobs, sender):
+        data = bytes(range(256)) * 4
+        digest = upload(client, data, sender).get_json()["content_hash"].split(":")[1]
+        
+        r = client.get(f"/api/v1/blobs/{digest}", headers={"Range": "bytes=10-19"})
+        
+        assert r.status_code == 206
+        assert r.data == data[10:20]
+    
+    def test_head_unknown_blob(self, client, blobs, sender):
+        r = client.head(f"/api/v1/blobs/{'a' * 64}")
+        assert r.status_code == 404
+    
+    def test_malformed_hash(self, client, blobs, sender):
+        r = client.get("/api/v1/blobs/not-a-hash")
+        assert r.status_code == 400
+
+
+class TestBlobMessages:
+    """Envelopes referencing blobs."""
+    
+    @pytest.fixture(autouse=True)
+    def recipient(self, register):
+        register()
+    
+    def test_message_with_blob(self, client, blobs, sender):
+        uploaded = upload(client, b"%PDF-1.7", sender).get_json()
+        
+        r = client.post("/api/v1/inbox/tom~novel",
+                        json=message(uploaded["content_hash"], uploaded["size"]))
+        assert r.status_code == 201
+    
+    def test_message_with_missing_blob(self, client, blobs, sender):
+        r = client.post("/api/v1/inbox/tom~novel", json=message("sha256:" + "b" * 64, 1))
+        assert r.status_code == 404
+        assert r.get_json()["error"]["code"] == "BLOB_NOT_FOUND"
+    
+    def test_remote_sender_blob_not_checked(self, client, blobs):
+        # 其他 Provider 的发送方把 Blob 放在自己的 Provider 上
+        r = client.post("/api/v1/inbox/tom~novel",
+                        json=message("sha256:" + "b" * 64, 1, "ai:amy~main#other.com"))
+        assert r.status_code == 201
+    
+    def test_message_with_wrong_size(self, client, blobs, sender):
+        uploaded = upload(client, b"%PDF-1.7", sender).get_json()
+        
+        r = client.post("/api/v1/inbox/tom~novel",
+                        json=message(uploaded["content_hash"], 999))
+        assert r.status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+import sys
+import threading
+
+import pytest
+
+import app as provider
+from bloom import BloomFilter
+from tenants import Tenant, TenantRegistry
+
+
+class TestBloomFilter:
+    """No false negatives, bounded false positives."""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = [f"ai:agent{i}~main#localhost" for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+        assert len(bloom) == 1000 and bloom.full()
+
+    def test_false_positive_rate_at_capacity(self):
+        bloom = BloomFilter.build((f"agent{i}~main" for i in range(5000)), capacity=10000, error_rate=0.01)
+        assert bloom.capacity == 10000
+        misses = sum(f"other{i}~main" in bloom for i in range(20000))
+        assert misses / 20000 < 0.01
+        assert bloom.false_positive_rate() < 0.01
+
+    def test_build_leaves_room_to_grow(self):
+        bloom = BloomFilter.build([f"k{i}" for i in range(100)], capacity=10)
+        assert bloom.capacity == 200
+        assert not bloom.full()
+
+
+class TestAddressFilter:
+    """Unknown addresses are rejected without a storage lookup."""
+
+    @pytest.fixture
+    def no_storage(self, monkeypatch):
+        """Fail the test if a lookup reaches storage."""
+        def fail(*args):
+            raise AssertionError("storage lookup")
+        for name in ("resolve", "get_agent", "has_inbox"):
+            monkeypatch.setattr(provider.db, name, fail)
+
+    def envelope(self, to="ai:ghost~main#localhost"):
+        return {"envelope": {"from_addr": "ai:x~y#other.com", "to_addr": to}, "payload": {"content": "hi"}}
+
+    def test_unknown_address_skips_storage(self, client, no_storage):
+        r = client.get("/api/v1/resolve", query_string={"address": "ai:ghost~main#localhost"})
+        assert r.status_code == 404
+        r = client.post("/api/v1/inbox/ghost~main", json=self.envelope())
+        assert r.status_code == 404
+        assert r.get_json()["error"]["code"] == "ADDRESS_NOT_FOUND"
+        r = client.post("/api/v1/inbox:batch", json={"messages": [self.envelope()]})
+        assert r.get_json()["results"][0]["error"]["code"] == "ADDRESS_NOT_FOUND"
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'aap_address_filter_lookups_total{result="miss"}' in text
+
+    def test_registered_address_found(self, client, register):
+        register("ai:tom~novel#localhost")
+        r = client.get("/api/v1/resolve", query_string={"address": "ai:tom~novel#localhost"})
+        assert r.status_code == 200
+        r = client.post("/api/v1/inbox/tom~novel", json=self.envelope("ai:tom~novel#localhost"))
+        assert r.status_code == 201
+        # 公开动态不是注册的 Agent，不经过过滤器
+        r = client.get("/api/v1/resolve", query_string={"address": "ai:feed~public#localhost"})
+        assert r.status_code == 200
+
+    def test_filter_grows_and_is_rebuilt(self, client, register, monkeypatch):
+        monkeypatch.setattr(provider, "ADDRESS_FILTER_CAPACITY", 4)
+        monkeypatch.setattr(provider, "db", provider.InMemoryDB())
+        addresses = [f"ai:agent{i}~main#localhost" for i in range(10)]
+        for address in addresses:
+            register(address)
+        assert provider.db.known.capacity >= 20
+        for address in addresses:
+            assert client.get("/api/v1/resolve", query_string={"address": address}).status_code == 200
+
+    def test_concurrent_registration(self, monkeypatch):
+        monkeypatch.setattr(provider, "ADDRESS_FILTER_CAPACITY", 64)
+        store = provider.InMemoryDB()
+
+        def register(n):
+            for i in range(200):
+                store.register_agent(f"ai:agent{n}x{i}~main#localhost", "m")
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # 尽量让线程在置位中途切换
+        try:
+            threads = [threading.Thread(target=register, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        missing = [address for address in store.agents if address not in store.known]
+        assert missing == []
+        assert all(agent["owner_role"] in store.known for agent in store.agents.values())
+
+    def test_rebuild_from_storage(self):
+        store = provider.InMemoryDB()
+        store.register_agent("ai:tom~novel#localhost", "m")
+        store.known = BloomFilter()  # 比如进程重启后
+        assert "tom~novel" not in store.known
+        store.rebuild_address_filter()
+        assert "tom~novel" in store.known and "ai:tom~novel#localhost" in store.known
+
+    def test_filter_is_per_domain(self, client, monkeypatch):
+        registry = TenantRegistry()
+        for domain in ("a.com", "b.com"):
+            registry.add(provider.make_tenant(domain, 0, 0))
+        monkeypatch.setattr(provider, "tenants", registry)
+        client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#a.com"}, base_url="http://a.com")
+        assert "tom~novel" in registry.get("a.com").db.known
+        assert "tom~novel" not in registry.get("b.com").db.known
+        r = client.post("/api/v1/inbox/tom~novel", json=self.envelope("ai:tom~novel#b.com"), base_url="http://b.com")
+        assert r.status_code == 404
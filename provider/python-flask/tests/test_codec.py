@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import app as provider
+import codec
+
+
+class TestCodec:
+    """JSON codec and pre-encoded inbox responses."""
+    
+    def test_round_trip(self):
+        obj = {"content": "你好！", "n": 1, "items": [1.5, None, True]}
+        assert codec.loads(codec.dumps(obj)) == obj
+    
+    def test_wide_integers_round_trip(self):
+        # orjson 只支持 64 位整数，更宽的必须原样保留而不是变成 float
+        for n in (2**64 - 1, -2**63, 2**70, -2**70, 123456789012345678901234567890):
+            obj = {"n": n, "items": [n, 1.5]}
+            assert codec.loads(codec.dumps(obj)) == obj
+            assert codec.loads(codec.dumps_stored(obj).decode("utf-8")) == obj
+        assert codec.loads(b'{"id": "1234567890123456789012"}') == {"id": "1234567890123456789012"}
+    
+    def test_dumps_stored_matches_dumps(self):
+        obj = {"content": "x" * 100, "metadata": {}}
+        assert codec.dumps_stored(obj) == codec.dumps(obj)
+    
+    def test_join_array(self):
+        items = [codec.dumps({"a": 1}), codec.dumps({"b": 2})]
+        assert json.loads(codec.join_array(items)) == [{"a": 1}, {"b": 2}]
+        assert json.loads(codec.join_array([])) == []
+    
+    def test_inbox_matches_stored_messages(self, client, register):
+        _, api_key = register()
+        for i in range(3):
+            client.post("/api/v1/inbox/tom~novel", json={
+                "envelope": {"from_addr": "ai:amy~main#other.com", "to_addr": "ai:tom~novel#localhost"},
+                "payload": {"content": f"消息 {i}"},
+            })
+        
+        r = client.get("/api/v1/inbox?limit=2", headers={"Authorization": f"Bearer {api_key}"})
+        
+        assert r.mimetype == "application/json"
+        assert r.get_json() == {
+            "messages": provider.db.get_messages("tom~novel", 2),
+            "count": 2,
+        }
+    
+    def test_wide_integer_in_message(self, client, register):
+        _, api_key = register()
+        big = 2**70 + 1
+        r = client.post("/api/v1/inbox/tom~novel", data=json.dumps({
+            "envelope": {"from_addr": "ai:amy~main#other.com", "to_addr": "ai:tom~novel#localhost"},
+            "payload": {"content": "big", "data": {"n": big}},
+        }), content_type="application/json")
+        assert r.status_code == 201
+        
+        r = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"})
+        assert json.loads(r.data)["messages"][0]["payload"]["data"] == {"n": big}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
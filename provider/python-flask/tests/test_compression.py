@@ -0,0 +1,121 @@
+import gzip
+import io
+import json
+import os
+
+import pytest
+
+import app as provider
+from compression import DecompressionMiddleware
+
+
+def envelope(content="Hello!"):
+    return {
+        "envelope": {
+            "from_addr": "ai:amy~main#other.com",
+            "to_addr": "ai:tom~novel#localhost",
+        },
+        "payload": {"content": content},
+    }
+
+
+class TestRequestDecompression:
+    """Compressed POST /api/v1/inbox/* bodies."""
+    
+    def test_gzip_body_accepted(self, client, register):
+        _, api_key = register()
+        body = gzip.compress(json.dumps(envelope("x" * 5000)).encode())
+        
+        r = client.post("/api/v1/inbox/tom~novel", data=body, headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        assert r.status_code == 201
+        
+        r = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"})
+        assert r.get_json()["messages"][0]["payload"]["content"] == "x" * 5000
+    
+    def test_unknown_encoding_rejected(self, client):
+        r = client.post("/api/v1/inbox/tom~novel", data=b"...", headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "br",
+        })
+        assert r.status_code == 415
+        assert r.get_json()["error"]["code"] == "UNSUPPORTED_ENCODING"
+    
+    def test_corrupt_body_rejected(self, client):
+        r = client.post("/api/v1/inbox/tom~novel", data=b"not gzip", headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        assert r.status_code == 415
+    
+    def test_decompression_bomb_rejected(self, client, monkeypatch):
+        monkeypatch.setattr(provider.app.wsgi_app, "max_size", 1024)
+        body = gzip.compress(b" " * 100000)
+        
+        r = client.post("/api/v1/inbox/tom~novel", data=body, headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        assert r.status_code == 413
+
+
+    def test_compressed_size_limited(self, client, monkeypatch):
+        monkeypatch.setattr(provider.app.wsgi_app, "max_compressed_size", 1024)
+        body = gzip.compress(os.urandom(4000))  # 压缩后仍约 4KB，解压后没有超限
+        r = client.post("/api/v1/inbox/tom~novel", data=body, headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        })
+        assert r.status_code == 413
+        assert r.get_json()["error"]["code"] == "PAYLOAD_TOO_LARGE"
+
+    def test_chunked_body_read_only_up_to_limit(self):
+        called = []
+        middleware = DecompressionMiddleware(lambda environ, start: called.append(1), ["/api"], 10000, 100)
+        stream = io.BytesIO(b"x" * 100000)
+        statuses = []
+        environ = {"HTTP_CONTENT_ENCODING": "gzip", "PATH_INFO": "/api/v1/inbox", "wsgi.input": stream}
+        middleware(environ, lambda status, headers: statuses.append(status))
+        assert statuses == ["413 Payload Too Large"]
+        assert stream.tell() == 101
+        assert called == []
+
+
+class TestResponseCompression:
+    """Large responses are compressed according to Accept-Encoding."""
+    
+    def test_large_inbox_compressed(self, client, register):
+        _, api_key = register()
+        for _ in range(5):
+            client.post("/api/v1/inbox/tom~novel", json=envelope("y" * 1000))
+        
+        r = client.get("/api/v1/inbox", headers={
+            "Authorization": f"Bearer {api_key}",
+            "Accept-Encoding": "gzip",
+        })
+        assert r.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in r.headers["Vary"]
+        assert json.loads(gzip.decompress(r.data))["count"] == 5
+    
+    def test_small_response_not_compressed(self, client):
+        r = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in r.headers
+    
+    def test_no_accept_encoding(self, client, register):
+        _, api_key = register()
+        client.post("/api/v1/inbox/tom~novel", json=envelope("y" * 5000))
+        
+        r = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"})
+        assert "Content-Encoding" not in r.headers
+    
+    def test_capability_advertised(self, client):
+        info = client.get("/api/v1/providers/info").get_json()
+        
+        assert "compression" in info["capabilities"]
+        assert "gzip" in info["compression"]["encodings"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
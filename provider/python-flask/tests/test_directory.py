@@ -0,0 +1,136 @@
+import urllib.parse
+
+import pytest
+
+from directory import Directory, announce, create_seed_app
+from relay import RelayError
+
+
+class Router:
+    """Transport dispatching requests to Flask test clients by URL host."""
+    
+    def __init__(self, clients):
+        self.clients = clients
+    
+    def request(self, method, url, body=None, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        if parts.netloc not in self.clients:
+            raise RelayError(f"{method} {url}: connection refused")
+        r = self.clients[parts.netloc].open(path, base_url=f"http://{parts.netloc}", method=method,
+                                            data=body, headers=headers)
+        return r.status_code, r.get_data()
+
+
+INFO = {"provider": "a.com", "version": "0.04", "capabilities": ["resolve"], "discovery_method": "direct"}
+
+
+class TestDirectory:
+    """Sequence numbers, deltas and tombstones."""
+    
+    def test_delta_since_version(self):
+        d = Directory()
+        d.upsert("a.com", INFO)
+        d.upsert("b.com", dict(INFO, provider="b.com"))
+        full = d.changes()
+        assert full["full"] and full["version"] == 2
+        assert [e["provider"] for e in full["providers"]] == ["a.com", "b.com"]
+        assert "discovery_method" not in full["providers"][0]
+        
+        d.upsert("a.com", dict(INFO, capabilities=["resolve", "inbox"]))
+        d.remove("b.com")
+        delta = d.changes(2, d.directory_id)
+        assert not delta["full"]
+        assert [e["provider"] for e in delta["providers"]] == ["a.com"]
+        assert delta["removed"] == ["b.com"]
+        assert delta["version"] == 4
+        assert d.changes(4, d.directory_id)["providers"] == []
+    
+    def test_renewal_without_change_is_not_a_delta(self):
+        d = Directory()
+        d.upsert("a.com", INFO)
+        d.upsert("a.com", INFO)
+        assert d.version == 1
+    
+    def test_unknown_directory_or_evicted_tombstones_send_full_list(self):
+        d = Directory(max_tombstones=1)
+        for name in ("a.com", "b.com", "c.com"):
+            d.upsert(name, dict(INFO, provider=name))
+        assert d.changes(3, "other-seed")["full"]
+        d.remove("a.com")
+        d.remove("b.com")  # 淘汰 a.com 的删除记录
+        assert d.changes(3, d.directory_id)["full"]
+        assert not d.changes(4, d.directory_id)["full"]
+    
+    def test_paging(self):
+        d = Directory()
+        for i in range(5):
+            d.upsert(f"p{i}.com", dict(INFO, provider=f"p{i}.com"))
+        page = d.changes(limit=2)
+        assert page["more"] and page["version"] == 2
+        rest = d.changes(page["version"], d.directory_id, limit=10)
+        assert [e["provider"] for e in rest["providers"]] == ["p2.com", "p3.com", "p4.com"]
+        assert not rest["more"]
+    
+    def test_expiry(self):
+        d = Directory(entry_ttl=10)
+        d.upsert("a.com", INFO)
+        assert d.expire(now=0) == 0
+        assert d.expire(now=10 ** 9) == 1
+        assert d.changes(1, d.directory_id)["removed"] == ["a.com"]
+
+
+class TestSeedNodes:
+    """Providers announcing to two seed instances."""
+    
+    @pytest.fixture
+    def seeds(self, client):
+        verify = Router({"localhost": client})
+        seed_apps = {name: create_seed_app(transport=verify, admin_token="t") for name in ("seed1", "seed2")}
+        clients = {name: a.test_client() for name, a in seed_apps.items()}
+        return seed_apps, clients
+    
+    def test_announce_to_both_seeds(self, seeds):
+        seed_apps, clients = seeds
+        results = announce(["http://seed1", "http://seed2"], "localhost", transport=Router(clients))
+        assert results == {"http://seed1": True, "http://seed2": True}
+        
+        for name in ("seed1", "seed2"):
+            data = clients[name].get("/api/v1/directory").get_json()
+            entry, = data["providers"]
+            assert entry["provider"] == "localhost"
+            assert "inbox_batch" in entry["capabilities"]
+            assert "base_url" not in entry  # 与默认规则一致
+        
+        # 两个种子节点各有自己的 directory_id，增量不能跨节点使用
+        id1 = clients["seed1"].get("/api/v1/directory").get_json()["directory_id"]
+        assert clients["seed2"].get(f"/api/v1/directory?since=1&directory_id={id1}").get_json()["full"]
+    
+    def test_registration_requires_reachable_provider(self, seeds):
+        _, clients = seeds
+        class Impostor:
+            def request(self, method, url, body=None, headers=None):
+                return 200, b'{"provider": "localhost"}'
+        
+        r = create_seed_app(transport=Impostor()).test_client().post(
+            "/api/v1/directory/providers", json={"provider": "other.com"})
+        assert r.status_code == 400  # providers/info 报告的是 localhost
+        
+        # base_url 必须指向 provider 自己的域名，不能借别人的名字登记
+        for url in ("http://evil.example", "http://localhost@evil.example", "http://localhost.evil.example"):
+            r = clients["seed1"].post("/api/v1/directory/providers", json={"provider": "localhost", "base_url": url})
+            assert r.status_code == 400
+            assert "base_url host" in r.get_json()["error"]["message"]
+        
+        seed = create_seed_app(transport=Router({}))
+        r = seed.test_client().post("/api/v1/directory/providers", json={"provider": "gone.test"})
+        assert r.status_code == 502
+        assert r.get_json()["error"]["code"] == "PROVIDER_UNREACHABLE"
+    
+    def test_remove_requires_admin(self, seeds):
+        _, clients = seeds
+        announce(["http://seed1"], "localhost", transport=Router(clients))
+        assert clients["seed1"].delete("/api/v1/directory/providers/localhost").status_code == 403
+        r = clients["seed1"].delete("/api/v1/directory/providers/localhost", headers={"Authorization": "Bearer t"})
+        assert r.status_code == 200
+        assert clients["seed1"].get("/api/v1/directory?since=1&directory_id=x").get_json()["providers"] == []
@@ -0,0 +1,175 @@
+import gzip
+import json
+
+import pytest
+
+import app as provider
+from feed import FeedStore
+
+
+def auth_header(api_key):
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+def feed_post(author, content):
+    return {
+        "envelope": {
+            "from_addr": author,
+            "to_addr": "ai:feed~public#localhost",
+            "message_type": "public",
+        },
+        "payload": {"content": content},
+    }
+
+
+def post(client, author, api_key, content):
+    """Publish through the outbox with the author's API key."""
+    return client.post("/api/v1/outbox", json=feed_post(author, content), headers=auth_header(api_key))
+
+
+@pytest.fixture
+def feed(client, monkeypatch):
+    monkeypatch.setattr(provider, "feed_store", FeedStore(fanout_threshold=1))
+    return provider.feed_store
+
+
+class TestFeedStore:
+    """Hybrid fan-out timelines."""
+    
+    def publish(self, store, author, n):
+        return [store.publish(author, {"payload": {"content": i}})["seq"] for i in range(n)]
+    
+    def test_push_and_pull_merge(self):
+        store = FeedStore(fanout_threshold=1)
+        store.follow("reader", "small")
+        store.follow("reader", "big")
+        store.follow("other", "big")  # big 有 2 个粉丝 -> 读扩散
+        
+        seqs = []
+        for _ in range(3):
+            seqs += self.publish(store, "small", 1) + self.publish(store, "big", 1)
+        
+        assert "reader" in store.timelines and "big" in store.pull_posts
+        assert [e[0] for e in store.timeline("reader", limit=10)] == sorted(seqs, reverse=True)
+    
+    def test_pagination_cursor(self):
+        store = FeedStore()
+        store.follow("reader", "a")
+        seqs = self.publish(store, "a", 5)
+        
+        page1 = store.timeline("reader", limit=2)
+        page2 = store.timeline("reader", limit=2, before=page1[-1][0])
+        
+        assert [e[0] for e in page1 + page2] == seqs[::-1][:4]
+    
+    def test_unread_advances_cursor(self):
+        store = FeedStore()
+        store.follow("reader", "a")
+        seqs = self.publish(store, "a", 3)
+        
+        assert [e[0] for e in store.unread("reader", limit=2)] == seqs[:2]
+        assert [e[0] for e in store.unread("reader", limit=2)] == seqs[2:]
+        assert store.unread("reader") == []
+    
+    def test_unfollow_hides_pushed_posts(self):
+        store = FeedStore()
+        store.follow("reader", "a")
+        self.publish(store, "a", 2)
+        store.unfollow("reader", "a")
+        
+        assert store.timeline("reader") == []
+    
+    def test_timeline_trimmed(self):
+        store = FeedStore(timeline_max=10)
+        store.follow("reader", "a")
+        self.publish(store, "a", 25)
+        
+        assert len(store.timelines["reader"]) <= 20
+
+
+class TestFeedAPI:
+    """Feed endpoints."""
+    
+    def test_publish_and_read(self, client, register, feed):
+        author, author_key = register("ai:alice~main#localhost")
+        _, reader_key = register("ai:tom~novel#localhost")
+        
+        r = client.post("/api/v1/feed/follow", json={"address": author}, headers=auth_header(reader_key))
+        assert r.status_code == 200
+        for i in range(3):
+            assert post(client, author, author_key, f"post {i}").status_code == 201
+        
+        r = client.get("/api/v1/feed?limit=2", headers=auth_header(reader_key))
+        body = r.get_json()
+        assert [p["payload"]["content"] for p in body["posts"]] == ["post 2", "post 1"]
+        
+        r = client.get(f"/api/v1/feed?limit=2&cursor={body['next_cursor']}", headers=auth_header(reader_key))
+        assert [p["payload"]["content"] for p in r.get_json()["posts"]] == ["post 0"]
+    
+    def test_retried_publish_is_deduplicated(self, client, register, feed):
+        author, author_key = register("ai:alice~main#localhost")
+        headers = dict(auth_header(author_key), **{"X-Idempotency-Key": "k1"})
+        ids = [client.post("/api/v1/outbox", json=feed_post(author, "once"), headers=headers).get_json()["message_id"]
+               for _ in range(2)]
+        assert ids[0] == ids[1]
+        assert len(feed.posts[author]) == 1
+        # 同一个 key 换一个作者不算重复
+        other, other_key = register("ai:tom~novel#localhost")
+        r = client.post("/api/v1/outbox", json=feed_post(other, "mine"),
+                        headers=dict(auth_header(other_key), **{"X-Idempotency-Key": "k1"}))
+        assert r.get_json()["message_id"] != ids[0]
+
+    def test_compressed_outbox_body(self, client, register, feed):
+        author, author_key = register("ai:alice~main#localhost")
+        body = gzip.compress(json.dumps(feed_post(author, "zipped")).encode())
+        r = client.post("/api/v1/outbox", data=body, headers=dict(
+            auth_header(author_key), **{"Content-Type": "application/json", "Content-Encoding": "gzip"}))
+        assert r.status_code == 201
+        assert len(feed.posts[author]) == 1
+
+    def test_feed_address_resolves(self, client, feed):
+        r = client.get("/api/v1/resolve?address=ai:feed~public%23localhost")
+        
+        assert r.status_code == 200
+        assert r.get_json()["receive"]["inbox_url"].endswith("/api/v1/inbox/feed~public")
+    
+    def test_unregistered_author_rejected(self, client, feed):
+        r = client.post("/api/v1/inbox/feed~public", json=feed_post("ai:ghost~main#localhost", "boo"))
+        assert r.status_code == 404
+    
+    def test_anonymous_publish_rejected(self, client, register, feed):
+        author, _ = register("ai:alice~main#localhost")
+        r = client.post("/api/v1/inbox/feed~public", json=feed_post(author, "forged"))
+        
+        assert r.status_code == 401
+        assert r.get_json()["error"]["code"] == "AUTHENTICATION_REQUIRED"
+        assert not feed.posts
+    
+    def test_cannot_publish_as_another_agent(self, client, register, feed):
+        author, _ = register("ai:alice~main#localhost")
+        _, other_key = register("ai:tom~novel#localhost")
+        
+        assert post(client, author, other_key, "forged").status_code == 403
+        assert not feed.posts
+    
+    def test_follow_unknown_address(self, client, register, feed):
+        _, api_key = register()
+        r = client.post("/api/v1/feed/follow", json={"address": "ai:ghost~main#localhost"},
+                        headers=auth_header(api_key))
+        assert r.status_code == 404
+    
+    def test_following_list(self, client, register, feed):
+        author, _ = register("ai:alice~main#localhost")
+        _, api_key = register("ai:tom~novel#localhost")
+        client.post("/api/v1/feed/follow", json={"address": author}, headers=auth_header(api_key))
+        
+        r = client.get("/api/v1/feed/following", headers=auth_header(api_key))
+        assert r.get_json()["following"] == [author]
+        
+        client.delete("/api/v1/feed/follow", json={"address": author}, headers=auth_header(api_key))
+        r = client.get("/api/v1/feed/following", headers=auth_header(api_key))
+        assert r.get_json()["count"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
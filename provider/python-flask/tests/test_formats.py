@@ -0,0 +1,125 @@
+import pytest
+
+import formats
+from formats import CBOR, JSON, MSGPACK, FormatError
+
+BINARY = [
+    pytest.param(MSGPACK, marks=pytest.mark.skipif(formats.msgpack is None, reason="msgpack not installed")),
+    pytest.param(CBOR, marks=pytest.mark.skipif(formats.cbor2 is None, reason="cbor2 not installed")),
+]
+
+SAMPLE = {
+    "envelope": {"from_addr": "ai:amy~main#other.com", "to_addr": "ai:tom~novel#localhost",
+                 "content_type": "text/plain", "content_size": 3},
+    "payload": {"content": "你好, agent ✓", "metadata": {"n": [1, 2.5, -3, 2 ** 40], "ok": True, "none": None}},
+}
+
+
+def message(content="hi"):
+    return {"envelope": dict(SAMPLE["envelope"]), "payload": dict(SAMPLE["payload"], content=content)}
+
+
+@pytest.mark.parametrize("mimetype", BINARY)
+class TestCodec:
+    """Binary encodings carry exactly the JSON data model."""
+
+    def test_round_trip(self, mimetype):
+        assert formats.decode(formats.encode(SAMPLE, mimetype), mimetype) == SAMPLE
+
+    def test_rejects_non_json_values(self, mimetype):
+        with pytest.raises(FormatError):
+            formats.decode(formats.encode({"payload": b"\x00raw"}, mimetype), mimetype)
+        with pytest.raises(FormatError):
+            formats.decode(formats.encode({1: "int key"}, mimetype), mimetype)
+
+    def test_rejects_corrupt_body(self, mimetype):
+        with pytest.raises(FormatError):
+            formats.decode(formats.encode(SAMPLE, mimetype)[:-3], mimetype)
+
+
+@pytest.mark.skipif(formats.cbor2 is None, reason="cbor2 not installed")
+class TestIntegerRange:
+    """CBOR bignums outside int64 / uint64 are format errors, not server errors."""
+
+    @pytest.mark.parametrize("n", [2 ** 64 - 1, -2 ** 63])
+    def test_64_bit_limits_accepted(self, n):
+        assert formats.decode(formats.encode({"n": [n]}, CBOR), CBOR) == {"n": [n]}
+
+    @pytest.mark.parametrize("n", [2 ** 64, -2 ** 63 - 1, 2 ** 70])
+    def test_wider_rejected(self, n):
+        with pytest.raises(FormatError):
+            formats.decode(formats.encode({"n": [n]}, CBOR), CBOR)
+
+    def test_request_rejected_with_400(self, client, register):
+        _, api_key = register()
+        body = message("big")
+        body["payload"]["metadata"] = {"n": 2 ** 70}
+        r = client.post("/api/v1/inbox/tom~novel", data=formats.encode(body, CBOR), headers={"Content-Type": CBOR})
+        assert r.status_code == 400
+        inbox = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"}).get_json()
+        assert inbox["messages"] == []
+
+
+@pytest.mark.parametrize("mimetype", BINARY)
+class TestNonFiniteFloats:
+    """NaN and infinities are not JSON numbers and are rejected like out-of-range integers."""
+
+    @pytest.mark.parametrize("x", [float("nan"), float("inf"), float("-inf")])
+    def test_rejected(self, mimetype, x):
+        with pytest.raises(FormatError):
+            formats.decode(formats.encode({"n": [x]}, mimetype), mimetype)
+
+    def test_request_rejected_with_400(self, client, register, mimetype):
+        _, api_key = register()
+        body = message("nan")
+        body["payload"]["metadata"] = {"x": float("nan")}
+        r = client.post("/api/v1/inbox/tom~novel", data=formats.encode(body, mimetype), headers={"Content-Type": mimetype})
+        assert r.status_code == 400
+        inbox = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"}).get_json()
+        assert inbox["messages"] == []
+
+
+@pytest.mark.parametrize("mimetype", BINARY)
+class TestNegotiation:
+    """Content-Type / Accept on the inbox endpoints."""
+
+    def test_send_and_fetch_equal_json(self, client, register, mimetype):
+        _, api_key = register()
+        auth = {"Authorization": f"Bearer {api_key}"}
+        r = client.post("/api/v1/inbox/tom~novel", data=formats.encode(message("binary"), mimetype),
+                        headers={"Content-Type": mimetype, "Accept": mimetype})
+        assert r.status_code == 201
+        assert r.mimetype == mimetype
+        assert formats.decode(r.data, mimetype)["success"] is True
+        client.post("/api/v1/inbox/tom~novel", json=message("json"))
+
+        as_json = client.get("/api/v1/inbox", headers=auth)
+        as_binary = client.get("/api/v1/inbox", headers=dict(auth, Accept=f"{mimetype}, {JSON};q=0.5"))
+        assert as_json.mimetype == JSON
+        assert as_binary.mimetype == mimetype
+        assert "Accept" in as_binary.headers["Vary"]
+        assert formats.decode(as_binary.data, mimetype) == as_json.get_json()
+        assert [m["payload"]["content"] for m in as_json.get_json()["messages"]] == ["binary", "json"]
+        assert len(as_binary.data) < len(as_json.data)
+
+    def test_json_unless_binary_preferred(self, client, mimetype):
+        for accept in ("*/*", f"{JSON}, {mimetype}", ""):
+            r = client.get("/health", headers={"Accept": accept} if accept else {})
+            assert r.mimetype == JSON
+
+    def test_batch(self, client, register, mimetype):
+        register()
+        body = formats.encode({"messages": [message("a"), message("b")]}, mimetype)
+        r = client.post("/api/v1/inbox:batch", data=body, headers={"Content-Type": mimetype})
+        assert [result["status"] for result in r.get_json()["results"]] == [201, 201]
+
+    def test_invalid_body(self, client, register, mimetype):
+        register()
+        body = formats.encode({"envelope": {"from_addr": b"bytes"}, "payload": {}}, mimetype)
+        r = client.post("/api/v1/inbox/tom~novel", data=body, headers={"Content-Type": mimetype})
+        assert r.status_code == 400
+
+    def test_advertised(self, client, mimetype):
+        info = client.get("/api/v1/providers/info").get_json()
+        assert "binary_formats" in info["capabilities"]
+        assert info["content_types"][0] == JSON and mimetype in info["content_types"]
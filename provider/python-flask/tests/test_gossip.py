@@ -0,0 +1,233 @@
+import random
+import urllib.parse
+
+import pytest
+
+import app as provider
+import codec
+from gossip import Gossip, MerkleTree
+from relay import RelayError
+
+
+class Mesh:
+    """Transport delivering POST /api/v1/gossip straight to in-process Gossip nodes."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.down = set()
+
+    def add(self, name, peers=(), **kwargs):
+        node = Gossip(name, f"http://{name}", {"capabilities": ["resolve"]}, peers, transport=self, **kwargs)
+        self.nodes[name] = node
+        return node
+
+    def request(self, method, url, body=None, headers=None):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.nodes or host in self.down:
+            raise RelayError(f"{method} {url}: connection refused")
+        return 200, codec.dumps(self.nodes[host].handle(codec.loads(body)))
+
+
+def names(node):
+    return [e["provider"] for e in node.alive()]
+
+
+class TestMerkleTree:
+    """Incremental hashes over member digests."""
+
+    def test_same_members_same_root_regardless_of_order(self):
+        a, b = MerkleTree(), MerkleTree()
+        members = [(f"p{i}.com", f"p{i}.com:1:alive") for i in range(50)]
+        for p, d in members:
+            a.update(p, d)
+        for p, d in reversed(members):
+            b.update(p, d)
+        assert a.hash() == b.hash() != ""
+
+        b.update("p7.com", "p7.com:2:alive")
+        assert a.hash() != b.hash()
+        leaf = a.leaf_of("p7.com")
+        differing = [p for p, h in b.children("").items() if a.hash(p) != h]
+        assert differing == [leaf[0]]
+        assert MerkleTree().hash() == ""
+
+
+class TestGossip:
+    """Membership merge and anti-entropy sync."""
+
+    def test_newer_incarnation_wins(self):
+        node = Gossip("a.com", transport=Mesh())
+        assert node.merge([{"provider": "b.com", "incarnation": 2, "status": "alive"}]) == 1
+        assert node.merge([{"provider": "b.com", "incarnation": 1, "status": "left"}]) == 0
+        assert node.merge([{"provider": "b.com", "incarnation": 3, "status": "left"}]) == 1
+        assert names(node) == ["a.com"]
+        assert node.merge([{"provider": "c.com", "incarnation": "x"}, "junk"]) == 0
+        # 超出 63 位或远在未来的 incarnation 会把成员钉死，一律忽略
+        for incarnation in (-1, 2 ** 62, 2 ** 63, 2 ** 70):
+            assert node.merge([{"provider": "b.com", "incarnation": incarnation, "status": "alive"}]) == 0
+        assert node.members["b.com"]["incarnation"] == 3
+
+    def test_entries_adopted_only_from_their_provider(self):
+        node = Gossip("a.com", transport=Mesh())
+        entries = [
+            {"provider": "b.com", "incarnation": 2, "status": "alive"},
+            {"provider": "c.com", "incarnation": 7, "status": "alive", "base_url": "https://evil.example"},
+            {"provider": "a.com", "incarnation": 2 ** 40, "status": "left"},
+        ]
+        assert node.receive(entries) == 0
+        assert node.receive(entries, "b.com") == 1
+        assert names(node) == ["a.com", "b.com"]
+        assert dict(node.candidates) == {"c.com": 7}
+        assert node.self_entry["status"] == "alive"
+
+        # 自己的条目也不能把地址指到别的主机
+        assert node.receive([{"provider": "c.com", "incarnation": 8, "base_url": "https://evil.example"}], "c.com") == 0
+        assert node.receive([{"provider": "c.com", "incarnation": 8, "base_url": "https://c.com/aap"}], "c.com") == 1
+        assert not node.candidates
+
+        small = Gossip("a.com", transport=Mesh(), max_candidates=2)
+        small.receive([{"provider": f"p{i}.com", "incarnation": 1} for i in range(5)])
+        assert list(small.candidates) == ["p0.com", "p1.com"]
+
+    def test_stale_self_entry_is_superseded(self):
+        node = Gossip("a.com", transport=Mesh())
+        current = node.self_entry["incarnation"]
+        node.merge([dict(node.self_entry)])  # 对方回传我们自己的条目
+        assert node.self_entry["incarnation"] == current
+
+        ahead = current + 10 ** 6
+        node.merge([{"provider": "a.com", "incarnation": ahead, "status": "left"}])
+        assert node.self_entry["incarnation"] > ahead
+        assert node.self_entry["status"] == "alive"
+
+    def test_sync_reconciles_both_sides(self):
+        mesh = Mesh()
+        a = mesh.add("a.com")
+        b = mesh.add("b.com")
+        a.merge([mesh.add(f"x{i}.com").self_entry for i in range(10)])
+        b.merge([mesh.add(f"y{i}.com").self_entry for i in range(10)])
+        a.sync_with("b.com")
+        # 第三方条目只是候选，各自核实后两边一致
+        assert "y0.com" not in names(a) and "b.com" in names(a)
+        assert sorted(a.candidates) == [f"y{i}.com" for i in range(10)]
+        assert sorted(b.candidates) == ["a.com"] + [f"x{i}.com" for i in range(10)]
+        a.verify_candidates(limit=20)
+        b.verify_candidates(limit=20)
+        assert names(a) == names(b)
+        assert len(names(a)) == 22
+        assert a.tree.hash() == b.tree.hash()
+
+    def test_in_sync_peers_exchange_one_round(self):
+        mesh = Mesh()
+        a = mesh.add("a.com")
+        b = mesh.add("b.com")
+        entries = [{"provider": f"p{i}.com", "incarnation": 1, "status": "alive"} for i in range(500)]
+        for node in (a, b):
+            node.merge(entries + [a.self_entry, b.self_entry])
+        rounds = a.stats["rounds"]
+        a.sync_with("b.com")
+        assert a.stats["rounds"] == rounds + 1
+
+        # 只有一个条目不同时，只传输那片叶子，而不是全部 500 个条目
+        b.merge([{"provider": "p42.com", "incarnation": 2, "status": "alive"}])
+        a.stats.update(rounds=0, entries_received=0)
+        a.sync_with("b.com")
+        assert a.candidates["p42.com"] == 2
+        assert a.members["p42.com"]["incarnation"] == 1
+        assert a.stats["entries_received"] < 10
+
+    def test_cluster_converges_from_a_single_seed(self):
+        random.seed(1)
+        mesh = Mesh()
+        nodes = [mesh.add("n0.com")] + [mesh.add(f"n{i}.com", peers=["n0.com"]) for i in range(1, 40)]
+        for _ in range(20):
+            for node in nodes:
+                node.gossip_once()
+            if len({node.tree.hash() for node in nodes}) == 1:
+                break
+        assert all(len(names(node)) == 40 for node in nodes)
+        assert len({node.tree.hash() for node in nodes}) == 1
+
+        # 收敛后每次同步只比较一次根哈希，自己的条目不会因为被回传而变化
+        incarnations = [node.self_entry["incarnation"] for node in nodes]
+        rounds = sum(node.stats["rounds"] for node in nodes)
+        for node in nodes:
+            node.gossip_once()
+        assert sum(node.stats["rounds"] for node in nodes) == rounds + 80
+        assert [node.self_entry["incarnation"] for node in nodes] == incarnations
+
+    def test_unreachable_member_becomes_suspect(self):
+        mesh = Mesh()
+        a = mesh.add("a.com", fanout=1, suspect_after=2)
+        mesh.add("b.com")
+        a.sync_with("b.com")
+        mesh.down.add("b.com")
+        a.gossip_once()
+        a.gossip_once()
+        assert names(a) == ["a.com"]
+        with pytest.raises(RelayError):
+            a.sync_with("b.com")
+
+        mesh.down.clear()
+        a.sync_with("b.com")
+        assert names(a) == ["a.com", "b.com"]
+
+    def test_leave_is_gossiped(self):
+        mesh = Mesh()
+        a = mesh.add("a.com")
+        b = mesh.add("b.com", peers=["a.com"])
+        b.gossip_once()
+        assert list(a.candidates) == ["b.com"]
+        a.gossip_once()
+        assert names(a) == ["a.com", "b.com"]
+        b.leave()
+        a.gossip_once()
+        assert names(a) == ["a.com"]
+
+    def test_unencodable_response_counts_as_failure(self):
+        class Broken(Mesh):
+            def request(self, method, url, body=None, headers=None):
+                raise TypeError("Integer exceeds 64-bit range")
+
+        a = Gossip("a.com", transport=Broken(), peers=["b.com"])
+        assert a.gossip_once() == 0
+        assert a.failures == {"b.com": 1}
+
+
+class TestGossipEndpoints:
+    """HTTP surface in app.py."""
+
+    @pytest.fixture
+    def node(self, monkeypatch):
+        node = Gossip("localhost", None, {"capabilities": ["resolve"]}, transport=Mesh())
+        node.merge([{"provider": "b.com", "incarnation": 5, "status": "alive", "base_url": "http://10.0.0.2"}])
+        monkeypatch.setattr(provider, "gossip", node)
+        return node
+
+    def test_disabled_by_default(self, client):
+        assert client.post("/api/v1/gossip", json={}).get_json()["error"]["code"] == "GOSSIP_DISABLED"
+        assert client.get("/api/v1/directory").status_code == 404
+        assert "gossip" not in client.get("/api/v1/providers/info").get_json()["capabilities"]
+
+    def test_exchange_and_members(self, client, node):
+        r = client.post("/api/v1/gossip", json={
+            "nodes": {"": "0" * 40},
+            "entries": [{"provider": "c.com", "incarnation": 1, "status": "alive"},
+                        {"provider": "b.com", "incarnation": 2 ** 62, "base_url": "http://evil.example"},
+                        {"provider": "b.com", "incarnation": 2 ** 70, "status": "left"}]
+        })
+        assert r.status_code == 200
+        assert len(r.get_json()["nodes"]) == 16
+        # 匿名请求里的条目一律不直接采纳：c.com 等待核实，b.com 不被改写
+        members = client.get("/api/v1/gossip/members").get_json()
+        assert [m["provider"] for m in members["members"]] == ["b.com", "localhost"]
+        assert dict(node.candidates) == {"c.com": 1}
+        assert node.members["b.com"]["incarnation"] == 5
+        assert client.post("/api/v1/gossip", data="[]", content_type="application/json").status_code == 400
+        assert "gossip" in client.get("/api/v1/providers/info").get_json()["capabilities"]
+
+    def test_directory_format(self, client, node):
+        data = client.get("/api/v1/directory").get_json()
+        assert data["full"] and not data["more"]
+        entry = next(e for e in data["providers"] if e["provider"] == "b.com")
+        assert entry == {"provider": "b.com", "base_url": "http://10.0.0.2", "discovery_method": "gossip"}
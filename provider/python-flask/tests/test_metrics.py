@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import app as provider
+from metrics import Metrics
+
+
+class TestMetricsRegistry:
+    """Sharded counters and exposition format."""
+    
+    def test_counts_from_many_threads(self):
+        m = Metrics()
+        m.counter("c_total", "test", ("kind",))
+        
+        def work():
+            for _ in range(1000):
+                m.inc("c_total", "a")
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert m.value("c_total", "a") == 8000
+        assert 'c_total{kind="a"} 8000' in m.render()
+    
+    def test_histogram_buckets(self):
+        m = Metrics()
+        m.histogram("h_seconds", "test", buckets=(0.1, 1.0))
+        for v in (0.05, 0.1, 0.5, 5.0):
+            m.observe("h_seconds", v)
+        
+        text = m.render()
+        assert 'h_seconds_bucket{le="0.1"} 2' in text
+        assert 'h_seconds_bucket{le="1.0"} 3' in text
+        assert 'h_seconds_bucket{le="+Inf"} 4' in text
+        assert "h_seconds_count 4" in text
+    
+    def test_label_escaping(self):
+        m = Metrics()
+        m.counter("c_total", "test", ("route",))
+        m.inc("c_total", 'a"b')
+        
+        assert 'c_total{route="a\\"b"} 1' in m.render()
+
+
+class TestMetricsEndpoint:
+    """Provider instrumentation."""
+    
+    def test_request_and_error_counters(self, client):
+        before = provider.metrics.value("aap_errors_total", "ADDRESS_NOT_FOUND")
+        client.get("/api/v1/resolve?address=ai:nobody~x%23localhost")
+        
+        assert provider.metrics.value("aap_errors_total", "ADDRESS_NOT_FOUND") == before + 1
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'aap_http_requests_total{route="/api/v1/resolve",method="GET",status="404"}' in text
+        assert 'aap_http_request_duration_seconds_bucket{route="/api/v1/resolve",method="GET",le="+Inf"}' in text
+    
+    def test_message_and_idempotency_counters(self, client, register):
+        register()
+        stored = provider.metrics.value("aap_messages_stored_total")
+        dups = provider.metrics.value("aap_idempotency_duplicates_total")
+        body = {
+            "envelope": {"from_addr": "ai:amy~main#other.com", "to_addr": "ai:tom~novel#localhost"},
+            "payload": {"content": "hi"},
+        }
+        for _ in range(2):
+            client.post("/api/v1/inbox/tom~novel", json=body, headers={"X-Idempotency-Key": "k1"})
+        
+        assert provider.metrics.value("aap_messages_stored_total") == stored + 1
+        assert provider.metrics.value("aap_idempotency_duplicates_total") == dups + 1
+        assert 'aap_inbox_depth_bucket{le="1"} 1' in client.get("/metrics").get_data(as_text=True)
+    
+    def test_auth_failures(self, client):
+        before = provider.metrics.value("aap_auth_failures_total", "invalid")
+        client.get("/api/v1/inbox", headers={"Authorization": "Bearer nope"})
+        
+        assert provider.metrics.value("aap_auth_failures_total", "invalid") == before + 1
+    
+    def test_metrics_token(self, client, monkeypatch):
+        monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+        
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,173 @@
+import io
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import app as provider
+import codec
+import migrate
+from migrate import MigrationError
+
+ADMIN = {"Authorization": "Bearer admin-secret"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+
+
+def message(content, to="ai:tom~novel#localhost", reply_to=None):
+    envelope = {"from_addr": "ai:amy~main#other.com", "to_addr": to, "content_type": "text/plain"}
+    if reply_to:
+        envelope["reply_to"] = reply_to
+    return {"envelope": envelope, "payload": {"content": content}}
+
+
+@pytest.fixture
+def populated(client, register):
+    """Two agents, a thread and an idempotent message; returns the api keys."""
+    _, tom = register()
+    _, amy = register("ai:amy~main#localhost")
+    root = client.post("/api/v1/inbox/tom~novel", json=message("root")).get_json()["message_id"]
+    client.post("/api/v1/inbox/tom~novel", json=message("reply", reply_to=root))
+    client.post("/api/v1/inbox/tom~novel", json=message("once"), headers={"X-Idempotency-Key": "k1"})
+    client.post("/api/v1/inbox/amy~main", json=message("hi amy", to="ai:amy~main#localhost"))
+    return {"tom": tom, "amy": amy, "root": root}
+
+
+def inbox(client, api_key):
+    return client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"}).get_json()["messages"]
+
+
+def lines(data):
+    return [codec.loads(line) for line in data.splitlines()]
+
+
+class TestExport:
+    """GET /api/v1/admin/export."""
+
+    def test_stream(self, client, populated):
+        r = client.get("/api/v1/admin/export", headers=ADMIN)
+        assert r.status_code == 200
+        assert r.mimetype == "application/x-ndjson"
+        items = lines(r.data)
+        assert items[0]["type"] == "header" and items[0]["domain"] == "localhost"
+        assert items[-1] == {"type": "end", "counts": {"agents": 2, "keys": 2, "messages": 4}}
+        keys = [i["key"] for i in items if i["type"] == "key"]
+        assert all("key_hash" in k and "api_key" not in k for k in keys)
+        once = [i for i in items if i["type"] == "message" and i["message"]["payload"]["content"] == "once"]
+        assert once[0]["idempotency_key"] == "k1"
+
+    def test_requires_admin(self, client):
+        assert client.get("/api/v1/admin/export").status_code == 403
+        assert client.post("/api/v1/admin/import", data=b"").status_code == 403
+
+    def test_invalid_cursor(self, client):
+        for cursor in ("bogus", "agents", "messages:1", "messages:-1:0", "agents:x"):
+            r = client.get("/api/v1/admin/export", query_string={"cursor": cursor}, headers=ADMIN)
+            assert r.status_code == 400
+
+    def test_resume_from_checkpoint(self, client, populated):
+        db = provider.db
+        full = b"".join(migrate.export_lines(db, "localhost", checkpoint_lines=1))
+        items = lines(full)
+        checkpoints = [i for i, item in enumerate(items) if item["type"] == "checkpoint"]
+        for position in checkpoints:
+            cursor = items[position]["cursor"]
+            resumed = lines(b"".join(migrate.export_lines(db, "localhost", cursor, checkpoint_lines=1)))
+            assert resumed[0]["cursor"] == cursor
+            # 续传的部分与完整导出的剩余部分相同 (end 行只统计本次导出的条数)
+            assert resumed[1:-1] == items[position + 1:-1]
+
+
+class TestImport:
+    """POST /api/v1/admin/import."""
+
+    def test_round_trip(self, client, populated, monkeypatch):
+        export = client.get("/api/v1/admin/export", headers=ADMIN).data
+        before = {name: inbox(client, populated[name]) for name in ("tom", "amy")}
+
+        monkeypatch.setattr(provider, "db", provider.InMemoryDB())
+        provider.auth_cache.clear()
+        headers = dict(ADMIN, **{"Content-Type": "application/x-ndjson"})
+        r = client.post("/api/v1/admin/import", data=export, headers=headers)
+        assert r.status_code == 200
+        stats = r.get_json()
+        assert (stats["agents"], stats["keys"], stats["messages"], stats["skipped"]) == (2, 2, 4, 0)
+        assert stats["cursor"] == "messages:0:0"
+
+        # 原来的 API Key 仍然有效，消息的 id / received_at 不变
+        assert {name: inbox(client, populated[name]) for name in ("tom", "amy")} == before
+        auth = {"Authorization": f"Bearer {populated['tom']}"}
+        thread = client.get(f"/api/v1/threads/{populated['root']}", headers=auth).get_json()
+        assert [m["payload"]["content"] for m in thread["messages"]] == ["root", "reply"]
+        dup = client.post("/api/v1/inbox/tom~novel", json=message("once"), headers={"X-Idempotency-Key": "k1"})
+        assert dup.get_json()["message_id"] == before["tom"][2]["id"]
+        assert client.get("/api/v1/resolve", query_string={"address": "ai:amy~main#localhost"}).status_code == 200
+
+    def test_replay_is_idempotent(self, client, populated):
+        export = client.get("/api/v1/admin/export", headers=ADMIN).data
+        stats = client.post("/api/v1/admin/import", data=export, headers=ADMIN).get_json()
+        assert (stats["agents"], stats["keys"], stats["messages"], stats["skipped"]) == (0, 0, 0, 8)
+        assert len(inbox(client, populated["tom"])) == 3
+
+    def test_malformed_line(self, client, register, monkeypatch):
+        register()
+        export = client.get("/api/v1/admin/export", headers=ADMIN).data
+        monkeypatch.setattr(provider, "db", provider.InMemoryDB())
+        body = export.replace(b'{"type":"end"', b'{"type":"message","owner_role":"x","message":{}}\n{"type":"end"')
+        r = client.post("/api/v1/admin/import", data=body, headers=ADMIN)
+        assert r.status_code == 400
+        assert "line 6" in r.get_json()["error"]["message"]
+        assert "ai:tom~novel#localhost" in provider.db.agents
+
+    def test_rejects_other_formats(self):
+        with pytest.raises(MigrationError):
+            migrate.import_lines(provider.InMemoryDB(), [b'{"type":"header","format":"other","version":1}'])
+        with pytest.raises(MigrationError):
+            migrate.import_lines(provider.InMemoryDB(), [b'["not", "an", "object"]'])
+
+    def test_iter_lines_blocks(self):
+        data = b'{"a":1}\n{"b":2}\n\n{"c":3}'
+        assert list(migrate.iter_lines(io.BytesIO(data), chunk_size=3)) == [b'{"a":1}', b'{"b":2}', b"", b'{"c":3}']
+        with pytest.raises(MigrationError):
+            list(migrate.iter_lines(io.BytesIO(b"x" * 100), chunk_size=10, max_line=50))
+
+
+class TestCommandLine:
+    """python migrate.py export / import against a running provider."""
+
+    @pytest.fixture
+    def server(self, client):
+        server = make_server("127.0.0.1", 0, provider.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+
+    def test_export_then_import(self, server, populated, tmp_path, monkeypatch):
+        path = str(tmp_path / "dump.ndjson")
+        migrate.main(["export", server, path, "--token", "admin-secret"])
+        before = inbox(provider.app.test_client(), populated["tom"])
+
+        monkeypatch.setattr(provider, "db", provider.InMemoryDB())
+        provider.auth_cache.clear()
+        migrate.main(["import", server, path, "--token", "admin-secret", "--chunk-lines", "3"])
+        assert inbox(provider.app.test_client(), populated["tom"]) == before
+        with open(path + ".progress") as f:
+            assert int(f.read()) == len(open(path, "rb").read())
+
+    def test_resume_export(self, server, populated, tmp_path):
+        path = str(tmp_path / "dump.ndjson")
+        migrate.main(["export", server, path, "--token", "admin-secret"])
+        complete = open(path, "rb").read()
+        # 模拟在 key 段之后中断：截掉第一条消息之后的内容
+        cut = complete.index(b'{"type":"message"') + 10
+        with open(path, "wb") as f:
+            f.write(complete[:cut])
+        migrate.main(["export", server, path, "--token", "admin-secret", "--resume"])
+        resumed = lines(open(path, "rb").read())
+        expected = lines(complete)
+        assert [i for i in resumed if i["type"] != "end"] == [i for i in expected if i["type"] != "end"]
+        assert resumed[-1]["type"] == "end"
@@ -0,0 +1,115 @@
+import tracemalloc
+
+import pytest
+
+import app as provider
+from profiling import RequestProfiler
+
+ADMIN = {"Authorization": "Bearer admin-secret"}
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "admin-secret")
+    p = RequestProfiler(0.0, provider.PROFILE_ROUTES)
+    monkeypatch.setattr(provider, "profiler", p)
+    return p
+
+
+class TestRequestProfiler:
+    """Sampling, stack aggregation and allocation snapshots."""
+    
+    def test_records_stacks_and_allocations(self):
+        p = RequestProfiler(1.0, ("/x",))
+        
+        def allocate():
+            return [bytearray(1000) for _ in range(100)]
+        
+        recorder = p.start()
+        kept = allocate()
+        p.stop(recorder, "/x")
+        
+        collapsed = p.collapsed()
+        assert "allocate (test_profiling.py" in collapsed
+        line = next(l for l in collapsed.splitlines() if "allocate" in l)
+        assert int(line.rsplit(" ", 1)[1]) >= 0
+        summary = p.summary()
+        assert summary["sampled_requests"] == {"/x": 1}
+        assert sum(a["size"] for a in summary["allocations"]) >= 100 * 1000
+        assert kept
+    
+    def test_only_one_request_at_a_time(self):
+        p = RequestProfiler(1.0, ("/x",))
+        recorder = p.start()
+        assert p.start() is None
+        p.stop(recorder, "/x")
+        
+        recorder = p.start()
+        assert recorder is not None
+        p.stop(recorder, "/x")
+    
+    def test_external_tracing_left_running(self):
+        p = RequestProfiler(1.0, ("/x",))
+        tracemalloc.start()
+        try:
+            recorder = p.start()
+            kept = [bytearray(1000) for _ in range(100)]
+            p.stop(recorder, "/x")
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+        summary = p.summary()
+        assert summary["sampled_requests"] == {"/x": 1}
+        assert summary["allocations"] == []
+        assert kept
+    
+    def test_sampling_respects_routes_and_rate(self):
+        p = RequestProfiler(1.0, ("/api/v1/resolve",))
+        assert p.wants("/api/v1/resolve")
+        assert not p.wants("/health")
+        assert p.wants("/health", force=True)
+        p.sample_rate = 0
+        assert not p.wants("/api/v1/resolve")
+
+
+class TestProfileEndpoints:
+    """Admin endpoints and request sampling in the provider."""
+    
+    def test_admin_token_required(self, client, profiler):
+        assert client.get("/api/v1/admin/profile").status_code == 403
+        assert client.get("/api/v1/admin/profile", headers={"Authorization": "Bearer nope"}).status_code == 403
+    
+    def test_disabled_without_admin_token(self, client, monkeypatch):
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        r = client.get("/api/v1/admin/profile", headers=ADMIN)
+        assert r.status_code == 403
+    
+    def test_sampled_resolve_shows_in_flamegraph(self, client, register, profiler):
+        addr, _ = register()
+        r = client.post("/api/v1/admin/profile", headers=ADMIN, json={"sample_rate": 1.0})
+        assert r.get_json()["sample_rate"] == 1.0
+        
+        client.get("/api/v1/resolve", query_string={"address": addr})
+        client.get("/health")
+        
+        summary = client.get("/api/v1/admin/profile", headers=ADMIN).get_json()
+        assert summary["sampled_requests"] == {"/api/v1/resolve": 1}
+        flame = client.get("/api/v1/admin/profile/flamegraph", headers=ADMIN)
+        assert flame.mimetype == "text/plain"
+        assert "resolve (app.py" in flame.get_data(as_text=True)
+    
+    def test_header_forces_profile(self, client, profiler):
+        client.get("/health", headers={"X-AAP-Profile": "admin-secret"})
+        client.get("/health", headers={"X-AAP-Profile": "wrong"})
+        
+        assert profiler.summary()["sampled_requests"] == {"/health": 1}
+    
+    def test_reset(self, client, profiler):
+        client.get("/health", headers={"X-AAP-Profile": "admin-secret"})
+        assert client.delete("/api/v1/admin/profile", headers=ADMIN).status_code == 204
+        assert profiler.summary()["sampled_requests"] == {}
+        assert profiler.collapsed() == ""
+    
+    def test_invalid_sample_rate(self, client, profiler):
+        r = client.post("/api/v1/admin/profile", headers=ADMIN, json={"sample_rate": 2})
+        assert r.status_code == 400
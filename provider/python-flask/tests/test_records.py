@@ -0,0 +1,223 @@
+import json
+
+import pytest
+
+import app as provider
+import codec
+import records
+from records import Inbox, MessageRecord
+
+
+def envelope(**extra):
+    env = {
+        "from_addr": "ai:amy~main#other.com",
+        "to_addr": "ai:tom~novel#localhost",
+        "message_type": "private",
+        "content_type": "text/plain",
+        "timestamp": "2026-01-02T03:04:05.123456Z",
+    }
+    env.update(extra)
+    return env
+
+
+class TestMessageRecord:
+    """Compact records convert back to the original message shape."""
+    
+    def test_round_trip(self):
+        env = envelope(reply_to="m-1", content_hash="sha256:" + "a" * 64, content_size=10)
+        payload = {"content": "你好", "metadata": {"lang": "zh"}}
+        record = MessageRecord.create(env, payload)
+        
+        d = record.to_dict()
+        assert d["envelope"] == env
+        assert d["payload"] == payload
+        assert d["received_at"].endswith("Z")
+        assert len(d["id"]) == 36
+        assert json.loads(record.encode()) == d
+    
+    def test_compacts_fields(self):
+        record = MessageRecord.create(envelope(), {"content": "hi"})
+        
+        assert type(record.message_type) is int
+        assert type(record.timestamp) is int
+        assert type(record.payload) is bytes
+    
+    def test_addresses_are_shared(self):
+        a = MessageRecord.create(codec.loads(codec.dumps(envelope())), {})
+        b = MessageRecord.create(codec.loads(codec.dumps(envelope())), {})
+        assert a.from_addr is b.from_addr
+        assert a.content_type is b.content_type
+    
+    def test_non_canonical_timestamp_kept_verbatim(self):
+        for ts in ("2026-01-02T03:04:05+00:00", "2026-01-02T03:04:05.100Z", "yesterday", 1700000000):
+            record = MessageRecord.create(envelope(timestamp=ts), {})
+            assert record.to_dict()["envelope"]["timestamp"] == ts
+    
+    def test_unknown_fields_and_types(self):
+        env = envelope(message_type="receipt", signature="sig", version="0.04")
+        record = MessageRecord.create(env, {})
+        assert record.to_dict()["envelope"] == env
+        assert record.message_type == "receipt"
+        assert records.MESSAGE_TYPES == ("private", "public")  # 表不随收到的类型增长
+        
+        odd = envelope(message_type=5)
+        assert MessageRecord.create(odd, {}).to_dict()["envelope"] == odd
+    
+    def test_inbox(self):
+        inbox = Inbox()
+        inbox.records.append(MessageRecord.create(envelope(), {}))
+        assert len(inbox) == 1
+
+
+class TestInboxStorage:
+    """InMemoryDB stores records and serves them as JSON."""
+    
+    def test_inbox_returns_original_envelope(self, client, register):
+        _, api_key = register()
+        env = envelope(to_addr="ai:tom~novel#localhost")
+        r = client.post("/api/v1/inbox/tom~novel", json={"envelope": env, "payload": {"content": "x"}})
+        message_id = r.get_json()["message_id"]
+        
+        inbox = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"}).get_json()
+        
+        assert inbox["messages"][0]["id"] == message_id
+        assert inbox["messages"][0]["envelope"] == env
+        assert inbox["messages"][0]["payload"] == {"content": "x"}
+    
+    def test_idempotent_returns_same_record(self, client, register):
+        register()
+        body = {"envelope": envelope(to_addr="ai:tom~novel#localhost"), "payload": {}}
+        headers = {"X-Idempotency-Key": "k1"}
+        first = client.post("/api/v1/inbox/tom~novel", json=body, headers=headers).get_json()
+        second = client.post("/api/v1/inbox/tom~novel", json=body, headers=headers).get_json()
+        assert first["message_id"] == second["message_id"]
+
+
+def add(inbox, from_addr="ai:amy~main#other.com", content="hello", **env):
+    record = MessageRecord.create(envelope(from_addr=from_addr, **env), {"content": content})
+    inbox.add(record, content)
+    return record
+
+
+class TestInboxIndex:
+    """Secondary indexes and filtered queries."""
+    
+    def test_unfiltered_matches_tail(self):
+        inbox = Inbox()
+        added = [add(inbox) for _ in range(5)]
+        records, cursor = inbox.query(limit=3)
+        assert records == added[-3:]
+        assert cursor == 2
+        records, cursor = inbox.query(limit=3, before=cursor)
+        assert records == added[:2]
+        assert cursor is None
+    
+    def test_combined_filters(self):
+        inbox = Inbox()
+        a1 = add(inbox, reply_to="m-1")
+        add(inbox, from_addr="ai:bob~main#other.com", reply_to="m-1")
+        a2 = add(inbox, content_type="text/markdown")
+        a3 = add(inbox, reply_to="m-1")
+        
+        assert inbox.query(from_addr="ai:amy~main#other.com", reply_to="m-1")[0] == [a1, a3]
+        assert inbox.query(content_type="text/markdown")[0] == [a2]
+        assert inbox.query(message_type="private", limit=2)[0] == [a2, a3]
+        assert inbox.query(message_type="public")[0] == []
+        assert inbox.query(from_addr="ai:nobody~x#y.com")[0] == []
+    
+    def test_time_range(self):
+        inbox = Inbox()
+        records = [add(inbox) for _ in range(4)]
+        for i, r in enumerate(records):
+            r.received_us = inbox.times[i] = 1000 * (i + 1)
+        
+        assert inbox.query(since=2000, until=3000)[0] == records[1:3]
+        assert inbox.query(since=3500)[0] == records[3:]
+        assert inbox.query(until=999)[0] == []
+    
+    def test_times_never_decrease(self):
+        inbox = Inbox()
+        first = add(inbox)
+        second = MessageRecord.create(envelope(), {})
+        second.received_us = first.received_us - 10
+        inbox.add(second)
+        assert list(inbox.times) == [first.received_us, first.received_us]
+    
+    def test_fulltext(self):
+        inbox = Inbox(fulltext=True)
+        r1 = add(inbox, content="The quick brown fox")
+        r2 = add(inbox, content="A lazy dog, quick!")
+        r3 = add(inbox, content="今天写了第三章")
+        
+        assert inbox.query(text="quick")[0] == [r1, r2]
+        assert inbox.query(text="QUICK fox")[0] == [r1]
+        assert inbox.query(text="第三章")[0] == [r3]
+        assert inbox.query(text="cat")[0] == []
+    
+    def test_fulltext_disabled(self):
+        inbox = Inbox()
+        add(inbox)
+        with pytest.raises(ValueError):
+            inbox.query(text="hello")
+    
+    def test_parse_time(self):
+        assert records.parse_time("1970-01-01T00:00:01Z") == 1000000
+        assert records.parse_time("1970-01-01T01:00:01+01:00") == 1000000
+        assert records.parse_time("1.5") == 1500000
+        with pytest.raises(ValueError):
+            records.parse_time("soon")
+
+
+class TestInboxFilters:
+    """GET /api/v1/inbox filter parameters."""
+    
+    @pytest.fixture
+    def inbox(self, client, register, monkeypatch):
+        monkeypatch.setattr(provider, "db", provider.InMemoryDB(fulltext=True))
+        _, key = register()
+        
+        def send(from_addr, content, **env):
+            body = {"envelope": {"from_addr": from_addr, "to_addr": "ai:tom~novel#localhost", **env},
+                    "payload": {"content": content}}
+            return client.post("/api/v1/inbox/tom~novel", json=body).get_json()["message_id"]
+        
+        def get(**params):
+            r = client.get("/api/v1/inbox", query_string=params, headers={"Authorization": f"Bearer {key}"})
+            return r.status_code, r.get_json()
+        return send, get
+    
+    def test_filter_by_sender_and_reply(self, inbox):
+        send, get = inbox
+        root = send("ai:amy~main#other.com", "first")
+        send("ai:bob~main#other.com", "second", reply_to=root)
+        send("ai:amy~main#other.com", "third", reply_to=root)
+        
+        _, data = get(from_addr="ai:amy~main#other.com")
+        assert [m["payload"]["content"] for m in data["messages"]] == ["first", "third"]
+        assert data["next_cursor"] is None
+        _, data = get(reply_to=root)
+        assert [m["payload"]["content"] for m in data["messages"]] == ["second", "third"]
+    
+    def test_fulltext_and_paging(self, inbox):
+        send, get = inbox
+        for i in range(5):
+            send("ai:amy~main#other.com", f"chapter {i} draft")
+        
+        _, page = get(q="draft", limit=2)
+        assert [m["payload"]["content"] for m in page["messages"]] == ["chapter 3 draft", "chapter 4 draft"]
+        _, page = get(q="draft", limit=2, cursor=page["next_cursor"])
+        assert [m["payload"]["content"] for m in page["messages"]] == ["chapter 1 draft", "chapter 2 draft"]
+    
+    def test_time_range_param(self, inbox):
+        send, get = inbox
+        send("ai:amy~main#other.com", "x")
+        status, data = get(since="2000-01-01T00:00:00Z", until="2999-01-01")
+        assert status == 200 and data["count"] == 1
+        assert get(since="2999-01-01T00:00:00Z")[1]["count"] == 0
+        assert get(since="tomorrow")[0] == 400
+    
+    def test_unfiltered_response_unchanged(self, inbox):
+        send, get = inbox
+        send("ai:amy~main#other.com", "x")
+        _, data = get()
+        assert set(data) == {"messages", "count"}
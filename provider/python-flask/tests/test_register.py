@@ -0,0 +1,97 @@
+import pytest
+
+import app as provider
+from tenants import TenantRegistry
+
+BATCH = "/api/agent/register:batch"
+
+
+def agents(*addresses):
+    return [{"aap_address": address, "model": "test"} for address in addresses]
+
+
+def inbox(client, api_key):
+    return client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {api_key}"})
+
+
+class TestRegisterBatch:
+    """POST /api/agent/register:batch."""
+
+    def test_registers_all(self, client):
+        r = client.post(BATCH, json={"agents": agents("ai:a~x#localhost", "ai:b~x#localhost")})
+        assert r.status_code == 200
+        body = r.get_json()
+        assert body["registered"] == 2
+        assert [result["status"] for result in body["results"]] == [201, 201]
+        assert [result["aap_address"] for result in body["results"]] == ["ai:a~x#localhost", "ai:b~x#localhost"]
+        for result in body["results"]:
+            assert inbox(client, result["api_key"]).status_code == 200
+        assert client.get("/api/v1/resolve", query_string={"address": "ai:b~x#localhost"}).status_code == 200
+
+    def test_per_item_errors(self, client, register):
+        register("ai:taken~x#localhost")
+        items = agents("ai:ok~x#localhost", "bad", "ai:taken~x#localhost", "ai:ok~x#localhost")
+        items.append({"aap_address": "ai:hook~x#localhost", "webhook_url": "ftp://nope"})
+        items.append("not an object")
+        results = client.post(BATCH, json={"agents": items}).get_json()["results"]
+        assert [r["status"] for r in results] == [201, 400, 409, 409, 400, 400]
+        assert [r.get("error", {}).get("code") for r in results[1:]] == [
+            "INVALID_ADDRESS", "ALREADY_EXISTS", "ALREADY_EXISTS", "INVALID_REQUEST", "INVALID_REQUEST"]
+        assert set(provider.db.agents) == {"ai:taken~x#localhost", "ai:ok~x#localhost"}
+
+    def test_atomic_rolls_back_nothing_registered(self, client, register):
+        register("ai:taken~x#localhost")
+        r = client.post(BATCH, json={"agents": agents("ai:a~x#localhost", "ai:taken~x#localhost", "ai:b"),
+                                     "atomic": True})
+        assert r.status_code == 409
+        body = r.get_json()
+        assert body["error"]["code"] == "ALREADY_EXISTS"
+        assert body["error"]["message"].startswith("agents[1]:")
+        assert [(e["index"], e["code"]) for e in body["errors"]] == [(1, "ALREADY_EXISTS"), (2, "INVALID_ADDRESS")]
+        assert set(provider.db.agents) == {"ai:taken~x#localhost"}
+
+    def test_atomic_success(self, client):
+        r = client.post(BATCH, json={"agents": agents("ai:a~x#localhost", "ai:b~x#localhost"), "atomic": True})
+        assert r.get_json()["registered"] == 2
+
+    def test_webhook_secret_returned(self, client):
+        item = {"aap_address": "ai:a~x#localhost", "webhook_url": "https://93.184.215.14/aap"}
+        result = client.post(BATCH, json={"agents": [item]}).get_json()["results"][0]
+        assert result["webhook_secret"] == provider.db.agents["ai:a~x#localhost"]["webhook_secret"]
+
+    def test_invalid_body(self, client, monkeypatch):
+        assert client.post(BATCH, json={"agents": []}).status_code == 400
+        assert client.post(BATCH, json=agents("ai:a~x#localhost")).status_code == 400
+        monkeypatch.setattr(provider, "REGISTER_BATCH_MAX", 2)
+        r = client.post(BATCH, json={"agents": agents("ai:a~x#localhost", "ai:b~x#localhost", "ai:c~x#localhost")})
+        assert r.status_code == 413
+
+
+class TestRegisterBatchTenants:
+    """Domain checks and agent quotas with several hosted domains."""
+
+    @pytest.fixture
+    def hosted(self, client, monkeypatch):
+        tenants = TenantRegistry()
+        tenants.add(provider.make_tenant("a.com", 0, 0))
+        tenants.add(provider.make_tenant("b.com", 2, 0))
+        monkeypatch.setattr(provider, "tenants", tenants)
+        return tenants
+
+    def test_wrong_provider(self, client, hosted):
+        r = client.post(BATCH, json={"agents": agents("ai:a~x#a.com", "ai:b~x#b.com")}, base_url="http://a.com")
+        assert [result["status"] for result in r.get_json()["results"]] == [201, 400]
+        assert r.get_json()["results"][1]["error"]["code"] == "WRONG_PROVIDER"
+
+    def test_quota_per_item(self, client, hosted):
+        items = agents("ai:a~x#b.com", "ai:b~x#b.com", "ai:c~x#b.com")
+        results = client.post(BATCH, json={"agents": items}, base_url="http://b.com").get_json()["results"]
+        assert [r["status"] for r in results] == [201, 201, 403]
+        assert len(hosted.tenants["b.com"].db.agents) == 2
+
+    def test_quota_atomic(self, client, hosted):
+        items = agents("ai:a~x#b.com", "ai:b~x#b.com", "ai:c~x#b.com")
+        r = client.post(BATCH, json={"agents": items, "atomic": True}, base_url="http://b.com")
+        assert r.status_code == 403
+        assert r.get_json()["error"]["code"] == "QUOTA_EXCEEDED"
+        assert not hosted.tenants["b.com"].db.agents
@@ -0,0 +1,248 @@
+import threading
+import urllib.parse
+
+import pytest
+
+import app as provider
+import relay as relay_module
+from relay import HTTPTransport, QueueFull, Relay, RelayError, TargetForbidden, is_public_address
+
+
+class FlaskTransport:
+    """Routes relay HTTP calls to the Flask test client, using the URL host as Host."""
+    
+    def __init__(self, client, batch=True, fail=0):
+        self.client = client
+        self.batch = batch
+        self.fail = fail  # 前 fail 次 POST 返回 503
+        self.posts = []
+    
+    def request(self, method, url, body=None, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        if parts.path == "/api/v1/providers/info" and not self.batch:
+            return 404, b""
+        if method == "POST":
+            self.posts.append(parts.path)
+            if self.fail:
+                self.fail -= 1
+                return 503, b""
+        r = self.client.open(path, base_url=f"http://{parts.netloc}", method=method,
+                             data=body, headers=headers)
+        return r.status_code, r.get_data()
+
+
+def message(to="ai:bob~main#remote.test", content="hi"):
+    return {"from_addr": "ai:tom~novel#localhost", "to_addr": to}, {"content": content}
+
+
+@pytest.fixture
+def remote(client, register):
+    """Register the remote recipient and return its inbox reader."""
+    _, key = register("ai:bob~main#remote.test")
+    
+    def inbox():
+        r = client.get("/api/v1/inbox?limit=100", headers={"Authorization": f"Bearer {key}"})
+        return r.get_json()["messages"]
+    return inbox
+
+
+class TestRelay:
+    """Queueing, batching, retries and backpressure."""
+    
+    def test_batches_to_capable_provider(self, client, remote):
+        transport = FlaskTransport(client)
+        relay = Relay(transport, linger=0.05)
+        ids = [relay.submit("tom~novel", "remote.test", *message(content=str(i))) for i in range(5)]
+        
+        assert relay.flush()
+        assert [m["payload"]["content"] for m in remote()] == ["0", "1", "2", "3", "4"]
+        assert transport.posts == ["/api/v1/inbox:batch"]
+        status = relay.status(ids[0])
+        assert status["status"] == "delivered"
+        assert status["message_id"]
+        assert relay.stats()["remote.test"]["delivered"] == 5
+    
+    def test_single_delivery_fallback(self, client, remote):
+        transport = FlaskTransport(client, batch=False)
+        relay = Relay(transport)
+        relay.submit("tom~novel", "remote.test", *message())
+        relay.submit("tom~novel", "remote.test", *message())
+        
+        assert relay.flush()
+        assert len(remote()) == 2
+        assert transport.posts == ["/api/v1/inbox/bob~main"] * 2
+    
+    def test_retries_transient_failures(self, client, remote):
+        transport = FlaskTransport(client, fail=2)
+        relay = Relay(transport, retry_delay=0)
+        relay_id = relay.submit("tom~novel", "remote.test", *message())
+        
+        assert relay.flush()
+        assert relay.status(relay_id)["attempts"] == 3
+        assert len(remote()) == 1
+    
+    def test_gives_up_after_max_attempts(self, client, remote):
+        relay = Relay(FlaskTransport(client, fail=10), retry_delay=0, max_attempts=2)
+        relay_id = relay.submit("tom~novel", "remote.test", *message())
+        
+        assert relay.flush()
+        status = relay.status(relay_id)
+        assert status["status"] == "failed"
+        assert status["attempts"] == 2
+        assert remote() == []
+    
+    def test_rejected_message_fails_without_retry(self, client, remote):
+        relay = Relay(FlaskTransport(client), retry_delay=0)
+        relay_id = relay.submit("tom~novel", "remote.test", *message(to="ai:bob~main#elsewhere.test"))
+        
+        assert relay.flush()
+        status = relay.status(relay_id)
+        assert status["status"] == "failed"
+        assert status["attempts"] == 1
+        assert "WRONG_PROVIDER" in status["error"]
+    
+    def test_backpressure(self):
+        entered, release = threading.Event(), threading.Event()
+        
+        class Blocking:
+            def request(self, method, url, body=None, headers=None):
+                entered.set()
+                release.wait(5)
+                raise RelayError("down", retryable=False)
+        
+        relay = Relay(Blocking(), queue_size=2, concurrency=1, batch_size=1, linger=0)
+        relay.submit("tom~novel", "slow.test", *message())
+        assert entered.wait(5)
+        relay.submit("tom~novel", "slow.test", *message())
+        relay.submit("tom~novel", "slow.test", *message())
+        with pytest.raises(QueueFull):
+            relay.submit("tom~novel", "slow.test", *message())
+        
+        # 其他目标不受影响
+        relay.submit("tom~novel", "other.test", *message(to="ai:x~y#other.test"))
+        release.set()
+        assert relay.flush()
+
+
+class TestTargets:
+    """Private-address guard and lookup caching."""
+    
+    @pytest.mark.parametrize("ip, public", [
+        ("8.8.8.8", True), ("2606:4700::1", True),
+        ("127.0.0.1", False), ("10.1.2.3", False), ("192.168.0.1", False), ("169.254.169.254", False),
+        ("100.64.0.1", False), ("0.0.0.0", False), ("::1", False), ("fe80::1%eth0", False),
+        ("fd00::1", False), ("::ffff:10.0.0.1", False),
+    ])
+    def test_is_public_address(self, ip, public):
+        assert is_public_address(ip) is public
+    
+    def test_transport_refuses_private_targets(self):
+        with pytest.raises(TargetForbidden) as e:
+            HTTPTransport(timeout=1).request("GET", "http://127.0.0.1:9/api/v1/providers/info")
+        assert e.value.retryable is False
+        
+        with pytest.raises(RelayError) as e:
+            HTTPTransport(timeout=1, allow_private=True).request("GET", "http://127.0.0.1:9/")
+        assert not isinstance(e.value, TargetForbidden)
+    
+    def test_private_destination_fails_without_retry(self):
+        relay = Relay(HTTPTransport(timeout=1), retry_delay=0)
+        relay_id = relay.submit("tom~novel", "127.0.0.1:9", *message(to="ai:bob~main#127.0.0.1:9"))
+        
+        assert relay.flush()
+        status = relay.status(relay_id)
+        assert (status["status"], status["attempts"]) == ("failed", 1)
+        assert "non-public" in status["error"]
+    
+    def test_failed_provider_info_cached_briefly(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(relay_module.time, "monotonic", lambda: now[0])
+        calls = []
+        
+        class Flaky:
+            up = False
+            
+            def request(self, method, url, body=None, headers=None):
+                calls.append(url)
+                if not self.up:
+                    raise RelayError("down")
+                return 200, b'{"provider": "remote.test"}'
+        
+        transport = Flaky()
+        relay = Relay(transport, cache_ttl=300, negative_ttl=10)
+        assert relay.provider_info("remote.test") is None
+        assert relay.provider_info("remote.test") is None
+        assert len(calls) == 1
+        
+        transport.up = True
+        now[0] += 11
+        assert relay.provider_info("remote.test") == {"provider": "remote.test"}
+        now[0] += 200
+        assert relay.provider_info("remote.test") == {"provider": "remote.test"}
+        assert len(calls) == 2
+
+
+class TestOutboxAPI:
+    """POST /api/v1/outbox and POST /api/v1/inbox:batch."""
+    
+    @pytest.fixture
+    def sender(self, client, register, monkeypatch):
+        monkeypatch.setattr(provider, "relay", Relay(FlaskTransport(client)))
+        _, key = register()
+        return {"Authorization": f"Bearer {key}"}
+    
+    def test_remote_message_is_queued(self, client, remote, sender):
+        envelope, payload = message()
+        r = client.post("/api/v1/outbox", json={"envelope": envelope, "payload": payload}, headers=sender)
+        
+        assert r.status_code == 202
+        relay_id = r.get_json()["relay_id"]
+        assert provider.relay.flush()
+        status = client.get(f"/api/v1/outbox/{relay_id}", headers=sender).get_json()
+        assert status["status"] == "delivered"
+        assert len(remote()) == 1
+    
+    def test_local_message_is_stored_directly(self, client, register, sender):
+        _, key = register("ai:amy~main#localhost")
+        envelope, payload = message(to="ai:amy~main#localhost")
+        
+        r = client.post("/api/v1/outbox", json={"envelope": envelope, "payload": payload}, headers=sender)
+        
+        assert r.status_code == 201
+        inbox = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {key}"}).get_json()
+        assert inbox["count"] == 1
+    
+    def test_from_addr_must_match_key(self, client, sender):
+        envelope, payload = message()
+        envelope["from_addr"] = "ai:someone~else#localhost"
+        r = client.post("/api/v1/outbox", json={"envelope": envelope, "payload": payload}, headers=sender)
+        assert r.status_code == 403
+    
+    def test_queue_full_returns_429(self, client, sender, monkeypatch):
+        monkeypatch.setattr(provider, "relay", Relay(queue_size=0))
+        envelope, payload = message()
+        r = client.post("/api/v1/outbox", json={"envelope": envelope, "payload": payload}, headers=sender)
+        assert r.status_code == 429
+        assert r.headers["Retry-After"] == "1"
+    
+    def test_status_hidden_from_other_agents(self, client, register, sender):
+        envelope, payload = message()
+        relay_id = client.post("/api/v1/outbox", json={"envelope": envelope, "payload": payload},
+                               headers=sender).get_json()["relay_id"]
+        _, other = register("ai:amy~main#localhost")
+        r = client.get(f"/api/v1/outbox/{relay_id}", headers={"Authorization": f"Bearer {other}"})
+        assert r.status_code == 404
+        provider.relay.flush()
+    
+    def test_batch_endpoint_reports_per_message(self, client, register):
+        register()
+        ok = {"envelope": {"from_addr": "ai:a~b#x.com", "to_addr": "ai:tom~novel#localhost"}, "payload": {}}
+        bad = {"envelope": {"from_addr": "ai:a~b#x.com"}, "payload": {}}
+        
+        r = client.post("/api/v1/inbox:batch", json={"messages": [ok, bad, ok]})
+        
+        results = r.get_json()["results"]
+        assert [x["status"] for x in results] == [201, 400, 201]
+        assert results[1]["error"]["code"] == "MISSING_FIELD"
+        assert client.post("/api/v1/inbox:batch", json={"messages": []}).status_code == 400
@@ -0,0 +1,175 @@
+import base64
+
+import pytest
+
+pytest.importorskip("cryptography")
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+import app as provider
+import codec
+import signing
+from relay import HTTPTransport, RelayError
+
+
+def b64(raw):
+    return signing.KEY_PREFIX + base64.b64encode(raw).decode()
+
+
+class Signer:
+    def __init__(self):
+        self.key = Ed25519PrivateKey.generate()
+        self.public_key = b64(self.key.public_key().public_bytes_raw())
+    
+    def message(self, sender, to="ai:bob~main#localhost", content="hi", sign=True):
+        env = {"from_addr": sender, "to_addr": to, "timestamp": "2026-01-01T00:00:00Z"}
+        payload = {"content": content, "metadata": {"n": 1.5}}
+        if sign:
+            env["signature"] = b64(self.key.sign(signing.canonical_bytes(env, payload)))
+        return env, payload
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    monkeypatch.setattr(provider, "sender_keys", signing.KeyCache())
+    monkeypatch.setattr(provider, "sender_key_failures", signing.KeyCache(ttl=30))
+
+
+@pytest.fixture
+def bob(client, register, keys):
+    _, key = register("ai:bob~main#localhost")
+    return key
+
+
+def register_signed(client, address, signer):
+    r = client.post("/api/agent/register", json={"aap_address": address, "public_key": signer.public_key})
+    assert r.status_code == 201
+
+
+class TestVerifyBatch:
+    def test_valid_and_tampered(self):
+        s = Signer()
+        env, payload = s.message("ai:tom~novel#localhost")
+        tampered = dict(payload, content="bye")
+        assert signing.verify_batch([
+            (s.public_key, env, payload),
+            (s.public_key, env, tampered),
+            (Signer().public_key, env, payload),
+            ("ed25519:bad", env, payload),
+            (s.public_key, dict(env, signature="nope"), payload),
+        ]) == [True, False, False, False, False]
+    
+    def test_canonical_ignores_key_order_and_signature(self):
+        a = signing.canonical_bytes({"b": 1, "a": "é", "signature": "x"}, {"content": "c"})
+        assert a == '{"envelope":{"a":"é","b":1},"payload":{"content":"c"}}'.encode()
+    
+    def test_key_cache_ttl_and_bound(self, monkeypatch):
+        cache = signing.KeyCache(ttl=10, max_size=2)
+        now = [100.0]
+        monkeypatch.setattr(signing.time, "monotonic", lambda: now[0])
+        cache.put("a", "ka")
+        cache.put("b", "")
+        assert cache.get("a") == "ka"
+        cache.put("c", "kc")  # 淘汰最久未用的 b
+        assert cache.get("b") is None
+        assert cache.get("c") == "kc"
+        now[0] += 11
+        assert cache.get("a") is None
+
+
+class TestReceiveSigned:
+    def test_register_and_resolve_public_key(self, client, keys):
+        s = Signer()
+        register_signed(client, "ai:tom~novel#localhost", s)
+        r = client.get("/api/v1/resolve", query_string={"address": "ai:tom~novel#localhost"})
+        assert r.get_json()["public_key"] == s.public_key
+        
+        r = client.post("/api/agent/register", json={"aap_address": "ai:x~y#localhost", "public_key": "rsa:abc"})
+        assert r.status_code == 400
+    
+    def test_local_sender(self, client, bob):
+        s = Signer()
+        register_signed(client, "ai:tom~novel#localhost", s)
+        env, payload = s.message("ai:tom~novel#localhost")
+        r = client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload})
+        assert r.status_code == 201
+        
+        payload["content"] = "forged"
+        r = client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload})
+        assert r.status_code == 401
+        assert r.get_json()["error"]["code"] == "INVALID_SIGNATURE"
+        
+        # 存储后读出的信封和正文仍能验证
+        r = client.get("/api/v1/inbox", headers={"Authorization": f"Bearer {bob}"})
+        stored = r.get_json()["messages"]
+        assert len(stored) == 1
+        assert signing.verify_batch([(s.public_key, stored[0]["envelope"], stored[0]["payload"])]) == [True]
+    
+    def test_unsigned_allowed_unless_required(self, client, bob, monkeypatch):
+        s = Signer()
+        register_signed(client, "ai:tom~novel#localhost", s)
+        env, payload = s.message("ai:tom~novel#localhost", sign=False)
+        assert client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload}).status_code == 201
+        
+        monkeypatch.setattr(provider, "REQUIRE_SIGNATURES", True)
+        r = client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload})
+        assert r.status_code == 401
+    
+    def test_remote_sender_key_resolved_once(self, client, bob, monkeypatch):
+        s = Signer()
+        calls = []
+        
+        class Transport:
+            def request(self, method, url, body=None, headers=None):
+                calls.append(url)
+                return 200, codec.dumps({"public_key": s.public_key})
+        
+        monkeypatch.setattr(provider, "sender_key_transport", Transport())
+        items = []
+        for i in range(3):
+            env, payload = s.message("ai:amy~main#remote.test", content=str(i))
+            items.append({"envelope": env, "payload": payload})
+        items[2]["payload"]["content"] = "forged"
+        
+        r = client.post("/api/v1/inbox:batch", json={"messages": items})
+        assert [x["status"] for x in r.get_json()["results"]] == [201, 201, 401]
+        assert calls == ["https://remote.test/api/v1/resolve?address=ai%3Aamy~main%23remote.test"]
+        
+        env, payload = s.message("ai:amy~main#remote.test")
+        assert client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload}).status_code == 201
+        assert len(calls) == 1
+    
+    def test_failed_key_lookup_cached_per_provider(self, client, bob, monkeypatch):
+        calls = []
+        
+        class Down:
+            def request(self, method, url, body=None, headers=None):
+                calls.append(url)
+                raise RelayError("timed out")
+        
+        monkeypatch.setattr(provider, "sender_key_transport", Down())
+        for sender in ("ai:a~x#down.test", "ai:b~x#down.test", "ai:a~x#DOWN.test"):
+            env, payload = Signer().message(sender)
+            assert client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload}).status_code == 201
+        assert len(calls) == 1
+    
+    def test_key_lookup_refuses_private_targets(self, client, bob, monkeypatch):
+        monkeypatch.setattr(provider, "sender_key_transport", HTTPTransport(timeout=1, keep_alive=False))
+        env, payload = Signer().message("ai:a~x#127.0.0.1:9")
+        
+        assert client.post("/api/v1/inbox/bob~main", json={"envelope": env, "payload": payload}).status_code == 201
+        assert provider.sender_key_failures.get("127.0.0.1:9") == ""
+    
+    def test_signed_feed_post(self, client, keys):
+        s = Signer()
+        register_signed(client, "ai:alice~main#localhost", s)
+        feed = "ai:feed~public#localhost"
+        
+        env, payload = s.message("ai:alice~main#localhost", to=feed)
+        assert client.post("/api/v1/inbox/feed~public", json={"envelope": env, "payload": payload}).status_code == 201
+        
+        env, payload = Signer().message("ai:alice~main#localhost", to=feed)
+        assert client.post("/api/v1/inbox/feed~public", json={"envelope": env, "payload": payload}).status_code == 401
+    
+    def test_capability(self, client):
+        info = client.get("/api/v1/providers/info").get_json()
+        assert "signatures" in info["capabilities"]
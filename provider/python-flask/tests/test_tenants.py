@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import app as provider
+from tenants import TenantRegistry, load_tenants
+
+
+@pytest.fixture
+def hosted(client, monkeypatch):
+    """Serve a.com (alias www.a.com) and b.com (2 agents, 3 messages) from one process."""
+    tenants = TenantRegistry()
+    tenants.add(provider.make_tenant("a.com", 0, 0), ["www.a.com"])
+    tenants.add(provider.make_tenant("b.com", 2, 3))
+    monkeypatch.setattr(provider, "tenants", tenants)
+    return tenants
+
+
+def register(client, address):
+    host = address.split("#")[1]
+    return client.post("/api/agent/register", json={"aap_address": address}, base_url=f"http://{host}")
+
+
+def auth(api_key):
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+def message(to_addr, content="hi", from_addr="ai:x~y#other.com"):
+    return {"envelope": {"from_addr": from_addr, "to_addr": to_addr}, "payload": {"content": content}}
+
+
+class TestRouting:
+    """Host-based tenant selection."""
+
+    def test_same_owner_role_is_separate_per_domain(self, client, hosted):
+        key_a = register(client, "ai:tom~novel#a.com").get_json()["api_key"]
+        key_b = register(client, "ai:tom~novel#b.com").get_json()["api_key"]
+        client.post("/api/v1/inbox/tom~novel", json=message("ai:tom~novel#a.com", "for a"),
+                    base_url="http://a.com")
+
+        inbox_a = client.get("/api/v1/inbox", headers=auth(key_a), base_url="http://a.com").get_json()
+        inbox_b = client.get("/api/v1/inbox", headers=auth(key_b), base_url="http://b.com").get_json()
+        assert [m["payload"]["content"] for m in inbox_a["messages"]] == ["for a"]
+        assert inbox_b["messages"] == []
+        assert client.get("/api/v1/resolve", query_string={"address": "ai:tom~novel#a.com"},
+                          base_url="http://b.com").status_code == 404
+
+    def test_key_from_another_domain_is_rejected(self, client, hosted):
+        key_a = register(client, "ai:tom~novel#a.com").get_json()["api_key"]
+        assert client.get("/api/v1/inbox", headers=auth(key_a), base_url="http://a.com").status_code == 200
+        # 认证缓存里已有这个 key，换个域名仍然不能用
+        assert client.get("/api/v1/inbox", headers=auth(key_a), base_url="http://b.com").status_code == 401
+        assert client.get("/api/v1/inbox", headers=auth(key_a), base_url="http://www.a.com").status_code == 200
+
+    def test_unknown_host(self, client, hosted):
+        r = client.get("/api/v1/providers/info", base_url="http://c.com")
+        assert r.status_code == 404
+        assert r.get_json()["error"]["code"] == "UNKNOWN_PROVIDER"
+        assert client.get("/health", base_url="http://c.com").status_code == 200
+        assert client.get("/api/v1/providers/info", base_url="http://B.com").get_json()["provider"] == "b.com"
+
+    def test_address_must_match_host(self, client, hosted):
+        r = client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#b.com"}, base_url="http://a.com")
+        assert r.get_json()["error"]["code"] == "WRONG_PROVIDER"
+        r = client.post("/api/v1/inbox/tom~novel", json=message("ai:tom~novel#b.com"), base_url="http://a.com")
+        assert r.get_json()["error"]["code"] == "WRONG_PROVIDER"
+
+    def test_outbox_to_sibling_domain_is_delivered_in_process(self, client, hosted):
+        key_a = register(client, "ai:tom~novel#a.com").get_json()["api_key"]
+        key_b = register(client, "ai:ann~main#b.com").get_json()["api_key"]
+        r = client.post("/api/v1/outbox", json=message("ai:ann~main#b.com", "cross", "ai:tom~novel#a.com"),
+                        headers=auth(key_a), base_url="http://a.com")
+        assert r.status_code == 201
+        assert r.get_json()["status"] == "delivered"
+        inbox = client.get("/api/v1/inbox", headers=auth(key_b), base_url="http://b.com").get_json()
+        assert inbox["messages"][0]["envelope"]["from_addr"] == "ai:tom~novel#a.com"
+
+
+class TestQuotas:
+    """Per-domain agent and message quotas."""
+
+    def test_agent_quota(self, client, hosted):
+        assert register(client, "ai:a~x#b.com").status_code == 201
+        assert register(client, "ai:b~x#b.com").status_code == 201
+        r = register(client, "ai:c~x#b.com")
+        assert r.status_code == 403
+        assert r.get_json()["error"]["code"] == "QUOTA_EXCEEDED"
+        assert register(client, "ai:c~x#a.com").status_code == 201
+
+    def test_message_quota(self, client, hosted):
+        register(client, "ai:a~x#b.com")
+        statuses = [
+            client.post("/api/v1/inbox/a~x", json=message("ai:a~x#b.com"), base_url="http://b.com").status_code
+            for _ in range(4)
+        ]
+        assert statuses == [201, 201, 201, 403]
+
+
+def test_load_tenants_file(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"B.com": {"max_agents": 5, "aliases": ["b.example:8443"]}, "c.com": {}}))
+    tenants = load_tenants("a.com, b.com", str(path), provider.make_tenant, max_messages=100)
+    assert sorted(t.domain for t in tenants) == ["a.com", "b.com", "c.com"]
+    assert tenants.get("b.example:8443") is tenants.get("b.com")
+    assert tenants.get("b.com").max_agents == 5
+    assert tenants.get("a.com").max_agents == 0
+    assert tenants.get("c.com").max_messages == 100
+    assert tenants.get("a.com").db is not tenants.get("c.com").db
@@ -0,0 +1,105 @@
+import pytest
+
+from records import MessageRecord
+from threads import ThreadIndex, key_str, thread_key
+
+
+def record(reply_to=None):
+    env = {"from_addr": "ai:a~b#x.com", "to_addr": "ai:c~d#localhost"}
+    if reply_to:
+        env["reply_to"] = reply_to
+    return MessageRecord.create(env, {})
+
+
+class TestThreadIndex:
+    """reply_to graph maintenance."""
+    
+    def test_root_children_and_order(self):
+        index = ThreadIndex()
+        root = record()
+        a = record(root.id)
+        b = record(root.id)
+        c = record(a.id)
+        for r in (root, a, b, c):
+            index.add(r)
+        
+        assert index.root_of(c.id) == root.uid
+        assert index.thread(root.uid) == [root, a, b, c]
+        assert index.get_children(root.id) == [a, b]
+        assert index.get_children(a.id) == [c]
+    
+    def test_reply_to_foreign_id(self):
+        """Replies to ids from other providers group under that id."""
+        index = ThreadIndex()
+        r1 = record("remote-42")
+        r2 = record(r1.id)
+        index.add(r1)
+        index.add(r2)
+        
+        assert index.root_of(r2.id) == "remote-42"
+        assert index.thread("remote-42") == [r1, r2]
+    
+    def test_keys(self):
+        r = record()
+        assert thread_key(r.id) == r.uid
+        assert key_str(r.uid) == r.id
+        assert thread_key("abc") == "abc"
+        assert thread_key("") is None
+
+
+class TestThreadAPI:
+    """GET /api/v1/threads/<id>."""
+    
+    @pytest.fixture
+    def agents(self, client, register):
+        keys = {}
+        for name in ("tom~novel", "amy~main", "bob~main"):
+            _, keys[name] = register(f"ai:{name}#localhost")
+        
+        def send(sender, to, content, reply_to=None):
+            env = {"from_addr": f"ai:{sender}#localhost", "to_addr": f"ai:{to}#localhost"}
+            if reply_to:
+                env["reply_to"] = reply_to
+            r = client.post(f"/api/v1/inbox/{to}", json={"envelope": env, "payload": {"content": content}})
+            return r.get_json()["message_id"]
+        
+        def thread(who, message_id, **params):
+            r = client.get(f"/api/v1/threads/{message_id}", query_string=params,
+                           headers={"Authorization": f"Bearer {keys[who]}"})
+            return r.status_code, r.get_json()
+        return send, thread
+    
+    def test_dialogue_across_inboxes(self, agents):
+        send, thread = agents
+        p = send("amy~main", "tom~novel", "hi")
+        r1 = send("tom~novel", "amy~main", "hello", reply_to=p)
+        r2 = send("amy~main", "tom~novel", "how are you", reply_to=r1)
+        send("bob~main", "tom~novel", "unrelated")
+        
+        status, data = thread("tom~novel", r2)
+        assert status == 200
+        assert data["thread_id"] == p
+        assert [m["payload"]["content"] for m in data["messages"]] == ["hi", "hello", "how are you"]
+        assert data["messages"][2]["envelope"]["reply_to"] == r1
+        assert data["next_cursor"] is None
+    
+    def test_paging(self, agents):
+        send, thread = agents
+        root = send("amy~main", "tom~novel", "0")
+        parent = root
+        for i in range(1, 5):
+            parent = send("amy~main", "tom~novel", str(i), reply_to=parent)
+        
+        _, page = thread("tom~novel", root, limit=3)
+        assert [m["payload"]["content"] for m in page["messages"]] == ["0", "1", "2"]
+        _, page = thread("tom~novel", root, limit=3, cursor=page["next_cursor"])
+        assert [m["payload"]["content"] for m in page["messages"]] == ["3", "4"]
+        assert page["next_cursor"] is None
+    
+    def test_outsiders_cannot_read(self, agents):
+        send, thread = agents
+        p = send("amy~main", "tom~novel", "secret")
+        send("tom~novel", "amy~main", "reply", reply_to=p)
+        
+        assert thread("bob~main", p)[0] == 404
+        assert thread("tom~novel", "no-such-message")[0] == 404
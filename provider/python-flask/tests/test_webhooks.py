@@ -0,0 +1,200 @@
+import threading
+import time
+
+import pytest
+
+import app as provider
+import codec
+import relay as relay_module
+from relay import RelayError, TargetForbidden
+from webhooks import SIGNATURE_HEADER, WebhookDispatcher, sign
+
+# 测试用的域名解析，不走真实 DNS
+ADDRESSES = {"agent.example": "93.184.215.14", "internal.example": "10.0.0.5"}
+
+
+class Receiver:
+    """Transport standing in for agent webhooks: records POSTs, answers with scripted statuses."""
+
+    def __init__(self, statuses=(), delay=0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.posts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body=None, headers=None):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+            self.posts.append((url, body, headers))
+        if status is None:
+            raise RelayError(f"POST {url}: connection refused")
+        if status == "forbidden":
+            raise TargetForbidden(f"{url} resolves to non-public address 10.0.0.5")
+        return status, b""
+
+
+def messages(receiver):
+    return [m for _, body, _ in receiver.posts for m in codec.loads(body)["messages"]]
+
+
+class TestDispatcher:
+    """Coalescing, retries and in-flight limits."""
+
+    def test_messages_within_window_share_one_post(self):
+        receiver = Receiver()
+        hooks = WebhookDispatcher(receiver, window=0.2)
+        for i in range(20):
+            hooks.submit("ai:tom~novel#localhost", "http://agent/hook", "s3cret", codec.dumps({"n": i}))
+        assert hooks.flush()
+        assert len(receiver.posts) == 1
+        url, body, headers = receiver.posts[0]
+        data = codec.loads(body)
+        assert data["agent"] == "ai:tom~novel#localhost"
+        assert [m["n"] for m in data["messages"]] == list(range(20))
+        assert headers[SIGNATURE_HEADER] == sign("s3cret", body)
+
+    def test_batch_size_and_in_flight_limit(self):
+        receiver = Receiver(delay=0.02)
+        hooks = WebhookDispatcher(receiver, window=0, batch_size=5, max_in_flight=2)
+        for i in range(40):
+            hooks.submit("ai:a~x#localhost", "http://agent/hook", "k", codec.dumps(i))
+        assert hooks.flush()
+        assert sorted(messages(receiver)) == list(range(40))
+        assert all(len(codec.loads(body)["messages"]) <= 5 for _, body, _ in receiver.posts)
+        assert receiver.max_active <= 2
+        assert hooks.stats()["ai:a~x#localhost"]["delivered"] == 40
+
+    def test_retries_transient_failures_with_the_same_delivery_id(self):
+        receiver = Receiver(statuses=[None, 503, 429, 200])
+        hooks = WebhookDispatcher(receiver, window=0, retry_delay=0.001)
+        hooks.submit("ai:a~x#localhost", "http://agent/hook", "k", b'{"n":1}')
+        assert hooks.flush()
+        assert len(receiver.posts) == 4
+        assert len({headers["X-AAP-Delivery"] for _, _, headers in receiver.posts}) == 1
+        assert hooks.stats()["ai:a~x#localhost"]["delivered"] == 1
+
+    def test_gives_up_on_client_errors(self):
+        receiver = Receiver(statuses=[404])
+        hooks = WebhookDispatcher(receiver, window=0, retry_delay=0.001)
+        hooks.submit("ai:a~x#localhost", "http://agent/hook", "k", b'{"n":1}')
+        assert hooks.flush()
+        assert len(receiver.posts) == 1
+        assert hooks.stats()["ai:a~x#localhost"]["failed"] == 1
+
+    def test_gives_up_on_forbidden_targets(self):
+        receiver = Receiver(statuses=["forbidden"])
+        hooks = WebhookDispatcher(receiver, window=0, retry_delay=0.001)
+        hooks.submit("ai:a~x#localhost", "https://agent/hook", "k", b'{"n":1}')
+        assert hooks.flush()
+        assert len(receiver.posts) == 1
+        assert hooks.stats()["ai:a~x#localhost"]["failed"] == 1
+
+    def test_http_webhook_not_pushed_unless_allowed(self):
+        receiver = Receiver()
+        hooks = WebhookDispatcher(receiver, window=0, allow_http=False)
+        hooks.submit("ai:a~x#localhost", "http://agent/hook", "k", b'{"n":1}')
+        assert hooks.flush()
+        assert receiver.posts == []
+        assert hooks.stats()["ai:a~x#localhost"]["failed"] == 1
+
+    def test_full_queue_drops_push(self):
+        receiver = Receiver(delay=0.05)
+        hooks = WebhookDispatcher(receiver, window=0, batch_size=1, max_in_flight=1, queue_size=2)
+        results = [hooks.submit("ai:a~x#localhost", "http://agent/hook", "k", codec.dumps(i)) for i in range(5)]
+        assert results.count(False) >= 1
+        assert hooks.flush()
+        assert hooks.stats()["ai:a~x#localhost"]["dropped"] == results.count(False)
+
+
+class TestWebhookRegistration:
+    """Agents registered with webhook_url get new messages pushed."""
+
+    @pytest.fixture(autouse=True)
+    def dns(self, monkeypatch):
+        real = relay_module.socket.getaddrinfo
+
+        def getaddrinfo(host, port, *args, **kwargs):
+            if host.endswith(".example") and host not in ADDRESSES:
+                raise relay_module.socket.gaierror(f"{host}: Name or service not known")
+            return real(ADDRESSES.get(host, host), port, *args, **kwargs)
+
+        monkeypatch.setattr(relay_module.socket, "getaddrinfo", getaddrinfo)
+
+    @pytest.fixture
+    def receiver(self, monkeypatch):
+        receiver = Receiver()
+        monkeypatch.setattr(provider, "webhooks", WebhookDispatcher(receiver, window=0.01))
+        return receiver
+
+    def test_push_and_inbox(self, client, receiver):
+        r = client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#localhost",
+                                                     "webhook_url": "https://agent.example/aap"})
+        assert r.status_code == 201
+        secret = r.get_json()["webhook_secret"]
+        assert "webhook_secret" not in client.get(
+            "/api/v1/resolve", query_string={"address": "ai:tom~novel#localhost"}).get_json()
+
+        envelope = {"from_addr": "ai:x~y#other.com", "to_addr": "ai:tom~novel#localhost"}
+        for i in range(3):
+            client.post("/api/v1/inbox/tom~novel", json={"envelope": envelope, "payload": {"content": f"m{i}"}},
+                        headers={"X-Idempotency-Key": f"k{i % 2}"})  # 第三条是重复消息
+        assert provider.webhooks.flush()
+
+        url, body, headers = receiver.posts[0]
+        assert url == "https://agent.example/aap"
+        assert headers[SIGNATURE_HEADER] == sign(secret, body)
+        assert [m["payload"]["content"] for m in messages(receiver)] == ["m0", "m1"]
+        # 推送之外，消息仍然留在收件箱
+        assert len(provider.db.get_messages("tom~novel")) == 2
+
+    def test_no_webhook_no_push(self, client, register, receiver):
+        register()
+        envelope = {"from_addr": "ai:x~y#other.com", "to_addr": "ai:tom~novel#localhost"}
+        client.post("/api/v1/inbox/tom~novel", json={"envelope": envelope, "payload": {"content": "hi"}})
+        assert provider.webhooks.flush()
+        assert receiver.posts == []
+
+    def test_invalid_webhook_url(self, client):
+        r = client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#localhost",
+                                                     "webhook_url": "ftp://agent.example"})
+        assert r.status_code == 400
+
+    @pytest.mark.parametrize("url", [
+        "http://agent.example/aap",        # 非调试模式只接受 https
+        "https://internal.example/aap",    # 解析到内网地址
+        "https://127.0.0.1:5000/admin",
+        "https://[::1]/aap",
+        "https://169.254.169.254/latest/meta-data",
+        "https://[::ffff:10.0.0.1]/aap",
+        "https://missing.example/aap",     # 解析不了
+        "https://agent.example:99999/aap",
+        "https:///aap",
+    ])
+    def test_refuses_unsafe_webhook_url(self, client, url):
+        r = client.post("/api/agent/register", json={"aap_address": "ai:tom~novel#localhost", "webhook_url": url})
+        assert r.status_code == 400
+        assert r.get_json()["error"]["code"] == "INVALID_REQUEST"
+        r = client.post("/api/agent/register:batch", json={"agents": [
+            {"aap_address": "ai:tom~novel#localhost", "webhook_url": url}]})
+        assert r.get_json()["results"][0]["status"] == 400
+        assert not provider.db.agents
+
+    def test_debug_and_private_targets(self, client, monkeypatch):
+        monkeypatch.setattr(provider, "DEBUG", True)
+        r = client.post("/api/agent/register", json={"aap_address": "ai:a~x#localhost",
+                                                     "webhook_url": "http://agent.example/aap"})
+        assert r.status_code == 201
+        r = client.post("/api/agent/register", json={"aap_address": "ai:b~x#localhost",
+                                                     "webhook_url": "http://127.0.0.1:8080/aap"})
+        assert r.status_code == 400
+        monkeypatch.setattr(provider, "ALLOW_PRIVATE_TARGETS", True)
+        r = client.post("/api/agent/register", json={"aap_address": "ai:b~x#localhost",
+                                                     "webhook_url": "http://127.0.0.1:8080/aap"})
+        assert r.status_code == 201
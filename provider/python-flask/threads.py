@@ -0,0 +1,62 @@
+"""
+会话线程索引 (reply_to)
+
+每条消息写入时更新索引：父消息 (reply_to)、线程根、按到达顺序排列的子消息和
+线程成员。本 Provider 分配的消息 id 按 128 位整数存储 (与 MessageRecord.uid
+相同)，其他 Provider 的 id 作为字符串原样使用。
+
+线程可以跨收件箱：本地 Agent 之间的对话，双方发出的消息分别存在对方的收件箱里，
+读取时按调用者可见性过滤。
+"""
+
+import uuid
+
+
+def thread_key(message_id):
+    """Index key for a message id: int for UUIDs issued here, the string otherwise."""
+    if not isinstance(message_id, str):
+        return None
+    try:
+        return uuid.UUID(message_id).int
+    except ValueError:
+        return message_id or None
+
+
+def key_str(key):
+    return str(uuid.UUID(int=key)) if isinstance(key, int) else key
+
+
+class ThreadIndex:
+    """reply_to graph over stored messages."""
+
+    def __init__(self):
+        self.records = {}   # {uid: MessageRecord}，按 id 取消息
+        self.parent = {}    # {uid: parent key}，只有回复才有
+        self.root = {}      # {uid: root key}，只有回复才有；非回复消息的根是自己
+        self.children = {}  # {key: [uid]}，按到达顺序
+        self.members = {}   # {root key: [uid]}，线程里的全部回复，按到达顺序
+
+    def add(self, record):
+        self.records[record.uid] = record
+        parent = thread_key(record.reply_to)
+        if parent is None:
+            return
+        root = self.root.get(parent, parent)
+        self.parent[record.uid] = parent
+        self.root[record.uid] = root
+        self.children.setdefault(parent, []).append(record.uid)
+        self.members.setdefault(root, []).append(record.uid)
+
+    def root_of(self, message_id):
+        key = thread_key(message_id)
+        return None if key is None else self.root.get(key, key)
+
+    def thread(self, root):
+        """Records of the thread in conversation order: the root (if stored here) then replies."""
+        head = self.records.get(root)
+        replies = [self.records[uid] for uid in self.members.get(root, ())]
+        return ([head] if head is not None else []) + replies
+
+    def get_children(self, message_id):
+        key = thread_key(message_id)
+        return [self.records[uid] for uid in self.children.get(key, ())]
@@ -0,0 +1,226 @@
+"""
+Webhook 推送
+
+注册时提供 webhook_url 的 Agent 不必轮询 GET /api/v1/inbox：消息照常存入收件箱，
+同时交给这里推送到 webhook：
+
+- 每个 Agent 一个有界队列；第一条消息到达后等 window 秒，把期间到达的消息合并成
+  一次 POST (最多 batch_size 条)，消息密集时请求数远少于逐条推送或轮询
+- 每个 webhook 最多 max_in_flight 个并发 POST，慢的 webhook 只影响自己；队列满时
+  新消息不再推送，只留在收件箱
+- 连接失败、5xx、429 按指数退避重试，其他 4xx 和重试用尽时放弃，消息仍可从收件箱取到
+- 请求体 {"agent": "...", "messages": [...], "count": n} 用注册时返回的 webhook_secret
+  做 HMAC-SHA256 签名 (X-AAP-Signature: sha256=<hex>)；X-AAP-Delivery 在重试时不变，
+  接收方可以据此去重
+- webhook_url 由注册者随意填写：注册时要求 https 并解析主机名，指向回环、内网、链路本地等
+  非公网地址的拒绝 (check_url)；推送时 HTTPTransport 在每次建立连接前再检查一次解析结果，
+  防止注册后改 DNS 指向内网
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import deque
+
+import codec
+from relay import HTTPTransport, RelayError, TargetForbidden, public_addresses
+
+WEBHOOK_WINDOW = 0.05        # 秒，合并窗口
+WEBHOOK_BATCH_SIZE = 100     # 每次 POST 的消息数上限
+WEBHOOK_MAX_IN_FLIGHT = 2    # 每个 webhook 同时进行的 POST 数
+WEBHOOK_QUEUE_SIZE = 1000    # 每个 webhook 等待推送的消息上限
+WEBHOOK_MAX_ATTEMPTS = 5
+WEBHOOK_RETRY_DELAY = 0.5    # 秒，第 n 次重试前等待 retry_delay * 2**(n-1)
+
+SIGNATURE_HEADER = "X-AAP-Signature"
+DELIVERY_HEADER = "X-AAP-Delivery"
+
+
+def check_url(url, allow_http=False, allow_private=False):
+    """
+    Validate a webhook_url at registration.
+
+    Raises:
+        ValueError: not an https URL (http also accepted with allow_http), or its host
+                    does not resolve or resolves to a non-public address
+    """
+    if not isinstance(url, str) or len(url) > 2048:
+        raise ValueError("webhook_url must be a URL of at most 2048 characters")
+    schemes = ("https", "http") if allow_http else ("https",)
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise ValueError("webhook_url is not a valid URL")
+    if parts.scheme not in schemes or not parts.hostname:
+        raise ValueError("webhook_url must be an http(s) URL" if allow_http else "webhook_url must be an https URL")
+    if not allow_private:
+        try:
+            public_addresses(parts.hostname, port)
+        except TargetForbidden as e:
+            raise ValueError(f"webhook_url not allowed: {e}")
+        except OSError:
+            raise ValueError(f"webhook_url host {parts.hostname} does not resolve")
+
+
+def sign(secret, body):
+    """X-AAP-Signature value for body."""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class _Hook:
+    __slots__ = ("address", "url", "secret", "queue", "workers", "sending", "cond",
+                 "delivered", "failed", "dropped", "batches")
+
+    def __init__(self, address, url, secret):
+        self.address = address
+        self.url = url
+        self.secret = secret
+        self.queue = deque()  # 已编码的消息 JSON
+        self.workers = 0      # 推送线程数，即同时进行的 POST 数上限
+        self.sending = 0      # 正在推送的消息数
+        self.cond = threading.Condition()
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+
+class WebhookDispatcher:
+    """
+    Per-agent push queues drained by coalescing delivery threads.
+
+    Threads are started on demand by submit() and exit after idle_timeout.
+    Unless allow_http is set, http:// webhooks (registered before https was required) are not pushed to.
+    """
+
+    def __init__(self, transport=None, window=WEBHOOK_WINDOW, batch_size=WEBHOOK_BATCH_SIZE,
+                 max_in_flight=WEBHOOK_MAX_IN_FLIGHT, queue_size=WEBHOOK_QUEUE_SIZE,
+                 max_attempts=WEBHOOK_MAX_ATTEMPTS, retry_delay=WEBHOOK_RETRY_DELAY, idle_timeout=30.0,
+                 allow_http=True):
+        self.transport = transport or HTTPTransport(timeout=10)
+        self.allow_http = allow_http
+        self.window = window
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+        self._hooks = {}  # {(address, url): _Hook}
+        self._lock = threading.Lock()
+
+    def submit(self, address, url, secret, message):
+        """
+        Queue one encoded message for the agent's webhook.
+
+        Returns False when the queue is full; the message then stays only in the inbox.
+        """
+        with self._lock:
+            hook = self._hooks.get((address, url))
+            if hook is None:
+                hook = self._hooks[(address, url)] = _Hook(address, url, secret)
+        with hook.cond:
+            if len(hook.queue) >= self.queue_size:
+                hook.dropped += 1
+                return False
+            hook.queue.append(message)
+            # 积压超过现有线程一批的量时加线程，最多 max_in_flight 个
+            if hook.workers < self.max_in_flight and len(hook.queue) > hook.workers * self.batch_size:
+                hook.workers += 1
+                threading.Thread(target=self._work, args=(hook,), daemon=True,
+                                 name=f"webhook-{address}").start()
+            else:
+                hook.cond.notify()
+        return True
+
+    def stats(self):
+        """{address: {"queued", "in_flight", "delivered", "failed", "dropped", "batches"}}"""
+        with self._lock:
+            hooks = list(self._hooks.values())
+        return {
+            h.address: {"queued": len(h.queue), "in_flight": h.sending, "delivered": h.delivered,
+                        "failed": h.failed, "dropped": h.dropped, "batches": h.batches}
+            for h in hooks
+        }
+
+    def flush(self, timeout=10.0):
+        """Wait until every queue is drained. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                hooks = list(self._hooks.values())
+            if not any(h.queue or h.sending for h in hooks):
+                return True
+            time.sleep(0.01)
+        return False
+
+    # ---------- 推送 ----------
+
+    def _take(self, hook):
+        """Next batch for hook, or None when the thread should exit."""
+        with hook.cond:
+            if not hook.queue:
+                hook.cond.wait(self.idle_timeout)
+                if not hook.queue:
+                    hook.workers -= 1
+                    return None
+            # 合并窗口从取到第一条消息开始计算，期间的 notify 不会提前结束等待
+            deadline = time.monotonic() + self.window
+            while len(hook.queue) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                hook.cond.wait(remaining)
+            batch = [hook.queue.popleft() for _ in range(min(self.batch_size, len(hook.queue)))]
+            hook.sending += len(batch)
+            return batch
+
+    def _work(self, hook):
+        while True:
+            batch = self._take(hook)
+            if batch is None:
+                close = getattr(self.transport, "close", None)
+                if close is not None:
+                    close()  # 本线程持有的 keep-alive 连接
+                return
+            if not batch:
+                continue
+            try:
+                ok = self._deliver(hook, batch)
+            except Exception:  # 推送线程不能因为意外错误退出
+                ok = False
+            with hook.cond:
+                hook.sending -= len(batch)
+                hook.batches += 1
+                if ok:
+                    hook.delivered += len(batch)
+                else:
+                    hook.failed += len(batch)
+
+    def _deliver(self, hook, batch):
+        body = codec.list_object("messages", batch, agent=hook.address)
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: sign(hook.secret, body),
+            DELIVERY_HEADER: str(uuid.uuid4()),
+        }
+        if not self.allow_http and not hook.url.startswith("https://"):
+            return False
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                status, _ = self.transport.request("POST", hook.url, body, headers)
+            except RelayError as e:
+                if not e.retryable:
+                    return False  # 目标被拒绝 (非公网地址)，重试也没用
+                status = None
+            if status is not None and status < 300:
+                return True
+            if status is not None and status < 500 and status != 429:
+                return False  # 对方明确拒绝，重试也没用
+            if attempt < self.max_attempts:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+        return False
@@ -0,0 +1,57 @@
+"""
+二进制消息体格式 (MessagePack / CBOR)，与 JSON 数据模型相同。
+
+可选依赖: pip install aap-sdk[msgpack] (msgpack) / aap-sdk[cbor] (cbor2)。
+"""
+
+from . import _json
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖: pip install aap-sdk[msgpack]
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # 可选依赖: pip install aap-sdk[cbor]
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# AAPClient(wire_format=...) -> (Content-Type, 编解码库)
+FORMATS = {"json": (JSON, _json), "msgpack": (MSGPACK, msgpack), "cbor": (CBOR, cbor2)}
+
+
+def mimetype(wire_format: str) -> str:
+    """Content-Type for a wire_format name; raises ValueError if unknown or not installed."""
+    if wire_format not in FORMATS:
+        raise ValueError(f"Unknown wire_format {wire_format!r}, expected one of {sorted(FORMATS)}")
+    mime, library = FORMATS[wire_format]
+    if library is None:
+        raise ValueError(f"wire_format={wire_format!r} requires pip install aap-sdk[{wire_format}]")
+    return mime
+
+
+def dumps(obj, mime: str) -> bytes:
+    if mime == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    if mime == CBOR:
+        return cbor2.dumps(obj)
+    return _json.dumps(obj)
+
+
+def loads(data: bytes, content_type: str = JSON):
+    """Decode a body by its Content-Type header; anything not binary is parsed as JSON."""
+    mime = (content_type or "").split(";")[0].strip().lower()
+    if mime == MSGPACK and msgpack:
+        return msgpack.unpackb(data, raw=False)
+    if mime == CBOR and cbor2:
+        return cbor2.loads(data)
+    return _json.loads(data)
+
+
+def loads_response(r):
+    """Decode a requests.Response body."""
+    return loads(r.content, r.headers.get("Content-Type", JSON))
@@ -0,0 +1,41 @@
+"""
+JSON 编解码：安装可选依赖 orjson 时使用 orjson，否则退回标准库 json。
+
+orjson 只支持 64 位整数，超出范围的整数 (解码时会变成 float，编码时报错) 退回标准库。
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # 可选依赖: pip install aap-sdk[fast]
+    orjson = None
+
+
+# 19 位以上的数字串可能是超出 64 位的整数，误报只是多走一次标准库解码
+_DIGITS_ONLY = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_WIDE_NUMBER = b"0" * 19
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+if orjson:
+    def dumps(obj) -> bytes:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # 超出 64 位的整数
+            return _stdlib_dumps(obj)
+
+    def loads(data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if _WIDE_NUMBER in bytes(data).translate(_DIGITS_ONLY):
+            return json.loads(data)
+        return orjson.loads(data)
+else:
+    dumps = _stdlib_dumps
+
+    def loads(data):
+        return json.loads(data)
@@ -0,0 +1,134 @@
+"""
+AAP 地址解析：ai:owner~role#provider
+
+只依赖标准库里启动时已加载的模块，不导入 HTTP 栈和 dataclasses，
+只做地址校验的 CLI / Serverless 函数可以直接 `from aap import parse_address`。
+"""
+
+import re
+
+from .errors import InvalidAddressError
+
+_AAP_REGEX = r"^ai:([^~#]+)~([^#]+)#(.+)$"
+_pattern = None  # 第一次解析时编译
+
+# 输入验证常量
+MAX_OWNER_LENGTH = 64
+MAX_ROLE_LENGTH = 64
+MAX_PROVIDER_LENGTH = 253  # DNS 域名最大长度
+VALID_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_."
+)
+# Provider 可以包含端口号 (localhost:5000, 192.168.1.1:8080)
+VALID_CHARS_PROVIDER = VALID_CHARS | frozenset(":")
+
+
+def _aap_pattern():
+    global _pattern
+    if _pattern is None:
+        _pattern = re.compile(_AAP_REGEX, re.IGNORECASE)
+    return _pattern
+
+
+def __getattr__(name):
+    # AAP_PATTERN 保持可用，但只在被访问时编译
+    if name == "AAP_PATTERN":
+        return _aap_pattern()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _validate_address_component(value: str, name: str, max_len: int, valid_chars=None) -> None:
+    """Validate a single address component."""
+    if not value:
+        raise InvalidAddressError(f"{name} cannot be empty")
+    
+    if len(value) > max_len:
+        raise InvalidAddressError(
+            f"{name} too long (max {max_len} characters): {len(value)}"
+        )
+    
+    # 检查有效字符
+    chars = valid_chars or VALID_CHARS
+    invalid_chars = set(value) - chars
+    if invalid_chars:
+        raise InvalidAddressError(
+            f"Invalid characters in {name}: {invalid_chars}"
+        )
+
+
+class AAPAddress:
+    """Parsed AAP address: ai:owner~role#provider."""
+    
+    # 普通类而不是 @dataclass：导入 dataclasses 会连带加载 inspect，拖慢冷启动
+    def __init__(self, owner: str, role: str, provider: str):
+        self.owner = owner
+        self.role = role
+        self.provider = provider
+    
+    def __repr__(self) -> str:
+        return f"AAPAddress(owner={self.owner!r}, role={self.role!r}, provider={self.provider!r})"
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.owner, self.role, self.provider) == (other.owner, other.role, other.provider)
+    
+    __hash__ = None  # 与 @dataclass(eq=True) 一致：可变对象不可哈希
+    
+    def __str__(self) -> str:
+        return f"ai:{self.owner}~{self.role}#{self.provider}"
+    
+    @property
+    def uri(self) -> str:
+        import urllib.parse
+        return urllib.parse.quote(str(self), safe="")
+
+
+def parse_address(address: str) -> AAPAddress:
+    """
+    Parse an AAP address string into components.
+    
+    Args:
+        address: AAP address string like "ai:tom~novel#molten.com"
+    
+    Returns:
+        AAPAddress object
+    
+    Raises:
+        InvalidAddressError: If address format is invalid
+    """
+    if not address:
+        raise InvalidAddressError("Address cannot be empty")
+    
+    # 总长度限制 (防止 DoS)
+    if len(address) > 500:
+        raise InvalidAddressError("Address too long (max 500 characters)")
+    
+    addr = address.strip()
+    if not addr.lower().startswith("ai:"):
+        raise InvalidAddressError("Address must start with 'ai:'")
+    
+    m = _aap_pattern().match(addr)
+    if not m:
+        raise InvalidAddressError(
+            f"Invalid AAP address format: {address[:50]}... "
+            "Expected: ai:owner~role#provider"
+        )
+    
+    owner, role, provider = m.groups()
+    
+    # 验证各组件
+    _validate_address_component(owner, "owner", MAX_OWNER_LENGTH)
+    _validate_address_component(role, "role", MAX_ROLE_LENGTH)
+    _validate_address_component(provider, "provider", MAX_PROVIDER_LENGTH, VALID_CHARS_PROVIDER)
+    
+    return AAPAddress(owner=owner, role=role, provider=provider.strip().lower())
+
+
+def is_valid_address(address: str) -> bool:
+    """Check if a string is a valid AAP address."""
+    try:
+        parse_address(address)
+        return True
+    except InvalidAddressError:
+        return False
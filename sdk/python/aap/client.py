@@ -0,0 +1,1152 @@
+"""
+AAP Provider 客户端
+
+HTTP 栈 (requests / urllib3) 只在这里导入，`import aap` 时不会加载，
+第一次访问 aap.AAPClient 时才导入本模块。
+"""
+
+import os
+import gzip
+import hashlib
+import secrets
+import urllib.parse
+from contextlib import nullcontext
+from typing import Optional, List, Dict, Any, BinaryIO, Callable, Iterable, Iterator, Union
+from time import monotonic, sleep, perf_counter
+
+import requests
+
+from . import _formats
+from .address import AAPAddress, parse_address
+from .errors import AAPError, MessageError, ProviderError, ResolveError
+from .messages import MessageEnvelope, MessagePayload, ResolveResult
+from .signing import DEFAULT_KEY_CACHE_SIZE, DEFAULT_KEY_CACHE_TTL, KeyCache, SigningKey, verify_batch
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖: pip install aap-sdk[zstd]
+    zstandard = None
+
+# 重试配置
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_RETRY_DELAY = 1.0  # 秒
+
+# 压缩配置：超过阈值且 Provider 声明支持时压缩请求体
+DEFAULT_COMPRESS_THRESHOLD = 1024  # 字节
+CLIENT_ENCODINGS = (["zstd"] if zstandard else []) + ["gzip"]
+
+# providers/info 查询失败 (连不上、超时、5xx) 后多久内不再查询，期间按不支持任何能力处理
+PROVIDER_INFO_NEGATIVE_TTL = 10.0  # 秒
+
+# 大附件 (Blob) 流式传输的块大小
+BLOB_CHUNK_SIZE = 64 * 1024
+
+# 批量注册每次请求的 Agent 数 (Provider 默认上限 REGISTER_BATCH_MAX=1000)
+DEFAULT_REGISTER_BATCH_SIZE = 1000
+
+# 客户端埋点事件，回调收到一个 dict，"event" 为事件名，其余字段见注释
+HOOK_EVENTS = frozenset([
+    "request_start",  # method, url, attempt
+    "request_end",    # method, url, attempt, status, duration, bytes_sent, bytes_received, error
+    "retry",          # method, url, attempt, delay, error
+    "cache_hit",      # cache, key
+    "cache_miss",     # cache, key
+    "resolve",        # address, duration, error
+])
+
+_NO_SPAN = nullcontext()
+
+BlobSource = Union[str, os.PathLike, bytes, BinaryIO, Iterable[bytes]]
+
+
+def _iter_file(f, chunk_size: int = BLOB_CHUNK_SIZE) -> Iterator[bytes]:
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in _iter_file(f):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AAPClient:
+    """
+    Main AAP Client for interacting with Providers.
+    
+    Usage:
+        client = AAPClient()
+        
+        # Resolve an address
+        info = client.resolve("ai:tom~novel#molten.com")
+        
+        # Send a message
+        client.send_message(
+            from_addr="ai:alice~main#provider.com",
+            to_addr="ai:tom~novel#molten.com",
+            content="Hello!"
+        )
+        
+        # Receive messages
+        messages = client.fetch_inbox("ai:tom~novel#molten.com", api_key="...")
+    """
+    
+    def __init__(
+        self,
+        timeout: int = 10,
+        verify_ssl: bool = True,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        compression: bool = True,
+        compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+        hooks: Optional[Dict[str, Iterable[Callable[[Dict], None]]]] = None,
+        tracer: Any = None,
+        signing_key: Optional[SigningKey] = None,
+        key_cache_ttl: float = DEFAULT_KEY_CACHE_TTL,
+        key_cache_size: int = DEFAULT_KEY_CACHE_SIZE,
+        directory: Optional["ProviderDirectory"] = None,
+        wire_format: str = "json"
+    ):
+        """
+        Initialize AAP Client.
+        
+        Args:
+            timeout: Request timeout in seconds
+            verify_ssl: Whether to verify SSL certificates (set to False for local testing)
+            max_retries: Maximum number of retries for failed requests
+            retry_delay: Delay between retries in seconds
+            compression: Compress large message bodies when the Provider supports it
+            compress_threshold: Minimum body size in bytes before compressing
+            hooks: {event: [callback, ...]} for events in HOOK_EVENTS (see add_hook)
+            tracer: Optional OpenTelemetry tracer (opentelemetry.trace.get_tracer(...));
+                spans are emitted for resolve/send/fetch and each HTTP attempt
+            signing_key: Sign outgoing messages with this key (see aap.signing)
+            key_cache_ttl: Seconds a sender public key learned from resolve stays cached
+            key_cache_size: Maximum number of cached sender public keys
+            directory: Seed-node provider list (aap.directory.ProviderDirectory) used
+                instead of providers/info and to find provider base URLs
+            wire_format: "msgpack" or "cbor" to send message bodies in that encoding to
+                Providers that advertise it and to ask for it in responses; "json" (default)
+                uses JSON only
+        """
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.wire_format = wire_format
+        self._mimetype = _formats.mimetype(wire_format)
+        # 不支持该格式的 Provider 会忽略 Accept 返回 JSON，按响应的 Content-Type 解码
+        self._accept = f"{self._mimetype}, {_formats.JSON};q=0.5" if self._mimetype != _formats.JSON else None
+        self._provider_info = {}  # {provider: providers/info 响应或 None (没有该端点)}
+        self._provider_info_failed = {}  # {provider: 查询失败的缓存到期时间 (monotonic)}
+        self.directory = directory
+        self.tracer = tracer
+        self.signing_key = signing_key
+        self.key_cache = KeyCache(key_cache_ttl, key_cache_size)  # {address: public_key}，resolve 时写入
+        self._hooks = {}  # {event: [callback]}，为空时埋点只有一次真值判断
+        for event, callbacks in (hooks or {}).items():
+            for callback in callbacks:
+                self.add_hook(event, callback)
+    
+    def add_hook(self, event: str, callback: Callable[[Dict], None]) -> None:
+        """
+        Register a callback for a client event.
+        
+        Callbacks run synchronously on the calling thread and receive one dict
+        with an "event" key plus the event's fields (see HOOK_EVENTS).
+        
+        Usage:
+            client.add_hook("request_end", lambda e: print(e["url"], e["duration"]))
+        
+        Raises:
+            ValueError: If event is not in HOOK_EVENTS
+        """
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"Unknown hook event: {event}")
+        self._hooks.setdefault(event, []).append(callback)
+    
+    def remove_hook(self, event: str, callback: Callable[[Dict], None]) -> None:
+        """Unregister a callback added with add_hook."""
+        callbacks = self._hooks.get(event, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._hooks.pop(event, None)
+    
+    def _emit(self, event: str, **fields) -> None:
+        callbacks = self._hooks.get(event)
+        if callbacks:
+            fields["event"] = event
+            for callback in callbacks:
+                callback(fields)
+    
+    def _span(self, name: str, attributes: Dict):
+        """Start an OpenTelemetry span if a tracer is configured."""
+        if self.tracer is None:
+            return _NO_SPAN
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+    
+    def _request_with_retry(
+        self, method: str, url: str, attempts: Optional[int] = None, **kwargs
+    ) -> requests.Response:
+        """
+        Make HTTP request with retry logic.
+        
+        Connection errors, timeouts and 5xx responses are retried; 4xx responses are not.
+        
+        Args:
+            method: HTTP method (GET, POST, etc.)
+            url: Request URL
+            attempts: Maximum attempts (default max_retries); 1 for requests that must not be repeated
+            **kwargs: Additional arguments for requests
+            
+        Returns:
+            Response object
+            
+        Raises:
+            ProviderError: If the request was rejected (4xx) or all retries fail
+        """
+        last_error = None
+        attempts = attempts or self.max_retries
+        if self._accept:
+            kwargs["headers"] = {"Accept": self._accept, **(kwargs.get("headers") or {})}
+        
+        for attempt in range(1, attempts + 1):
+            if self._hooks:
+                self._emit("request_start", method=method, url=url, attempt=attempt)
+                start = perf_counter()
+            
+            r = None
+            error = None
+            with self._span(f"HTTP {method}", {"http.method": method, "http.url": url, "aap.attempt": attempt}) as span:
+                try:
+                    r = requests.request(
+                        method=method,
+                        url=url,
+                        timeout=self.timeout,
+                        verify=self.verify_ssl,
+                        **kwargs
+                    )
+                    if span is not None:
+                        span.set_attribute("http.status_code", r.status_code)
+                    r.raise_for_status()
+                except requests.RequestException as e:
+                    error = e
+                    if span is not None:
+                        span.record_exception(e)
+            
+            if self._hooks:
+                self._emit_request_end(method, url, attempt, perf_counter() - start, r, error)
+            if error is None:
+                return r
+            
+            last_error = error
+            if error.response is not None and error.response.status_code < 500:
+                # 4xx：请求本身被拒绝，重试结果一样
+                raise ProviderError(
+                    f"{method} {url} rejected with HTTP {error.response.status_code}"
+                ) from error
+            if attempt < attempts:
+                delay = self.retry_delay * attempt  # 指数退避
+                if self._hooks:
+                    self._emit("retry", method=method, url=url, attempt=attempt, delay=delay, error=error)
+                sleep(delay)
+        
+        raise ProviderError(
+            f"Provider unreachable after {attempts} attempts: {url}"
+        ) from last_error
+    
+    def _emit_request_end(self, method, url, attempt, duration, response, error) -> None:
+        if response is None and error is not None:
+            response = error.response
+        request = response.request if response is not None else getattr(error, "request", None)
+        body = request.body if request is not None else None
+        
+        self._emit(
+            "request_end",
+            method=method,
+            url=url,
+            attempt=attempt,
+            status=response.status_code if response is not None else None,
+            duration=duration,
+            bytes_sent=len(body) if isinstance(body, (bytes, str)) else 0,
+            bytes_received=len(response.content) if response is not None else 0,
+            error=error
+        )
+    
+    def _get_url(self, provider: str, path: str) -> str:
+        """Get URL from the provider directory if listed there, else http for localhost and https otherwise."""
+        if self.directory is not None:
+            base_url = self.directory.base_url(provider)
+            if base_url:
+                return base_url + path
+        if "localhost" in provider or "127.0.0.1" in provider:
+            return f"http://{provider}{path}"
+        return f"https://{provider}{path}"
+    
+    def _resolve_provider(self, address: str) -> dict:
+        """
+        Resolve Provider endpoints from AAP address (v0.04 Stage 1: Direct).
+        
+        This method extracts the provider from an AAP address and returns
+        the known endpoints. Stage 1 uses direct connection (domain-based URL).
+        
+        Future stages may add DNS SRV discovery with fallback to direct.
+        
+        Args:
+            address: AAP address string
+        
+        Returns:
+            dict with provider info:
+                - provider: provider domain
+                - resolve_url: resolve API URL
+                - inbox_url: inbox API URL (base)
+                - discovery_method: "direct", "seed" or "gossip"
+        """
+        addr = parse_address(address)
+        provider = addr.provider
+        base_url = self._get_url(provider, "")
+        
+        entry = self.directory.get(provider) if self.directory is not None else None
+        
+        return {
+            "provider": provider,
+            "resolve_url": f"{base_url}/api/v1/resolve",
+            "inbox_url": f"{base_url}/api/v1/inbox",
+            "discovery_method": entry.get("discovery_method", "seed") if entry else "direct"
+        }
+    
+    def get_provider_info(self, provider: str) -> dict:
+        """
+        Get Provider info (optional endpoint).
+        
+        Calls /api/v1/providers/info if available.
+        
+        Args:
+            provider: Provider domain
+        
+        Returns:
+            dict with provider info, or None if endpoint not available
+        """
+        try:
+            return self._fetch_provider_info(provider)
+        except (requests.RequestException, ValueError):
+            return None
+    
+    def _fetch_provider_info(self, provider: str) -> Optional[dict]:
+        """providers/info, or None on 404. Raises RequestException / ValueError on other failures."""
+        url = self._get_url(provider, "/api/v1/providers/info")
+        r = requests.get(url, timeout=self.timeout, verify=self.verify_ssl)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json()
+    
+    def _capabilities(self, provider: str) -> Optional[dict]:
+        """
+        providers/info of provider (or its directory entry), fetched once per
+        provider and cached on the client. None if the endpoint is not available.
+        
+        A failed query is cached only for PROVIDER_INFO_NEGATIVE_TTL seconds, so one
+        transient error does not turn off compression or batching for good.
+        """
+        if provider in self._provider_info:
+            if self._hooks:
+                self._emit("cache_hit", cache="provider_info", key=provider)
+        elif self._provider_info_failed.get(provider, 0) > monotonic():
+            if self._hooks:
+                self._emit("cache_hit", cache="provider_info", key=provider)
+            return None
+        else:
+            # 种子节点目录里的条目就是该 Provider 的 providers/info，省一次请求
+            entry = self.directory.get(provider) if self.directory is not None else None
+            if entry is not None:
+                if self._hooks:
+                    self._emit("cache_hit", cache="directory", key=provider)
+            else:
+                if self._hooks:
+                    self._emit("cache_miss", cache="provider_info", key=provider)
+                try:
+                    entry = self._fetch_provider_info(provider)
+                except (requests.RequestException, ValueError):
+                    self._provider_info_failed[provider] = monotonic() + PROVIDER_INFO_NEGATIVE_TTL
+                    return None
+            self._provider_info_failed.pop(provider, None)
+            self._provider_info[provider] = entry
+        return self._provider_info[provider]
+    
+    def _request_encoding(self, provider: str) -> Optional[str]:
+        """Pick a Content-Encoding for request bodies sent to provider from its "compression" capability."""
+        info = self._capabilities(provider)
+        if not info or "compression" not in info.get("capabilities", []):
+            return None
+        supported = info.get("compression", {}).get("encodings", [])
+        for encoding in CLIENT_ENCODINGS:
+            if encoding in supported:
+                return encoding
+        return None
+    
+    def _body_format(self, provider: str) -> str:
+        """Content-Type for request bodies sent to provider: wire_format if it advertises it, else JSON."""
+        if self._mimetype == _formats.JSON:
+            return _formats.JSON
+        info = self._capabilities(provider)
+        if info and self._mimetype in info.get("content_types", []):
+            return self._mimetype
+        return _formats.JSON
+    
+    def _encode_body(self, body: Dict, provider: str) -> tuple:
+        """Serialize a body in the negotiated format, compressing it if worthwhile. Returns (data, headers)."""
+        mime = self._body_format(provider)
+        data = _formats.dumps(body, mime)
+        headers = {"Content-Type": mime}
+        
+        if self.compression and len(data) >= self.compress_threshold:
+            encoding = self._request_encoding(provider)
+            if encoding == "zstd":
+                data = zstandard.ZstdCompressor().compress(data)
+                headers["Content-Encoding"] = encoding
+            elif encoding == "gzip":
+                data = gzip.compress(data)
+                headers["Content-Encoding"] = encoding
+        
+        return data, headers
+    
+    def register_many(
+        self,
+        agents: Iterable[Union[str, Dict]],
+        atomic: bool = False,
+        batch_size: int = DEFAULT_REGISTER_BATCH_SIZE
+    ) -> List[Dict]:
+        """
+        Register many agents with one POST /api/agent/register:batch per batch_size agents
+        on each Provider.
+        
+        Addresses are checked with parse_address first, so a malformed one fails before
+        anything is sent. Providers that do not advertise "register_batch" get one
+        POST /api/agent/register per agent.
+        
+        Registration is not idempotent, so each POST is sent once and never retried: a
+        retry after a timeout could be rejected as ALREADY_EXISTS and lose the API keys
+        the first attempt created. After a ProviderError, resolve the addresses to see
+        which were registered.
+        
+        Args:
+            agents: AAP addresses, or dicts with "aap_address" and optional "model",
+                "public_key" and "webhook_url"
+            atomic: Each batch is registered all-or-nothing (applies per request)
+            batch_size: Agents per request
+        
+        Returns:
+            One result per agent in input order: {"status": 201, "aap_address": ...,
+            "api_key": ..., ...} or {"status": 409, "error": {"code": ..., "message": ...}}
+        
+        Raises:
+            InvalidAddressError: A malformed address (nothing was sent)
+            ProviderError: Provider unreachable, or an atomic batch was rejected
+        """
+        items = []
+        by_provider = {}  # {provider: [items 下标]}
+        for agent in agents:
+            item = dict(agent) if isinstance(agent, dict) else {"aap_address": agent}
+            addr = parse_address(item.get("aap_address", ""))
+            item["aap_address"] = str(addr)
+            by_provider.setdefault(addr.provider, []).append(len(items))
+            items.append(item)
+        
+        results = [None] * len(items)
+        for provider, indexes in by_provider.items():
+            info = self._capabilities(provider)
+            if not info or "register_batch" not in info.get("capabilities", []):
+                if atomic:
+                    raise ProviderError(f"{provider} does not support batch registration (atomic=True)")
+                url = self._get_url(provider, "/api/agent/register")
+                for i in indexes:
+                    results[i] = self._register(url, items[i], provider)
+                continue
+            
+            url = self._get_url(provider, "/api/agent/register:batch")
+            for start in range(0, len(indexes), batch_size):
+                chunk = indexes[start:start + batch_size]
+                body = {"agents": [items[i] for i in chunk], "atomic": atomic}
+                with self._span("aap.register_many", {"aap.provider": provider, "aap.batch_size": len(chunk)}):
+                    response = self._register(url, body, provider)
+                if "error" in response:
+                    errors = "; ".join(f"agents[{chunk[e['index']]}]: {e['code']}" for e in response.get("errors", []))
+                    raise ProviderError(f"Batch registration rejected by {provider}: {errors or response['error']}")
+                for i, result in zip(chunk, response["results"]):
+                    results[i] = result
+        return results
+    
+    def _register(self, url: str, body: Dict, provider: str) -> Dict:
+        """POST a registration body once; a 4xx rejection is returned as {"status", "error"} instead of raised."""
+        data, headers = self._encode_body(body, provider)
+        try:
+            r = self._request_with_retry("POST", url, attempts=1, data=data, headers=headers)
+        except ProviderError as e:
+            response = getattr(e.__cause__, "response", None)
+            if response is None or not 400 <= response.status_code < 500:
+                raise
+            try:
+                result = _formats.loads_response(response)
+            except ValueError:
+                raise e from None
+            result["status"] = response.status_code
+            return result
+        result = _formats.loads_response(r)
+        if r.status_code == 201:  # 单个注册的响应
+            result = {"status": 201, **{k: v for k, v in result.items() if k not in ("success", "message")}}
+        return result
+    
+    def resolve(self, address: str) -> ResolveResult:
+        """
+        Resolve an AAP address to get provider info.
+        
+        Args:
+            address: AAP address to resolve
+        
+        Returns:
+            ResolveResult with provider endpoints
+        
+        Raises:
+            InvalidAddressError: If address is invalid
+            ResolveError: If resolve fails
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, "/api/v1/resolve")
+        params = {"address": str(addr)}
+        
+        start = perf_counter()
+        error = None
+        try:
+            with self._span("aap.resolve", {"aap.address": str(addr), "aap.provider": addr.provider}):
+                r = self._request_with_retry("GET", url, params=params)
+                data = _formats.loads_response(r)
+                result = ResolveResult.from_dict(data)
+                self.key_cache.put(str(addr), result.public_key)
+                return result
+        except ProviderError as e:
+            error = e
+            raise ResolveError(f"Failed to resolve {address}: {e}")
+        finally:
+            if self._hooks:
+                self._emit("resolve", address=str(addr), duration=perf_counter() - start, error=error)
+    
+    def send_message(
+        self,
+        from_addr: str,
+        to_addr: str,
+        content: str,
+        message_type: str = "private",
+        reply_to: Optional[str] = None,
+        content_type: str = "text/plain",
+        metadata: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        content_size: Optional[int] = None
+    ) -> Dict:
+        """
+        Send a message to another Agent.
+        
+        Args:
+            from_addr: Sender's AAP address
+            to_addr: Recipient's AAP address
+            content: Message content
+            message_type: "private" or "public" (default: private)
+            reply_to: Original message ID if replying
+            content_type: MIME type (default: text/plain)
+            metadata: Optional metadata dict
+            idempotency_key: Optional key to prevent duplicate messages
+            content_hash: Hash of a blob already uploaded to the sender's Provider
+            content_size: Size of that blob in bytes
+        
+        Returns:
+            API response dict
+        
+        Raises:
+            MessageError: If send fails
+        """
+        from_parsed = parse_address(from_addr)
+        to_parsed = parse_address(to_addr)
+        
+        with self._span("aap.send_message", {
+            "aap.from": str(from_parsed),
+            "aap.to": str(to_parsed),
+            "aap.provider": to_parsed.provider,
+            "aap.message_type": message_type,
+            "aap.content_type": content_type
+        }):
+            return self._send_message(
+                from_parsed, to_parsed, content, message_type, reply_to,
+                content_type, metadata, idempotency_key, content_hash, content_size
+            )
+    
+    def _send_message(
+        self,
+        from_parsed: AAPAddress,
+        to_parsed: AAPAddress,
+        content: str,
+        message_type: str,
+        reply_to: Optional[str],
+        content_type: str,
+        metadata: Optional[Dict],
+        idempotency_key: Optional[str],
+        content_hash: Optional[str],
+        content_size: Optional[int]
+    ) -> Dict:
+        to_addr = str(to_parsed)
+        resolve_info = self.resolve(to_addr)
+        inbox_url = resolve_info.receive.get("inbox_url")
+        
+        if not inbox_url:
+            raise MessageError(f"No inbox URL for {to_addr}")
+        
+        envelope = MessageEnvelope(
+            from_addr=str(from_parsed),
+            to_addr=str(to_parsed),
+            message_type=message_type,
+            reply_to=reply_to,
+            content_type=content_type,
+            content_hash=content_hash,
+            content_size=content_size
+        )
+        
+        payload = MessagePayload(content=content, metadata=metadata)
+        
+        body = {
+            "envelope": envelope.to_dict(),
+            "payload": payload.to_dict()
+        }
+        if self.signing_key is not None:
+            body["envelope"]["signature"] = self.signing_key.sign(body["envelope"], body["payload"])
+        
+        data, headers = self._encode_body(body, to_parsed.provider)
+        
+        # 添加幂等性 key
+        if idempotency_key:
+            headers["X-Idempotency-Key"] = idempotency_key
+        elif message_type == "private":
+            headers["X-Idempotency-Key"] = secrets.token_urlsafe(16)
+        
+        try:
+            r = self._request_with_retry(
+                "POST",
+                inbox_url,
+                data=data,
+                headers=headers
+            )
+            return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to send message: {e}")
+    
+    def _blob_url(self, provider: str, content_hash: str = "") -> str:
+        digest = content_hash.split(":", 1)[-1]
+        return self._get_url(provider, "/api/v1/blobs" + (f"/{digest}" if digest else ""))
+    
+    def upload_blob(self, provider: str, source: BlobSource, api_key: str) -> Dict:
+        """
+        Stream content to your own Provider's blob store.
+        
+        Blobs are content-addressed: uploading the same content twice stores it once.
+        Uploads count against the agent's blob quota, are streamed and are not retried.
+        
+        Args:
+            provider: Provider domain (the one that issued api_key)
+            source: File path (str or PathLike), bytes, binary file object,
+                or iterable of bytes chunks
+            api_key: Your API key (needs messages:send)
+        
+        Returns:
+            dict with "content_hash" ("sha256:<hex>"), "size" and "deduplicated"
+        
+        Raises:
+            MessageError: If the upload fails or the Provider reports a different hash
+        """
+        url = self._blob_url(provider)
+        headers = {"Content-Type": "application/octet-stream", "Authorization": f"Bearer {api_key}"}
+        
+        if isinstance(source, (str, os.PathLike)):
+            # 已知哈希：先 HEAD 检查，Provider 已有相同内容就不必再传
+            digest = _file_sha256(source)
+            try:
+                r = requests.head(f"{url}/{digest}", timeout=self.timeout, verify=self.verify_ssl)
+                if r.status_code == 200:
+                    return {
+                        "content_hash": "sha256:" + digest,
+                        "size": os.path.getsize(source),
+                        "deduplicated": True
+                    }
+            except requests.RequestException:
+                pass
+            headers["X-Content-SHA256"] = digest
+            with open(source, "rb") as f:
+                return self._post_blob(url, _iter_file(f), headers)
+        
+        if isinstance(source, bytes):
+            return self._post_blob(url, [source], headers)
+        if hasattr(source, "read"):
+            return self._post_blob(url, _iter_file(source), headers)
+        return self._post_blob(url, source, headers)
+    
+    def _post_blob(self, url: str, chunks: Iterable[bytes], headers: Dict) -> Dict:
+        h = hashlib.sha256()
+        
+        def hashed():
+            for chunk in chunks:
+                h.update(chunk)
+                yield chunk
+        
+        try:
+            r = requests.post(
+                url,
+                data=hashed(),
+                headers=headers,
+                timeout=self.timeout,
+                verify=self.verify_ssl
+            )
+            r.raise_for_status()
+        except requests.RequestException as e:
+            raise MessageError(f"Failed to upload blob: {e}") from e
+        
+        result = _formats.loads_response(r)
+        if result.get("content_hash") != "sha256:" + h.hexdigest():
+            raise MessageError(f"Blob hash mismatch: Provider stored {result.get('content_hash')}")
+        return result
+    
+    def send_blob(
+        self,
+        from_addr: str,
+        to_addr: str,
+        source: BlobSource,
+        api_key: str,
+        content_type: str = "application/octet-stream",
+        caption: str = "",
+        message_type: str = "private",
+        reply_to: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict:
+        """
+        Send large content as a blob: upload it to the sender's own Provider,
+        then send a message whose envelope carries the content hash and size.
+        The recipient downloads it from the sender's Provider (see iter_blob).
+        
+        Args:
+            from_addr: Sender's AAP address
+            to_addr: Recipient's AAP address
+            source: Content to upload (see upload_blob)
+            api_key: Sender's API key
+            content_type: MIME type of the blob
+            caption: Short text sent as payload.content
+        
+        Returns:
+            API response dict of the message send
+        """
+        blob = self.upload_blob(parse_address(from_addr).provider, source, api_key)
+        
+        return self.send_message(
+            from_addr=from_addr,
+            to_addr=to_addr,
+            content=caption,
+            message_type=message_type,
+            reply_to=reply_to,
+            content_type=content_type,
+            metadata=metadata,
+            idempotency_key=idempotency_key,
+            content_hash=blob["content_hash"],
+            content_size=blob["size"]
+        )
+    
+    def iter_blob(
+        self,
+        address: str,
+        content_hash: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        chunk_size: int = BLOB_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Stream a blob from the Provider of `address`.
+        
+        Args:
+            address: AAP address whose Provider holds the blob: the sender
+                (envelope from_addr) of the message that references it
+            content_hash: "sha256:<hex>" from the message envelope
+            start: First byte to fetch (inclusive), for range requests
+            end: Last byte to fetch (inclusive)
+            chunk_size: Size of yielded chunks
+        
+        Yields:
+            bytes chunks
+        """
+        addr = parse_address(address)
+        url = self._blob_url(addr.provider, content_hash)
+        
+        headers = {}
+        if start is not None or end is not None:
+            headers["Range"] = f"bytes={start or 0}-{'' if end is None else end}"
+        
+        try:
+            r = requests.get(url, headers=headers, stream=True,
+                             timeout=self.timeout, verify=self.verify_ssl)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            raise MessageError(f"Failed to fetch blob: {e}") from e
+        
+        with r:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                yield chunk
+    
+    def save_blob(self, address: str, content_hash: str, path) -> int:
+        """
+        Download a blob to a file, verifying its hash.
+        
+        Returns:
+            Number of bytes written
+        
+        Raises:
+            MessageError: If the download fails or the content does not match the hash
+        """
+        h = hashlib.sha256()
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in self.iter_blob(address, content_hash):
+                h.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        
+        if content_hash.split(":", 1)[-1] != h.hexdigest():
+            os.remove(path)
+            raise MessageError(f"Downloaded blob does not match {content_hash}")
+        return size
+    
+    def sender_key(self, address: str) -> str:
+        """
+        Public key of address ("" if it publishes none), from the key cache
+        or by resolving the address.
+        
+        Raises:
+            InvalidAddressError: If address is invalid
+            ResolveError: If the address cannot be resolved
+        """
+        address = str(parse_address(address))
+        public_key = self.key_cache.get(address)
+        if public_key is not None:
+            if self._hooks:
+                self._emit("cache_hit", cache="public_key", key=address)
+            return public_key
+        if self._hooks:
+            self._emit("cache_miss", cache="public_key", key=address)
+        return self.resolve(address).public_key
+    
+    def verify_messages(self, messages: List[Dict]) -> List[Optional[bool]]:
+        """
+        Verify the signatures of inbox messages in one batch.
+        
+        Sender keys come from the key cache, resolving each unknown sender once.
+        
+        Returns:
+            Per message: True/False for a signed message whose sender publishes
+            a key, None when the message is unsigned or no key is available
+        """
+        keys = {}  # {from_addr: public_key}，解析失败记为 ""
+        batch = []
+        for message in messages:
+            envelope = message.get("envelope") or {}
+            sender = envelope.get("from_addr")
+            if not envelope.get("signature") or not sender:
+                continue
+            if sender not in keys:
+                try:
+                    keys[sender] = self.sender_key(sender)
+                except AAPError:
+                    keys[sender] = ""
+            if keys[sender]:
+                batch.append((keys[sender], envelope, message.get("payload") or {}))
+        
+        verified = iter(verify_batch(batch))
+        results = []
+        for message in messages:
+            envelope = message.get("envelope") or {}
+            signed = envelope.get("signature") and keys.get(envelope.get("from_addr"))
+            results.append(next(verified) if signed else None)
+        return results
+    
+    def fetch_inbox(
+        self,
+        address: str,
+        api_key: str,
+        limit: int = 20,
+        verify: bool = False
+    ) -> List[Dict]:
+        """
+        Fetch messages from inbox.
+        
+        Args:
+            address: Your AAP address
+            api_key: Your API key
+            limit: Max messages to fetch
+            verify: Check sender signatures and set message["verified"]
+                (True/False, or None for unsigned messages; see verify_messages)
+        
+        Returns:
+            List of message dicts
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, "/api/v1/inbox")
+        
+        headers = {"Authorization": f"Bearer {api_key}"}
+        params = {"limit": limit}
+        
+        try:
+            with self._span("aap.fetch_inbox", {"aap.address": str(addr), "aap.provider": addr.provider}):
+                r = self._request_with_retry("GET", url, headers=headers, params=params)
+                messages = _formats.loads_response(r).get("messages", [])
+        except ProviderError as e:
+            raise MessageError(f"Failed to fetch inbox: {e}")
+        
+        if verify:
+            for message, verified in zip(messages, self.verify_messages(messages)):
+                message["verified"] = verified
+        return messages
+    
+    def search_inbox(
+        self,
+        address: str,
+        api_key: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        from_addr: Optional[str] = None,
+        reply_to: Optional[str] = None,
+        content_type: Optional[str] = None,
+        message_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> Dict:
+        """
+        Fetch inbox messages matching server-side filters.
+        
+        All filters are combined; the Provider answers from its indexes
+        instead of returning the whole inbox.
+        
+        Args:
+            address: Your AAP address
+            api_key: Your API key
+            limit: Max messages per page
+            cursor: next_cursor of the previous page (older messages)
+            from_addr: Only messages from this address
+            reply_to: Only replies to this message id
+            content_type: Only this content type
+            message_type: Only this message type
+            since: Received at or after (ISO 8601 or epoch seconds)
+            until: Received at or before (ISO 8601 or epoch seconds)
+            query: Full-text search over payload content (if the Provider enables it)
+        
+        Returns:
+            dict with "messages" (oldest first), "count" and "next_cursor"
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, "/api/v1/inbox")
+        headers = {"Authorization": f"Bearer {api_key}"}
+        params = {"limit": limit, "cursor": cursor, "from_addr": from_addr, "reply_to": reply_to,
+                  "content_type": content_type, "message_type": message_type,
+                  "since": since, "until": until, "q": query}
+        params = {k: v for k, v in params.items() if v is not None}
+        if len(params) == 1:
+            params["cursor"] = ""  # 没有过滤条件时也要带上 next_cursor
+        
+        try:
+            with self._span("aap.search_inbox", {"aap.address": str(addr), "aap.provider": addr.provider}):
+                r = self._request_with_retry("GET", url, headers=headers, params=params)
+                return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to search inbox: {e}")
+    
+    def fetch_thread(
+        self,
+        address: str,
+        api_key: str,
+        message_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Fetch the conversation thread containing a message.
+        
+        message_id may be any message in the thread. Messages come back in
+        arrival order, starting with the root; each envelope's reply_to is
+        its parent id.
+        
+        Args:
+            address: Your AAP address
+            api_key: Your API key
+            message_id: Id of any message in the thread
+            limit: Max messages per page
+            cursor: next_cursor of the previous page
+        
+        Returns:
+            dict with "thread_id", "messages", "count" and "next_cursor"
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, f"/api/v1/threads/{urllib.parse.quote(message_id, safe='')}")
+        headers = {"Authorization": f"Bearer {api_key}"}
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        
+        try:
+            with self._span("aap.fetch_thread", {"aap.address": str(addr), "aap.provider": addr.provider}):
+                r = self._request_with_retry("GET", url, headers=headers, params=params)
+                return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to fetch thread: {e}")
+    
+    def publish(
+        self,
+        from_addr: str,
+        content: str,
+        content_type: str = "text/plain",
+        metadata: Optional[Dict] = None,
+        api_key: Optional[str] = None
+    ) -> Dict:
+        """
+        Publish to public feed.
+        
+        Providers only accept posts that prove the author: pass api_key to
+        publish through your Provider's outbox, or sign with signing_key.
+        Each post carries a fresh X-Idempotency-Key, so a retry after a timeout
+        does not publish it twice.
+        
+        Args:
+            from_addr: Sender's AAP address
+            content: Post content
+            content_type: MIME type
+            metadata: Optional metadata
+            api_key: Your API key (needs messages:send)
+        
+        Returns:
+            API response dict
+        
+        Raises:
+            MessageError: Neither api_key nor signing_key is set, or publishing failed
+        """
+        feed_addr = "ai:feed~public#" + parse_address(from_addr).provider
+        idempotency_key = secrets.token_urlsafe(16)
+        if api_key is None:
+            if self.signing_key is None:
+                raise MessageError(
+                    "publish requires api_key (your API key) or a client signing_key; "
+                    "Providers reject unauthenticated feed posts"
+                )
+            return self.send_message(
+                from_addr=from_addr,
+                to_addr=feed_addr,
+                content=content,
+                message_type="public",
+                content_type=content_type,
+                metadata=metadata,
+                idempotency_key=idempotency_key
+            )
+        
+        addr = parse_address(from_addr)
+        url = self._get_url(addr.provider, "/api/v1/outbox")
+        body = {
+            "envelope": MessageEnvelope(
+                from_addr=str(addr),
+                to_addr=feed_addr,
+                message_type="public",
+                content_type=content_type
+            ).to_dict(),
+            "payload": MessagePayload(content=content, metadata=metadata).to_dict()
+        }
+        if self.signing_key is not None:
+            body["envelope"]["signature"] = self.signing_key.sign(body["envelope"], body["payload"])
+        data, headers = self._encode_body(body, addr.provider)
+        headers["Authorization"] = f"Bearer {api_key}"
+        headers["X-Idempotency-Key"] = idempotency_key
+        
+        try:
+            r = self._request_with_retry("POST", url, data=data, headers=headers)
+            return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to publish: {e}")
+
+
+    def follow(self, address: str, api_key: str, author: str, unfollow: bool = False) -> Dict:
+        """
+        Follow (or unfollow) an author's public feed on your Provider.
+        
+        Args:
+            address: Your AAP address
+            api_key: Your API key
+            author: AAP address of the author to follow
+            unfollow: Remove the subscription instead
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, "/api/v1/feed/follow")
+        headers = {"Authorization": f"Bearer {api_key}"}
+        
+        try:
+            r = self._request_with_retry(
+                "DELETE" if unfollow else "POST",
+                url,
+                json={"address": str(parse_address(author))},
+                headers=headers
+            )
+            return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to update follow: {e}")
+    
+    def fetch_feed(
+        self,
+        address: str,
+        api_key: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        unread: bool = False
+    ) -> Dict:
+        """
+        Fetch posts from authors you follow.
+        
+        Args:
+            address: Your AAP address
+            api_key: Your API key
+            limit: Max posts per page
+            cursor: next_cursor of the previous page (newest-first paging)
+            unread: Only posts since the last unread fetch, oldest first
+        
+        Returns:
+            dict with "posts", "count" and "next_cursor"
+        """
+        addr = parse_address(address)
+        url = self._get_url(addr.provider, "/api/v1/feed")
+        headers = {"Authorization": f"Bearer {api_key}"}
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        if unread:
+            params["unread"] = "true"
+        
+        try:
+            r = self._request_with_retry("GET", url, headers=headers, params=params)
+            return _formats.loads_response(r)
+        except ProviderError as e:
+            raise MessageError(f"Failed to fetch feed: {e}")
+
+
+def create_client() -> AAPClient:
+    """Create a new AAP client instance."""
+    return AAPClient()
+
+
+# Convenience functions
+resolve = lambda addr: create_client().resolve(addr)
+send = lambda from_addr, to_addr, content: create_client().send_message(from_addr, to_addr, content)
@@ -0,0 +1,207 @@
+"""
+种子节点 Provider 目录 (v0.04 阶段4)
+
+从种子节点下载一次完整的 Provider 列表，之后用 version 只同步增量。列表保存在
+本地缓存文件里，启动时用 mmap 打开：只扫描每行开头的 Provider 名建立索引，
+条目在第一次用到时才解析 JSON，Provider 很多时冷启动也不需要解析整个文件。
+
+缓存文件格式 (UTF-8)：
+    AAPDIR1 {"directory_id": "...", "version": 42, "seed": "https://seed..."}
+    provider.com<TAB>{"provider": "provider.com", "capabilities": [...], ...}
+    ...
+
+AAPClient(directory=...) 用目录里的 capabilities / compression 代替
+GET /api/v1/providers/info，用 base_url 代替按域名推断的地址。
+"""
+
+import mmap
+import os
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from . import _json
+from .errors import ProviderError
+
+CACHE_MAGIC = b"AAPDIR1 "
+
+
+class ProviderDirectory:
+    """
+    Local copy of a seed node's provider list.
+
+    Usage:
+        directory = ProviderDirectory(["https://seed1.example", "https://seed2.example"],
+                                      cache_path="~/.cache/aap/directory")
+        directory.sync()                 # 首次全量，之后只取增量
+        client = AAPClient(directory=directory)
+    """
+
+    def __init__(
+        self,
+        seeds: Iterable[str],
+        cache_path: Optional[str] = None,
+        timeout: int = 10,
+        verify_ssl: bool = True
+    ):
+        self.seeds = [seed.rstrip("/") for seed in seeds]
+        self.cache_path = os.path.expanduser(cache_path) if cache_path else None
+        self.timeout = timeout
+        self.verify_ssl = verify_ssl
+        self.directory_id = None  # 列表来自哪个种子节点实例，version 只在同一实例内有意义
+        self.version = 0
+        self.seed = None
+        self._entries = {}   # {provider: entry}，已解析或同步得到的条目
+        self._offsets = {}   # {provider: (start, end)}，mmap 中尚未解析的条目
+        self._mmap = None
+        if self.cache_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._offsets)
+
+    def __contains__(self, provider: str) -> bool:
+        return provider in self._entries or provider in self._offsets
+
+    def providers(self) -> List[str]:
+        return sorted(set(self._entries) | set(self._offsets))
+
+    def get(self, provider: str) -> Optional[Dict]:
+        """Directory entry for provider (capabilities, compression, base_url...), or None."""
+        entry = self._entries.get(provider)
+        if entry is None:
+            span = self._offsets.pop(provider, None)
+            if span is None:
+                return None
+            entry = self._entries[provider] = _json.loads(self._mmap[span[0]:span[1]])
+        return entry
+
+    def base_url(self, provider: str) -> Optional[str]:
+        entry = self.get(provider)
+        return entry.get("base_url") if entry else None
+
+    # ---------- 本地缓存 ----------
+
+    def load(self) -> bool:
+        """Map the cache file and index its lines. Returns False if there is no usable cache."""
+        try:
+            f = open(self.cache_path, "rb")
+        except FileNotFoundError:
+            return False
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        end = mm.find(b"\n")
+        try:
+            if mm[:len(CACHE_MAGIC)] != CACHE_MAGIC or end < 0:
+                raise ValueError("not a directory cache")
+            header = _json.loads(mm[len(CACHE_MAGIC):end])
+        except ValueError:
+            mm.close()
+            return False
+
+        offsets = {}
+        pos = end + 1
+        size = len(mm)
+        while pos < size:
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                end = size
+            tab = mm.find(b"\t", pos, end)
+            if tab > pos:
+                offsets[mm[pos:tab].decode("utf-8")] = (tab + 1, end)
+            pos = end + 1
+
+        self._close()
+        self._mmap = mm
+        self._offsets = offsets
+        self._entries = {}
+        self.directory_id = header.get("directory_id")
+        self.version = header.get("version", 0)
+        self.seed = header.get("seed")
+        return True
+
+    def save(self) -> None:
+        """Write the cache file atomically (temp file + rename)."""
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        header = {"directory_id": self.directory_id, "version": self.version, "seed": self.seed}
+        with open(tmp, "wb") as f:
+            f.write(CACHE_MAGIC + _json.dumps(header) + b"\n")
+            for provider in self.providers():
+                entry = self._entries.get(provider)
+                if entry is not None:
+                    data = _json.dumps(entry)
+                else:
+                    start, end = self._offsets[provider]
+                    data = self._mmap[start:end]  # 没改过的条目原样拷贝，不解析
+                f.write(provider.encode("utf-8") + b"\t" + data + b"\n")
+        self._close()  # Windows 上不能替换仍被映射的文件
+        os.replace(tmp, self.cache_path)
+        self.load()
+
+    def _close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    # ---------- 同步 ----------
+
+    def _apply(self, data: Dict) -> int:
+        if data.get("full"):
+            # 全量：用新列表替换，保持已映射的旧文件可读直到重写
+            self._entries = {}
+            self._offsets = {}
+        for entry in data.get("providers", []):
+            self._offsets.pop(entry["provider"], None)
+            self._entries[entry["provider"]] = entry
+        for provider in data.get("removed", []):
+            self._entries.pop(provider, None)
+            self._offsets.pop(provider, None)
+        self.directory_id = data.get("directory_id")
+        self.version = data.get("version", 0)
+        return len(data.get("providers", [])) + len(data.get("removed", []))
+
+    def _fetch(self, seed: str) -> int:
+        changes = 0
+        while True:
+            params = {}
+            if self.seed == seed and self.directory_id:
+                params = {"since": self.version, "directory_id": self.directory_id}
+            r = requests.get(f"{seed}/api/v1/directory", params=params,
+                             timeout=self.timeout, verify=self.verify_ssl)
+            r.raise_for_status()
+            data = _json.loads(r.content)
+            self.seed = seed
+            changes += self._apply(data)
+            if not data.get("more"):
+                return changes
+
+    def sync(self) -> int:
+        """
+        Bring the list up to date from the first reachable seed (the one used
+        last time first, so deltas apply) and save the cache.
+
+        Returns:
+            Number of entries added, updated or removed
+
+        Raises:
+            ProviderError: If no seed node is reachable
+        """
+        seeds = sorted(self.seeds, key=lambda s: s != self.seed)
+        state = (self.seed, self.directory_id, self.version)
+        errors = []
+        for seed in seeds:
+            try:
+                changes = self._fetch(seed)
+            except (requests.RequestException, ValueError) as e:
+                errors.append(f"{seed}: {e}")
+                continue
+            if changes or state != (self.seed, self.directory_id, self.version):
+                self.save()
+            return changes
+        raise ProviderError("No seed node reachable: " + "; ".join(errors))
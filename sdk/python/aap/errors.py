@@ -0,0 +1,33 @@
+"""
+AAP SDK 异常类型。
+"""
+
+
+class AAPError(Exception):
+    """Base exception for AAP SDK."""
+    pass
+
+
+class InvalidAddressError(AAPError):
+    """Invalid AAP address format."""
+    pass
+
+
+class ResolveError(AAPError):
+    """Failed to resolve address."""
+    pass
+
+
+class MessageError(AAPError):
+    """Failed to send/receive message."""
+    pass
+
+
+class ProviderError(AAPError):
+    """Provider is unreachable or returned an error."""
+    pass
+
+
+class SignatureError(AAPError):
+    """Malformed key or signature, or signing support is not installed."""
+    pass
@@ -0,0 +1,78 @@
+"""
+AAP 消息数据结构：解析结果、信封和正文。
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Dict
+
+
+@dataclass
+class ResolveResult:
+    """Result of resolving an AAP address."""
+    version: str
+    aap: str
+    public_key: str
+    receive: Dict[str, str]
+    capabilities: Optional[Dict[str, bool]] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ResolveResult":
+        return cls(
+            version=data.get("version", "0.03"),
+            aap=data.get("aap", ""),
+            public_key=data.get("public_key", ""),
+            receive=data.get("receive", {}),
+            capabilities=data.get("capabilities")
+        )
+
+
+@dataclass
+class MessageEnvelope:
+    """AAP message envelope."""
+    from_addr: str
+    to_addr: str
+    message_type: str = "private"
+    reply_to: Optional[str] = None
+    content_type: str = "text/plain"
+    timestamp: Optional[str] = None
+    content_hash: Optional[str] = None   # "sha256:<hex>"，内容在 Blob 存储中
+    content_size: Optional[int] = None
+    signature: Optional[str] = None      # "ed25519:<base64>"，见 aap.signing
+    
+    def __post_init__(self):
+        if self.timestamp is None:
+            self.timestamp = datetime.utcnow().isoformat() + "Z"
+    
+    def to_dict(self) -> Dict:
+        # 直接构造，避免 asdict() 的深拷贝；字段顺序与 asdict() 一致
+        data = {
+            "from_addr": self.from_addr,
+            "to_addr": self.to_addr,
+            "message_type": self.message_type,
+        }
+        if self.reply_to is not None:
+            data["reply_to"] = self.reply_to
+        data["content_type"] = self.content_type
+        if self.timestamp is not None:
+            data["timestamp"] = self.timestamp
+        if self.content_hash is not None:
+            data["content_hash"] = self.content_hash
+        if self.content_size is not None:
+            data["content_size"] = self.content_size
+        if self.signature is not None:
+            data["signature"] = self.signature
+        return data
+
+
+@dataclass
+class MessagePayload:
+    """AAP message payload."""
+    content: str
+    metadata: Optional[Dict] = None
+    
+    def to_dict(self) -> Dict:
+        data = {"content": self.content}
+        if self.metadata:
+            data["metadata"] = self.metadata
+        return data
@@ -0,0 +1,178 @@
+"""
+消息签名 (Ed25519)
+
+发送方用私钥对规范化的 {"envelope", "payload"} 签名，签名放在信封的 signature
+字段；接收方用发送方 resolve 结果里的 public_key 验证。公钥和签名的格式都是
+"ed25519:<base64>"。
+
+规范化：去掉信封里的 signature 字段后按 key 排序、无空白、UTF-8 编码的 JSON，
+Provider 存储和转发不改变这个结果。
+
+需要可选依赖 cryptography (pip install aap-sdk[sign])，只在用到签名时导入。
+"""
+
+import base64
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .errors import SignatureError
+
+KEY_PREFIX = "ed25519:"
+KEY_SIZE = 32
+SIGNATURE_SIZE = 64
+
+DEFAULT_KEY_CACHE_TTL = 300.0  # 秒
+DEFAULT_KEY_CACHE_SIZE = 1024
+
+
+def _ed25519():
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+    except ImportError:
+        raise SignatureError("Message signing requires cryptography: pip install aap-sdk[sign]") from None
+    return ed25519
+
+
+def _decode(value: str, size: int, name: str) -> bytes:
+    if not isinstance(value, str) or not value.startswith(KEY_PREFIX):
+        raise SignatureError(f"{name} must be '{KEY_PREFIX}<base64>'")
+    try:
+        raw = base64.b64decode(value[len(KEY_PREFIX):], validate=True)
+    except ValueError:
+        raise SignatureError(f"{name} is not valid base64") from None
+    if len(raw) != size:
+        raise SignatureError(f"{name} must be {size} bytes, got {len(raw)}")
+    return raw
+
+
+def _encode(raw: bytes) -> str:
+    return KEY_PREFIX + base64.b64encode(raw).decode("ascii")
+
+
+def canonical_bytes(envelope: Dict, payload: Dict) -> bytes:
+    """The bytes that are signed: sorted-key compact JSON without envelope["signature"]."""
+    if "signature" in envelope:
+        envelope = {k: v for k, v in envelope.items() if k != "signature"}
+    return json.dumps(
+        {"envelope": envelope, "payload": payload},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=DEFAULT_KEY_CACHE_SIZE)
+def _load_public_key(public_key: str):
+    # 解析公钥比验签本身便宜不了多少，同一发送方的消息复用同一个对象
+    return _ed25519().Ed25519PublicKey.from_public_bytes(_decode(public_key, KEY_SIZE, "public_key"))
+
+
+class SigningKey:
+    """
+    An Ed25519 private key for signing outgoing messages.
+    
+    Usage:
+        key = SigningKey.generate()
+        key.public_key   # publish this when registering the agent
+        key.seed         # store this secret to load the key again later
+    """
+    
+    def __init__(self, private_key):
+        self._key = private_key
+        self.public_key = _encode(private_key.public_key().public_bytes_raw())
+    
+    @classmethod
+    def generate(cls) -> "SigningKey":
+        return cls(_ed25519().Ed25519PrivateKey.generate())
+    
+    @classmethod
+    def from_seed(cls, seed: str) -> "SigningKey":
+        """Load a key from the "ed25519:<base64>" seed returned by .seed."""
+        raw = _decode(seed, KEY_SIZE, "seed")
+        return cls(_ed25519().Ed25519PrivateKey.from_private_bytes(raw))
+    
+    @property
+    def seed(self) -> str:
+        return _encode(self._key.private_bytes_raw())
+    
+    def sign(self, envelope: Dict, payload: Dict) -> str:
+        """Signature for envelope["signature"]."""
+        return _encode(self._key.sign(canonical_bytes(envelope, payload)))
+
+
+def verify(public_key: str, envelope: Dict, payload: Dict) -> bool:
+    """
+    Check envelope["signature"] against public_key.
+    
+    Returns False for a missing, malformed or wrong signature or a malformed key.
+    
+    Raises:
+        SignatureError: cryptography is not installed
+    """
+    return verify_batch([(public_key, envelope, payload)])[0]
+
+
+def verify_batch(items: Iterable[Tuple[str, Dict, Dict]]) -> List[bool]:
+    """
+    Verify many (public_key, envelope, payload) triples in one call.
+    
+    Each distinct public key is parsed once (and cached across calls).
+    
+    Raises:
+        SignatureError: cryptography is not installed
+    """
+    _ed25519()
+    from cryptography.exceptions import InvalidSignature
+    
+    results = []
+    for public_key, envelope, payload in items:
+        try:
+            key = _load_public_key(public_key)
+            signature = _decode(envelope.get("signature"), SIGNATURE_SIZE, "signature")
+            key.verify(signature, canonical_bytes(envelope, payload))
+            results.append(True)
+        except (SignatureError, InvalidSignature):
+            results.append(False)
+    return results
+
+
+class KeyCache:
+    """
+    Bounded TTL cache of sender public keys {address: public_key}.
+    
+    An empty string records that the address publishes no key.
+    """
+    
+    def __init__(self, ttl: float = DEFAULT_KEY_CACHE_TTL, max_size: int = DEFAULT_KEY_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # {address: (expires_at, public_key)}，按最近使用排序
+        self._lock = Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, address: str) -> Optional[str]:
+        """Cached key for address, or None when absent or expired."""
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is None:
+                return None
+            if entry[0] <= monotonic():
+                del self._entries[address]
+                return None
+            self._entries.move_to_end(address)
+            return entry[1]
+    
+    def put(self, address: str, public_key: str) -> None:
+        with self._lock:
+            self._entries[address] = (monotonic() + self.ttl, public_key or "")
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,142 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+
+import aap
+from aap import AAPClient, ProviderDirectory, ProviderError, _json
+
+
+class FakeSeed:
+    """In-memory seed node speaking the /api/v1/directory delta protocol."""
+    
+    def __init__(self, name):
+        self.directory_id = name
+        self.log = []   # [(seq, provider, entry or None)]
+        self.requests = []
+        self.up = True
+    
+    def put(self, provider, **fields):
+        self.log.append((len(self.log) + 1, provider, dict(fields, provider=provider, seq=len(self.log) + 1)))
+    
+    def remove(self, provider):
+        self.log.append((len(self.log) + 1, provider, None))
+    
+    def changes(self, params):
+        self.requests.append(dict(params))
+        since = params.get("since")
+        full = since is None or params.get("directory_id") != self.directory_id
+        latest = {}
+        for seq, provider, entry in self.log:
+            if full or seq > since:
+                latest[provider] = entry
+        return {
+            "directory_id": self.directory_id,
+            "version": len(self.log),
+            "full": full,
+            "more": False,
+            "providers": [e for e in latest.values() if e is not None],
+            "removed": [] if full else [p for p, e in latest.items() if e is None],
+        }
+
+
+@pytest.fixture
+def seeds(monkeypatch):
+    seeds = {"http://seed1": FakeSeed("s1"), "http://seed2": FakeSeed("s2")}
+    
+    def get(url, params=None, **kwargs):
+        seed = seeds[url.rsplit("/api/v1/directory", 1)[0]]
+        if not seed.up:
+            raise requests.ConnectionError("seed down")
+        r = requests.Response()
+        r.status_code = 200
+        r._content = _json.dumps(seed.changes(params or {}))
+        return r
+    
+    monkeypatch.setattr(aap.directory.requests, "get", get)
+    for seed in seeds.values():
+        seed.put("a.com", capabilities=["resolve", "compression"], compression={"encodings": ["gzip"]})
+        seed.put("b.com", capabilities=["resolve"], base_url="http://10.0.0.2:8080")
+    return seeds
+
+
+class TestProviderDirectory:
+    """Full download, deltas, on-disk cache and seed failover."""
+    
+    def test_full_then_delta(self, seeds, tmp_path):
+        seed = seeds["http://seed1"]
+        d = ProviderDirectory(["http://seed1", "http://seed2"], cache_path=str(tmp_path / "dir"))
+        assert d.sync() == 2
+        assert d.providers() == ["a.com", "b.com"]
+        
+        seed.put("c.com", capabilities=[])
+        seed.remove("a.com")
+        assert d.sync() == 2
+        assert seed.requests[-1] == {"since": 2, "directory_id": "s1"}
+        assert d.providers() == ["b.com", "c.com"]
+        assert d.version == 4
+    
+    def test_cache_reloaded_lazily(self, seeds, tmp_path):
+        path = str(tmp_path / "dir")
+        ProviderDirectory(["http://seed1"], cache_path=path).sync()
+        
+        d = ProviderDirectory(["http://seed1"], cache_path=path)
+        assert len(d) == 2 and d.version == 2
+        assert d._entries == {}  # 只建索引，不解析条目
+        assert d.get("b.com")["base_url"] == "http://10.0.0.2:8080"
+        assert d.get("missing.com") is None
+        
+        # 增量同步从缓存的 version 开始，未解析的条目原样写回
+        seeds["http://seed1"].put("c.com")
+        assert d.sync() == 1
+        assert seeds["http://seed1"].requests[-1]["since"] == 2
+        assert ProviderDirectory([], cache_path=path).get("a.com")["capabilities"] == ["resolve", "compression"]
+    
+    def test_failover_to_second_seed_downloads_full_list(self, seeds, tmp_path):
+        d = ProviderDirectory(["http://seed1", "http://seed2"], cache_path=str(tmp_path / "dir"))
+        d.sync()
+        seeds["http://seed1"].up = False
+        d.sync()
+        assert seeds["http://seed2"].requests == [{}]  # 另一个种子节点的 version 不能直接用
+        assert d.seed == "http://seed2" and d.directory_id == "s2"
+        
+        seeds["http://seed2"].up = False
+        with pytest.raises(ProviderError):
+            d.sync()
+    
+    def test_corrupt_cache_ignored(self, tmp_path):
+        path = tmp_path / "dir"
+        path.write_bytes(b"garbage")
+        d = ProviderDirectory([], cache_path=str(path))
+        assert len(d) == 0 and d.version == 0
+
+
+class TestClientDirectory:
+    """AAPClient uses directory entries instead of providers/info."""
+    
+    def test_prewarmed_capabilities_and_base_url(self, seeds, monkeypatch):
+        d = ProviderDirectory(["http://seed1"])
+        d.sync()
+        client = AAPClient(directory=d)
+        events = []
+        client.add_hook("cache_hit", events.append)
+        monkeypatch.setattr(aap.client.requests, "get", lambda *a, **k: pytest.fail("providers/info fetched"))
+        
+        assert client._request_encoding("a.com") == "gzip"
+        assert events[0]["cache"] == "directory"
+        assert client._get_url("b.com", "/api/v1/resolve") == "http://10.0.0.2:8080/api/v1/resolve"
+        assert client._get_url("a.com", "/x") == "https://a.com/x"
+        assert client._resolve_provider("ai:tom~novel#b.com")["discovery_method"] == "seed"
+        assert client._resolve_provider("ai:tom~novel#z.com")["discovery_method"] == "direct"
+    
+    def test_gossip_entries_report_their_discovery_method(self, seeds):
+        # 开启 gossip 的 Provider 以目录格式列出成员，条目自带 discovery_method
+        seeds["http://seed1"].put("g.com", capabilities=["gossip"], discovery_method="gossip")
+        d = ProviderDirectory(["http://seed1"])
+        d.sync()
+        client = AAPClient(directory=d)
+        assert client._resolve_provider("ai:tom~novel#g.com")["discovery_method"] == "gossip"
+        assert client._resolve_provider("ai:tom~novel#b.com")["discovery_method"] == "seed"
@@ -0,0 +1,186 @@
+import pytest
+import sys
+import os
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+
+import aap
+from aap import AAPClient, ResolveError
+
+
+def make_response(status=200, body=b'{}', sent=b''):
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    r.request = requests.Request("GET", "https://molten.com/").prepare()
+    r.request.body = sent
+    return r
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    """Replace requests.request with a queue of canned responses."""
+    responses = []
+    
+    def request(method, url, **kwargs):
+        item = responses.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+    
+    monkeypatch.setattr(aap.client.requests, "request", request)
+    monkeypatch.setattr(aap.client, "sleep", lambda s: None)
+    return responses
+
+
+class FakeSpan:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.exceptions = []
+    
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+    
+    def record_exception(self, exc):
+        self.exceptions.append(exc)
+
+
+class FakeTracer:
+    """Duck-typed stand-in for an OpenTelemetry tracer."""
+    
+    def __init__(self):
+        self.spans = []
+    
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = FakeSpan(name, attributes or {})
+        self.spans.append(span)
+        yield span
+
+
+RESOLVE_BODY = b'{"address":"ai:tom~novel#molten.com","receive":{"inbox_url":"https://molten.com/api/v1/inbox/tom~novel"}}'
+
+
+class TestHooks:
+    """Test client instrumentation hooks."""
+    
+    def test_unknown_event_rejected(self):
+        """add_hook only accepts events in HOOK_EVENTS."""
+        with pytest.raises(ValueError):
+            AAPClient().add_hook("nope", print)
+    
+    def test_request_events(self, fake_http):
+        """request_start / request_end carry status, timing and byte counts."""
+        events = []
+        client = AAPClient(hooks={"request_start": [events.append], "request_end": [events.append]})
+        fake_http.append(make_response(body=b'{"ok":true}', sent=b'abc'))
+        
+        client._request_with_retry("POST", "https://molten.com/x")
+        
+        assert [e["event"] for e in events] == ["request_start", "request_end"]
+        end = events[1]
+        assert end["status"] == 200
+        assert end["attempt"] == 1
+        assert end["bytes_sent"] == 3
+        assert end["bytes_received"] == len(b'{"ok":true}')
+        assert end["duration"] >= 0
+        assert end["error"] is None
+    
+    def test_retry_event(self, fake_http):
+        """A failed attempt emits retry before the next attempt."""
+        events = []
+        client = AAPClient(max_retries=2, retry_delay=0.5)
+        client.add_hook("retry", events.append)
+        fake_http.extend([requests.ConnectionError("down"), make_response()])
+        
+        client._request_with_retry("GET", "https://molten.com/x")
+        
+        assert len(events) == 1
+        assert events[0]["attempt"] == 1
+        assert events[0]["delay"] == 0.5
+        assert isinstance(events[0]["error"], requests.ConnectionError)
+    
+    def test_client_errors_not_retried(self, fake_http):
+        """4xx responses fail on the first attempt; 5xx are retried."""
+        events = []
+        client = AAPClient(max_retries=3)
+        client.add_hook("retry", events.append)
+        fake_http.extend([make_response(status=409), make_response(status=503), make_response()])
+        
+        with pytest.raises(aap.ProviderError, match="HTTP 409"):
+            client._request_with_retry("POST", "https://molten.com/x")
+        assert events == []
+        client._request_with_retry("GET", "https://molten.com/x")
+        assert len(events) == 1 and fake_http == []
+    
+    def test_resolve_event_on_failure(self, fake_http):
+        """resolve is emitted with the error when resolution fails."""
+        events = []
+        client = AAPClient(max_retries=1, hooks={"resolve": [events.append]})
+        fake_http.append(make_response(status=404))
+        
+        with pytest.raises(ResolveError):
+            client.resolve("ai:tom~novel#molten.com")
+        
+        assert events[0]["address"] == "ai:tom~novel#molten.com"
+        assert events[0]["error"] is not None
+    
+    def test_provider_info_cache_events(self, fake_http):
+        """The providers/info cache reports a miss then a hit."""
+        events = []
+        client = AAPClient(hooks={"cache_hit": [events.append], "cache_miss": [events.append]})
+        fake_http.append(make_response(body=b'{"capabilities":[]}'))
+        
+        client._request_encoding("molten.com")
+        client._request_encoding("molten.com")
+        
+        assert [e["event"] for e in events] == ["cache_miss", "cache_hit"]
+        assert events[0]["key"] == "molten.com"
+    
+    def test_remove_hook(self, fake_http):
+        """Removed callbacks are no longer called."""
+        events = []
+        client = AAPClient()
+        client.add_hook("request_end", events.append)
+        client.remove_hook("request_end", events.append)
+        fake_http.append(make_response())
+        
+        client._request_with_retry("GET", "https://molten.com/x")
+        
+        assert events == []
+        assert client._hooks == {}
+
+
+class TestTracing:
+    """Test OpenTelemetry-style spans."""
+    
+    def test_send_message_spans(self, fake_http):
+        """send_message nests resolve and HTTP spans with AAP attributes."""
+        tracer = FakeTracer()
+        client = AAPClient(tracer=tracer, compression=False)
+        fake_http.extend([make_response(body=RESOLVE_BODY), make_response(body=b'{"status":"delivered"}')])
+        
+        client.send_message("ai:alice~bot#molten.com", "ai:tom~novel#molten.com", "hi")
+        
+        names = [s.name for s in tracer.spans]
+        assert names == ["aap.send_message", "aap.resolve", "HTTP GET", "HTTP POST"]
+        assert tracer.spans[0].attributes["aap.from"] == "ai:alice~bot#molten.com"
+        assert tracer.spans[0].attributes["aap.to"] == "ai:tom~novel#molten.com"
+        assert tracer.spans[1].attributes["aap.provider"] == "molten.com"
+        assert tracer.spans[3].attributes["http.status_code"] == 200
+    
+    def test_failed_attempt_recorded(self, fake_http):
+        """HTTP errors are recorded on the attempt span."""
+        tracer = FakeTracer()
+        client = AAPClient(tracer=tracer, max_retries=1)
+        fake_http.append(make_response(status=500))
+        
+        with pytest.raises(aap.ProviderError):
+            client._request_with_retry("GET", "https://molten.com/x")
+        
+        assert tracer.spans[0].attributes["http.status_code"] == 500
+        assert len(tracer.spans[0].exceptions) == 1
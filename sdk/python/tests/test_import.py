@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+SDK_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# 冷启动预算 (毫秒)，CI 机器较慢时可用环境变量放宽
+IMPORT_BUDGET_MS = float(os.environ.get("AAP_IMPORT_BUDGET_MS", "50"))
+
+HEAVY_MODULES = ["requests", "urllib3", "dataclasses", "datetime", "http.client", "aap.client", "aap.messages"]
+
+
+def run(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=SDK_DIR, capture_output=True, text=True, check=True
+    )
+
+
+def import_times(module):
+    """{module: cumulative microseconds} from `python -X importtime -c "import <module>"`."""
+    result = run(f"import {module}", "-X", "importtime")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestLazyImport:
+    """`import aap` must not pull in the HTTP stack."""
+    
+    @pytest.mark.parametrize("module", HEAVY_MODULES)
+    def test_heavy_module_not_loaded(self, module):
+        out = run(f"import sys, aap; print({module!r} in sys.modules)").stdout.strip()
+        assert out == "False"
+    
+    def test_address_parsing_without_http_stack(self):
+        code = (
+            "import sys\n"
+            "from aap import parse_address, is_valid_address, InvalidAddressError\n"
+            "assert parse_address('ai:tom~novel#Molten.com').provider == 'molten.com'\n"
+            "assert not is_valid_address('tom')\n"
+            "print('requests' in sys.modules)\n"
+        )
+        assert run(code).stdout.strip() == "False"
+    
+    def test_client_loaded_on_first_use(self):
+        code = (
+            "import sys, aap\n"
+            "client = aap.AAPClient()\n"
+            "print('requests' in sys.modules, aap.AAPClient is aap.client.AAPClient)\n"
+        )
+        assert run(code).stdout.strip() == "True True"
+    
+    def test_lazy_names_in_dir(self):
+        import aap
+        assert {"AAPClient", "MessageEnvelope", "parse_address"} <= set(dir(aap))
+        with pytest.raises(AttributeError):
+            aap.no_such_name
+    
+    def test_import_time_budget(self):
+        times = import_times("aap")
+        assert "requests" not in times
+        assert times["aap"] / 1000 < IMPORT_BUDGET_MS, f"import aap took {times['aap'] / 1000:.1f} ms"
@@ -0,0 +1,129 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+pytest.importorskip("cryptography")
+
+import requests
+
+import aap
+from aap import AAPClient, KeyCache, MessageEnvelope, SignatureError, SigningKey, _json
+from aap.signing import canonical_bytes, verify, verify_batch
+
+ALICE = "ai:alice~main#alice.com"
+TOM = "ai:tom~novel#molten.com"
+
+
+def response(body):
+    r = requests.Response()
+    r.status_code = 200
+    r._content = _json.dumps(body)
+    return r
+
+
+def signed_message(key, sender=ALICE, content="hi"):
+    envelope = MessageEnvelope(from_addr=sender, to_addr=TOM).to_dict()
+    payload = {"content": content}
+    envelope["signature"] = key.sign(envelope, payload)
+    return {"envelope": envelope, "payload": payload, "id": "m"}
+
+
+class TestSigning:
+    """Key handling, canonical form and verification."""
+    
+    def test_sign_and_verify(self):
+        key = SigningKey.generate()
+        message = signed_message(key)
+        
+        assert verify(key.public_key, message["envelope"], message["payload"])
+        assert not verify(key.public_key, message["envelope"], {"content": "forged"})
+        assert not verify(SigningKey.generate().public_key, message["envelope"], message["payload"])
+        assert not verify("ed25519:AAAA", message["envelope"], message["payload"])
+    
+    def test_seed_round_trip(self):
+        key = SigningKey.generate()
+        assert SigningKey.from_seed(key.seed).public_key == key.public_key
+        with pytest.raises(SignatureError):
+            SigningKey.from_seed("ed25519:short")
+    
+    def test_canonical_form(self):
+        """Key order and the signature field do not change the signed bytes."""
+        a = canonical_bytes({"to_addr": "b", "from_addr": "a", "signature": "x"}, {"content": "你好"})
+        b = canonical_bytes({"from_addr": "a", "to_addr": "b"}, {"content": "你好"})
+        assert a == b == '{"envelope":{"from_addr":"a","to_addr":"b"},"payload":{"content":"你好"}}'.encode()
+    
+    def test_verify_batch(self):
+        k1, k2 = SigningKey.generate(), SigningKey.generate()
+        m1, m2 = signed_message(k1), signed_message(k2)
+        items = [(k1.public_key, m1["envelope"], m1["payload"]),
+                 (k2.public_key, m2["envelope"], m2["payload"]),
+                 (k1.public_key, m2["envelope"], m2["payload"])]
+        assert verify_batch(items) == [True, True, False]
+    
+    def test_key_cache_bounded_and_expiring(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(aap.signing, "monotonic", lambda: now[0])
+        cache = KeyCache(ttl=5, max_size=2)
+        cache.put("a", "ka")
+        cache.put("b", "kb")
+        cache.get("a")
+        cache.put("c", "kc")
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("ka", None, "kc")
+        now[0] = 6
+        assert cache.get("a") is None
+
+
+class TestClientSigning:
+    """AAPClient signs outgoing messages and verifies fetched ones."""
+    
+    def test_send_message_signs_envelope(self, monkeypatch):
+        key = SigningKey.generate()
+        posted = {}
+        
+        def request(method, url, **kwargs):
+            if method == "GET":
+                return response({"aap": TOM, "public_key": "", "receive": {"inbox_url": "https://molten.com/api/v1/inbox/tom~novel"}})
+            posted.update(_json.loads(kwargs["data"]))
+            return response({"success": True, "message_id": "m1"})
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        AAPClient(signing_key=key, compression=False).send_message(ALICE, TOM, "hello")
+        
+        assert posted["envelope"]["signature"].startswith("ed25519:")
+        assert verify(key.public_key, posted["envelope"], posted["payload"])
+    
+    def test_fetch_inbox_verify_resolves_each_sender_once(self, monkeypatch):
+        key = SigningKey.generate()
+        messages = [signed_message(key, content=str(i)) for i in range(3)]
+        messages[1]["payload"]["content"] = "forged"
+        messages.append({"envelope": {"from_addr": "ai:bob~main#bob.com", "to_addr": TOM}, "payload": {"content": "unsigned"}})
+        resolved = []
+        
+        def request(method, url, **kwargs):
+            if url.endswith("/api/v1/resolve"):
+                resolved.append(kwargs["params"]["address"])
+                return response({"aap": ALICE, "public_key": key.public_key, "receive": {}})
+            return response({"messages": messages})
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        client = AAPClient()
+        events = []
+        client.add_hook("cache_hit", events.append)
+        
+        fetched = client.fetch_inbox(TOM, "key", verify=True)
+        assert [m["verified"] for m in fetched] == [True, False, True, None]
+        assert resolved == [ALICE]
+        
+        client.fetch_inbox(TOM, "key", verify=True)
+        assert resolved == [ALICE]
+        assert events[-1]["cache"] == "public_key"
+    
+    def test_unknown_sender_is_unverified(self, monkeypatch):
+        def request(method, url, **kwargs):
+            raise requests.ConnectionError("down")
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        client = AAPClient(max_retries=1)
+        assert client.verify_messages([signed_message(SigningKey.generate())]) == [None]
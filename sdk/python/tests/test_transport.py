@@ -0,0 +1,438 @@
+import gzip
+import hashlib
+import json
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dataclasses import asdict
+
+from aap import AAPClient, InvalidAddressError, MessageEnvelope, MessageError, ProviderError, _formats, _json
+
+
+def provider_info(encodings):
+    return {
+        "provider": "molten.com",
+        "capabilities": ["resolve", "inbox", "register", "compression"],
+        "compression": {"encodings": encodings, "min_size": 1024}
+    }
+
+
+class TestRequestCompression:
+    """Test request body compression negotiation."""
+    
+    def test_small_body_not_compressed(self):
+        """Bodies below the threshold are sent as plain JSON."""
+        client = AAPClient()
+        client._provider_info["molten.com"] = provider_info(["gzip"])
+        
+        data, headers = client._encode_body({"a": "b"}, "molten.com")
+        
+        assert "Content-Encoding" not in headers
+        assert json.loads(data) == {"a": "b"}
+    
+    def test_large_body_gzip(self):
+        """Large bodies are gzipped when the provider supports it."""
+        client = AAPClient()
+        client._provider_info["molten.com"] = provider_info(["gzip"])
+        body = {"content": "x" * 5000}
+        
+        data, headers = client._encode_body(body, "molten.com")
+        
+        assert headers["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(data)) == body
+    
+    def test_provider_without_compression(self):
+        """Providers that do not advertise compression get plain JSON."""
+        client = AAPClient()
+        client._provider_info["molten.com"] = None
+        
+        data, headers = client._encode_body({"content": "x" * 5000}, "molten.com")
+        
+        assert "Content-Encoding" not in headers
+    
+    def test_compression_disabled(self):
+        """compression=False never compresses."""
+        client = AAPClient(compression=False)
+        client._provider_info["molten.com"] = provider_info(["gzip"])
+        
+        data, headers = client._encode_body({"content": "x" * 5000}, "molten.com")
+        
+        assert "Content-Encoding" not in headers
+    
+    def test_failed_provider_info_not_cached_for_good(self, monkeypatch):
+        """A transient providers/info failure is retried after PROVIDER_INFO_NEGATIVE_TTL."""
+        import aap
+        import requests
+        
+        now = [100.0]
+        calls = []
+        
+        def get(url, **kwargs):
+            calls.append(url)
+            if len(calls) == 1:
+                raise requests.ConnectionError("down")
+            r = requests.Response()
+            r.status_code = 200
+            r._content = json.dumps(provider_info(["gzip"])).encode()
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "get", get)
+        monkeypatch.setattr(aap.client, "monotonic", lambda: now[0])
+        client = AAPClient()
+        
+        assert client._request_encoding("molten.com") is None
+        assert client._request_encoding("molten.com") is None
+        assert len(calls) == 1  # 失败在 TTL 内缓存
+        now[0] += aap.client.PROVIDER_INFO_NEGATIVE_TTL + 1
+        assert client._request_encoding("molten.com") == "gzip"
+        assert client._request_encoding("molten.com") == "gzip"
+        assert len(calls) == 2
+    
+    def test_unknown_encodings_ignored(self):
+        """Encodings the client cannot produce are skipped."""
+        client = AAPClient()
+        client._provider_info["molten.com"] = provider_info(["br"])
+        
+        assert client._request_encoding("molten.com") is None
+
+
+class TestEnvelopeSerialization:
+    """Test direct envelope serialization."""
+    
+    def test_to_dict_matches_asdict(self):
+        """to_dict is equivalent to filtering None out of asdict()."""
+        for reply_to in (None, "msg-1"):
+            env = MessageEnvelope(
+                from_addr="ai:alice~main#provider.com",
+                to_addr="ai:tom~novel#molten.com",
+                reply_to=reply_to
+            )
+            expected = {k: v for k, v in asdict(env).items() if v is not None}
+            
+            assert env.to_dict() == expected
+            assert list(env.to_dict()) == list(expected)
+    
+    def test_blob_fields(self):
+        """Blob hash and size are included only when set."""
+        env = MessageEnvelope(
+            from_addr="ai:alice~main#provider.com",
+            to_addr="ai:tom~novel#molten.com",
+            content_hash="sha256:" + "a" * 64,
+            content_size=1024
+        )
+        
+        assert env.to_dict()["content_hash"] == "sha256:" + "a" * 64
+        assert env.to_dict()["content_size"] == 1024
+        assert "content_hash" not in MessageEnvelope("ai:a~b#c.d", "ai:e~f#g.h").to_dict()
+    
+    def test_blob_url(self):
+        """Blob URLs accept prefixed and bare hashes."""
+        client = AAPClient()
+        
+        assert client._blob_url("molten.com") == "https://molten.com/api/v1/blobs"
+        assert client._blob_url("molten.com", "sha256:abc") == "https://molten.com/api/v1/blobs/abc"
+        assert client._blob_url("localhost:5000", "abc") == "http://localhost:5000/api/v1/blobs/abc"
+    
+    def test_upload_blob_to_own_provider(self, monkeypatch):
+        """Blobs are uploaded to the sender's Provider with the sender's API key."""
+        import aap.client
+        calls = []
+        
+        class Response:
+            headers = {"Content-Type": "application/json"}
+            content = b""
+            
+            def raise_for_status(self):
+                pass
+        
+        def post(url, data, headers, **kwargs):
+            body = b"".join(data)
+            calls.append((url, headers["Authorization"]))
+            response = Response()
+            response.content = json.dumps({"content_hash": "sha256:" + hashlib.sha256(body).hexdigest(),
+                                           "size": len(body), "deduplicated": False}).encode()
+            return response
+        
+        monkeypatch.setattr(aap.client.requests, "post", post)
+        client = AAPClient()
+        
+        result = client.upload_blob("myprovider.com", b"chapter", api_key="alice-key")
+        
+        assert calls == [("https://myprovider.com/api/v1/blobs", "Bearer alice-key")]
+        assert result["size"] == 7
+    
+    def test_json_round_trip(self):
+        """The JSON codec round-trips non-ASCII content."""
+        body = {"payload": {"content": "你好！", "metadata": {"n": 1}}}
+        
+        assert _json.loads(_json.dumps(body)) == body
+    
+    def test_json_wide_integers(self):
+        """Integers beyond 64 bits round-trip exactly instead of becoming floats."""
+        for n in (2**64 - 1, -2**63, 2**70, -2**70):
+            body = {"payload": {"metadata": {"n": n}}}
+            
+            assert _json.loads(_json.dumps(body)) == body
+            assert _json.loads(_json.dumps(body).decode("utf-8")) == body
+
+
+
+class TestInboxQueries:
+    """Test inbox search and thread requests."""
+    
+    def test_filters_sent_as_query_params(self, monkeypatch):
+        """Only the filters given are sent, with q for full-text."""
+        import aap
+        import requests
+        sent = {}
+        
+        def request(method, url, **kwargs):
+            sent.update(kwargs["params"])
+            r = requests.Response()
+            r.status_code = 200
+            r._content = b'{"messages":[],"count":0,"next_cursor":null}'
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        data = AAPClient().search_inbox(
+            "ai:tom~novel#molten.com", "key", from_addr="ai:amy~main#x.com", query="draft"
+        )
+        
+        assert sent == {"limit": 20, "from_addr": "ai:amy~main#x.com", "q": "draft"}
+        assert data["next_cursor"] is None
+
+    
+    def test_fetch_thread_url(self, monkeypatch):
+        """fetch_thread requests the thread endpoint for the message id."""
+        import aap
+        import requests
+        seen = {}
+        
+        def request(method, url, **kwargs):
+            seen["url"] = url
+            seen["params"] = kwargs["params"]
+            r = requests.Response()
+            r.status_code = 200
+            r._content = b'{"thread_id":"m-1","messages":[],"count":0,"next_cursor":null}'
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        data = AAPClient().fetch_thread("ai:tom~novel#molten.com", "key", "m-1", limit=10)
+        
+        assert seen["url"] == "https://molten.com/api/v1/threads/m-1"
+        assert seen["params"] == {"limit": 10}
+        assert data["thread_id"] == "m-1"
+    
+    def test_publish_through_outbox(self, monkeypatch):
+        """publish with an API key posts to the author's own outbox."""
+        import aap
+        import requests
+        seen = {}
+        
+        def request(method, url, **kwargs):
+            seen.update(url=url, headers=kwargs["headers"], data=kwargs["data"])
+            r = requests.Response()
+            r.status_code = 201
+            r._content = b'{"success":true,"status":"delivered","message_id":"feed-1"}'
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        client = AAPClient(compress_threshold=10)
+        client._provider_info["molten.com"] = provider_info(["gzip"])
+        client.publish("ai:alice~main#molten.com", "hello", api_key="key")
+        
+        assert seen["url"] == "https://molten.com/api/v1/outbox"
+        assert seen["headers"]["Authorization"] == "Bearer key"
+        assert seen["headers"]["Content-Encoding"] == "gzip"  # 与其他发送一样协商编码和压缩
+        body = json.loads(gzip.decompress(seen["data"]))
+        assert body["envelope"]["to_addr"] == "ai:feed~public#molten.com"
+        assert body["payload"]["content"] == "hello"
+        
+        key = seen["headers"]["X-Idempotency-Key"]
+        client.publish("ai:alice~main#molten.com", "again", api_key="key")
+        assert seen["headers"]["X-Idempotency-Key"] != key
+    
+    def test_publish_without_credentials(self, monkeypatch):
+        """Without api_key or signing_key publish fails before sending anything."""
+        import aap
+        
+        monkeypatch.setattr(aap.client.requests, "request", lambda *a, **k: pytest.fail("request sent"))
+        with pytest.raises(MessageError, match="api_key"):
+            AAPClient().publish("ai:alice~main#molten.com", "hello")
+
+
+
+class TestRegisterMany:
+    """Test batch agent registration."""
+    
+    def fake_provider(self, monkeypatch, sent, status=200):
+        import aap
+        import requests
+        
+        monkeypatch.setattr(aap.client, "sleep", lambda s: pytest.fail("registration was retried"))
+        
+        def request(method, url, **kwargs):
+            body = json.loads(kwargs["data"])
+            sent.append((url, body))
+            if status is None:
+                raise requests.Timeout("read timed out")
+            r = requests.Response()
+            r.status_code = status
+            if url.endswith(":batch") and status == 200:
+                results = [{"status": 201, "aap_address": a["aap_address"], "api_key": "k-" + a["aap_address"]}
+                           for a in body["agents"]]
+                r._content = json.dumps({"results": results, "registered": len(results)}).encode()
+            elif url.endswith(":batch") and status >= 500:
+                r._content = b'{"error":{"code":"INTERNAL_ERROR","message":"boom"}}'
+            elif url.endswith(":batch"):
+                r._content = json.dumps({"error": {"code": "ALREADY_EXISTS", "message": "agents[1]: taken"},
+                                         "errors": [{"index": 1, "code": "ALREADY_EXISTS", "message": "taken"}]}).encode()
+            elif body["aap_address"].startswith("ai:taken"):
+                r.status_code = 409
+                r._content = b'{"error":{"code":"ALREADY_EXISTS","message":"Agent already registered"}}'
+            else:
+                r.status_code = 201
+                r._content = json.dumps({"success": True, "aap_address": body["aap_address"], "api_key": "k",
+                                         "message": "Agent registered successfully"}).encode()
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+    
+    def test_batches_per_provider_in_order(self, monkeypatch):
+        """Agents are grouped by provider and batch_size; results keep input order."""
+        sent = []
+        self.fake_provider(monkeypatch, sent)
+        client = AAPClient()
+        for provider in ("a.com", "b.com"):
+            client._provider_info[provider] = dict(provider_info([]), capabilities=["register_batch"])
+        agents = ["ai:a1~x#a.com", {"aap_address": "ai:b1~x#B.com", "model": "gpt"}, "ai:a2~x#a.com", "ai:a3~x#a.com"]
+        
+        results = client.register_many(agents, batch_size=2)
+        
+        assert [r["aap_address"] for r in results] == ["ai:a1~x#a.com", "ai:b1~x#b.com", "ai:a2~x#a.com", "ai:a3~x#a.com"]
+        assert [(url, len(body["agents"])) for url, body in sent] == [
+            ("https://a.com/api/agent/register:batch", 2),
+            ("https://a.com/api/agent/register:batch", 1),
+            ("https://b.com/api/agent/register:batch", 1),
+        ]
+        assert sent[2][1]["agents"][0]["model"] == "gpt"
+        assert sent[0][1]["atomic"] is False
+    
+    def test_fallback_without_batch_capability(self, monkeypatch):
+        """Providers without register_batch get one request per agent; rejections become results."""
+        sent = []
+        self.fake_provider(monkeypatch, sent)
+        client = AAPClient()
+        client._provider_info["old.com"] = provider_info([])
+        
+        results = client.register_many(["ai:new~x#old.com", "ai:taken~x#old.com"])
+        
+        assert [url for url, _ in sent] == ["https://old.com/api/agent/register"] * 2
+        assert results[0] == {"status": 201, "aap_address": "ai:new~x#old.com", "api_key": "k"}
+        assert results[1]["status"] == 409 and results[1]["error"]["code"] == "ALREADY_EXISTS"
+        with pytest.raises(ProviderError):
+            client.register_many(["ai:new~x#old.com"], atomic=True)
+    
+    def test_atomic_rejection_raises(self, monkeypatch):
+        sent = []
+        self.fake_provider(monkeypatch, sent, status=409)
+        client = AAPClient()
+        client._provider_info["a.com"] = dict(provider_info([]), capabilities=["register_batch"])
+        
+        with pytest.raises(ProviderError, match=r"agents\[1\]: ALREADY_EXISTS"):
+            client.register_many(["ai:a~x#a.com", "ai:b~x#a.com"], atomic=True)
+        assert len(sent) == 1
+        assert sent[0][1]["atomic"] is True
+    
+    @pytest.mark.parametrize("status", [None, 503])
+    def test_registration_is_not_retried(self, monkeypatch, status):
+        """A timeout may mean the agents were registered; retrying would turn that into a 409."""
+        sent = []
+        self.fake_provider(monkeypatch, sent, status=status)
+        client = AAPClient()
+        client._provider_info["a.com"] = dict(provider_info([]), capabilities=["register_batch"])
+        
+        with pytest.raises(ProviderError):
+            client.register_many(["ai:a~x#a.com", "ai:b~x#a.com"])
+        assert len(sent) == 1
+    
+    def test_invalid_address_sends_nothing(self, monkeypatch):
+        sent = []
+        self.fake_provider(monkeypatch, sent)
+        with pytest.raises(InvalidAddressError):
+            AAPClient().register_many(["ai:a~x#a.com", "not-an-address"])
+        assert sent == []
+
+
+@pytest.mark.skipif(_formats.msgpack is None, reason="msgpack not installed")
+class TestWireFormat:
+    """Test MessagePack body negotiation."""
+    
+    def info(self, content_types):
+        return dict(provider_info(["gzip"]), content_types=content_types)
+    
+    def test_round_trip(self):
+        """MessagePack and CBOR decode to the same values as JSON."""
+        body = {"envelope": {"content_size": 2 ** 40}, "payload": {"content": "你好！", "metadata": {"x": [1.5, None, True]}}}
+        mimes = [_formats.MSGPACK] + ([_formats.CBOR] if _formats.cbor2 else [])
+        for mime in mimes:
+            assert _formats.loads(_formats.dumps(body, mime), mime) == _json.loads(_json.dumps(body))
+    
+    def test_body_format_follows_provider(self):
+        """Binary bodies only go to providers that list the content type."""
+        client = AAPClient(wire_format="msgpack")
+        client._provider_info["molten.com"] = self.info(["application/json", "application/msgpack"])
+        client._provider_info["old.com"] = self.info(["application/json"])
+        client._provider_info["none.com"] = None
+        body = {"content": "x" * 5000}
+        
+        data, headers = client._encode_body(body, "molten.com")
+        assert headers["Content-Type"] == "application/msgpack"
+        assert _formats.msgpack.unpackb(gzip.decompress(data)) == body
+        for provider in ("old.com", "none.com"):
+            data, headers = client._encode_body(body, provider)
+            assert headers["Content-Type"] == "application/json"
+    
+    def test_accept_header_and_binary_response(self, monkeypatch):
+        """Responses are decoded by their Content-Type; JSON still works."""
+        import aap
+        import requests
+        sent = []
+        bodies = [
+            (_formats.MSGPACK, _formats.dumps({"messages": [{"id": "m-1"}], "count": 1}, _formats.MSGPACK)),
+            ("application/json", b'{"messages":[{"id":"m-2"}],"count":1}'),
+        ]
+        
+        def request(method, url, **kwargs):
+            sent.append(kwargs["headers"])
+            r = requests.Response()
+            r.status_code = 200
+            r.headers["Content-Type"], r._content = bodies.pop(0)
+            return r
+        
+        monkeypatch.setattr(aap.client.requests, "request", request)
+        client = AAPClient(wire_format="msgpack")
+        
+        assert client.fetch_inbox("ai:tom~novel#molten.com", "key")[0]["id"] == "m-1"
+        assert client.fetch_inbox("ai:tom~novel#molten.com", "key")[0]["id"] == "m-2"
+        assert sent[0]["Accept"] == "application/msgpack, application/json;q=0.5"
+        assert sent[0]["Authorization"] == "Bearer key"
+    
+    def test_json_client_sends_no_accept(self):
+        """The default client keeps plain JSON."""
+        client = AAPClient()
+        client._provider_info["molten.com"] = self.info(["application/json", "application/msgpack"])
+        
+        data, headers = client._encode_body({"a": "b"}, "molten.com")
+        assert headers["Content-Type"] == "application/json"
+        assert client._accept is None
+    
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            AAPClient(wire_format="xml")
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])